@@ -0,0 +1,265 @@
+"""
+Motor de seleção adaptativa de perguntas (repetição espaçada por caixas de Leitner).
+
+O estado de um estudante em um quiz é guardado em um único BinaryField, como
+arrays compactos: para cada caixa, um array de vencimentos (minutos desde a
+época) ordenado e o array paralelo com os ids das perguntas. Cada pergunta
+ocupa 8 bytes, independentemente de quantas vezes foi respondida.
+
+Selecionar perguntas vencidas é uma busca binária por caixa:
+O(CAIXAS * log n + k), sem varrer o banco de perguntas. Ao carregar, um índice
+pergunta -> caixa é montado para que saber se uma pergunta já foi vista custe O(1).
+"""
+
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_right
+from heapq import merge
+from itertools import islice
+
+from django.db import transaction
+
+from . import caching
+from .models import MemoriaAdaptativa, Pergunta
+from .versioning import versao_global
+
+# Intervalo de revisão (minutos) de cada caixa: errar volta para a caixa 0,
+# acertar avança uma caixa
+INTERVALOS = (10, 60 * 24, 60 * 24 * 3, 60 * 24 * 7, 60 * 24 * 16, 60 * 24 * 35)
+CAIXAS = len(INTERVALOS)
+
+FORMATO_VERSAO = 1
+_CABECALHO = struct.Struct('<BB')
+_TIPO = 'I'  # inteiro sem sinal de 32 bits
+
+if array(_TIPO).itemsize != 4:  # pragma: no cover - plataformas exóticas
+    _TIPO = 'L'
+
+
+def minutos(agora=None):
+    """
+    Converte um timestamp (ou o instante atual) em minutos desde a época
+    """
+    return int((time.time() if agora is None else agora) // 60)
+
+
+def _para_bytes(valores):
+    if sys.byteorder == 'big':
+        valores = array(_TIPO, valores)
+        valores.byteswap()
+    return valores.tobytes()
+
+
+def _de_bytes(dados):
+    valores = array(_TIPO)
+    valores.frombytes(dados)
+    if sys.byteorder == 'big':
+        valores.byteswap()
+    return valores
+
+
+class EstadoMemoria:
+    """
+    Filas de revisão de um estudante em um quiz, uma por caixa de Leitner
+    """
+
+    def __init__(self):
+        self.vencimentos = [array(_TIPO) for _ in range(CAIXAS)]
+        self.perguntas = [array(_TIPO) for _ in range(CAIXAS)]
+        self.indice = {}  # pergunta_id -> caixa
+
+    @classmethod
+    def carregar(cls, dados):
+        """
+        Reconstrói o estado a partir do BinaryField (bytes vazios = estado novo)
+        """
+        estado = cls()
+        if not dados:
+            return estado
+        dados = bytes(dados)
+        versao, caixas = _CABECALHO.unpack_from(dados)
+        if versao != FORMATO_VERSAO:
+            raise ValueError(f'Formato de memória adaptativa desconhecido: {versao}')
+        contagens = struct.unpack_from(f'<{caixas}I', dados, _CABECALHO.size)
+        posicao = _CABECALHO.size + 4 * caixas
+        for caixa, quantidade in enumerate(contagens):
+            tamanho = 4 * quantidade
+            vencimentos = _de_bytes(dados[posicao:posicao + tamanho])
+            perguntas = _de_bytes(dados[posicao + tamanho:posicao + 2 * tamanho])
+            posicao += 2 * tamanho
+            if caixa < CAIXAS:
+                # As filas já estão ordenadas: cópia direta dos arrays
+                estado.vencimentos[caixa] = vencimentos
+                estado.perguntas[caixa] = perguntas
+                estado.indice.update(dict.fromkeys(perguntas, caixa))
+            else:
+                # Estados gravados com mais caixas são acomodados na última
+                for vencimento, pergunta_id in zip(vencimentos, perguntas):
+                    estado._inserir(CAIXAS - 1, vencimento, pergunta_id)
+        return estado
+
+    def serializar(self):
+        """
+        Empacota o estado em bytes para o BinaryField
+        """
+        partes = [
+            _CABECALHO.pack(FORMATO_VERSAO, CAIXAS),
+            struct.pack(f'<{CAIXAS}I', *(len(fila) for fila in self.perguntas)),
+        ]
+        for vencimentos, perguntas in zip(self.vencimentos, self.perguntas):
+            partes.append(_para_bytes(vencimentos))
+            partes.append(_para_bytes(perguntas))
+        return b''.join(partes)
+
+    def __len__(self):
+        return sum(len(fila) for fila in self.perguntas)
+
+    def _inserir(self, caixa, vencimento, pergunta_id):
+        vencimentos = self.vencimentos[caixa]
+        posicao = bisect_right(vencimentos, vencimento)
+        vencimentos.insert(posicao, vencimento)
+        self.perguntas[caixa].insert(posicao, pergunta_id)
+        self.indice[pergunta_id] = caixa
+
+    def localizar(self, pergunta_id):
+        """
+        Retorna (caixa, posição) da pergunta, ou None se ela nunca foi vista
+        """
+        caixa = self.indice.get(pergunta_id)
+        if caixa is None:
+            return None
+        return caixa, self.perguntas[caixa].index(pergunta_id)
+
+    def contem(self, pergunta_id):
+        return pergunta_id in self.indice
+
+    def caixa(self, pergunta_id):
+        """
+        Caixa atual da pergunta (0 = menos dominada), ou None se nunca vista
+        """
+        return self.indice.get(pergunta_id)
+
+    def registrar(self, pergunta_id, correta, agora=None):
+        """
+        Move a pergunta de caixa conforme a resposta e agenda a próxima revisão
+        """
+        agora = minutos(agora)
+        local = self.localizar(pergunta_id)
+        if local is None:
+            caixa = 1 if correta else 0
+        else:
+            caixa_atual, posicao = local
+            del self.vencimentos[caixa_atual][posicao]
+            del self.perguntas[caixa_atual][posicao]
+            caixa = min(caixa_atual + 1, CAIXAS - 1) if correta else 0
+        self._inserir(caixa, agora + INTERVALOS[caixa], pergunta_id)
+        return caixa
+
+    def vencidas(self, quantidade, agora=None, permitidas=None):
+        """
+        Até `quantidade` perguntas com revisão vencida, das caixas mais fracas
+        para as mais fortes e, dentro da caixa, das mais atrasadas primeiro.
+        Com `permitidas`, perguntas fora desse conjunto são ignoradas.
+        """
+        agora = minutos(agora)
+        selecionadas = []
+        for vencimentos, perguntas in zip(self.vencimentos, self.perguntas):
+            faltam = quantidade - len(selecionadas)
+            if faltam <= 0:
+                break
+            vencidas = islice(perguntas, bisect_right(vencimentos, agora))
+            if permitidas is not None:
+                vencidas = (pergunta_id for pergunta_id in vencidas if pergunta_id in permitidas)
+            selecionadas.extend(islice(vencidas, faltam))
+        return selecionadas
+
+    def proximas(self, quantidade, excluir=(), permitidas=None):
+        """
+        Perguntas com revisão mais próxima (para completar a sessão), fora de
+        `excluir` e, se informado, dentro de `permitidas`
+        """
+        excluir = set(excluir)
+        filas = (
+            (
+                (vencimento, pergunta_id)
+                for vencimento, pergunta_id in zip(vencimentos, perguntas)
+                if pergunta_id not in excluir and (permitidas is None or pergunta_id in permitidas)
+            )
+            for vencimentos, perguntas in zip(self.vencimentos, self.perguntas)
+        )
+        # Cada fila já está ordenada por vencimento: basta intercalar até completar
+        return [pergunta_id for _, pergunta_id in islice(merge(*filas), quantidade)]
+
+
+def perguntas_do_quiz(quiz_id):
+    """
+    Ids das perguntas do quiz na ordem do autor, em cache pela versão de conteúdo
+    """
+    return caching.obter(
+        f'perguntas_quiz:{quiz_id}',
+        lambda: list(Pergunta.objects.filter(quiz_id=quiz_id).order_by('ordem', 'pk').values_list('pk', flat=True)),
+        versao_global('conteudo'),
+        60 * 60 * 24,
+        obsoleto=False,
+    )
+
+
+def selecionar_ids(memoria, ids_quiz, quantidade, agora=None):
+    """
+    Escolhe os ids da próxima sessão: vencidas primeiro, depois perguntas novas
+    (na ordem do quiz, a partir do cursor da memória) e, por fim, as revisões
+    mais próximas
+    """
+    estado = EstadoMemoria.carregar(memoria.estado)
+    # Perguntas removidas do quiz que ainda estejam na memória não ocupam vagas
+    permitidas = set(ids_quiz)
+    selecionadas = estado.vencidas(quantidade, agora, permitidas)
+    escolhidas = set(selecionadas)
+
+    cursor = memoria.novas_introduzidas
+    while len(selecionadas) < quantidade and cursor < len(ids_quiz):
+        pergunta_id = ids_quiz[cursor]
+        if pergunta_id not in escolhidas and not estado.contem(pergunta_id):
+            selecionadas.append(pergunta_id)
+            escolhidas.add(pergunta_id)
+        cursor += 1
+
+    if len(selecionadas) < quantidade:
+        selecionadas.extend(
+            estado.proximas(quantidade - len(selecionadas), excluir=escolhidas, permitidas=permitidas)
+        )
+    return selecionadas
+
+
+def proximas_perguntas(estudante, quiz, quantidade=10, agora=None):
+    """
+    Próximo conjunto de perguntas de prática adaptativa, com as respostas pré-carregadas.
+    Perguntas removidas do quiz que ainda estejam na memória são ignoradas na seleção.
+    """
+    memoria, _ = MemoriaAdaptativa.objects.get_or_create(estudante=estudante, quiz=quiz)
+    ids = selecionar_ids(memoria, perguntas_do_quiz(quiz.pk), quantidade, agora)
+    perguntas = Pergunta.objects.filter(pk__in=ids).prefetch_related('respostas').in_bulk()
+    return [perguntas[pid] for pid in ids if pid in perguntas]
+
+
+def registrar_resposta(estudante, pergunta, correta, agora=None):
+    """
+    Atualiza a memória do estudante após uma resposta. Retorna a nova caixa.
+    A linha é travada para que respostas simultâneas não se sobrescrevam.
+    """
+    with transaction.atomic():
+        memoria, _ = MemoriaAdaptativa.objects.select_for_update().get_or_create(
+            estudante=estudante, quiz_id=pergunta.quiz_id
+        )
+        estado = EstadoMemoria.carregar(memoria.estado)
+        caixa = estado.registrar(pergunta.pk, correta, agora)
+        memoria.estado = estado.serializar()
+
+        # Avança o cursor de perguntas novas enquanto as próximas já forem conhecidas
+        ids_quiz = perguntas_do_quiz(pergunta.quiz_id)
+        while memoria.novas_introduzidas < len(ids_quiz) and estado.contem(ids_quiz[memoria.novas_introduzidas]):
+            memoria.novas_introduzidas += 1
+        memoria.save(update_fields=['estado', 'novas_introduzidas', 'data_atualizacao'])
+    return caixa
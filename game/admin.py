@@ -1,10 +1,19 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
+from django.db.models import Q
+from django.utils.html import format_html_join
 from .models import (
     Estudante, Pontuacao, Conquista, EstudanteConquista, 
-    Quiz, Pergunta, Resposta, Resultado, Modulo, Desafio, ProgressoDesafio
+    Quiz, Pergunta, Resposta, Resultado, Modulo, Desafio, ProgressoDesafio, MemoriaAdaptativa,
+    EtapaDilema, EscolhaDilema, EstadoDilema, EventoPontuacao, NivelPontuacao,
 )
+from . import counters
+from .adaptive import EstadoMemoria
+from .analytics import classificar, taxas_escolha
+from .dilemma import GrafoInvalido, compilar, percurso
+from .scoring import registrar_pontos
+from .search import backend as backend_busca, ids_encontrados
 
 
 class EstudanteInline(admin.StackedInline):
@@ -65,10 +74,63 @@ class PontuacaoAdmin(admin.ModelAdmin):
     list_display = ('estudante', 'pontos_totais', 'nivel_atual', 'data_atualizacao')
     list_filter = ('nivel_atual', 'data_atualizacao')
     search_fields = ('estudante__nome', 'estudante__user__username')
-    readonly_fields = ('data_atualizacao',)
+    # Os pontos só mudam por lançamentos no livro-razão (Eventos de Pontuação)
+    readonly_fields = ('pontos_totais', 'nivel_atual', 'data_atualizacao')
     ordering = ('-pontos_totais',)
 
 
+@admin.register(NivelPontuacao)
+class NivelPontuacaoAdmin(admin.ModelAdmin):
+    """
+    Admin para a curva de níveis
+    """
+    list_display = ('nivel', 'pontos_minimos', 'nome')
+    ordering = ('pontos_minimos',)
+
+    def _lembrar_renivelamento(self, request):
+        messages.info(
+            request,
+            'A curva de níveis mudou. Execute "python manage.py renivelar" para atualizar o nível dos estudantes.'
+        )
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        self._lembrar_renivelamento(request)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self._lembrar_renivelamento(request)
+
+
+@admin.register(EventoPontuacao)
+class EventoPontuacaoAdmin(admin.ModelAdmin):
+    """
+    Admin para o livro-razão de pontos: lançamentos podem ser incluídos
+    (ajustes manuais), mas nunca alterados ou excluídos
+    """
+    list_display = ('estudante', 'delta', 'origem', 'data')
+    list_filter = ('data',)
+    list_select_related = ('estudante',)
+    search_fields = ('estudante__nome', 'origem')
+    fields = ('estudante', 'delta', 'origem')
+    autocomplete_fields = ('estudante',)
+
+    def get_changeform_initial_data(self, request):
+        initial = super().get_changeform_initial_data(request)
+        initial.setdefault('origem', f'ajuste_admin:{request.user.username}')
+        return initial
+
+    def save_model(self, request, obj, form, change):
+        evento = registrar_pontos(obj.estudante, obj.delta, obj.origem)
+        obj.pk = evento.pk
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Conquista)
 class ConquistaAdmin(admin.ModelAdmin):
     """
@@ -103,6 +165,38 @@ class EstudanteConquistaAdmin(admin.ModelAdmin):
     ordering = ('-data_desbloqueio',)
 
 
+class BuscaTextualMixin:
+    """
+    Troca a busca por LIKE '%...%' do admin pelo índice de busca textual
+    """
+    tipo_busca = None
+    # Outros tipos indexados cujos resultados também valem: {tipo: campo com o id}
+    relacionados_busca = {}
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip() or backend_busca() is None:
+            return super().get_search_results(request, queryset, search_term)
+        filtro = Q(pk__in=ids_encontrados(self.tipo_busca, search_term))
+        for tipo, campo in self.relacionados_busca.items():
+            filtro |= Q(**{f'{campo}__in': ids_encontrados(tipo, search_term)})
+        return queryset.filter(filtro), False
+
+
+class ContadoresMixin:
+    """
+    Recalcula os contadores do quiz uma vez por formulário salvo (ou exclusão
+    em massa), e não a cada pergunta ou resposta dos inlines
+    """
+
+    def save_related(self, request, form, formsets, change):
+        with counters.em_lote():
+            super().save_related(request, form, formsets, change)
+
+    def delete_queryset(self, request, queryset):
+        with counters.em_lote():
+            super().delete_queryset(request, queryset)
+
+
 class RespostaInline(admin.TabularInline):
     """
     Inline para exibir respostas de uma pergunta
@@ -113,14 +207,18 @@ class RespostaInline(admin.TabularInline):
 
 
 @admin.register(Pergunta)
-class PerguntaAdmin(admin.ModelAdmin):
+class PerguntaAdmin(ContadoresMixin, BuscaTextualMixin, admin.ModelAdmin):
     """
     Admin para o modelo Pergunta
     """
-    list_display = ('texto_curto', 'quiz', 'ordem', 'pontos')
+    list_display = ('texto_curto', 'quiz', 'ordem', 'pontos', 'dificuldade', 'discriminacao', 'diagnostico')
     list_filter = ('quiz', 'ordem')
+    list_select_related = ('quiz', 'estatistica')
     search_fields = ('texto', 'quiz__titulo')
+    tipo_busca = 'pergunta'
+    relacionados_busca = {'quiz': 'quiz_id'}
     inlines = [RespostaInline]
+    readonly_fields = ('dificuldade', 'discriminacao', 'diagnostico', 'taxas_escolha')
     fieldsets = (
         ('Informações Básicas', {
             'fields': ('quiz', 'texto', 'explicacao')
@@ -128,12 +226,55 @@ class PerguntaAdmin(admin.ModelAdmin):
         ('Configurações', {
             'fields': ('ordem', 'pontos')
         }),
+        ('Análise de Itens', {
+            'fields': ('dificuldade', 'discriminacao', 'diagnostico', 'taxas_escolha'),
+            'description': 'Atualizada pelo comando "python manage.py analisar_perguntas".',
+            'classes': ('collapse',)
+        }),
     )
     
     def texto_curto(self, obj):
         """Retorna uma versão curta do texto da pergunta"""
         return obj.texto[:50] + "..." if len(obj.texto) > 50 else obj.texto
     texto_curto.short_description = 'Pergunta'
+    
+    def _estatistica(self, obj):
+        return getattr(obj, 'estatistica', None)
+    
+    def dificuldade(self, obj):
+        """Retorna a proporção de acertos da pergunta"""
+        estatistica = self._estatistica(obj)
+        if not estatistica or estatistica.dificuldade is None:
+            return "-"
+        return f"{estatistica.dificuldade:.0%}"
+    dificuldade.short_description = 'Acertos'
+    
+    def discriminacao(self, obj):
+        """Retorna a correlação ponto-bisserial da pergunta"""
+        estatistica = self._estatistica(obj)
+        if not estatistica or estatistica.discriminacao is None:
+            return "-"
+        return f"{estatistica.discriminacao:.2f}"
+    discriminacao.short_description = 'Discriminação'
+    
+    def diagnostico(self, obj):
+        """Retorna o diagnóstico resumido da pergunta"""
+        return classificar(self._estatistica(obj))
+    diagnostico.short_description = 'Diagnóstico'
+    
+    def taxas_escolha(self, obj):
+        """Retorna a taxa de escolha de cada alternativa"""
+        taxas = taxas_escolha(self._estatistica(obj))
+        if not taxas:
+            return "-"
+        return format_html_join(
+            '', '<div>{}{}: {}</div>',
+            (
+                ('✔ ' if resposta.correta else '', resposta.texto[:60], f"{taxas.get(resposta.pk, 0):.0%}")
+                for resposta in obj.respostas.all()
+            )
+        )
+    taxas_escolha.short_description = 'Escolha das alternativas'
 
 
 class PerguntaInline(admin.TabularInline):
@@ -154,15 +295,19 @@ class PerguntaInline(admin.TabularInline):
 
 
 @admin.register(Quiz)
-class QuizAdmin(admin.ModelAdmin):
+class QuizAdmin(ContadoresMixin, BuscaTextualMixin, admin.ModelAdmin):
     """
     Admin para o modelo Quiz
     """
-    list_display = ('titulo', 'tema', 'nivel_dificuldade', 'pontos_base', 'ativo', 'data_criacao')
+    list_display = (
+        'titulo', 'tema', 'nivel_dificuldade', 'pontos_base', 'total_perguntas', 'pontos_maximos', 'ativo',
+        'data_criacao',
+    )
     list_filter = ('nivel_dificuldade', 'tema', 'ativo', 'data_criacao')
     search_fields = ('titulo', 'descricao', 'tema')
+    tipo_busca = 'quiz'
     inlines = [PerguntaInline]
-    readonly_fields = ('data_criacao',)
+    readonly_fields = ('data_criacao', 'total_perguntas', 'pontos_maximos', 'total_respostas')
     fieldsets = (
         ('Informações Básicas', {
             'fields': ('titulo', 'descricao', 'tema', 'ativo')
@@ -171,7 +316,7 @@ class QuizAdmin(admin.ModelAdmin):
             'fields': ('nivel_dificuldade', 'pontos_base', 'tempo_limite')
         }),
         ('Dados do Sistema', {
-            'fields': ('data_criacao',),
+            'fields': ('data_criacao', 'total_perguntas', 'pontos_maximos', 'total_respostas'),
             'classes': ('collapse',)
         }),
     )
@@ -211,5 +356,124 @@ admin.site.site_header = "LogiCash - Administração"
 admin.site.site_title = "LogiCash Admin"
 admin.site.index_title = "Painel de Administração do LogiCash"
 admin.site.register(Modulo)
-admin.site.register(Desafio)
-admin.site.register(ProgressoDesafio)
\ No newline at end of file
+admin.site.register(ProgressoDesafio)
+
+
+@admin.register(MemoriaAdaptativa)
+class MemoriaAdaptativaAdmin(admin.ModelAdmin):
+    """
+    Admin para a memória de prática adaptativa (somente leitura do estado empacotado)
+    """
+    list_display = ('estudante', 'quiz', 'perguntas_vistas', 'data_atualizacao')
+    list_filter = ('quiz',)
+    search_fields = ('estudante__nome', 'quiz__titulo')
+    readonly_fields = ('perguntas_vistas', 'novas_introduzidas', 'data_atualizacao')
+    exclude = ('estado',)
+    
+    def perguntas_vistas(self, obj):
+        """Retorna quantas perguntas já estão nas filas de revisão"""
+        return len(EstadoMemoria.carregar(obj.estado))
+    perguntas_vistas.short_description = 'Perguntas vistas'
+
+
+def avisar_compilacao_dilema(request, desafio):
+    """
+    Compila o dilema após uma edição e informa o resultado da validação
+    """
+    if desafio.tipo != 'dilema':
+        return
+    try:
+        grafo = compilar(desafio.pk)
+    except GrafoInvalido as erro:
+        messages.error(request, f'O dilema "{desafio.titulo}" não pode ser jogado: {erro}')
+        return
+    finais = sum(1 for etapa in range(len(grafo.chaves)) if grafo.final(etapa))
+    messages.info(request, f'Dilema "{desafio.titulo}" compilado: {len(grafo.chaves)} etapas, {finais} finais.')
+
+
+class EtapaDilemaInline(admin.TabularInline):
+    """
+    Inline para as etapas de um desafio do tipo dilema
+    """
+    model = EtapaDilema
+    extra = 1
+    fields = ('chave', 'texto', 'inicial', 'pontos')
+    show_change_link = True
+
+
+@admin.register(Desafio)
+class DesafioAdmin(admin.ModelAdmin):
+    """
+    Admin para o modelo Desafio
+    """
+    list_display = ('titulo', 'modulo', 'tipo', 'ordem', 'pontos_base', 'ativo')
+    list_filter = ('tipo', 'modulo', 'ativo')
+    search_fields = ('titulo', 'descricao')
+    inlines = [EtapaDilemaInline]
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        avisar_compilacao_dilema(request, form.instance)
+
+
+class EscolhaDilemaInline(admin.TabularInline):
+    """
+    Inline para as escolhas que saem de uma etapa
+    """
+    model = EscolhaDilema
+    fk_name = 'etapa'
+    extra = 2
+    fields = ('texto', 'destino', 'consequencia', 'pontos', 'ordem')
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        # Só oferece como destino etapas do mesmo dilema
+        if db_field.name == 'destino' and request.resolver_match:
+            etapa_id = request.resolver_match.kwargs.get('object_id')
+            desafio_id = EtapaDilema.objects.filter(pk=etapa_id).values('desafio_id')[:1] if etapa_id else None
+            if desafio_id is not None:
+                kwargs['queryset'] = EtapaDilema.objects.filter(desafio_id__in=desafio_id)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+@admin.register(EtapaDilema)
+class EtapaDilemaAdmin(admin.ModelAdmin):
+    """
+    Admin para as etapas de dilema, com suas escolhas
+    """
+    list_display = ('chave', 'desafio', 'inicial', 'pontos')
+    list_filter = ('desafio', 'inicial')
+    list_select_related = ('desafio',)
+    search_fields = ('chave', 'texto', 'desafio__titulo')
+    inlines = [EscolhaDilemaInline]
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        avisar_compilacao_dilema(request, form.instance.desafio)
+
+
+@admin.register(EstadoDilema)
+class EstadoDilemaAdmin(admin.ModelAdmin):
+    """
+    Admin para os percursos dos estudantes nos dilemas (somente leitura do caminho)
+    """
+    list_display = ('estudante', 'desafio', 'passos', 'pontos', 'concluido', 'data_atualizacao')
+    list_filter = ('concluido', 'desafio')
+    search_fields = ('estudante__nome', 'desafio__titulo')
+    readonly_fields = ('etapas_visitadas', 'data_atualizacao')
+    exclude = ('caminho',)
+
+    def passos(self, obj):
+        """Retorna quantas escolhas o estudante já fez"""
+        return len(obj.caminho)
+    passos.short_description = 'Passos'
+
+    def etapas_visitadas(self, obj):
+        """Retorna as etapas percorridas, reconstruídas a partir do caminho compacto"""
+        try:
+            grafo = compilar(obj.desafio_id)
+        except GrafoInvalido:
+            return "-"
+        if grafo.assinatura != obj.assinatura:
+            return "Percurso de uma versão anterior do dilema"
+        return ' → '.join(percurso(grafo, obj.caminho))
+    etapas_visitadas.short_description = 'Etapas visitadas'
@@ -0,0 +1,190 @@
+"""
+Análise de itens das perguntas (dificuldade, discriminação e distratores).
+
+As respostas por tentativa (RespostaResultado) são lidas em lotes e agregadas
+com NumPy. Cada EstatisticaPergunta guarda somas suficientes (n, Σx, Σy, Σy²,
+Σxy), então novos lotes são somados às estatísticas existentes sem recalcular
+o histórico. Cada resposta somada é marcada como analisada, então uma resposta
+com id menor que as já processadas, mas cuja transação terminou depois, entra
+no lote seguinte em vez de ser pulada; a linha de MarcoProcessamento serializa
+execuções concorrentes.
+"""
+
+import numpy as np
+from django.db import transaction
+
+from .models import EstatisticaPergunta, MarcoProcessamento, RespostaResultado
+
+MARCO = 'analise_perguntas'
+TAMANHO_LOTE = 5000
+
+# Limites usados para classificar as perguntas no admin
+DIFICULDADE_MUITO_FACIL = 0.9
+DIFICULDADE_MUITO_DIFICIL = 0.2
+DISCRIMINACAO_MINIMA = 0.2
+TENTATIVAS_MINIMAS = 20
+
+
+def carregar_lote(tamanho=TAMANHO_LOTE):
+    """
+    Lê o próximo lote de respostas ainda não analisadas como arrays NumPy.
+    Retorna None quando não há respostas novas.
+    """
+    linhas = list(
+        RespostaResultado.objects.filter(analisada=False).order_by('pk').values_list(
+            'pk', 'pergunta_id', 'resposta_id', 'correta', 'resultado__acertos'
+        )[:tamanho]
+    )
+    if not linhas:
+        return None
+    ids, perguntas, respostas, corretas, escores = zip(*linhas)
+    return {
+        'ids': ids,
+        'perguntas': np.array(perguntas, dtype=np.int64),
+        'respostas': np.array([resposta or 0 for resposta in respostas], dtype=np.int64),
+        'corretas': np.array(corretas, dtype=np.float64),
+        'escores': np.array(escores, dtype=np.float64),
+    }
+
+
+def agregar_lote(lote):
+    """
+    Agrega um lote por pergunta, de forma vetorizada.
+    O escore usado na discriminação é o do resultado sem a própria pergunta
+    (correlação item-total corrigida).
+    """
+    perguntas, indice = np.unique(lote['perguntas'], return_inverse=True)
+    quantidade = len(perguntas)
+    x = lote['corretas']
+    y = lote['escores'] - x
+
+    somas = {
+        'tentativas': np.bincount(indice, minlength=quantidade),
+        'acertos': np.bincount(indice, weights=x, minlength=quantidade),
+        'soma_escores': np.bincount(indice, weights=y, minlength=quantidade),
+        'soma_escores_quadrado': np.bincount(indice, weights=y * y, minlength=quantidade),
+        'soma_escores_acertos': np.bincount(indice, weights=x * y, minlength=quantidade),
+    }
+
+    # Contagem de escolhas por (pergunta, resposta); resposta 0 = em branco
+    pares, contagens = np.unique(np.stack([indice, lote['respostas']]), axis=1, return_counts=True)
+    escolhas = [{} for _ in range(quantidade)]
+    for posicao, resposta_id, contagem in zip(pares[0].tolist(), pares[1].tolist(), contagens.tolist()):
+        escolhas[posicao][str(resposta_id)] = contagem
+
+    return perguntas, somas, escolhas
+
+
+def calcular_indices(tentativas, acertos, soma_escores, soma_escores_quadrado, soma_escores_acertos):
+    """
+    Dificuldade (proporção de acertos) e discriminação ponto-bisserial a partir
+    das somas suficientes. Retorna arrays; NaN onde o índice é indefinido.
+    """
+    n = np.asarray(tentativas, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = acertos / n
+        media = soma_escores / n
+        covariancia = soma_escores_acertos / n - p * media
+        variancia = p * (1 - p) * (soma_escores_quadrado / n - media * media)
+        discriminacao = np.where(variancia > 1e-12, covariancia / np.sqrt(variancia), np.nan)
+    return p, discriminacao
+
+
+def _mesclar(perguntas, somas, escolhas):
+    """
+    Soma o lote às estatísticas gravadas e recalcula os índices das perguntas afetadas
+    """
+    existentes = {
+        estatistica.pergunta_id: estatistica
+        for estatistica in EstatisticaPergunta.objects.filter(pergunta_id__in=perguntas.tolist())
+    }
+    registros = [
+        existentes.get(pergunta_id) or EstatisticaPergunta(pergunta_id=pergunta_id, escolhas={})
+        for pergunta_id in perguntas.tolist()
+    ]
+
+    campos = list(somas)
+    totais = {
+        campo: somas[campo] + np.array([getattr(registro, campo) for registro in registros], dtype=np.float64)
+        for campo in campos
+    }
+    dificuldade, discriminacao = calcular_indices(**totais)
+
+    for posicao, registro in enumerate(registros):
+        registro.tentativas = int(totais['tentativas'][posicao])
+        registro.acertos = int(totais['acertos'][posicao])
+        registro.soma_escores = float(totais['soma_escores'][posicao])
+        registro.soma_escores_quadrado = float(totais['soma_escores_quadrado'][posicao])
+        registro.soma_escores_acertos = float(totais['soma_escores_acertos'][posicao])
+        registro.dificuldade = float(dificuldade[posicao])
+        registro.discriminacao = None if np.isnan(discriminacao[posicao]) else float(discriminacao[posicao])
+        for resposta_id, contagem in escolhas[posicao].items():
+            registro.escolhas[resposta_id] = registro.escolhas.get(resposta_id, 0) + contagem
+
+    novos = [registro for registro in registros if registro.pk is None]
+    atualizados = [registro for registro in registros if registro.pk is not None]
+    EstatisticaPergunta.objects.bulk_create(novos)
+    EstatisticaPergunta.objects.bulk_update(
+        atualizados, campos + ['escolhas', 'dificuldade', 'discriminacao']
+    )
+    return len(registros)
+
+
+def atualizar_estatisticas(tamanho_lote=TAMANHO_LOTE, recalcular=False):
+    """
+    Processa as respostas novas desde a última execução.
+    Com recalcular=True apaga as estatísticas e reprocessa todo o histórico.
+    Retorna (respostas processadas, perguntas atualizadas).
+    """
+    if recalcular:
+        with transaction.atomic():
+            EstatisticaPergunta.objects.all().delete()
+            MarcoProcessamento.objects.filter(nome=MARCO).delete()
+            RespostaResultado.objects.filter(analisada=True).update(analisada=False)
+
+    total_respostas = 0
+    perguntas_atualizadas = set()
+    while True:
+        with transaction.atomic():
+            marco, _ = MarcoProcessamento.objects.select_for_update().get_or_create(nome=MARCO)
+            lote = carregar_lote(tamanho_lote)
+            if lote is None:
+                break
+            perguntas, somas, escolhas = agregar_lote(lote)
+            _mesclar(perguntas, somas, escolhas)
+            RespostaResultado.objects.filter(pk__in=lote['ids']).update(analisada=True)
+            marco.ultimo_id = max(marco.ultimo_id, lote['ids'][-1])
+            marco.save(update_fields=['ultimo_id', 'data_atualizacao'])
+
+        total_respostas += len(lote['perguntas'])
+        perguntas_atualizadas.update(perguntas.tolist())
+    return total_respostas, len(perguntas_atualizadas)
+
+
+def taxas_escolha(estatistica):
+    """
+    Proporção de escolha de cada resposta: {resposta_id: taxa}
+    """
+    if not estatistica or not estatistica.tentativas:
+        return {}
+    return {
+        int(resposta_id): contagem / estatistica.tentativas
+        for resposta_id, contagem in estatistica.escolhas.items()
+    }
+
+
+def classificar(estatistica):
+    """
+    Diagnóstico resumido de uma pergunta para os autores de conteúdo
+    """
+    if not estatistica or estatistica.tentativas < TENTATIVAS_MINIMAS:
+        return 'Poucos dados'
+    if estatistica.discriminacao is not None and estatistica.discriminacao < 0:
+        return 'Enganosa'
+    if estatistica.dificuldade >= DIFICULDADE_MUITO_FACIL:
+        return 'Muito fácil'
+    if estatistica.dificuldade <= DIFICULDADE_MUITO_DIFICIL:
+        return 'Muito difícil'
+    if estatistica.discriminacao is not None and estatistica.discriminacao < DISCRIMINACAO_MINIMA:
+        return 'Baixa discriminação'
+    return 'Adequada'
@@ -0,0 +1,455 @@
+"""
+API JSON compacta para clientes móveis e de baixa banda.
+
+Todas as rotas aceitam ?fields=a,b (sparse fieldsets) e as listas aceitam
+?offset=&limit= para paginação. As respostas são comprimidas com gzip e
+respondem 304 quando a versão dos dados não mudou.
+"""
+
+import json
+import zlib
+from functools import wraps
+
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_GET, require_http_methods
+
+from . import adaptive, dilemma, levels, queries, results, search, simulation
+from .conditional import resposta_condicional, chaves_estudante, chaves_globais, lembrar_estudante
+from .routers import ler_da_replica
+from .models import Conquista, Desafio, Estudante, EstudanteConquista, Pontuacao, Quiz, Resposta
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional: sem ele usa o json da biblioteca padrão
+    orjson = None
+
+
+LIMITE_PADRAO = 20
+LIMITE_MAXIMO = 100
+# Tamanho máximo do corpo descomprimido da sincronização em lote
+TAMANHO_MAXIMO_LOTE = 5 * 1024 * 1024
+
+
+def serializar(dados):
+    """
+    Serializa para JSON compacto (sem espaços), usando orjson quando disponível
+    """
+    if orjson is not None:
+        return orjson.dumps(dados)
+    return json.dumps(dados, separators=(',', ':'), ensure_ascii=False, default=str).encode('utf-8')
+
+
+class CompactJsonResponse(HttpResponse):
+    """
+    Resposta JSON serializada pelo encoder mais rápido disponível
+    """
+
+    def __init__(self, dados, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=serializar(dados), **kwargs)
+
+
+def api_login_required(view):
+    """
+    Como login_required, mas responde 401 em JSON em vez de redirecionar
+    """
+    @wraps(view)
+    def _view(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return CompactJsonResponse({'erro': 'Autenticação necessária.'}, status=401)
+        return view(request, *args, **kwargs)
+    return _view
+
+
+def endpoint(chaves):
+    """
+    Empilha os decorators comuns das rotas da API
+    """
+    def decorator(view):
+        return gzip_page(require_GET(api_login_required(resposta_condicional(chaves)(view))))
+    return decorator
+
+
+def _campos(request):
+    campos = request.GET.get('fields')
+    if not campos:
+        return None
+    return {campo.strip() for campo in campos.split(',') if campo.strip()}
+
+
+def _filtrar(item, campos):
+    if campos is None:
+        return item
+    return {chave: valor for chave, valor in item.items() if chave in campos}
+
+
+def _inteiro(valor, padrao, minimo, maximo):
+    try:
+        return max(minimo, min(int(valor), maximo))
+    except (TypeError, ValueError):
+        return padrao
+
+
+def _janela(request):
+    offset = _inteiro(request.GET.get('offset'), 0, 0, 10 ** 9)
+    limit = _inteiro(request.GET.get('limit'), LIMITE_PADRAO, 1, LIMITE_MAXIMO)
+    return offset, limit
+
+
+def _paginado(request, itens, total, offset, limit):
+    """
+    Envelope padrão das listas: total, janela atual e próximo offset
+    """
+    campos = _campos(request)
+    proximo = offset + limit if offset + limit < total else None
+    return CompactJsonResponse({
+        'count': total,
+        'offset': offset,
+        'limit': limit,
+        'next': proximo,
+        'results': [_filtrar(item, campos) for item in itens],
+    })
+
+
+def _estudante(request):
+    estudante, _ = Estudante.objects.get_or_create(
+        user=request.user,
+        defaults={'nome': request.user.get_full_name() or request.user.username}
+    )
+    lembrar_estudante(request, estudante)
+    return estudante
+
+
+@endpoint(chaves_estudante('niveis'))
+def dashboard_api(request):
+    """
+    Estatísticas do dashboard do estudante logado
+    """
+    estudante = _estudante(request)
+    pontuacao = Pontuacao.objects.filter(estudante=estudante).values('pontos_totais', 'nivel_atual').first()
+    pontuacao = pontuacao or {'pontos_totais': 0, 'nivel_atual': 1}
+    progresso = levels.progresso(pontuacao['pontos_totais'])
+    dados = {
+        'estudante_id': estudante.pk,
+        'nome': estudante.nome,
+        **pontuacao,
+        'nome_nivel': progresso['nome'],
+        'pontos_proximo_nivel': progresso['pontos_proximo'],
+        'faltam_proximo_nivel': progresso['faltam'],
+        'percentual_nivel': progresso['percentual'],
+        **queries.estatisticas_estudante(estudante),
+    }
+    return CompactJsonResponse(_filtrar(dados, _campos(request)))
+
+
+@endpoint(chaves_globais('ranking'))
+@ler_da_replica
+def ranking_api(request):
+    """
+    Janela paginada do ranking geral
+    """
+    offset, limit = _janela(request)
+    topo = queries.topo_ranking()
+    if offset + limit <= queries.TAMANHO_TOPO_RANKING:
+        # Primeiras páginas: fatia do topo compartilhado em cache
+        return _paginado(request, topo['itens'][offset:offset + limit], topo['total'], offset, limit)
+    linhas = queries.ranking(offset, offset + limit).values_list(
+        'estudante_id', 'estudante__nome', 'pontos_totais', 'nivel_atual'
+    )
+    itens = [
+        {
+            'posicao': offset + indice + 1,
+            'estudante_id': estudante_id,
+            'nome': nome,
+            'pontos_totais': pontos,
+            'nivel_atual': nivel,
+        }
+        for indice, (estudante_id, nome, pontos, nivel) in enumerate(linhas)
+    ]
+    return _paginado(request, itens, topo['total'], offset, limit)
+
+
+@endpoint(chaves_estudante('conteudo'))
+def progresso_api(request):
+    """
+    Mapa de módulos com o progresso do estudante em cada desafio
+    """
+    estudante = _estudante(request)
+    offset, limit = _janela(request)
+    mapa = queries.mapa_modulos(estudante)
+    itens = [
+        {
+            'id': modulo['id'],
+            'slug': modulo['slug'],
+            'nome': modulo['nome'],
+            'total_desafios': modulo['total_desafios'],
+            'desafios_concluidos': modulo['desafios_concluidos'],
+            'percentual': modulo['percentual'],
+            'proximo_desafio_id': modulo['proximo_desafio']['id'] if modulo['proximo_desafio'] else None,
+            'desafios': [
+                {
+                    'id': desafio['id'],
+                    'titulo': desafio['titulo'],
+                    'tipo': desafio['tipo'],
+                    'status': desafio['status'],
+                    'pontuacao': desafio['pontuacao'],
+                    'total_perguntas': desafio['total_perguntas'],
+                    'pontos_maximos': desafio['pontos_maximos'],
+                }
+                for desafio in modulo['desafios']
+            ],
+        }
+        for modulo in mapa[offset:offset + limit]
+    ]
+    return _paginado(request, itens, len(mapa), offset, limit)
+
+
+@endpoint(chaves_estudante('conquistas'))
+def conquistas_api(request):
+    """
+    Conquistas ativas, indicando quais o estudante já desbloqueou e quando
+    """
+    estudante = _estudante(request)
+    offset, limit = _janela(request)
+    desbloqueios = dict(
+        EstudanteConquista.objects.filter(estudante=estudante).values_list('conquista_id', 'data_desbloqueio')
+    )
+    conquistas = Conquista.objects.filter(ativa=True).order_by('criterio_pontos', 'nome')
+    itens = [
+        {
+            'id': conquista['id'],
+            'nome': conquista['nome'],
+            'descricao': conquista['descricao'],
+            'icone': conquista['icone'],
+            'cor': conquista['cor'],
+            'criterio_pontos': conquista['criterio_pontos'],
+            'criterio_quizzes': conquista['criterio_quizzes'],
+            'desbloqueada': conquista['id'] in desbloqueios,
+            'data_desbloqueio': desbloqueios[conquista['id']].isoformat() if conquista['id'] in desbloqueios else None,
+        }
+        for conquista in conquistas.values(
+            'id', 'nome', 'descricao', 'icone', 'cor', 'criterio_pontos', 'criterio_quizzes'
+        )[offset:offset + limit]
+    ]
+    return _paginado(request, itens, conquistas.count(), offset, limit)
+
+
+@endpoint(chaves_globais('conteudo'))
+def busca_api(request):
+    """
+    Busca textual (?q=) em quizzes, perguntas e módulos, ordenada por relevância.
+    ?tipos=quiz,pergunta,modulo restringe os tipos; "trecho" vem com <mark> nos termos.
+    """
+    tipos = [tipo for tipo in request.GET.get('tipos', '').split(',') if tipo in search.TIPOS] or None
+    limite = _inteiro(request.GET.get('limit'), LIMITE_PADRAO, 1, LIMITE_MAXIMO)
+    resultados = search.buscar(request.GET.get('q', ''), tipos, limite)
+    campos = _campos(request)
+    return CompactJsonResponse({'results': [_filtrar(resultado, campos) for resultado in resultados]})
+
+
+@gzip_page
+@require_http_methods(['GET', 'POST'])
+@api_login_required
+def pratica_api(request, quiz_id):
+    """
+    Prática adaptativa de um quiz.
+    GET: próximo conjunto de perguntas (?quantidade=, padrão 10).
+    POST {"pergunta": id, "resposta": id}: corrige e atualiza a memória do estudante.
+    """
+    quiz = get_object_or_404(Quiz, pk=quiz_id, ativo=True)
+    estudante = _estudante(request)
+
+    if request.method == 'GET':
+        quantidade = _inteiro(request.GET.get('quantidade'), 10, 1, LIMITE_MAXIMO)
+        perguntas = adaptive.proximas_perguntas(estudante, quiz, quantidade)
+        return CompactJsonResponse({
+            'quiz_id': quiz.pk,
+            'results': [
+                {
+                    'id': pergunta.pk,
+                    'texto': pergunta.texto,
+                    'pontos': pergunta.pontos,
+                    'respostas': [
+                        {'id': resposta.pk, 'texto': resposta.texto}
+                        for resposta in pergunta.respostas.all()
+                    ],
+                }
+                for pergunta in perguntas
+            ],
+        })
+
+    try:
+        dados = json.loads(request.body)
+        pergunta_id, resposta_id = int(dados['pergunta']), int(dados['resposta'])
+    except (ValueError, KeyError, TypeError):
+        return CompactJsonResponse({'erro': 'Informe "pergunta" e "resposta".'}, status=400)
+
+    resposta = get_object_or_404(
+        Resposta.objects.select_related('pergunta'),
+        pk=resposta_id, pergunta_id=pergunta_id, pergunta__quiz=quiz
+    )
+    caixa = adaptive.registrar_resposta(estudante, resposta.pergunta, resposta.correta)
+    correta_id = Resposta.objects.filter(pergunta_id=pergunta_id, correta=True).values_list('pk', flat=True).first()
+    return CompactJsonResponse({
+        'correta': resposta.correta,
+        'resposta_correta': correta_id,
+        'explicacao': resposta.pergunta.explicacao,
+        'caixa': caixa,
+    })
+
+
+@gzip_page
+@require_GET
+@api_login_required
+def simulacao_api(request, tipo):
+    """
+    Simulação financeira (desafios do tipo "simulacao").
+    Cada parâmetro aceita um valor ou uma lista separada por vírgulas para
+    varredura, ex.: ?deposito_mensal=50,100&taxa_mensal=0.5,1&meses=24
+    """
+    parametros = {nome: valor.split(',') for nome, valor in request.GET.items()}
+    try:
+        resultado = simulation.simular(tipo, parametros)
+    except simulation.SimulacaoInvalida as erro:
+        return CompactJsonResponse({'erro': str(erro)}, status=400)
+    return CompactJsonResponse(resultado)
+
+
+@gzip_page
+@require_http_methods(['POST'])
+@api_login_required
+def resultado_api(request, quiz_id):
+    """
+    Envio do resultado de uma tentativa do quiz, corrigido no servidor.
+    POST {"respostas": [{"pergunta": id, "resposta": id}, ...], "tempo_gasto": segundos}
+    com o header Idempotency-Key (ou "chave" no corpo) único por tentativa.
+    201 no primeiro envio; os reenvios com a mesma chave recebem 200 e o mesmo
+    resultado, com o header Idempotent-Replayed, sem gravar nada.
+    """
+    quiz = get_object_or_404(Quiz, pk=quiz_id, ativo=True)
+    try:
+        dados = json.loads(request.body)
+        chave = request.headers.get('Idempotency-Key') or dados.get('chave')
+        respostas = {}
+        for item in dados['respostas']:
+            pergunta_id = int(item['pergunta'])
+            if pergunta_id in respostas:
+                raise ValueError
+            respostas[pergunta_id] = int(item['resposta'])
+        tempo_gasto = dados.get('tempo_gasto')
+        tempo_gasto = max(int(tempo_gasto), 0) if tempo_gasto is not None else None
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return CompactJsonResponse(
+            {'erro': 'Informe "respostas" como [{"pergunta": id, "resposta": id}], uma por pergunta.'}, status=400
+        )
+
+    try:
+        resultado, criado = results.enviar(_estudante(request), quiz, respostas, chave, tempo_gasto)
+    except results.EnvioInvalido as erro:
+        return CompactJsonResponse({'erro': str(erro)}, status=400)
+    except results.ChaveEmConflito as erro:
+        return CompactJsonResponse({'erro': str(erro)}, status=409)
+
+    response = CompactJsonResponse(resultado, status=201 if criado else 200)
+    if not criado:
+        response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _corpo_descomprimido(request):
+    """
+    Corpo da requisição, descomprimindo Content-Encoding gzip/deflate com
+    limite de tamanho. Levanta ValueError se inválido ou grande demais.
+    """
+    codificacao = request.headers.get('Content-Encoding', 'identity').strip().lower()
+    if codificacao == 'identity':
+        corpo = request.body
+    elif codificacao in ('gzip', 'deflate'):
+        # wbits: 16 + MAX_WBITS aceita só gzip; MAX_WBITS, zlib (o "deflate" do HTTP)
+        descompressor = zlib.decompressobj(16 + zlib.MAX_WBITS if codificacao == 'gzip' else zlib.MAX_WBITS)
+        try:
+            corpo = descompressor.decompress(request.body, TAMANHO_MAXIMO_LOTE + 1)
+        except zlib.error:
+            raise ValueError('Corpo comprimido inválido.')
+    else:
+        raise ValueError(f'Content-Encoding {codificacao} não suportado.')
+    if len(corpo) > TAMANHO_MAXIMO_LOTE:
+        raise ValueError('Lote grande demais.')
+    return corpo
+
+
+@gzip_page
+@require_http_methods(['POST'])
+@api_login_required
+def sincronizar_api(request):
+    """
+    Sincronização das tentativas feitas offline, em um único envio.
+    POST {"tentativas": [{"chave", "quiz", "respostas": [{"pergunta", "resposta"}],
+    "tempo_gasto"?, "desafio"?, "realizado_em"?}, ...]}, de preferência com
+    Content-Encoding: gzip. Responde 200 com o resultado de cada tentativa, na
+    ordem do lote: "criado", "repetido" (já sincronizada, sem nova gravação) ou
+    "invalido" (com "erro"). Reenviar o lote inteiro é seguro.
+    """
+    try:
+        dados = json.loads(_corpo_descomprimido(request))
+        tentativas = dados['tentativas']
+        if not isinstance(tentativas, list):
+            raise TypeError
+    except ValueError as erro:
+        mensagem = str(erro) if not isinstance(erro, json.JSONDecodeError) else 'JSON inválido.'
+        return CompactJsonResponse({'erro': mensagem}, status=400)
+    except (KeyError, TypeError):
+        return CompactJsonResponse({'erro': 'Informe "tentativas" como uma lista.'}, status=400)
+
+    try:
+        itens = results.sincronizar(_estudante(request), tentativas)
+    except results.EnvioInvalido as erro:
+        return CompactJsonResponse({'erro': str(erro)}, status=413)
+    return CompactJsonResponse({
+        'criados': sum(item['status'] == 'criado' for item in itens),
+        'repetidos': sum(item['status'] == 'repetido' for item in itens),
+        'invalidos': sum(item['status'] == 'invalido' for item in itens),
+        'resultados': itens,
+    })
+
+
+@gzip_page
+@require_http_methods(['GET', 'POST'])
+@api_login_required
+def dilema_api(request, desafio_id):
+    """
+    Percurso do estudante em um desafio do tipo "dilema".
+    GET: etapa atual e escolhas disponíveis.
+    POST {"escolha": indice}: aplica a escolha e retorna a consequência e a nova etapa.
+    POST {"reiniciar": true}: recomeça o dilema.
+    """
+    desafio = get_object_or_404(Desafio, pk=desafio_id, tipo='dilema', ativo=True)
+    estudante = _estudante(request)
+
+    try:
+        if request.method == 'GET':
+            grafo, estado = dilemma.carregar_estado(estudante, desafio.pk)
+            return CompactJsonResponse(dilemma.situacao(grafo, estado))
+
+        try:
+            dados = json.loads(request.body)
+            if dados.get('reiniciar'):
+                grafo, estado = dilemma.carregar_estado(estudante, desafio.pk, reiniciar=True)
+                return CompactJsonResponse(dilemma.situacao(grafo, estado))
+            indice = int(dados['escolha'])
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return CompactJsonResponse({'erro': 'Informe "escolha" ou "reiniciar".'}, status=400)
+
+        grafo, estado, escolha = dilemma.escolher(estudante, desafio.pk, indice)
+    except dilemma.GrafoInvalido:
+        return CompactJsonResponse({'erro': 'Este dilema está em manutenção.'}, status=503)
+    except dilemma.EscolhaInvalida as erro:
+        return CompactJsonResponse({'erro': str(erro)}, status=400)
+
+    return CompactJsonResponse({
+        'consequencia': escolha.consequencia,
+        'pontos_escolha': escolha.pontos,
+        **dilemma.situacao(grafo, estado),
+    })
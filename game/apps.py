@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class GameConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'game'
+
+    def ready(self):
+        # Registra os receivers de invalidação de cache
+        from . import signals  # noqa: F401
+        # Registra os checks do projeto (manage.py check)
+        from . import checks  # noqa: F401
@@ -0,0 +1,98 @@
+"""
+Variantes assíncronas do dashboard, do ranking e das estatísticas, para servir sob ASGI.
+
+As consultas de cada página usam a interface async do ORM (aget_or_create,
+aaggregate, iteração com `async for`) e são agrupadas com asyncio.gather; o
+ranking e as estatísticas gerais vêm do cache compartilhado de game/caching.py.
+As páginas usam os mesmos templates e o mesmo GET condicional das views
+síncronas em game/views.py.
+
+Observação: no Django 5.2 o ORM async executa cada query na thread de sync
+compartilhada (thread_sensitive), uma de cada vez e pela mesma conexão. O
+gather não paraleliza as queries de uma requisição: só sobrepõe a espera por
+elas com o que não passa por essa thread (leituras de cache e versões) e libera
+o event loop para outras requisições. O comando benchmark_async mede a
+diferença para o caminho WSGI, que atende requisições em threads próprias.
+Os middlewares do projeto também têm caminho async (game.middleware.MiddlewareHibrido):
+da pilha só o process_view do CsrfViewMiddleware ainda passa pela thread de sync.
+"""
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import render
+
+from . import queries
+from .conditional import alembrar_estudante, chaves_estudante, chaves_globais, resposta_condicional
+from .models import Estudante, Pontuacao
+from .routers import ler_da_replica
+from .versioning import aversao_estudante, aversao_global
+
+# O render acessa sessão, mensagens e usuário de forma síncrona
+arender = sync_to_async(render)
+
+
+async def _lista(queryset):
+    return [item async for item in queryset]
+
+
+@login_required
+@resposta_condicional(chaves_estudante('conquistas', 'niveis'))
+async def dashboard_async(request):
+    """
+    Dashboard do estudante; as queries do gather rodam em sequência na thread de sync,
+    intercaladas com as leituras de versão no cache
+    """
+    user = await request.auser()
+    estudante, _ = await Estudante.objects.aget_or_create(
+        user=user,
+        defaults={'nome': user.get_full_name() or user.username}
+    )
+
+    (pontuacao, _), estatisticas, desbloqueadas, disponiveis, recentes, versao_estudante, versao_conquistas, _ = (
+        await asyncio.gather(
+            Pontuacao.objects.aget_or_create(estudante=estudante, defaults={'pontos_totais': 0, 'nivel_atual': 1}),
+            queries.aestatisticas_estudante(estudante),
+            _lista(queries.conquistas_desbloqueadas(estudante)),
+            _lista(queries.conquistas_disponiveis(estudante)),
+            _lista(queries.resultados_recentes(estudante)),
+            aversao_estudante(estudante.pk),
+            aversao_global('conquistas'),
+            alembrar_estudante(request, estudante),
+        )
+    )
+    # A curva de níveis pode precisar ser recarregada do banco
+    progresso_nivel = await sync_to_async(pontuacao.progresso_nivel)()
+
+    return await arender(request, 'index.html', {
+        'estudante': estudante,
+        'pontuacao': pontuacao,
+        'progresso_nivel': progresso_nivel,
+        'conquistas_desbloqueadas': desbloqueadas,
+        'conquistas_disponiveis': disponiveis,
+        **estatisticas,
+        'resultados_recentes': recentes,
+        'versao_estudante': versao_estudante,
+        'versao_conquistas': versao_conquistas,
+    })
+
+
+@login_required
+@resposta_condicional(chaves_globais('ranking'))
+@ler_da_replica
+async def ranking_async(request):
+    """
+    Ranking dos estudantes (topo compartilhado em cache)
+    """
+    rankings = (await queries.atopo_ranking())['itens']
+    return await arender(request, 'ranking.html', {'rankings': rankings})
+
+
+@login_required
+@ler_da_replica
+async def estatisticas_async(request):
+    """
+    Estatísticas gerais; acertos no cache local não saem do event loop
+    """
+    return await arender(request, 'estatisticas.html', await queries.aestatisticas_gerais())
@@ -0,0 +1,194 @@
+"""
+Cache de dados compartilhados (ranking, catálogo de módulos, estatísticas gerais)
+protegido contra "estouro de manada".
+
+Cada entrada é guardada no cache compartilhado como um envelope
+(versão, valor, expira_em, custo) e também em um LRU por processo, para que as
+leituras mais quentes não paguem nem a ida ao cache nem a desserialização.
+
+- Recálculo único: quando a entrada vence, só quem consegue a trava
+  (cache.add) recalcula. Os demais devolvem o valor anterior enquanto isso
+  (stale-while-revalidate) ou, se não houver valor algum, aguardam o resultado
+  tentando pegar a trava a cada volta: se quem calculava falhou (ou a trava
+  venceu após TIMEOUT_TRAVA), só um dos que esperam assume o recálculo. Nunca
+  se calcula sem a trava.
+- A trava guarda um token de quem a pegou e só o dono a apaga: um cálculo que
+  passou de TIMEOUT_TRAVA não remove a trava que outro processo pegou depois.
+- Expiração antecipada probabilística (XFetch): perto do vencimento cada
+  leitura tem uma chance, proporcional ao custo do cálculo, de recalcular
+  antes da hora, então as entradas raramente chegam a vencer sob carga.
+- A versão (ex.: versao_global('conteudo')) invalida a entrada na hora. Com
+  obsoleto=False uma versão antiga nunca é servida: os pedidos simultâneos
+  esperam o recálculo em vez de ver dados antigos.
+"""
+
+import asyncio
+import math
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+TIMEOUT_PADRAO = 60
+# Tempo extra em que o envelope vencido continua no cache para ser servido como obsoleto
+JANELA_OBSOLETA = 5 * 60
+TIMEOUT_TRAVA = 30
+ESPERA_TRAVA = 0.05
+BETA = 1.0
+
+MAX_LOCAL = 256
+# Validade máxima de uma cópia local: limita quanto um processo pode ficar atrás dos outros
+TIMEOUT_LOCAL = 5
+
+_local = OrderedDict()
+_trava_local = threading.Lock()
+# Sentinela: a trava está com outro processo e ainda não há valor utilizável
+_AGUARDAR = object()
+
+
+def _chave(nome):
+    return f'compartilhado:{nome}'
+
+
+def limpar_local():
+    """
+    Esvazia o LRU deste processo (testes e comandos)
+    """
+    with _trava_local:
+        _local.clear()
+
+
+def _ler_local(nome):
+    with _trava_local:
+        item = _local.get(nome)
+        if item is None:
+            return None
+        envelope, validade = item
+        if time.monotonic() >= validade:
+            del _local[nome]
+            return None
+        _local.move_to_end(nome)
+        return envelope
+
+
+def _guardar_local(nome, envelope):
+    with _trava_local:
+        _local[nome] = (envelope, time.monotonic() + TIMEOUT_LOCAL)
+        _local.move_to_end(nome)
+        while len(_local) > MAX_LOCAL:
+            _local.popitem(last=False)
+
+
+def _fresco(envelope, versao, agora):
+    """
+    Envelope utilizável sem recalcular? Inclui o sorteio da expiração antecipada.
+    """
+    versao_envelope, _, expira_em, custo = envelope
+    if versao_envelope != versao:
+        return False
+    # XFetch: -log(U) é exponencial, então a antecipação média é custo * BETA
+    return agora - custo * BETA * math.log(1.0 - random.random()) < expira_em
+
+
+def _calcular(nome, calcular, versao, timeout, local):
+    inicio = time.time()
+    valor = calcular()
+    agora = time.time()
+    envelope = (versao, valor, agora + timeout, agora - inicio)
+    cache.set(_chave(nome), envelope, timeout + JANELA_OBSOLETA)
+    if local:
+        _guardar_local(nome, envelope)
+    return valor
+
+
+def _calcular_com_trava(nome, calcular, versao, timeout, local):
+    trava = _chave(nome) + ':trava'
+    token = uuid.uuid4().hex
+    if not cache.add(trava, token, TIMEOUT_TRAVA):
+        return _AGUARDAR
+    try:
+        return _calcular(nome, calcular, versao, timeout, local)
+    finally:
+        # Se a trava venceu durante o cálculo, ela pode ser de outro processo agora.
+        # O cache não tem "apagar se igual": resta a janela entre o get e o delete.
+        if cache.get(trava) == token:
+            cache.delete(trava)
+
+
+def _consultar(nome, calcular, versao, timeout, obsoleto, local):
+    """
+    Primeira leitura: valor fresco, recálculo com a trava ou valor obsoleto aceitável
+    """
+    agora = time.time()
+    if local:
+        envelope = _ler_local(nome)
+        if envelope is not None and _fresco(envelope, versao, agora):
+            return envelope[1]
+
+    envelope = cache.get(_chave(nome))
+    if envelope is not None and _fresco(envelope, versao, agora):
+        if local:
+            _guardar_local(nome, envelope)
+        return envelope[1]
+
+    valor = _calcular_com_trava(nome, calcular, versao, timeout, local)
+    if valor is _AGUARDAR and envelope is not None and (obsoleto or envelope[0] == versao):
+        # Outro processo está recalculando
+        return envelope[1]
+    return valor
+
+
+def _aguardar(nome, calcular, versao, timeout, local):
+    """
+    Uma volta da espera: o valor que o outro processo gravou ou, se a trava
+    vagou sem resultado (o cálculo dele falhou), o recálculo feito aqui
+    """
+    envelope = cache.get(_chave(nome))
+    if envelope is not None and envelope[0] == versao:
+        if local:
+            _guardar_local(nome, envelope)
+        return envelope[1]
+    return _calcular_com_trava(nome, calcular, versao, timeout, local)
+
+
+def obter(nome, calcular, versao=None, timeout=TIMEOUT_PADRAO, obsoleto=True, local=True):
+    """
+    Valor de `nome`, calculado por `calcular()` no máximo uma vez por vez entre
+    todos os processos.
+
+    `versao` invalida a entrada quando muda. Com `obsoleto=True` o valor de uma
+    versão anterior ainda pode ser devolvido enquanto outro processo recalcula;
+    use obsoleto=False para dados que não podem ficar para trás.
+    `local=False` dispensa o LRU do processo (valores grandes ou raros).
+    """
+    valor = _consultar(nome, calcular, versao, timeout, obsoleto, local)
+    # Termina no máximo quando a trava vence (TIMEOUT_TRAVA): aí um dos que esperam a pega
+    while valor is _AGUARDAR:
+        time.sleep(ESPERA_TRAVA)
+        valor = _aguardar(nome, calcular, versao, timeout, local)
+    return valor
+
+
+# Cada passo vai ao executor só pelo tempo de uma leitura (ou de um cálculo);
+# a espera entre eles fica no event loop, sem ocupar a thread do ORM
+_consultar_async = sync_to_async(_consultar)
+_aguardar_async = sync_to_async(_aguardar)
+
+
+async def aobter(nome, calcular, versao=None, timeout=TIMEOUT_PADRAO, obsoleto=True, local=True):
+    """
+    Versão assíncrona de obter: acertos no LRU local não saem do event loop
+    """
+    if local:
+        envelope = _ler_local(nome)
+        if envelope is not None and _fresco(envelope, versao, time.time()):
+            return envelope[1]
+    valor = await _consultar_async(nome, calcular, versao, timeout, obsoleto, local)
+    while valor is _AGUARDAR:
+        await asyncio.sleep(ESPERA_TRAVA)
+        valor = await _aguardar_async(nome, calcular, versao, timeout, local)
+    return valor
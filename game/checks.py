@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register('database')
+def orcamento_conexoes(app_configs, **kwargs):
+    """
+    Conexões persistentes só cabem se workers * threads não passar do limite do banco
+    """
+    conexoes = settings.SERVIDOR_WORKERS * settings.SERVIDOR_THREADS
+    if conexoes <= settings.DB_MAX_CONEXOES:
+        return []
+    return [
+        Warning(
+            f'{settings.SERVIDOR_WORKERS} workers x {settings.SERVIDOR_THREADS} threads abririam {conexoes} '
+            f'conexões por banco, acima de DB_MAX_CONEXOES ({settings.DB_MAX_CONEXOES}).',
+            hint='CONN_MAX_AGE foi zerado (uma conexão por requisição). Reduza LOGICASH_WORKERS/LOGICASH_THREADS '
+                 'ou use um pooler (pgbouncer) e aumente LOGICASH_DB_MAX_CONEXOES.',
+            id='game.W001',
+        )
+    ]
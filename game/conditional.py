@@ -0,0 +1,141 @@
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.contrib import messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .models import Estudante
+from .versioning import chave_estudante, chave_global, carimbo
+
+
+def estudante_id_da_sessao(request):
+    """
+    Retorna o id do Estudante do usuário logado guardado na sessão,
+    consultando o banco apenas na primeira vez
+    """
+    estudante_id = request.session.get('estudante_id')
+    if estudante_id is None:
+        estudante_id = Estudante.objects.filter(user=request.user).values_list('pk', flat=True).first()
+        if estudante_id is not None:
+            request.session['estudante_id'] = estudante_id
+    return estudante_id
+
+
+def lembrar_estudante(request, estudante):
+    """
+    Atualiza o id do Estudante na sessão (ex.: perfil criado pela própria view)
+    """
+    if request.session.get('estudante_id') != estudante.pk:
+        request.session['estudante_id'] = estudante.pk
+
+
+async def alembrar_estudante(request, estudante):
+    """
+    Versão assíncrona de lembrar_estudante
+    """
+    if await request.session.aget('estudante_id') != estudante.pk:
+        await request.session.aset('estudante_id', estudante.pk)
+
+
+def _tem_mensagens_pendentes(request):
+    # Mensagens são exibidas uma única vez: a página precisa ser renderizada
+    return len(messages.get_messages(request)) > 0
+
+
+def chaves_estudante(*globais):
+    """
+    Monta a função de chaves de versão: versão do estudante + versões globais
+    """
+    def chaves(request):
+        lista = [chave_global(nome) for nome in globais]
+        estudante_id = estudante_id_da_sessao(request)
+        if estudante_id is not None:
+            lista.append(chave_estudante(estudante_id))
+        return lista
+    return chaves
+
+
+def chaves_globais(*globais):
+    """
+    Monta a função de chaves de versão apenas com versões globais
+    """
+    def chaves(request):
+        return [chave_global(nome) for nome in globais]
+    return chaves
+
+
+def _validadores(request, chaves):
+    """
+    ETag e Last-Modified da página, ou None quando a resposta não deve ser condicional
+    """
+    if (
+        request.method not in ('GET', 'HEAD')
+        or not request.user.is_authenticated
+        or _tem_mensagens_pendentes(request)
+    ):
+        return None
+
+    versoes, modificado_em = carimbo(chaves(request))
+    bruto = '|'.join(
+        str(parte) for parte in (
+            settings.RELEASE_VERSION,
+            request.user.pk,
+            request.path,
+            request.META.get('QUERY_STRING', ''),
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+            *versoes,
+        )
+    )
+    etag = quote_etag(hashlib.md5(bruto.encode(), usedforsecurity=False).hexdigest())
+    last_modified = int(modificado_em) if modificado_em else None
+    return etag, last_modified
+
+
+def _finalizar(response, etag, last_modified):
+    if response.status_code == 200:
+        response.headers.setdefault('ETag', etag)
+        if last_modified:
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+    # Página privada: o navegador guarda, mas sempre revalida
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def resposta_condicional(chaves):
+    """
+    Decorator de GET condicional (ETag/Last-Modified) baseado em carimbos de versão.
+    O ETag é calculado sem executar as queries da página; se o navegador já tem a
+    versão atual, a view nem é chamada e a resposta é 304.
+    Aceita views síncronas e assíncronas.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def _view_async(request, *args, **kwargs):
+                # Sessão e mensagens só têm acesso síncrono: uma única ida à thread de sync
+                validadores = await sync_to_async(_validadores)(request, chaves)
+                if validadores is None:
+                    return await view(request, *args, **kwargs)
+                etag, last_modified = validadores
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return _finalizar(response, etag, last_modified)
+            return _view_async
+
+        @wraps(view)
+        def _view(request, *args, **kwargs):
+            validadores = _validadores(request, chaves)
+            if validadores is None:
+                return view(request, *args, **kwargs)
+            etag, last_modified = validadores
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return _finalizar(response, etag, last_modified)
+        return _view
+    return decorator
@@ -0,0 +1,118 @@
+"""
+Contadores desnormalizados do Quiz: total_perguntas, pontos_maximos e total_respostas.
+
+Correção, catálogo e relatórios leem os campos do Quiz em vez de contar e
+somar as perguntas a cada uso. Os receptores em signals.py mantêm os campos
+atualizados a cada save/delete de Pergunta e Resposta, recalculando o quiz
+afetado com um único UPDATE (subqueries sobre as perguntas e respostas atuais,
+dentro da mesma transação da alteração: não há contagem incremental que possa
+divergir).
+
+Operações em massa:
+
+- dentro de `em_lote()` os receptores só anotam os quizzes afetados, que são
+  recalculados uma vez ao sair do bloco (o admin usa isso ao salvar os inlines);
+- bulk_create, QuerySet.update e SQL direto não disparam sinais: adicione os
+  quizzes ao conjunto retornado por em_lote() ou chame recalcular() depois;
+- o comando `recalcular_contadores` confere e corrige todos os quizzes.
+
+O UPDATE não dispara post_save do Quiz, então recalcular() sobe a versão
+'conteudo' por conta própria (após o commit) para que estrutura_modulos e as
+páginas do catálogo não fiquem com os contadores antigos.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Pergunta, Quiz, Resposta
+from .versioning import incrementar_versao_global
+
+CAMPOS = ('total_perguntas', 'pontos_maximos', 'total_respostas')
+
+_lote = ContextVar('logicash_contadores_lote', default=None)
+
+
+def _subquery(queryset, agregado):
+    valores = queryset.values('quiz_id').annotate(valor=agregado).values('valor')
+    return Coalesce(Subquery(valores, output_field=IntegerField()), Value(0))
+
+
+def expressoes():
+    """
+    Valor correto de cada contador como expressão sobre o quiz da linha
+    """
+    perguntas = Pergunta.objects.filter(quiz_id=OuterRef('pk')).order_by()
+    respostas = Resposta.objects.filter(pergunta__quiz_id=OuterRef('pk')).order_by().annotate(
+        quiz_id=F('pergunta__quiz_id')
+    )
+    return {
+        'total_perguntas': _subquery(perguntas, Count('pk')),
+        'pontos_maximos': _subquery(perguntas, Sum('pontos')),
+        'total_respostas': _subquery(respostas, Count('pk')),
+    }
+
+
+def recalcular(quizzes=None):
+    """
+    Recalcula os contadores dos quizzes (ids) em um único UPDATE, ou de todos
+    com quizzes=None. Retorna o número de quizzes atualizados.
+    """
+    consulta = Quiz.objects.all()
+    if quizzes is not None:
+        quizzes = {quiz_id for quiz_id in quizzes if quiz_id is not None}
+        if not quizzes:
+            return 0
+        consulta = consulta.filter(pk__in=quizzes)
+    atualizados = consulta.update(**expressoes())
+    if atualizados:
+        transaction.on_commit(lambda: incrementar_versao_global('conteudo'))
+    return atualizados
+
+
+def divergentes():
+    """
+    [(quiz_id, gravados, corretos)] dos quizzes com contadores desatualizados
+    """
+    consulta = Quiz.objects.annotate(**{f'correto_{campo}': expressao for campo, expressao in expressoes().items()})
+    resultado = []
+    for linha in consulta.values('pk', *CAMPOS, *(f'correto_{campo}' for campo in CAMPOS)):
+        gravados = tuple(linha[campo] for campo in CAMPOS)
+        corretos = tuple(linha[f'correto_{campo}'] for campo in CAMPOS)
+        if gravados != corretos:
+            resultado.append((linha['pk'], gravados, corretos))
+    return resultado
+
+
+def alterado(*quizzes):
+    """
+    Chamado pelos receptores: recalcula agora ou, dentro de em_lote(), ao fim do bloco
+    """
+    pendentes = _lote.get()
+    if pendentes is None:
+        recalcular(quizzes)
+    else:
+        pendentes.update(quiz_id for quiz_id in quizzes if quiz_id is not None)
+
+
+@contextmanager
+def em_lote():
+    """
+    Adia os recálculos disparados por sinais para o fim do bloco, um UPDATE
+    para todos os quizzes afetados. O conjunto retornado aceita ids de
+    quizzes alterados por operações que não disparam sinais.
+    """
+    externo = _lote.get()
+    if externo is not None:
+        yield externo  # bloco aninhado: o mais externo recalcula
+        return
+    pendentes = set()
+    token = _lote.set(pendentes)
+    try:
+        yield pendentes
+    finally:
+        _lote.reset(token)
+    recalcular(pendentes)
@@ -0,0 +1,277 @@
+"""
+Motor dos desafios do tipo "dilema": cenários ramificados de escolhas e consequências.
+
+As etapas e escolhas editadas no admin são compiladas em um grafo imutável
+(tuplas indexadas por inteiros), validado como acíclico e com todos os caminhos
+terminando em um final. O grafo compilado fica em memória no processo e só é
+recompilado quando a versão de conteúdo muda.
+
+O estado do estudante é só o índice da etapa atual, os pontos acumulados e um
+byte por escolha feita; cada passo é uma consulta direta
+`grafo.escolhas[etapa][indice]`, sem percorrer o banco.
+"""
+
+import hashlib
+from typing import NamedTuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EscolhaDilema, EstadoDilema, EtapaDilema, ProgressoDesafio
+from .scoring import registrar_pontos
+from .versioning import versao_global
+
+# O caminho guarda um byte por passo e a etapa atual é um PositiveSmallIntegerField
+MAX_ESCOLHAS = 255
+MAX_ETAPAS = 32767
+
+
+class GrafoInvalido(ValueError):
+    """
+    O dilema cadastrado não forma um grafo jogável
+    """
+
+
+class EscolhaInvalida(ValueError):
+    """
+    Escolha inexistente na etapa atual ou dilema já concluído
+    """
+
+
+class Escolha(NamedTuple):
+    texto: str
+    destino: int
+    pontos: int
+    consequencia: str
+
+
+class Grafo(NamedTuple):
+    """
+    Dilema compilado. A etapa 0 é a inicial; etapas sem escolhas são finais.
+    """
+    desafio_id: int
+    assinatura: str
+    chaves: tuple
+    textos: tuple
+    pontos: tuple
+    escolhas: tuple
+
+    def final(self, etapa):
+        return not self.escolhas[etapa]
+
+
+def _validar(etapas, escolhas):
+    """
+    Retorna a ordem das etapas a partir da inicial (busca em largura) ou levanta
+    GrafoInvalido com todos os problemas encontrados
+    """
+    problemas = []
+    iniciais = [pk for pk, etapa in etapas.items() if etapa['inicial']]
+    if not etapas:
+        raise GrafoInvalido('O dilema não tem etapas.')
+    if len(iniciais) != 1:
+        raise GrafoInvalido(f'O dilema deve ter exatamente uma etapa inicial (tem {len(iniciais)}).')
+    if len(etapas) > MAX_ETAPAS:
+        problemas.append(f'O dilema tem mais de {MAX_ETAPAS} etapas.')
+
+    for pk, saidas in escolhas.items():
+        chave = etapas[pk]['chave']
+        if len(saidas) > MAX_ESCOLHAS:
+            problemas.append(f'A etapa "{chave}" tem mais de {MAX_ESCOLHAS} escolhas.')
+        for saida in saidas:
+            if saida['destino_id'] not in etapas:
+                problemas.append(f'Uma escolha da etapa "{chave}" leva a uma etapa de outro desafio.')
+
+    ordem = [iniciais[0]]
+    vistas = {iniciais[0]}
+    for pk in ordem:
+        for saida in escolhas.get(pk, ()):
+            destino = saida['destino_id']
+            if destino in etapas and destino not in vistas:
+                vistas.add(destino)
+                ordem.append(destino)
+    inalcancaveis = sorted(etapas[pk]['chave'] for pk in etapas if pk not in vistas)
+    if inalcancaveis:
+        problemas.append(f'Etapas inalcançáveis a partir da inicial: {", ".join(inalcancaveis)}.')
+
+    # Busca em profundidade iterativa: uma aresta para uma etapa ainda na pilha fecha um ciclo
+    estado = {}
+    for raiz in ordem:
+        if raiz in estado:
+            continue
+        pilha = [(raiz, iter(escolhas.get(raiz, ())))]
+        estado[raiz] = 'aberta'
+        while pilha:
+            pk, saidas = pilha[-1]
+            saida = next(saidas, None)
+            if saida is None:
+                estado[pk] = 'fechada'
+                pilha.pop()
+                continue
+            destino = saida['destino_id']
+            if estado.get(destino) == 'aberta':
+                problemas.append(
+                    f'O dilema tem um ciclo: "{etapas[pk]["chave"]}" volta para "{etapas[destino]["chave"]}".'
+                )
+            elif destino in etapas and destino not in estado:
+                estado[destino] = 'aberta'
+                pilha.append((destino, iter(escolhas.get(destino, ()))))
+
+    if not any(not escolhas.get(pk) for pk in ordem):
+        problemas.append('Nenhum final é alcançável a partir da etapa inicial.')
+    if problemas:
+        raise GrafoInvalido(' '.join(problemas))
+    return ordem
+
+
+def compilar(desafio_id):
+    """
+    Lê as etapas e escolhas do dilema (duas consultas) e monta o grafo imutável
+    """
+    etapas = {
+        etapa['id']: etapa
+        for etapa in EtapaDilema.objects.filter(desafio_id=desafio_id).order_by('pk').values(
+            'id', 'chave', 'texto', 'inicial', 'pontos'
+        )
+    }
+    escolhas = {}
+    for escolha in EscolhaDilema.objects.filter(etapa__desafio_id=desafio_id).order_by('ordem', 'pk').values(
+        'etapa_id', 'destino_id', 'texto', 'pontos', 'consequencia'
+    ):
+        escolhas.setdefault(escolha['etapa_id'], []).append(escolha)
+
+    ordem = _validar(etapas, escolhas)
+    indice = {pk: posicao for posicao, pk in enumerate(ordem)}
+    grafo = Grafo(
+        desafio_id=desafio_id,
+        assinatura='',
+        chaves=tuple(etapas[pk]['chave'] for pk in ordem),
+        textos=tuple(etapas[pk]['texto'] for pk in ordem),
+        pontos=tuple(etapas[pk]['pontos'] for pk in ordem),
+        escolhas=tuple(
+            tuple(
+                Escolha(saida['texto'], indice[saida['destino_id']], saida['pontos'], saida['consequencia'])
+                for saida in escolhas.get(pk, ())
+            )
+            for pk in ordem
+        ),
+    )
+    # Percursos iniciados em outra versão do grafo são reiniciados (os índices podem ter mudado)
+    assinatura = hashlib.sha256(repr(grafo).encode()).hexdigest()[:16]
+    return grafo._replace(assinatura=assinatura)
+
+
+# desafio_id -> (versão de conteúdo, Grafo ou GrafoInvalido)
+_compilados = {}
+
+
+def grafo_dilema(desafio_id):
+    """
+    Grafo compilado do dilema, recompilado apenas quando a versão de conteúdo muda
+    """
+    versao = versao_global('conteudo')
+    em_memoria = _compilados.get(desafio_id)
+    if em_memoria is None or em_memoria[0] != versao:
+        try:
+            resultado = compilar(desafio_id)
+        except GrafoInvalido as erro:
+            resultado = erro
+        em_memoria = _compilados[desafio_id] = (versao, resultado)
+    if isinstance(em_memoria[1], GrafoInvalido):
+        raise em_memoria[1]
+    return em_memoria[1]
+
+
+def _reiniciar(estado, grafo):
+    estado.assinatura = grafo.assinatura
+    estado.etapa_atual = 0
+    estado.caminho = b''
+    estado.pontos = grafo.pontos[0]
+    estado.concluido = grafo.final(0)
+
+
+def situacao(grafo, estado):
+    """
+    Etapa atual do estudante pronta para exibição
+    """
+    etapa = estado.etapa_atual
+    return {
+        'desafio_id': grafo.desafio_id,
+        'etapa': grafo.chaves[etapa],
+        'texto': grafo.textos[etapa],
+        'escolhas': [{'indice': posicao, 'texto': escolha.texto} for posicao, escolha in enumerate(grafo.escolhas[etapa])],
+        'passos': len(estado.caminho),
+        'pontos': estado.pontos,
+        'concluido': estado.concluido,
+    }
+
+
+def carregar_estado(estudante, desafio_id, reiniciar=False):
+    """
+    Estado do estudante no dilema, começando (ou recomeçando) o percurso quando
+    necessário. Retorna (grafo, estado).
+    """
+    grafo = grafo_dilema(desafio_id)
+    estado, criado = EstadoDilema.objects.get_or_create(estudante=estudante, desafio_id=desafio_id)
+    if criado or reiniciar or estado.assinatura != grafo.assinatura:
+        _reiniciar(estado, grafo)
+        estado.save()
+    return grafo, estado
+
+
+def _concluir(estudante, desafio_id, pontos):
+    """
+    Registra a conclusão do desafio; os pontos só entram na pontuação na primeira vez
+    """
+    progresso, _ = ProgressoDesafio.objects.select_for_update().get_or_create(
+        estudante=estudante, desafio_id=desafio_id
+    )
+    primeira_vez = not progresso.concluido
+    progresso.pontuacao = max(progresso.pontuacao, pontos)
+    if primeira_vez:
+        progresso.concluido = True
+        progresso.data_conclusao = timezone.now()
+    progresso.save()
+
+    if primeira_vez and pontos > 0:
+        registrar_pontos(estudante, pontos, f'dilema:{desafio_id}')
+
+
+def escolher(estudante, desafio_id, indice):
+    """
+    Aplica a escolha `indice` na etapa atual. Retorna (grafo, estado, escolha).
+    """
+    grafo = grafo_dilema(desafio_id)
+    with transaction.atomic():
+        estado, criado = EstadoDilema.objects.select_for_update().get_or_create(
+            estudante=estudante, desafio_id=desafio_id
+        )
+        if criado or estado.assinatura != grafo.assinatura:
+            _reiniciar(estado, grafo)
+        if estado.concluido:
+            raise EscolhaInvalida('O dilema já foi concluído; reinicie para jogar de novo.')
+        saidas = grafo.escolhas[estado.etapa_atual]
+        if not 0 <= indice < len(saidas):
+            raise EscolhaInvalida('Escolha inexistente nesta etapa.')
+
+        escolha = saidas[indice]
+        estado.etapa_atual = escolha.destino
+        estado.caminho = bytes(estado.caminho) + bytes((indice,))
+        estado.pontos += escolha.pontos + grafo.pontos[escolha.destino]
+        estado.concluido = grafo.final(escolha.destino)
+        estado.save()
+        if estado.concluido:
+            _concluir(estudante, desafio_id, max(estado.pontos, 0))
+    return grafo, estado, escolha
+
+
+def percurso(grafo, caminho):
+    """
+    Reconstrói as chaves das etapas visitadas a partir do caminho compacto
+    """
+    etapa = 0
+    chaves = [grafo.chaves[0]]
+    for indice in bytes(caminho):
+        etapa = grafo.escolhas[etapa][indice].destino
+        chaves.append(grafo.chaves[etapa])
+    return chaves
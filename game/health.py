@@ -0,0 +1,118 @@
+"""
+Sondas de saúde para o orquestrador (load balancer, Kubernetes, systemd).
+
+- /saude/vivo/ (liveness): o processo responde. Não toca no banco nem no cache,
+  para que uma falha do banco não faça o orquestrador reiniciar todos os workers.
+- /saude/pronto/ (readiness): executa `SELECT 1` em cada banco configurado e um
+  set/get no cache, medindo a latência de cada um. Responde 503 se algum falhar
+  ou passar de settings.SAUDE_LIMITE_MS: o worker sai do balanceamento até se
+  recuperar.
+
+O SaudeMiddleware fica no topo do MIDDLEWARE e responde antes da validação de
+host, sessão e autenticação: as sondas vêm pelo IP do worker, sem cookies, e
+não devem abrir sessões nem passar pela instrumentação das outras camadas.
+"""
+
+import os
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import JsonResponse
+
+from .middleware import MiddlewareHibrido
+
+CAMINHO_VIVO = '/saude/vivo/'
+CAMINHO_PRONTO = '/saude/pronto/'
+TIMEOUT_CHAVE_CACHE = 10
+
+
+def limite_ms():
+    return getattr(settings, 'SAUDE_LIMITE_MS', 500)
+
+
+def _medir(verificacao):
+    """
+    {'ok', 'ms'} (e 'erro' se falhou) de uma verificação
+    """
+    inicio = time.perf_counter()
+    try:
+        verificacao()
+    except Exception as erro:  # qualquer falha tira o worker do balanceamento
+        return {'ok': False, 'ms': round((time.perf_counter() - inicio) * 1000, 2), 'erro': f'{type(erro).__name__}: {erro}'}
+    ms = round((time.perf_counter() - inicio) * 1000, 2)
+    resultado = {'ok': ms <= limite_ms(), 'ms': ms}
+    if not resultado['ok']:
+        resultado['erro'] = f'acima de {limite_ms()} ms'
+    return resultado
+
+
+def _banco(alias):
+    def verificacao():
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    return verificacao
+
+
+def _cache():
+    # Chave própria do processo: sondas simultâneas de workers diferentes não se confundem
+    chave = f'saude:{os.getpid()}:{uuid.uuid4().hex}'
+    cache.set(chave, 1, TIMEOUT_CHAVE_CACHE)
+    try:
+        if cache.get(chave) != 1:
+            raise RuntimeError('valor gravado não foi lido de volta')
+    finally:
+        cache.delete(chave)
+
+
+def verificar():
+    """
+    (pronto, {nome da verificação: resultado}) para bancos e cache
+    """
+    verificacoes = {f'banco:{alias}': _banco(alias) for alias in connections}
+    verificacoes['cache'] = _cache
+    resultados = {nome: _medir(verificacao) for nome, verificacao in verificacoes.items()}
+    return all(resultado['ok'] for resultado in resultados.values()), resultados
+
+
+def vivo():
+    return JsonResponse({'status': 'ok', 'pid': os.getpid()})
+
+
+def pronto():
+    ok, resultados = verificar()
+    return JsonResponse(
+        {'status': 'ok' if ok else 'indisponivel', 'pid': os.getpid(), 'verificacoes': resultados},
+        status=200 if ok else 503,
+    )
+
+
+class SaudeMiddleware(MiddlewareHibrido):
+    """
+    Responde às sondas antes do resto da pilha. Deve ser o primeiro do MIDDLEWARE.
+    """
+
+    def responder(self, request):
+        if request.method in ('GET', 'HEAD'):
+            if request.path_info == CAMINHO_VIVO:
+                return self._sem_cache(vivo())
+            if request.path_info == CAMINHO_PRONTO:
+                return self._sem_cache(pronto())
+        return self.get_response(request)
+
+    async def aresponder(self, request):
+        if request.method in ('GET', 'HEAD'):
+            if request.path_info == CAMINHO_VIVO:
+                return self._sem_cache(vivo())
+            if request.path_info == CAMINHO_PRONTO:
+                # Banco e cache são síncronos: só a sonda de prontidão sai do event loop
+                return self._sem_cache(await sync_to_async(pronto)())
+        return await self.get_response(request)
+
+    def _sem_cache(self, response):
+        response['Cache-Control'] = 'no-store'
+        return response
@@ -0,0 +1,128 @@
+"""
+Curva de níveis configurável (tabela NivelPontuacao).
+
+A tabela é carregada uma vez por processo em arrays ordenados de limiares e
+recarregada só quando a versão global "niveis" muda. Nível, progresso e pontos
+para o próximo nível são buscas binárias (bisect) nesses arrays.
+
+No banco, o nível é calculado por uma expressão CASE com os mesmos limiares,
+usada nos incrementos atômicos de pontos e no renivelamento em massa.
+"""
+
+from bisect import bisect_right
+from typing import NamedTuple
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.lookups import GreaterThanOrEqual
+
+from .models import NivelPontuacao, Pontuacao
+from .versioning import incrementar_versao_global, versao_global
+
+# Usada enquanto a tabela estiver vazia: 100 pontos por nível, até o nível 100
+PONTOS_POR_NIVEL = 100
+NIVEL_MAXIMO = 100
+
+
+class Curva(NamedTuple):
+    limiares: tuple
+    niveis: tuple
+    nomes: tuple
+
+    def posicao(self, pontos):
+        # Índice do maior limiar <= pontos (pontos abaixo do primeiro ficam no primeiro nível)
+        return max(bisect_right(self.limiares, pontos) - 1, 0)
+
+
+CURVA_PADRAO = Curva(
+    limiares=tuple(range(0, PONTOS_POR_NIVEL * NIVEL_MAXIMO, PONTOS_POR_NIVEL)),
+    niveis=tuple(range(1, NIVEL_MAXIMO + 1)),
+    nomes=('',) * NIVEL_MAXIMO,
+)
+
+# (versão da curva, Curva) carregada neste processo
+_carregada = None
+
+
+def carregar_curva():
+    """
+    Lê a curva do banco, ordenada pelos pontos mínimos
+    """
+    linhas = list(NivelPontuacao.objects.order_by('pontos_minimos').values_list('pontos_minimos', 'nivel', 'nome'))
+    if not linhas:
+        return CURVA_PADRAO
+    limiares, niveis, nomes = zip(*linhas)
+    if list(niveis) != sorted(niveis):
+        raise ValueError('A curva de níveis deve crescer junto com os pontos mínimos.')
+    return Curva(limiares, niveis, nomes)
+
+
+def curva():
+    """
+    Curva em memória, recarregada quando a versão "niveis" muda
+    """
+    global _carregada
+    versao = versao_global('niveis')
+    if _carregada is None or _carregada[0] != versao:
+        _carregada = (versao, carregar_curva())
+    return _carregada[1]
+
+
+def nivel_para(pontos):
+    """
+    Nível correspondente a uma pontuação
+    """
+    atual = curva()
+    return atual.niveis[atual.posicao(pontos)]
+
+
+def progresso(pontos):
+    """
+    Nível atual, título, limiares do nível e quanto falta para o próximo
+    (pontos_proximo e faltam são None no último nível)
+    """
+    atual = curva()
+    posicao = atual.posicao(pontos)
+    inicio = atual.limiares[posicao]
+    ultimo = posicao + 1 >= len(atual.limiares)
+    proximo = None if ultimo else atual.limiares[posicao + 1]
+    if ultimo:
+        percentual = 100
+    else:
+        percentual = min(max(round((pontos - inicio) * 100 / (proximo - inicio)), 0), 100)
+    return {
+        'nivel': atual.niveis[posicao],
+        'nome': atual.nomes[posicao],
+        'pontos_nivel': inicio,
+        'pontos_proximo': proximo,
+        'faltam': None if ultimo else proximo - pontos,
+        'percentual': percentual,
+    }
+
+
+def expressao_nivel(pontos):
+    """
+    Expressão SQL do nível para a expressão de pontos, com os limiares da curva atual
+    """
+    atual = curva()
+    return Case(
+        *(
+            When(GreaterThanOrEqual(pontos, Value(limiar)), then=Value(nivel))
+            for limiar, nivel in zip(reversed(atual.limiares[1:]), reversed(atual.niveis[1:]))
+        ),
+        default=Value(atual.niveis[0]),
+    )
+
+
+def renivelar():
+    """
+    Recalcula o nível de todas as pontuações após uma mudança na curva, com um
+    único UPDATE que só toca as linhas cujo nível mudou. Retorna quantas mudaram.
+    """
+    nivel = expressao_nivel(F('pontos_totais'))
+    with transaction.atomic():
+        alteradas = Pontuacao.objects.exclude(nivel_atual=nivel).update(nivel_atual=nivel)
+    if alteradas:
+        incrementar_versao_global('ranking')
+        incrementar_versao_global('niveis')
+    return alteradas
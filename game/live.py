@@ -0,0 +1,662 @@
+"""
+Quiz ao vivo em sala de aula por WebSocket, no estilo Kahoot (somente sob ASGI).
+
+O professor (usuário staff) abre uma sala para um Quiz ativo conectando em
+/ws/ao-vivo/?quiz=<id> e recebe o código de 6 dígitos; os estudantes entram em
+/ws/ao-vivo/<codigo>/ com a sessão do site. Mensagens do cliente são objetos
+JSON: o professor conduz com {"acao": "proxima" | "revelar" | "encerrar"} e o
+estudante responde com {"acao": "responder", "resposta": <id da alternativa>}.
+
+- Estado em memória: perguntas, gabarito, participantes, contagem das
+  alternativas e placar vivem no processo; durante a sessão nada é lido nem
+  gravado no banco. Cada resposta é corrigida na hora; a pergunta fecha quando
+  todos os conectados respondem ou o tempo (AO_VIVO_TEMPO_PERGUNTA) acaba. O
+  placar ordena por pontos e, no empate, pelo tempo total de resposta.
+- Saída em lotes: cada conexão tem uma fila e uma tarefa de escrita que envia
+  no máximo um quadro a cada AO_VIVO_INTERVALO_MS, com todas as mensagens
+  acumuladas (o quadro é uma lista JSON). Mensagens de estado (participantes,
+  respondidas, contagem, placar, posicao) são coalescidas: só a última de cada
+  tipo sai. O que vai para a sala toda é serializado uma vez e a mesma string
+  entra em todas as filas; a contagem de respostas é publicada uma vez por
+  intervalo, não a cada resposta. Um cliente que acumula mais de LIMITE_FILA
+  mensagens sem ler é desconectado.
+- Gravação no fim: ao encerrar (pelo professor, depois da última pergunta,
+  sem professor por AO_VIVO_TEMPO_ORFA segundos ou no desligamento do worker,
+  pelo lifespan do ASGI), results.gravar_sessao grava os resultados e os
+  pontos de todos em uma transação.
+
+As salas ficam no worker em que foram abertas: `servir --asgi` usa um worker
+só, salvo com afinidade por código no balanceador (AO_VIVO_AFINIDADE). O comando
+`carga_ao_vivo` mede quantas conexões simultâneas um worker sustenta.
+"""
+
+import asyncio
+import json
+import logging
+import secrets
+import time
+from collections import Counter
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aget_user
+from django.http.cookie import parse_cookie
+from django.http.request import split_domain_port, validate_host
+from django.utils import timezone
+
+from . import results
+from .models import Estudante, Pergunta, Quiz
+
+logger = logging.getLogger(__name__)
+
+PREFIXO = '/ws/ao-vivo/'
+LIMITE_FILA = 500
+TAMANHO_MAXIMO_MENSAGEM = 4096
+TAMANHO_PLACAR = 10
+
+# Códigos de fechamento da aplicação (faixa 4000-4999 do WebSocket)
+FECHAR_NAO_AUTENTICADO = 4401
+FECHAR_PROIBIDO = 4403
+FECHAR_NAO_ENCONTRADA = 4404
+FECHAR_SUBSTITUIDA = 4409
+FECHAR_LENTO = 4408
+FECHAR_SALA_CHEIA = 4429
+
+# codigo -> Sala, no worker atual
+_salas = {}
+
+
+def tempo_pergunta():
+    return getattr(settings, 'AO_VIVO_TEMPO_PERGUNTA', 20)
+
+
+def intervalo_envio():
+    return getattr(settings, 'AO_VIVO_INTERVALO_MS', 100) / 1000
+
+
+def max_participantes():
+    return getattr(settings, 'AO_VIVO_MAX_PARTICIPANTES', 500)
+
+
+def tempo_orfa():
+    return getattr(settings, 'AO_VIVO_TEMPO_ORFA', 120)
+
+
+def _json(mensagem):
+    return json.dumps(mensagem, ensure_ascii=False, separators=(',', ':'))
+
+
+def _cancelar(tarefa):
+    if tarefa is not None and tarefa is not asyncio.current_task():
+        tarefa.cancel()
+
+
+class Conexao:
+    """
+    Fila de saída de um WebSocket, esvaziada por uma tarefa própria em no
+    máximo um quadro por intervalo. As mensagens chegam já serializadas.
+    """
+
+    def __init__(self, send, intervalo):
+        self._send = send
+        self.intervalo = intervalo
+        self.eventos = []  # fragmentos JSON, na ordem
+        self.estados = {}  # tipo -> último fragmento
+        self.fechamento = None
+        self.aberta = True
+        self.quadros = self.mensagens = 0
+        self._sinal = asyncio.Event()
+        self._tarefa = asyncio.create_task(self._escrever())
+
+    def evento(self, fragmento):
+        if not self.aberta or self.fechamento is not None:
+            return
+        if self.estados:
+            # Estados pendentes saem antes do evento, para não chegarem fora de ordem
+            self.eventos.extend(self.estados.values())
+            self.estados.clear()
+        self.eventos.append(fragmento)
+        if len(self.eventos) > LIMITE_FILA:
+            self.eventos.clear()
+            self.fechar(FECHAR_LENTO)
+        self._sinal.set()
+
+    def estado(self, tipo, fragmento):
+        if self.aberta and self.fechamento is None:
+            self.estados[tipo] = fragmento
+            self._sinal.set()
+
+    def enviar(self, mensagem):
+        self.evento(_json(mensagem))
+
+    def fechar(self, codigo=1000):
+        if self.fechamento is None:
+            self.fechamento = codigo
+            self._sinal.set()
+
+    def parar(self):
+        self.aberta = False
+        _cancelar(self._tarefa)
+
+    async def _escrever(self):
+        try:
+            while True:
+                await self._sinal.wait()
+                self._sinal.clear()
+                partes = self.eventos + list(self.estados.values())
+                self.eventos, self.estados = [], {}
+                if partes:
+                    await self._send({'type': 'websocket.send', 'text': '[' + ','.join(partes) + ']'})
+                    self.quadros += 1
+                    self.mensagens += len(partes)
+                if self.fechamento is not None:
+                    await self._send({'type': 'websocket.close', 'code': self.fechamento})
+                    return
+                # Janela de agrupamento: o que chegar até lá vai no próximo quadro
+                await asyncio.sleep(self.intervalo)
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # o cliente caiu no meio do envio; a leitura recebe o disconnect
+            logger.debug('Falha ao enviar para o WebSocket', exc_info=True)
+        finally:
+            self.aberta = False
+
+
+class Participante:
+    __slots__ = ('estudante_id', 'nome', 'conexao', 'pontos', 'acertos', 'tempo_ms', 'respostas')
+
+    def __init__(self, estudante_id, nome):
+        self.estudante_id = estudante_id
+        self.nome = nome
+        self.conexao = None
+        self.pontos = self.acertos = self.tempo_ms = 0
+        self.respostas = {}  # pergunta_id -> resposta_id
+
+
+class Sala:
+    """
+    Uma sessão ao vivo de um quiz. Os métodos rodam no event loop do worker,
+    sem concorrência entre si fora dos awaits (só encerrar() espera o banco).
+    """
+
+    def __init__(self, codigo, quiz, perguntas, professor_id):
+        self.codigo = codigo
+        self.quiz = quiz
+        # [{'id', 'texto', 'explicacao', 'pontos', 'alternativas': {id: texto}, 'corretas': set}]
+        self.perguntas = perguntas
+        self.professor_id = professor_id
+        self.professor = None
+        self.participantes = {}  # estudante_id -> Participante
+        self.indice = -1
+        self.aberta = False
+        self.inicio_pergunta = 0
+        self.contagem = Counter()
+        self.respondidas = 0
+        self.encerrando = self.encerrada = False
+        self.inicio = timezone.now()
+        self.chave = f'ao-vivo-{codigo}-{secrets.token_hex(4)}'
+        self.tempo_pergunta = tempo_pergunta()
+        self.intervalo = intervalo_envio()
+        self._cronometro = self._publicacao = self._orfa = None
+
+    # Envio
+
+    def conexoes(self):
+        if self.professor is not None:
+            yield self.professor
+        for participante in self.participantes.values():
+            if participante.conexao is not None:
+                yield participante.conexao
+
+    def transmitir(self, mensagem):
+        fragmento = _json(mensagem)
+        for conexao in self.conexoes():
+            conexao.evento(fragmento)
+
+    def transmitir_estado(self, mensagem):
+        fragmento = _json(mensagem)
+        for conexao in self.conexoes():
+            conexao.estado(mensagem['tipo'], fragmento)
+
+    def conectados(self):
+        return sum(participante.conexao is not None for participante in self.participantes.values())
+
+    def _agendar_publicacao(self):
+        """
+        Participantes e respostas mudam a cada conexão e resposta: publica uma vez por intervalo
+        """
+        if self._publicacao is None:
+            self._publicacao = asyncio.create_task(self._publicar_depois())
+
+    async def _publicar_depois(self):
+        await asyncio.sleep(self.intervalo)
+        self._publicacao = None
+        self.transmitir_estado({'tipo': 'participantes', 'total': self.conectados()})
+        if self.aberta:
+            self.transmitir_estado({
+                'tipo': 'respondidas', 'pergunta': self.perguntas[self.indice]['id'],
+                'total': self.respondidas, 'participantes': self.conectados(),
+            })
+            if self.professor is not None:
+                self.professor.estado('contagem', _json(self._contagem()))
+
+    def _contagem(self):
+        pergunta = self.perguntas[self.indice]
+        return {
+            'tipo': 'contagem', 'pergunta': pergunta['id'],
+            'alternativas': {str(alternativa): self.contagem[alternativa] for alternativa in pergunta['alternativas']},
+        }
+
+    def _pergunta(self):
+        pergunta = self.perguntas[self.indice]
+        restante = self.tempo_pergunta - (time.monotonic() - self.inicio_pergunta)
+        return {
+            'tipo': 'pergunta', 'indice': self.indice + 1, 'total': len(self.perguntas),
+            'id': pergunta['id'], 'texto': pergunta['texto'], 'pontos': pergunta['pontos'],
+            'tempo': max(round(restante, 1), 0),
+            'alternativas': [{'id': alternativa, 'texto': texto} for alternativa, texto in pergunta['alternativas'].items()],
+        }
+
+    def _sala(self, papel, **extras):
+        return {
+            'tipo': 'sala', 'codigo': self.codigo, 'papel': papel,
+            'quiz': {'id': self.quiz.pk, 'titulo': self.quiz.titulo, 'total_perguntas': len(self.perguntas)},
+            'participantes': self.conectados(), **extras,
+        }
+
+    # Entrada e saída
+
+    def entrar_professor(self, conexao):
+        if self.professor is not None:
+            self.professor.fechar(FECHAR_SUBSTITUIDA)
+        self.professor = conexao
+        _cancelar(self._orfa)
+        self._orfa = None
+        conexao.enviar(self._sala('professor'))
+        if self.aberta:
+            conexao.enviar(self._pergunta())
+            conexao.estado('contagem', _json(self._contagem()))
+        if self.indice >= 0:
+            conexao.estado('placar', _json(self._placar(self._classificacao())))
+
+    def entrar_estudante(self, estudante_id, nome, conexao):
+        """
+        Participante da conexão, ou None se a sala estiver cheia. Reconectar
+        mantém a pontuação e substitui a conexão anterior.
+        """
+        participante = self.participantes.get(estudante_id)
+        if participante is None:
+            if len(self.participantes) >= max_participantes():
+                return None
+            participante = self.participantes[estudante_id] = Participante(estudante_id, nome)
+        elif participante.conexao is not None:
+            participante.conexao.fechar(FECHAR_SUBSTITUIDA)
+        participante.conexao = conexao
+        conexao.enviar(self._sala('estudante', nome=nome))
+        if self.aberta:
+            pergunta = self._pergunta()
+            pergunta['respondida'] = participante.respostas.get(pergunta['id'])
+            conexao.enviar(pergunta)
+        if self.indice >= 0:
+            self._enviar_posicoes(self._classificacao(), [participante])
+        self._agendar_publicacao()
+        return participante
+
+    def sair(self, conexao, participante):
+        if self.encerrada:
+            return
+        if conexao is self.professor:
+            self.professor = None
+            self._orfa = asyncio.create_task(self._encerrar_sem_professor())
+        elif participante is not None and participante.conexao is conexao:
+            participante.conexao = None
+            if self.aberta and self._todos_responderam():
+                self.revelar()
+            self._agendar_publicacao()
+
+    async def _encerrar_sem_professor(self):
+        await asyncio.sleep(tempo_orfa())
+        if self.professor is None:
+            await self.encerrar()
+
+    # Condução
+
+    async def comando(self, conexao, participante, dados):
+        acao = dados.get('acao')
+        if self.encerrando:
+            conexao.enviar({'tipo': 'erro', 'mensagem': 'A sessão está sendo encerrada.'})
+        elif conexao is self.professor and acao in ('proxima', 'revelar', 'encerrar'):
+            if acao == 'proxima':
+                await self.proxima()
+            elif acao == 'revelar':
+                self.revelar()
+            else:
+                await self.encerrar()
+        elif participante is not None and participante.conexao is conexao and acao == 'responder':
+            self.responder(participante, dados.get('resposta'))
+        else:
+            conexao.enviar({'tipo': 'erro', 'mensagem': f'Ação inválida: {acao}.'})
+
+    async def proxima(self):
+        if self.aberta:
+            self.professor.enviar({'tipo': 'erro', 'mensagem': 'Revele a pergunta atual antes de avançar.'})
+            return
+        if self.indice + 1 >= len(self.perguntas):
+            await self.encerrar()
+            return
+        self.indice += 1
+        self.aberta = True
+        self.contagem = Counter()
+        self.respondidas = 0
+        self.inicio_pergunta = time.monotonic()
+        self.transmitir(self._pergunta())
+        self._cronometro = asyncio.create_task(self._tempo_esgotado(self.indice))
+        self._agendar_publicacao()
+
+    async def _tempo_esgotado(self, indice):
+        await asyncio.sleep(self.tempo_pergunta)
+        if self.aberta and self.indice == indice:
+            self.revelar()
+
+    def responder(self, participante, resposta_id):
+        pergunta = self.perguntas[self.indice] if self.aberta else None
+        try:
+            resposta_id = int(resposta_id)
+        except (TypeError, ValueError):
+            resposta_id = None
+        if pergunta is None:
+            erro = 'Nenhuma pergunta aberta.'
+        elif resposta_id not in pergunta['alternativas']:
+            erro = 'Alternativa inválida.'
+        elif pergunta['id'] in participante.respostas:
+            erro = 'Você já respondeu esta pergunta.'
+        else:
+            erro = None
+        if erro:
+            participante.conexao.enviar({'tipo': 'erro', 'mensagem': erro})
+            return
+
+        participante.respostas[pergunta['id']] = resposta_id
+        participante.tempo_ms += int((time.monotonic() - self.inicio_pergunta) * 1000)
+        if resposta_id in pergunta['corretas']:
+            participante.acertos += 1
+            participante.pontos += pergunta['pontos']
+        self.contagem[resposta_id] += 1
+        self.respondidas += 1
+        participante.conexao.enviar({'tipo': 'recebida', 'pergunta': pergunta['id'], 'resposta': resposta_id})
+        if self.respondidas >= self.conectados() and self._todos_responderam():
+            self.revelar()
+        else:
+            self._agendar_publicacao()
+
+    def _todos_responderam(self):
+        pergunta_id = self.perguntas[self.indice]['id']
+        return all(
+            pergunta_id in participante.respostas
+            for participante in self.participantes.values() if participante.conexao is not None
+        )
+
+    def revelar(self):
+        if not self.aberta:
+            return
+        self.aberta = False
+        _cancelar(self._cronometro)
+        self._cronometro = None
+        pergunta = self.perguntas[self.indice]
+        self.transmitir({
+            'tipo': 'gabarito', 'pergunta': pergunta['id'], 'corretas': sorted(pergunta['corretas']),
+            'explicacao': pergunta['explicacao'], 'respondidas': self.respondidas,
+            'alternativas': self._contagem()['alternativas'],
+        })
+        classificacao = self._classificacao()
+        self.transmitir_estado(self._placar(classificacao))
+        self._enviar_posicoes(classificacao, classificacao)
+
+    # Placar
+
+    def _classificacao(self):
+        return sorted(self.participantes.values(), key=lambda p: (-p.pontos, p.tempo_ms, p.nome))
+
+    def _placar(self, classificacao):
+        return {
+            'tipo': 'placar', 'participantes': len(classificacao),
+            'ranking': [
+                {'posicao': posicao, 'nome': participante.nome, 'pontos': participante.pontos, 'acertos': participante.acertos}
+                for posicao, participante in enumerate(classificacao[:TAMANHO_PLACAR], 1)
+            ],
+        }
+
+    def _enviar_posicoes(self, classificacao, participantes):
+        posicoes = {participante.estudante_id: posicao for posicao, participante in enumerate(classificacao, 1)}
+        pergunta = self.perguntas[self.indice]
+        for participante in participantes:
+            if participante.conexao is None:
+                continue
+            participante.conexao.estado('posicao', _json({
+                'tipo': 'posicao', 'posicao': posicoes[participante.estudante_id], 'de': len(classificacao),
+                'pontos': participante.pontos, 'acertos': participante.acertos,
+                # Com a pergunta aberta (reconexão), o gabarito ainda não pode vazar
+                'acertou': None if self.aberta else participante.respostas.get(pergunta['id']) in pergunta['corretas'],
+            }))
+
+    async def encerrar(self):
+        """
+        Revela a pergunta aberta, grava os resultados de todos e fecha a sala.
+        Se a gravação falhar a sala continua aberta e o professor pode tentar de novo.
+        """
+        if self.encerrando or self.encerrada:
+            return
+        self.revelar()
+        self.encerrando = True
+        participacoes = [
+            (participante.estudante_id, dict(participante.respostas), round(participante.tempo_ms / 1000))
+            for participante in self.participantes.values() if participante.respostas
+        ]
+        try:
+            gravados = await sync_to_async(results.gravar_sessao)(self.quiz, self.chave, self.inicio, participacoes)
+        except Exception:
+            logger.exception('Falha ao gravar a sessão ao vivo %s', self.codigo)
+            self.encerrando = False
+            if self.professor is not None:
+                self.professor.enviar({'tipo': 'erro', 'mensagem': 'Não foi possível gravar os resultados; tente encerrar de novo.'})
+            return
+
+        self.encerrada = True
+        for tarefa in (self._cronometro, self._publicacao, self._orfa):
+            _cancelar(tarefa)
+        classificacao = self._classificacao()
+        self.transmitir({**self._placar(classificacao), 'tipo': 'fim', 'gravados': len(gravados)})
+        for conexao in self.conexoes():
+            conexao.fechar()
+        _salas.pop(self.codigo, None)
+
+
+async def abrir_sala(quiz_id, professor_id):
+    """
+    Carrega o quiz ativo com perguntas e gabarito (as únicas leituras da sessão) e registra a sala
+    """
+    try:
+        quiz = await Quiz.objects.aget(pk=int(quiz_id), ativo=True)
+    except (TypeError, ValueError, Quiz.DoesNotExist):
+        return None
+    perguntas = [
+        {
+            'id': pergunta.pk,
+            'texto': pergunta.texto,
+            'explicacao': pergunta.explicacao,
+            'pontos': pergunta.pontos,
+            'alternativas': {resposta.pk: resposta.texto for resposta in pergunta.respostas.all()},
+            'corretas': {resposta.pk for resposta in pergunta.respostas.all() if resposta.correta},
+        }
+        async for pergunta in Pergunta.objects.filter(quiz=quiz).prefetch_related('respostas').order_by('ordem')
+    ]
+    perguntas = [pergunta for pergunta in perguntas if pergunta['alternativas']]
+    if not perguntas:
+        return None
+    codigo = f'{secrets.randbelow(10 ** 6):06d}'
+    while codigo in _salas:
+        codigo = f'{secrets.randbelow(10 ** 6):06d}'
+    sala = _salas[codigo] = Sala(codigo, quiz, perguntas, professor_id)
+    return sala
+
+
+def salas():
+    return list(_salas.values())
+
+
+def _cabecalhos(scope):
+    return {nome.decode('latin-1').lower(): valor.decode('latin-1') for nome, valor in scope.get('headers', [])}
+
+
+def _origem_valida(scope):
+    """
+    Host em ALLOWED_HOSTS e, vindo de um navegador, Origin igual ao Host: sem
+    isso outro site poderia abrir o WebSocket com o cookie do estudante
+    """
+    cabecalhos = _cabecalhos(scope)
+    host = cabecalhos.get('host', '')
+    permitidos = settings.ALLOWED_HOSTS or (['.localhost', '127.0.0.1', '[::1]'] if settings.DEBUG else [])
+    dominio, _ = split_domain_port(host)
+    if not dominio or not validate_host(dominio, permitidos):
+        return False
+    origem = cabecalhos.get('origin')
+    return origem is None or urlsplit(origem).netloc == host
+
+
+async def _usuario(scope):
+    cookies = parse_cookie(_cabecalhos(scope).get('cookie', ''))
+    engine = import_module(settings.SESSION_ENGINE)
+    return await aget_user(SimpleNamespace(session=engine.SessionStore(cookies.get(settings.SESSION_COOKIE_NAME))))
+
+
+def _recusar(conexao, codigo, mensagem):
+    conexao.enviar({'tipo': 'erro', 'mensagem': mensagem})
+    conexao.fechar(codigo)
+    return None, None
+
+
+async def _entrar(scope, conexao, codigo):
+    """
+    (sala, participante) da conexão; participante é None para o professor
+    """
+    user = await _usuario(scope)
+    if not user.is_authenticated:
+        return _recusar(conexao, FECHAR_NAO_AUTENTICADO, 'Faça login para entrar na sala.')
+    if not codigo:
+        if not user.is_staff:
+            return _recusar(conexao, FECHAR_PROIBIDO, 'Somente professores abrem salas.')
+        quiz_id = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('quiz', [None])[0]
+        sala = await abrir_sala(quiz_id, user.pk)
+        if sala is None:
+            return _recusar(conexao, FECHAR_NAO_ENCONTRADA, 'Quiz inexistente, inativo ou sem perguntas.')
+        sala.entrar_professor(conexao)
+        return sala, None
+
+    sala = _salas.get(codigo)
+    if sala is None or sala.encerrando or sala.encerrada:
+        return _recusar(conexao, FECHAR_NAO_ENCONTRADA, 'Sala não encontrada.')
+    if user.pk == sala.professor_id:
+        sala.entrar_professor(conexao)
+        return sala, None
+    estudante, _ = await Estudante.objects.aget_or_create(
+        user=user, defaults={'nome': user.get_full_name() or user.username}
+    )
+    participante = sala.entrar_estudante(estudante.pk, estudante.nome, conexao)
+    if participante is None:
+        return _recusar(conexao, FECHAR_SALA_CHEIA, 'Sala cheia.')
+    return sala, participante
+
+
+def _ler(mensagem):
+    texto = mensagem.get('text')
+    if texto is None and mensagem.get('bytes') is not None:
+        texto = mensagem['bytes'].decode('utf-8', 'replace')
+    if not texto or len(texto) > TAMANHO_MAXIMO_MENSAGEM:
+        return None
+    try:
+        dados = json.loads(texto)
+    except ValueError:
+        return None
+    return dados if isinstance(dados, dict) else None
+
+
+async def aplicacao(scope, receive, send):
+    """
+    Aplicação ASGI dos WebSockets do quiz ao vivo
+    """
+    if (await receive())['type'] != 'websocket.connect':
+        return
+    if not scope['path'].startswith(PREFIXO) or not _origem_valida(scope):
+        await send({'type': 'websocket.close', 'code': FECHAR_PROIBIDO})  # antes do accept: HTTP 403
+        return
+    await send({'type': 'websocket.accept'})
+    conexao = Conexao(send, intervalo_envio())
+    sala = participante = None
+    try:
+        sala, participante = await _entrar(scope, conexao, scope['path'][len(PREFIXO):].strip('/'))
+        while True:
+            mensagem = await receive()
+            if mensagem['type'] == 'websocket.disconnect':
+                break
+            if mensagem['type'] != 'websocket.receive' or sala is None:
+                continue
+            dados = _ler(mensagem)
+            if dados is None:
+                conexao.enviar({'tipo': 'erro', 'mensagem': 'Envie um objeto JSON com "acao".'})
+            else:
+                await sala.comando(conexao, participante, dados)
+    finally:
+        if sala is not None:
+            sala.sair(conexao, participante)
+        conexao.parar()
+
+
+async def encerrar_salas():
+    """
+    Encerra e grava todas as salas abertas no worker (desligamento). Retorna
+    quantas foram gravadas.
+    """
+    gravadas = 0
+    for sala in salas():
+        await sala.encerrar()
+        gravadas += sala.encerrada
+    return gravadas
+
+
+async def _lifespan(receive, send):
+    """
+    Ciclo de vida do worker: no desligamento (SIGTERM, fim do timeout gracioso)
+    as salas abertas são encerradas e gravadas antes de o processo sair
+    """
+    while True:
+        mensagem = await receive()
+        if mensagem['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif mensagem['type'] == 'lifespan.shutdown':
+            try:
+                gravadas = await encerrar_salas()
+            except Exception as erro:
+                logger.exception('Falha ao encerrar as salas ao vivo no desligamento')
+                await send({'type': 'lifespan.shutdown.failed', 'message': repr(erro)})
+            else:
+                if gravadas:
+                    logger.info('%s sala(s) ao vivo encerrada(s) e gravada(s) no desligamento', gravadas)
+                await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+def roteador(http):
+    """
+    Aplicação ASGI do projeto: WebSockets vão para as salas ao vivo, o lifespan
+    encerra as salas no desligamento e o resto vai para o Django
+    """
+    async def aplicacao_asgi(scope, receive, send):
+        if scope['type'] == 'websocket':
+            return await aplicacao(scope, receive, send)
+        if scope['type'] == 'lifespan':
+            return await _lifespan(receive, send)
+        return await http(scope, receive, send)
+    return aplicacao_asgi
@@ -0,0 +1,757 @@
+"""
+Gerador de carga HTTP com asyncio, sem ferramentas externas (comando `carga`).
+
+Cada estudante sintético é uma tarefa com a própria conexão keep-alive e os
+próprios cookies: faz login pelo formulário (com o token CSRF, como um
+navegador) e, quando todos entraram, repete jornadas sorteadas pelo peso até o
+fim do teste. Um ritmo global limita as requisições por segundo de todos os
+estudantes somados.
+
+Uma jornada é uma lista de passos:
+
+    {'nome': 'quiz_responder', 'metodo': 'POST', 'url': '/api/quizzes/{quiz}/pratica/',
+     'json': {'pergunta': '{pergunta}', 'resposta': '{resposta}'},
+     'extrair': {'pergunta': 'results.0.id'}}
+
+`{variavel}` na URL e nos valores é substituído por {usuario}, {quiz} e
+{desafio} (sorteados entre os ativos) e pelas variáveis extraídas de
+respostas JSON anteriores com `extrair` (caminho com pontos). Um passo cuja
+variável não existe é pulado. O comando aceita um arquivo JSON com
+{nome: {'peso': n, 'passos': [...]}} no lugar de JORNADAS_PADRAO.
+
+Os sorteios (jornada, quiz, desafio, pausas) vêm de um random.Random próprio
+do gerador, nunca do módulo random global: com a mesma semente (`--semente`)
+cada estudante repete a mesma sequência de jornadas.
+
+CargaAoVivo (comando `carga_ao_vivo`) enche uma sala do quiz ao vivo
+(game/live.py) com estudantes em WebSockets simultâneos, usando o
+ClienteWebSocket mínimo daqui, e mede conexão, difusão das perguntas,
+confirmação das respostas e gravação no fim.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import ssl
+import time
+from collections import Counter
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+TIMEOUT_PADRAO = 30
+LIMITE_CABECALHOS = 64 * 1024
+
+JORNADAS_PADRAO = {
+    'estudo': {
+        'peso': 5,
+        'passos': [
+            {'nome': 'dashboard', 'url': '/dashboard/'},
+            {'nome': 'desafios', 'url': '/desafios/'},
+            {
+                'nome': 'quiz_perguntas', 'url': '/api/quizzes/{quiz}/pratica/?quantidade=5',
+                'extrair': {'pergunta': 'results.0.id', 'resposta': 'results.0.respostas.0.id'},
+            },
+            {
+                'nome': 'quiz_responder', 'metodo': 'POST', 'url': '/api/quizzes/{quiz}/pratica/',
+                'json': {'pergunta': '{pergunta}', 'resposta': '{resposta}'},
+            },
+            {'nome': 'ranking', 'url': '/ranking/'},
+        ],
+    },
+    'consulta': {
+        'peso': 3,
+        'passos': [
+            {'nome': 'dashboard', 'url': '/dashboard/'},
+            {'nome': 'ranking', 'url': '/ranking/'},
+            {'nome': 'estatisticas', 'url': '/estatisticas/'},
+        ],
+    },
+    'aplicativo': {
+        'peso': 2,
+        'passos': [
+            {'nome': 'api_dashboard', 'url': '/api/dashboard/'},
+            {'nome': 'api_progresso', 'url': '/api/progresso/'},
+            {'nome': 'api_ranking', 'url': '/api/ranking/?limit=20'},
+        ],
+    },
+}
+
+_VARIAVEL = re.compile(r'\{(\w+)\}')
+
+
+class ErroHttp(Exception):
+    pass
+
+
+class Resposta:
+    def __init__(self, status, cabecalhos, corpo):
+        self.status = status
+        self.cabecalhos = cabecalhos  # nome em minúsculas -> lista de valores
+        self.corpo = corpo
+
+    def cabecalho(self, nome, padrao=None):
+        valores = self.cabecalhos.get(nome.lower())
+        return valores[-1] if valores else padrao
+
+    def json(self):
+        return json.loads(self.corpo)
+
+
+class ClienteHttp:
+    """
+    Cliente HTTP/1.1 mínimo sobre asyncio: uma conexão keep-alive (reaberta se
+    o servidor fechar), cookies da sessão e token CSRF nos métodos de escrita
+    """
+
+    def __init__(self, url_base, timeout=TIMEOUT_PADRAO):
+        partes = urlsplit(url_base)
+        if partes.scheme not in ('http', 'https') or not partes.hostname:
+            raise ValueError(f'URL inválida: {url_base}')
+        self.host = partes.hostname
+        self.porta = partes.port or (443 if partes.scheme == 'https' else 80)
+        self.ssl = ssl.create_default_context() if partes.scheme == 'https' else None
+        self.cabecalho_host = partes.netloc
+        self.origem = f'{partes.scheme}://{partes.netloc}'
+        self.timeout = timeout
+        self.cookies = {}
+        self._leitor = self._escritor = None
+
+    async def _conectar(self):
+        if self._escritor is None:
+            self._leitor, self._escritor = await asyncio.open_connection(self.host, self.porta, ssl=self.ssl)
+
+    async def fechar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+            try:
+                await self._escritor.wait_closed()
+            except (ConnectionError, ssl.SSLError):
+                pass
+        self._leitor = self._escritor = None
+
+    def _guardar_cookies(self, resposta):
+        for valor in resposta.cabecalhos.get('set-cookie', []):
+            cookie = SimpleCookie()
+            cookie.load(valor)
+            for nome, morsel in cookie.items():
+                if morsel['max-age'] == '0' or morsel.value == '':
+                    self.cookies.pop(nome, None)
+                else:
+                    self.cookies[nome] = morsel.value
+
+    def _montar(self, metodo, caminho, corpo, tipo):
+        linhas = [
+            f'{metodo} {caminho} HTTP/1.1',
+            f'Host: {self.cabecalho_host}',
+            'Connection: keep-alive',
+            'Accept-Encoding: identity',
+            'User-Agent: logicash-carga',
+        ]
+        if self.cookies:
+            linhas.append('Cookie: ' + '; '.join(f'{nome}={valor}' for nome, valor in self.cookies.items()))
+        if metodo not in ('GET', 'HEAD', 'OPTIONS'):
+            # O CsrfViewMiddleware confere o header com o cookie (e a origem no HTTPS)
+            if 'csrftoken' in self.cookies:
+                linhas.append(f'X-CSRFToken: {self.cookies["csrftoken"]}')
+            linhas.append(f'Origin: {self.origem}')
+            linhas.append(f'Referer: {self.origem}{caminho}')
+        if corpo is not None:
+            linhas.append(f'Content-Type: {tipo}')
+        linhas.append(f'Content-Length: {len(corpo or b"")}')
+        return ('\r\n'.join(linhas) + '\r\n\r\n').encode('latin-1') + (corpo or b'')
+
+    async def _ler_corpo(self, metodo, status, cabecalhos):
+        if metodo == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            return b'', False
+        codificacao = cabecalhos.get('transfer-encoding', [''])[-1].lower()
+        if 'chunked' in codificacao:
+            partes = []
+            while True:
+                tamanho = int((await self._leitor.readline()).split(b';')[0].strip() or b'0', 16)
+                if tamanho == 0:
+                    while (await self._leitor.readline()) not in (b'\r\n', b'\n', b''):
+                        pass  # trailers
+                    return b''.join(partes), False
+                partes.append(await self._leitor.readexactly(tamanho))
+                await self._leitor.readline()
+        if 'content-length' in cabecalhos:
+            return await self._leitor.readexactly(int(cabecalhos['content-length'][-1])), False
+        return await self._leitor.read(), True  # sem tamanho: o corpo vai até o servidor fechar
+
+    async def _trocar(self, metodo, caminho, dados):
+        await self._conectar()
+        self._escritor.write(dados)
+        await self._escritor.drain()
+        bruto = await self._leitor.readuntil(b'\r\n\r\n')
+        if len(bruto) > LIMITE_CABECALHOS:
+            raise ErroHttp('cabeçalhos grandes demais')
+        linha_status, *linhas = bruto.decode('latin-1').split('\r\n')
+        try:
+            status = int(linha_status.split()[1])
+        except (IndexError, ValueError):
+            raise ErroHttp(f'linha de status inválida: {linha_status!r}')
+        cabecalhos = {}
+        for linha in linhas:
+            if ':' in linha:
+                nome, valor = linha.split(':', 1)
+                cabecalhos.setdefault(nome.strip().lower(), []).append(valor.strip())
+        corpo, fechou = await self._ler_corpo(metodo, status, cabecalhos)
+        if fechou or cabecalhos.get('connection', [''])[-1].lower() == 'close':
+            await self.fechar()
+        return Resposta(status, cabecalhos, corpo)
+
+    async def requisitar(self, metodo, caminho, corpo=None, tipo='application/octet-stream'):
+        dados = self._montar(metodo, caminho, corpo, tipo)
+        reaproveitada = self._escritor is not None
+        try:
+            resposta = await asyncio.wait_for(self._trocar(metodo, caminho, dados), self.timeout)
+        except (ConnectionError, asyncio.IncompleteReadError) as erro:
+            await self.fechar()
+            if not reaproveitada:
+                raise
+            # Conexão keep-alive fechada pelo servidor enquanto ociosa: tenta uma vez em outra
+            try:
+                resposta = await asyncio.wait_for(self._trocar(metodo, caminho, dados), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.fechar()
+                raise erro
+        except BaseException:
+            await self.fechar()  # resposta pela metade: a conexão não pode ser reaproveitada
+            raise
+        self._guardar_cookies(resposta)
+        return resposta
+
+
+def _valor_caminho(dados, caminho):
+    for parte in caminho.split('.'):
+        if isinstance(dados, list) and parte.isdigit() and int(parte) < len(dados):
+            dados = dados[int(parte)]
+        elif isinstance(dados, dict) and parte in dados:
+            dados = dados[parte]
+        else:
+            return None
+    return dados
+
+
+def _substituir(valor, variaveis):
+    """
+    Preenche {variavel} em strings (recursivamente em listas e dicts). Um valor
+    que é só "{variavel}" recebe o valor original (número continua número).
+    Levanta KeyError se faltar variável.
+    """
+    if isinstance(valor, str):
+        inteira = _VARIAVEL.fullmatch(valor)
+        if inteira:
+            return variaveis[inteira.group(1)]
+        return _VARIAVEL.sub(lambda encontrada: str(variaveis[encontrada.group(1)]), valor)
+    if isinstance(valor, dict):
+        return {chave: _substituir(item, variaveis) for chave, item in valor.items()}
+    if isinstance(valor, list):
+        return [_substituir(item, variaveis) for item in valor]
+    return valor
+
+
+def validar_jornadas(jornadas):
+    """
+    Confere o formato das jornadas; levanta ValueError com a primeira falha
+    """
+    if not isinstance(jornadas, dict) or not jornadas:
+        raise ValueError('As jornadas devem ser um objeto {nome: {"peso": n, "passos": [...]}}.')
+    for nome, jornada in jornadas.items():
+        if not isinstance(jornada, dict) or not jornada.get('passos'):
+            raise ValueError(f'Jornada "{nome}" sem passos.')
+        if not isinstance(jornada.get('peso', 1), (int, float)) or jornada.get('peso', 1) <= 0:
+            raise ValueError(f'Jornada "{nome}" com peso inválido.')
+        for passo in jornada['passos']:
+            if not isinstance(passo, dict) or not str(passo.get('url', '')).startswith('/'):
+                raise ValueError(f'Jornada "{nome}": todo passo precisa de "url" começando com /.')
+    return jornadas
+
+
+class Ritmo:
+    """
+    Limita as requisições de todas as tarefas a `taxa` por segundo (None: sem limite)
+    """
+
+    def __init__(self, taxa):
+        self.intervalo = 1 / taxa if taxa else 0
+        self.proxima = time.perf_counter()
+
+    async def esperar(self):
+        if not self.intervalo:
+            return
+        agora = time.perf_counter()
+        vez = max(self.proxima, agora)
+        self.proxima = vez + self.intervalo
+        if vez > agora:
+            await asyncio.sleep(vez - agora)
+
+
+class Estatisticas:
+    def __init__(self):
+        self.latencias = {}
+        self.erros = Counter()
+        self.pulados = Counter()
+        self.status = {}
+        self.jornadas = Counter()
+
+    def registrar(self, nome, segundos, status=None, erro=False):
+        self.latencias.setdefault(nome, []).append(segundos)
+        self.status.setdefault(nome, Counter())[status if status is not None else 'falha'] += 1
+        if erro:
+            self.erros[nome] += 1
+
+    def resumo(self, duracao):
+        """
+        Por endpoint (e 'total'): requisições, req/s, percentis em ms, máximo e % de erros
+        """
+        linhas = []
+        todos = [latencia for latencias in self.latencias.values() for latencia in latencias]
+        for nome, latencias in sorted(self.latencias.items()) + [('total', todos)]:
+            ordenadas = sorted(latencias)
+            erros = sum(self.erros.values()) if nome == 'total' else self.erros[nome]
+            linhas.append({
+                'endpoint': nome,
+                'requisicoes': len(ordenadas),
+                'rps': len(ordenadas) / duracao if duracao else 0.0,
+                'p50': percentil(ordenadas, 50) * 1000,
+                'p95': percentil(ordenadas, 95) * 1000,
+                'p99': percentil(ordenadas, 99) * 1000,
+                'max': (ordenadas[-1] if ordenadas else 0.0) * 1000,
+                'erros': erros,
+                'erros_pct': 100 * erros / len(ordenadas) if ordenadas else 0.0,
+            })
+        return linhas
+
+
+def percentil(ordenadas, p):
+    """
+    Percentil pelo método do posto mais próximo (lista já ordenada)
+    """
+    if not ordenadas:
+        return 0.0
+    return ordenadas[max(math.ceil(p / 100 * len(ordenadas)) - 1, 0)]
+
+
+class Estudante:
+    """
+    Estudante sintético: login pelo formulário e jornadas até o prazo
+    """
+
+    def __init__(self, gerador, usuario, senha):
+        self.gerador = gerador
+        self.usuario = usuario
+        self.senha = senha
+        self.cliente = ClienteHttp(gerador.url_base, gerador.timeout)
+        # Um gerador por estudante: a ordem em que as tarefas intercalam não muda a sequência de cada um
+        self.aleatorio = random.Random(gerador.aleatorio.getrandbits(64))
+
+    async def _medir(self, estatisticas, nome, metodo, caminho, corpo=None, tipo=None, esperado=None):
+        await self.gerador.ritmo.esperar()
+        inicio = time.perf_counter()
+        try:
+            resposta = await self.cliente.requisitar(metodo, caminho, corpo, tipo or 'application/octet-stream')
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ErroHttp):
+            estatisticas.registrar(nome, time.perf_counter() - inicio, erro=True)
+            return None
+        ok = resposta.status in esperado if esperado else resposta.status < 400
+        estatisticas.registrar(nome, time.perf_counter() - inicio, resposta.status, not ok)
+        return resposta if ok else None
+
+    async def entrar(self):
+        estatisticas = self.gerador.login
+        if await self._medir(estatisticas, 'login_pagina', 'GET', '/login/') is None:
+            return False
+        corpo = urlencode({
+            'username': self.usuario,
+            'password': self.senha,
+            'csrfmiddlewaretoken': self.cliente.cookies.get('csrftoken', ''),
+        }).encode()
+        # 302 para o dashboard; 200 é o formulário de volta com erro
+        resposta = await self._medir(
+            estatisticas, 'login', 'POST', '/login/', corpo, 'application/x-www-form-urlencoded', esperado=(302,)
+        )
+        return resposta is not None
+
+    async def passo(self, passo, variaveis):
+        nome = passo.get('nome') or passo['url']
+        try:
+            caminho = _substituir(passo['url'], variaveis)
+            corpo = tipo = None
+            if 'json' in passo:
+                corpo, tipo = json.dumps(_substituir(passo['json'], variaveis)).encode(), 'application/json'
+            elif 'form' in passo:
+                corpo, tipo = urlencode(_substituir(passo['form'], variaveis)).encode(), 'application/x-www-form-urlencoded'
+        except KeyError:
+            self.gerador.estatisticas.pulados[nome] += 1
+            return
+        resposta = await self._medir(
+            self.gerador.estatisticas, nome, passo.get('metodo', 'GET').upper(), caminho, corpo, tipo, passo.get('esperado')
+        )
+        for variavel, caminho_json in passo.get('extrair', {}).items():
+            valor = None
+            if resposta is not None:
+                try:
+                    valor = _valor_caminho(resposta.json(), caminho_json)
+                except ValueError:
+                    pass
+            if valor is None:
+                variaveis.pop(variavel, None)
+            else:
+                variaveis[variavel] = valor
+
+    def sortear_jornada(self):
+        nomes = list(self.gerador.jornadas)
+        pesos = [self.gerador.jornadas[nome].get('peso', 1) for nome in nomes]
+        return self.aleatorio.choices(nomes, pesos)[0]
+
+    async def jornadas(self):
+        while time.perf_counter() < self.gerador.prazo:
+            nome = self.sortear_jornada()
+            variaveis = self.gerador.variaveis(self.usuario, self.aleatorio)
+            for passo in self.gerador.jornadas[nome]['passos']:
+                if time.perf_counter() >= self.gerador.prazo:
+                    return
+                await self.passo(passo, variaveis)
+                if self.gerador.pausa:
+                    await asyncio.sleep(self.aleatorio.uniform(0, 2 * self.gerador.pausa))
+            else:
+                self.gerador.estatisticas.jornadas[nome] += 1
+
+
+class GeradorCarga:
+    """
+    Executa `estudantes` [(usuario, senha)] em paralelo por `duracao` segundos.
+    `aleatorio` (random.Random) fixa os sorteios; sem ele cada execução sorteia outra sequência.
+    """
+
+    def __init__(self, url_base, estudantes, jornadas=None, taxa=None, duracao=30, pausa=0,
+                 quizzes=(), desafios=(), timeout=TIMEOUT_PADRAO, aleatorio=None):
+        ClienteHttp(url_base)  # valida a URL antes de começar
+        self.url_base = url_base
+        self.estudantes = estudantes
+        self.jornadas = validar_jornadas(jornadas or JORNADAS_PADRAO)
+        self.taxa = taxa
+        self.duracao = duracao
+        self.pausa = pausa
+        self.quizzes = list(quizzes)
+        self.desafios = list(desafios)
+        self.timeout = timeout
+        self.aleatorio = aleatorio or random.Random()
+        self.estatisticas = Estatisticas()
+        self.login = Estatisticas()  # fase de login, antes do início da contagem
+        self.ritmo = self.prazo = None
+
+    def variaveis(self, usuario, aleatorio):
+        variaveis = {'usuario': usuario}
+        if self.quizzes:
+            variaveis['quiz'] = aleatorio.choice(self.quizzes)
+        if self.desafios:
+            variaveis['desafio'] = aleatorio.choice(self.desafios)
+        return variaveis
+
+    async def executar(self):
+        """
+        Faz o login de todos os estudantes e então roda as jornadas por
+        `duracao` segundos. Retorna a duração real das jornadas: o login (hash
+        de senha, caro de propósito) fica fora da taxa medida, mas aparece no relatório.
+        """
+        self.ritmo = Ritmo(self.taxa)
+        estudantes = [Estudante(self, usuario, senha) for usuario, senha in self.estudantes]
+        try:
+            entraram = await asyncio.gather(*(estudante.entrar() for estudante in estudantes))
+            ativos = [estudante for estudante, entrou in zip(estudantes, entraram) if entrou]
+            self.ritmo = Ritmo(self.taxa)
+            inicio = time.perf_counter()
+            self.prazo = inicio + self.duracao
+            await asyncio.gather(*(estudante.jornadas() for estudante in ativos))
+            return time.perf_counter() - inicio
+        finally:
+            for estudante in estudantes:
+                await estudante.cliente.fechar()
+
+
+GUID_WEBSOCKET = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+class ClienteWebSocket:
+    """
+    Cliente WebSocket mínimo (RFC 6455) sobre asyncio: handshake com os cookies
+    da sessão, quadros de texto mascarados, ping/pong e fechamento
+    """
+
+    def __init__(self, url_base, timeout=TIMEOUT_PADRAO):
+        partes = urlsplit(url_base)
+        if partes.scheme not in ('http', 'https', 'ws', 'wss') or not partes.hostname:
+            raise ValueError(f'URL inválida: {url_base}')
+        seguro = partes.scheme in ('https', 'wss')
+        self.host = partes.hostname
+        self.porta = partes.port or (443 if seguro else 80)
+        self.ssl = ssl.create_default_context() if seguro else None
+        self.cabecalho_host = partes.netloc
+        self.timeout = timeout
+        self.codigo_fechamento = None
+        self._leitor = self._escritor = None
+
+    async def conectar(self, caminho, cookies=None):
+        self._leitor, self._escritor = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.porta, ssl=self.ssl), self.timeout
+        )
+        chave = base64.b64encode(os.urandom(16)).decode()
+        linhas = [
+            f'GET {caminho} HTTP/1.1',
+            f'Host: {self.cabecalho_host}',
+            'Upgrade: websocket',
+            'Connection: Upgrade',
+            f'Sec-WebSocket-Key: {chave}',
+            'Sec-WebSocket-Version: 13',
+            'User-Agent: logicash-carga',
+        ]
+        if cookies:
+            linhas.append('Cookie: ' + '; '.join(f'{nome}={valor}' for nome, valor in cookies.items()))
+        self._escritor.write(('\r\n'.join(linhas) + '\r\n\r\n').encode('latin-1'))
+        await self._escritor.drain()
+        bruto = await asyncio.wait_for(self._leitor.readuntil(b'\r\n\r\n'), self.timeout)
+        linha_status, *linhas = bruto.decode('latin-1').split('\r\n')
+        partes = linha_status.split()
+        if len(partes) < 2 or partes[1] != '101':
+            await self.fechar()
+            raise ErroHttp(f'handshake recusado: {linha_status}')
+        cabecalhos = {
+            nome.strip().lower(): valor.strip() for nome, _, valor in (linha.partition(':') for linha in linhas) if nome
+        }
+        esperado = base64.b64encode(hashlib.sha1((chave + GUID_WEBSOCKET).encode()).digest()).decode()
+        if cabecalhos.get('sec-websocket-accept') != esperado:
+            await self.fechar()
+            raise ErroHttp('Sec-WebSocket-Accept inválido')
+
+    def _quadro(self, opcode, dados):
+        mascara = os.urandom(4)
+        tamanho = len(dados)
+        if tamanho < 126:
+            cabecalho = bytes([0x80 | opcode, 0x80 | tamanho])
+        elif tamanho < 1 << 16:
+            cabecalho = bytes([0x80 | opcode, 0x80 | 126]) + tamanho.to_bytes(2, 'big')
+        else:
+            cabecalho = bytes([0x80 | opcode, 0x80 | 127]) + tamanho.to_bytes(8, 'big')
+        # XOR com a máscara repetida, de uma vez como inteiro
+        repetida = (mascara * (tamanho // 4 + 1))[:tamanho]
+        mascarados = (int.from_bytes(dados, 'big') ^ int.from_bytes(repetida, 'big')).to_bytes(tamanho, 'big')
+        return cabecalho + mascara + mascarados
+
+    async def _escrever(self, opcode, dados):
+        self._escritor.write(self._quadro(opcode, dados))
+        await self._escritor.drain()
+
+    async def enviar(self, mensagem):
+        await self._escrever(0x1, json.dumps(mensagem).encode())
+
+    async def _ler_quadro(self):
+        primeiro, segundo = await self._leitor.readexactly(2)
+        tamanho = segundo & 0x7F
+        if tamanho == 126:
+            tamanho = int.from_bytes(await self._leitor.readexactly(2), 'big')
+        elif tamanho == 127:
+            tamanho = int.from_bytes(await self._leitor.readexactly(8), 'big')
+        mascara = await self._leitor.readexactly(4) if segundo & 0x80 else None
+        dados = await self._leitor.readexactly(tamanho)
+        if mascara:
+            dados = bytes(byte ^ mascara[indice % 4] for indice, byte in enumerate(dados))
+        return bool(primeiro & 0x80), primeiro & 0x0F, dados
+
+    async def receber(self):
+        """
+        Próxima mensagem de texto, ou None quando o servidor fecha (o código fica em codigo_fechamento)
+        """
+        partes = []
+        while True:
+            final, opcode, dados = await self._ler_quadro()
+            if opcode == 0x8:
+                self.codigo_fechamento = int.from_bytes(dados[:2], 'big') if len(dados) >= 2 else 1005
+                try:
+                    await self._escrever(0x8, dados[:2])
+                except ConnectionError:
+                    pass
+                return None
+            if opcode == 0x9:
+                await self._escrever(0xA, dados)
+                continue
+            if opcode == 0xA:
+                continue
+            partes.append(dados)
+            if final:
+                return b''.join(partes).decode('utf-8')
+
+    async def fechar(self, codigo=1000):
+        if self._escritor is None:
+            return
+        try:
+            if self.codigo_fechamento is None:
+                await self._escrever(0x8, codigo.to_bytes(2, 'big'))
+            self._escritor.close()
+            await self._escritor.wait_closed()
+        except (ConnectionError, ssl.SSLError):
+            pass
+        self._leitor = self._escritor = None
+
+
+class ParticipanteCarga:
+    """
+    Uma conexão da sala ao vivo: lê os quadros em segundo plano e entrega as mensagens por tipo
+    """
+
+    def __init__(self, url_base, cookies, timeout):
+        self.cliente = ClienteWebSocket(url_base, timeout)
+        self.cookies = cookies
+        self.timeout = timeout
+        self.filas = {}
+        self.quadros = self.mensagens = 0
+        self._leitura = None
+
+    def _fila(self, tipo):
+        return self.filas.setdefault(tipo, asyncio.Queue())
+
+    async def conectar(self, caminho):
+        await self.cliente.conectar(caminho, self.cookies)
+        self._leitura = asyncio.create_task(self._ler())
+
+    async def _ler(self):
+        try:
+            while (texto := await self.cliente.receber()) is not None:
+                chegada = time.perf_counter()
+                self.quadros += 1
+                for mensagem in json.loads(texto):
+                    self.mensagens += 1
+                    self._fila(mensagem['tipo']).put_nowait((chegada, mensagem))
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            pass
+        self._fila('fechada').put_nowait((time.perf_counter(), {'codigo': self.cliente.codigo_fechamento}))
+
+    async def esperar(self, tipo, condicao=None):
+        """
+        (instante de chegada, mensagem) do próximo `tipo` que satisfaz a condição
+        """
+        fila = self._fila(tipo)
+        prazo = time.perf_counter() + self.timeout
+        while True:
+            chegada, mensagem = await asyncio.wait_for(fila.get(), max(prazo - time.perf_counter(), 0))
+            if condicao is None or condicao(mensagem):
+                return chegada, mensagem
+
+    async def fechar(self):
+        await self.cliente.fechar()
+        if self._leitura is not None:
+            self._leitura.cancel()
+
+
+class CargaAoVivo:
+    """
+    Abre uma sala com o professor, conecta os estudantes (até `simultaneas`
+    handshakes por vez) e conduz `perguntas` perguntas: cada estudante
+    responde uma alternativa sorteada após até `tempo_resposta` segundos.
+    `cookies` e `professor` são os cookies de sessão de cada conexão;
+    `aleatorio` (random.Random) fixa os sorteios.
+    """
+
+    def __init__(self, url_base, quiz_id, professor, cookies, perguntas=None, tempo_resposta=2,
+                 simultaneas=50, timeout=TIMEOUT_PADRAO, ao_conectar=None, aleatorio=None):
+        ClienteWebSocket(url_base)  # valida a URL antes de começar
+        self.url_base = url_base
+        self.quiz_id = quiz_id
+        self.professor = professor
+        self.cookies = cookies
+        self.perguntas = perguntas
+        self.tempo_resposta = tempo_resposta
+        self.simultaneas = simultaneas
+        self.timeout = timeout
+        self.ao_conectar = ao_conectar  # chamado quando todos conectaram, antes da primeira pergunta
+        self.aleatorio = aleatorio or random.Random()
+        self.estatisticas = Estatisticas()
+        self.conectados = 0
+        self.fim = None
+        self.quadros = self.mensagens = 0
+
+    def _registrar(self, nome, inicio, fim=None, erro=False):
+        self.estatisticas.registrar(nome, (fim or time.perf_counter()) - inicio, 'falha' if erro else 'ok', erro)
+
+    async def _entrar(self, cookies, caminho, semaforo):
+        participante = ParticipanteCarga(self.url_base, cookies, self.timeout)
+        async with semaforo:
+            inicio = time.perf_counter()
+            try:
+                await participante.conectar(caminho)
+                chegada, _ = await participante.esperar('sala')
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ErroHttp):
+                self._registrar('conexao', inicio, erro=True)
+                await participante.fechar()
+                return None
+        self._registrar('conexao', inicio, chegada)
+        return participante
+
+    async def _responder(self, participante, pergunta, enviada):
+        try:
+            chegada, mensagem = await participante.esperar('pergunta', lambda m: m['id'] == pergunta)
+        except asyncio.TimeoutError:
+            self._registrar('difusao', enviada, erro=True)
+            return
+        self._registrar('difusao', enviada, chegada)
+        await asyncio.sleep(self.aleatorio.uniform(0, self.tempo_resposta))
+        inicio = time.perf_counter()
+        try:
+            await participante.cliente.enviar({'acao': 'responder', 'resposta': self.aleatorio.choice(mensagem['alternativas'])['id']})
+            chegada, _ = await participante.esperar('recebida', lambda m: m['pergunta'] == pergunta)
+        except (OSError, asyncio.TimeoutError):
+            self._registrar('resposta', inicio, erro=True)
+            return
+        self._registrar('resposta', inicio, chegada)
+
+    async def executar(self):
+        """
+        Retorna a duração da fase de perguntas (depois de todos conectados)
+        """
+        professor = ParticipanteCarga(self.url_base, self.professor, self.timeout)
+        participantes = []
+        try:
+            await professor.conectar(f'/ws/ao-vivo/?quiz={self.quiz_id}')
+            _, sala = await professor.esperar('sala')
+            caminho = f'/ws/ao-vivo/{sala["codigo"]}/'
+            semaforo = asyncio.Semaphore(self.simultaneas)
+            conectados = await asyncio.gather(*(self._entrar(cookies, caminho, semaforo) for cookies in self.cookies))
+            participantes = [participante for participante in conectados if participante is not None]
+            self.conectados = len(participantes)
+            if self.ao_conectar:
+                self.ao_conectar()
+
+            total = min(self.perguntas or sala['quiz']['total_perguntas'], sala['quiz']['total_perguntas'])
+            inicio = time.perf_counter()
+            for _ in range(total):
+                enviada = time.perf_counter()
+                await professor.cliente.enviar({'acao': 'proxima'})
+                _, pergunta = await professor.esperar('pergunta')
+                await asyncio.gather(*(self._responder(p, pergunta['id'], enviada) for p in participantes))
+                if participantes:
+                    respondida = time.perf_counter()
+                    await professor.esperar('gabarito', lambda m: m['pergunta'] == pergunta['id'])
+                    self._registrar('gabarito', respondida)
+                else:
+                    await professor.cliente.enviar({'acao': 'revelar'})
+            duracao = time.perf_counter() - inicio
+
+            enviada = time.perf_counter()
+            await professor.cliente.enviar({'acao': 'encerrar'})
+            try:
+                chegada, self.fim = await professor.esperar('fim')
+                self._registrar('encerrar', enviada, chegada)
+            except asyncio.TimeoutError:
+                self._registrar('encerrar', enviada, erro=True)
+            return duracao
+        finally:
+            for participante in [professor, *participantes]:
+                self.quadros += participante.quadros
+                self.mensagens += participante.mensagens
+            await asyncio.gather(*(participante.fechar() for participante in [professor, *participantes]))
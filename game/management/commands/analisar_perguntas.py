@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from game.analytics import TAMANHO_LOTE, atualizar_estatisticas
+
+
+class Command(BaseCommand):
+    help = 'Atualiza as estatísticas de item das perguntas com as respostas novas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=TAMANHO_LOTE,
+            help='Quantidade de respostas carregadas por lote'
+        )
+        parser.add_argument(
+            '--recalcular', action='store_true',
+            help='Descarta as estatísticas atuais e reprocessa todo o histórico'
+        )
+
+    def handle(self, *args, **options):
+        respostas, perguntas = atualizar_estatisticas(options['lote'], options['recalcular'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{respostas} respostas processadas, {perguntas} perguntas atualizadas.'
+        ))
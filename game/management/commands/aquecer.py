@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game.warmup import aquecer
+
+
+class Command(BaseCommand):
+    help = (
+        'Aquece o processo antes de receber tráfego: templates, rotas, traduções, '
+        'caches compartilhados e conexões (fechadas ao final, seguro para fork)'
+    )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        relatorio = aquecer()
+        for nome, segundos, detalhe, ok in relatorio:
+            estilo = self.style.SUCCESS if ok else self.style.ERROR
+            self.stdout.write(f'{nome:<12}{segundos * 1000:>9.1f} ms  ' + estilo(detalhe))
+        self.stdout.write(f'{"total":<12}{(time.perf_counter() - inicio) * 1000:>9.1f} ms')
+        if not all(ok for _, _, _, ok in relatorio):
+            raise CommandError('Aquecimento incompleto: veja as etapas com erro acima.')
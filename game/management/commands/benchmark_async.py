@@ -0,0 +1,127 @@
+import asyncio
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+# Página síncrona (WSGI) -> variante assíncrona (ASGI)
+PAGINAS = {
+    'dashboard': 'dashboard_async',
+    'ranking': 'ranking_async',
+    'estatisticas': 'estatisticas_async',
+}
+
+
+def percentil(ordenadas, p):
+    """
+    Percentil pelo método do posto mais próximo (lista já ordenada)
+    """
+    if not ordenadas:
+        return 0.0
+    return ordenadas[max(math.ceil(p / 100 * len(ordenadas)) - 1, 0)]
+
+
+def resumir(latencias, duracao):
+    ordenadas = sorted(latencias)
+    return {
+        'media': sum(ordenadas) / len(ordenadas) if ordenadas else 0.0,
+        'p50': percentil(ordenadas, 50),
+        'p95': percentil(ordenadas, 95),
+        'p99': percentil(ordenadas, 99),
+        'rps': len(ordenadas) / duracao if duracao else 0.0,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara a latência das views síncronas servidas pelo handler WSGI com as '
+        'variantes async servidas pelo handler ASGI (o mesmo que o uvicorn chama), sem rede. '
+        'No ASGI as queries do ORM async passam uma a uma pela única thread de sync.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', required=True, help='Usuário (com Estudante) usado nas requisições')
+        parser.add_argument('--requisicoes', type=int, default=200, help='Requisições por página e caminho')
+        parser.add_argument('--concorrencia', type=int, default=10, help='Requisições simultâneas')
+        parser.add_argument(
+            '--paginas', default=','.join(PAGINAS),
+            help=f'Páginas medidas, separadas por vírgula ({", ".join(PAGINAS)})'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['usuario'])
+        except User.DoesNotExist:
+            raise CommandError(f'Usuário "{options["usuario"]}" não encontrado.')
+        paginas = [pagina.strip() for pagina in options['paginas'].split(',') if pagina.strip()]
+        desconhecidas = set(paginas) - set(PAGINAS)
+        if desconhecidas:
+            raise CommandError(f'Páginas desconhecidas: {", ".join(sorted(desconhecidas))}')
+
+        quantidade = max(options['requisicoes'], 1)
+        concorrencia = max(min(options['concorrencia'], quantidade), 1)
+        self.stdout.write(
+            f'{quantidade} requisições por caminho, {concorrencia} simultâneas (latências em ms); '
+            'WSGI: uma thread por requisição; ASGI: um event loop, queries em série na thread de sync'
+        )
+        self.stdout.write(f'{"página":<14}{"caminho":<8}{"média":>9}{"p50":>9}{"p95":>9}{"p99":>9}{"req/s":>9}{"erros":>7}')
+        for pagina in paginas:
+            medicoes = (
+                ('WSGI', self._medir_wsgi(reverse(pagina), user, quantidade, concorrencia)),
+                ('ASGI', asyncio.run(self._medir_asgi(reverse(PAGINAS[pagina]), user, quantidade, concorrencia))),
+            )
+            for caminho, (resumo, erros) in medicoes:
+                self.stdout.write(
+                    f'{pagina:<14}{caminho:<8}{resumo["media"] * 1000:>9.2f}{resumo["p50"] * 1000:>9.2f}'
+                    f'{resumo["p95"] * 1000:>9.2f}{resumo["p99"] * 1000:>9.2f}{resumo["rps"]:>9.1f}{erros:>7}'
+                )
+
+    def _medir_wsgi(self, url, user, quantidade, concorrencia):
+        # Um Client por thread, como os workers com threads de um servidor WSGI
+        def trabalhador(total):
+            client = Client()
+            client.force_login(user)
+            latencias, erros = [], 0
+            for _ in range(total):
+                inicio = time.perf_counter()
+                response = client.get(url)
+                latencias.append(time.perf_counter() - inicio)
+                erros += response.status_code != 200
+            return latencias, erros
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(concorrencia) as executor:
+            partes = list(executor.map(trabalhador, self._dividir(quantidade, concorrencia)))
+        return self._juntar(partes, time.perf_counter() - inicio)
+
+    async def _medir_asgi(self, url, user, quantidade, concorrencia):
+        # Tarefas no mesmo event loop, como um worker uvicorn: o ORM async as serializa
+        # na thread de sync, então só o trabalho fora do banco se sobrepõe
+        async def trabalhador(total):
+            client = AsyncClient()
+            await client.aforce_login(user)
+            latencias, erros = [], 0
+            for _ in range(total):
+                inicio = time.perf_counter()
+                response = await client.get(url)
+                latencias.append(time.perf_counter() - inicio)
+                erros += response.status_code != 200
+            return latencias, erros
+
+        inicio = time.perf_counter()
+        partes = await asyncio.gather(*(trabalhador(total) for total in self._dividir(quantidade, concorrencia)))
+        return self._juntar(partes, time.perf_counter() - inicio)
+
+    @staticmethod
+    def _dividir(quantidade, concorrencia):
+        base, resto = divmod(quantidade, concorrencia)
+        return [base + (indice < resto) for indice in range(concorrencia)]
+
+    @staticmethod
+    def _juntar(partes, duracao):
+        latencias = [latencia for parte, _ in partes for latencia in parte]
+        return resumir(latencias, duracao), sum(erros for _, erros in partes)
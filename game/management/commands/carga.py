@@ -0,0 +1,126 @@
+import asyncio
+import json
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from game.loadtest import JORNADAS_PADRAO, GeradorCarga, validar_jornadas
+from game.models import Desafio, Quiz
+
+SENHA_PADRAO = 'carga-logicash'
+
+
+class Command(BaseCommand):
+    help = (
+        'Teste de carga contra um servidor em execução: estudantes sintéticos fazem login e repetem '
+        'jornadas ponderadas (dashboard, desafios, quiz, ranking) a uma taxa alvo, com vazão, '
+        'percentis de latência e erros por endpoint'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Endereço do servidor')
+        parser.add_argument('--estudantes', type=int, default=10, help='Estudantes sintéticos simultâneos')
+        parser.add_argument('--prefixo', default='carga', help='Usuários <prefixo>1, <prefixo>2, ...')
+        parser.add_argument('--senha', default=SENHA_PADRAO, help='Senha dos usuários sintéticos')
+        parser.add_argument(
+            '--criar', action='store_true',
+            help='Cria (ou redefine a senha de) os usuários sintéticos no banco local antes do teste'
+        )
+        parser.add_argument('--taxa', type=float, help='Requisições por segundo somando todos os estudantes')
+        parser.add_argument('--duracao', type=float, default=30, help='Segundos de teste')
+        parser.add_argument('--pausa', type=float, default=0, help='Pausa média entre passos (s), como um usuário lendo')
+        parser.add_argument('--jornadas', help='Arquivo JSON com as jornadas (padrão: game.loadtest.JORNADAS_PADRAO)')
+        parser.add_argument('--timeout', type=float, default=30, help='Timeout de cada requisição (s)')
+        parser.add_argument(
+            '--semente', type=int,
+            help='Semente dos sorteios (jornadas, quizzes, pausas) para repetir uma execução; sem ela, uma nova a cada vez'
+        )
+
+    def handle(self, *args, **options):
+        quantidade = max(options['estudantes'], 1)
+        usuarios = [f'{options["prefixo"]}{indice}' for indice in range(1, quantidade + 1)]
+        if options['criar']:
+            self._criar(usuarios, options['senha'])
+        jornadas = self._jornadas(options['jornadas'])
+        semente = options['semente'] if options['semente'] is not None else random.randrange(2 ** 32)
+
+        try:
+            gerador = GeradorCarga(
+                options['url'],
+                [(usuario, options['senha']) for usuario in usuarios],
+                jornadas=jornadas,
+                taxa=options['taxa'],
+                duracao=options['duracao'],
+                pausa=options['pausa'],
+                quizzes=Quiz.objects.filter(ativo=True).values_list('pk', flat=True),
+                desafios=Desafio.objects.filter(ativo=True).values_list('pk', flat=True),
+                timeout=options['timeout'],
+                aleatorio=random.Random(semente),
+            )
+        except ValueError as erro:
+            raise CommandError(str(erro))
+
+        alvo = f'{options["taxa"]:g} req/s' if options['taxa'] else 'sem limite de taxa'
+        self.stdout.write(
+            f'{quantidade} estudantes por {options["duracao"]:g} s contra {options["url"]} ({alvo}, semente {semente})'
+        )
+        inicio_login = time.perf_counter()
+        duracao = asyncio.run(gerador.executar())
+        self._tabela(gerador.login, time.perf_counter() - inicio_login - duracao, 'Login')
+        if not gerador.login.status.get('login', {}).get(302):
+            raise CommandError('Nenhum login funcionou: confira --senha ou use --criar.')
+        self._relatorio(gerador.estatisticas, duracao, options['taxa'])
+
+    def _criar(self, usuarios, senha):
+        existentes = {user.username: user for user in User.objects.filter(username__in=usuarios)}
+        for usuario in usuarios:
+            user = existentes.get(usuario) or User(username=usuario, first_name='Carga')
+            user.set_password(senha)
+            user.save()
+        self.stdout.write(f'{len(usuarios)} usuários sintéticos prontos ({len(usuarios) - len(existentes)} criados).')
+
+    def _jornadas(self, caminho):
+        if not caminho:
+            return JORNADAS_PADRAO
+        try:
+            with open(caminho, encoding='utf-8') as arquivo:
+                return validar_jornadas(json.load(arquivo))
+        except (OSError, ValueError) as erro:
+            raise CommandError(f'Jornadas inválidas em {caminho}: {erro}')
+
+    def _tabela(self, estatisticas, duracao, titulo):
+        linhas = estatisticas.resumo(duracao)
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{titulo} ({duracao:.1f} s, latências em ms)'))
+        self.stdout.write(f'{"endpoint":<18}{"req":>7}{"req/s":>9}{"p50":>9}{"p95":>9}{"p99":>9}{"máx":>9}{"erros":>8}')
+        for linha in linhas:
+            texto = (
+                f'{linha["endpoint"]:<18}{linha["requisicoes"]:>7}{linha["rps"]:>9.1f}{linha["p50"]:>9.1f}'
+                f'{linha["p95"]:>9.1f}{linha["p99"]:>9.1f}{linha["max"]:>9.1f}{linha["erros_pct"]:>7.1f}%'
+            )
+            self.stdout.write(self.style.WARNING(texto) if linha['erros'] else texto)
+        for endpoint, contagem in sorted(estatisticas.status.items()):
+            falhas = {codigo: vezes for codigo, vezes in contagem.items() if codigo == 'falha' or codigo >= 400}
+            if falhas:
+                self.stdout.write(self.style.WARNING(
+                    f'{endpoint}: ' + ', '.join(f'{codigo} x{vezes}' for codigo, vezes in falhas.items())
+                ))
+        return linhas
+
+    def _relatorio(self, estatisticas, duracao, taxa):
+        linhas = self._tabela(estatisticas, duracao, 'Jornadas')
+        if estatisticas.pulados:
+            self.stdout.write('Passos pulados (variável ausente): ' + ', '.join(
+                f'{nome} x{vezes}' for nome, vezes in sorted(estatisticas.pulados.items())
+            ))
+        self.stdout.write('Jornadas completas: ' + (', '.join(
+            f'{nome} x{vezes}' for nome, vezes in sorted(estatisticas.jornadas.items())
+        ) or 'nenhuma'))
+
+        total = linhas[-1]
+        if taxa and total['rps'] < taxa * 0.9:
+            self.stdout.write(self.style.WARNING(
+                f'Taxa alcançada ({total["rps"]:.1f} req/s) abaixo da alvo ({taxa:g}): o servidor ou os '
+                'estudantes são o limite; aumente --estudantes ou veja as latências.'
+            ))
@@ -0,0 +1,155 @@
+import asyncio
+import os
+import random
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from game.loadtest import CargaAoVivo
+from game.models import Quiz
+
+BACKEND = 'django.contrib.auth.backends.ModelBackend'
+
+
+def recursos(pid):
+    """
+    (RSS em KB, segundos de CPU) do processo, pelo /proc; None fora do Linux
+    """
+    try:
+        with open(f'/proc/{pid}/status') as arquivo:
+            rss = next(int(linha.split()[1]) for linha in arquivo if linha.startswith('VmRSS:'))
+        with open(f'/proc/{pid}/stat') as arquivo:
+            campos = arquivo.read().rsplit(')', 1)[1].split()
+        return rss, (int(campos[11]) + int(campos[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, StopIteration, ValueError, IndexError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Teste de carga do quiz ao vivo contra um servidor ASGI em execução: abre uma sala, conecta N '
+        'estudantes por WebSocket e conduz as perguntas, medindo conexão, difusão, respostas e gravação; '
+        'com --pid, mostra memória por conexão e CPU do worker'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Endereço do servidor ASGI')
+        parser.add_argument('--estudantes', type=int, default=200, help='Conexões de estudantes simultâneas')
+        parser.add_argument('--prefixo', default='aovivo', help='Usuários <prefixo>1, <prefixo>2, ... e <prefixo>-professor')
+        parser.add_argument('--criar', action='store_true', help='Cria os usuários sintéticos que faltarem')
+        parser.add_argument('--quiz', type=int, help='Quiz da sala (padrão: o primeiro ativo com perguntas)')
+        parser.add_argument('--perguntas', type=int, help='Perguntas a conduzir (padrão: todas)')
+        parser.add_argument('--tempo-resposta', type=float, default=2, help='Cada estudante responde em até N s')
+        parser.add_argument('--simultaneas', type=int, default=50, help='Handshakes em paralelo na fase de conexão')
+        parser.add_argument('--timeout', type=float, default=30, help='Espera máxima por cada mensagem (s)')
+        parser.add_argument('--pid', type=int, help='PID do worker do servidor, para medir memória e CPU')
+        parser.add_argument('--semente', type=int, help='Semente dos sorteios (tempos e alternativas das respostas)')
+
+    def handle(self, *args, **options):
+        quantidade = max(options['estudantes'], 1)
+        quiz = self._quiz(options['quiz'])
+        professor, estudantes = self._usuarios(options['prefixo'], quantidade, options['criar'])
+        # Sessões criadas direto no banco: o login pelo formulário (hash de senha) não é o que se mede aqui
+        sessoes = [self._sessao(user) for user in [professor, *estudantes]]
+        cookie = settings.SESSION_COOKIE_NAME
+        medidas = {'antes': recursos(options['pid']) if options['pid'] else None}
+        semente = options['semente'] if options['semente'] is not None else random.randrange(2 ** 32)
+
+        carga = CargaAoVivo(
+            options['url'], quiz.pk, {cookie: sessoes[0]}, [{cookie: sessao} for sessao in sessoes[1:]],
+            perguntas=options['perguntas'], tempo_resposta=options['tempo_resposta'],
+            simultaneas=options['simultaneas'], timeout=options['timeout'],
+            ao_conectar=lambda: medidas.update(conectados=recursos(options['pid']) if options['pid'] else None),
+            aleatorio=random.Random(semente),
+        )
+        self.stdout.write(f'{quantidade} estudantes na sala do quiz "{quiz.titulo}" em {options["url"]} (semente {semente})')
+        inicio = time.perf_counter()
+        try:
+            duracao = asyncio.run(carga.executar())
+        except (OSError, asyncio.TimeoutError) as erro:
+            raise CommandError(f'Não foi possível conduzir a sala: {erro!r}. O servidor roda com --asgi?')
+        finally:
+            engine = import_module(settings.SESSION_ENGINE)
+            for sessao in sessoes:
+                engine.SessionStore(sessao).delete()
+        medidas['depois'] = recursos(options['pid']) if options['pid'] else None
+        self._relatorio(carga, quantidade, duracao, time.perf_counter() - inicio, medidas)
+
+    def _quiz(self, quiz_id):
+        consulta = Quiz.objects.filter(ativo=True, total_perguntas__gt=0)
+        quiz = consulta.filter(pk=quiz_id).first() if quiz_id else consulta.order_by('pk').first()
+        if quiz is None:
+            raise CommandError('Nenhum quiz ativo com perguntas' + (f' com id {quiz_id}.' if quiz_id else '.'))
+        return quiz
+
+    def _usuarios(self, prefixo, quantidade, criar):
+        nomes = [f'{prefixo}-professor'] + [f'{prefixo}{indice}' for indice in range(1, quantidade + 1)]
+        existentes = {user.username: user for user in User.objects.filter(username__in=nomes)}
+        faltando = [nome for nome in nomes if nome not in existentes]
+        if faltando and not criar:
+            raise CommandError(f'{len(faltando)} usuários sintéticos não existem: use --criar.')
+        novos = []
+        for nome in faltando:
+            user = User(username=nome, first_name='Carga', is_staff=nome == nomes[0])
+            user.set_unusable_password()
+            novos.append(user)
+        if novos:
+            User.objects.bulk_create(novos)
+            existentes.update((user.username, user) for user in User.objects.filter(username__in=faltando))
+            self.stdout.write(f'{len(novos)} usuários sintéticos criados.')
+        professor = existentes[nomes[0]]
+        if not professor.is_staff:
+            raise CommandError(f'{professor.username} precisa ser staff para abrir a sala.')
+        return professor, [existentes[nome] for nome in nomes[1:]]
+
+    def _sessao(self, user):
+        sessao = import_module(settings.SESSION_ENGINE).SessionStore()
+        sessao[SESSION_KEY] = str(user.pk)
+        sessao[BACKEND_SESSION_KEY] = BACKEND
+        sessao[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        sessao.save()
+        return sessao.session_key
+
+    def _relatorio(self, carga, quantidade, duracao, total, medidas):
+        linhas = [linha for linha in carga.estatisticas.resumo(duracao) if linha['endpoint'] != 'total']
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Sala ao vivo ({total:.1f} s, latências em ms)'))
+        self.stdout.write(f'{"etapa":<12}{"n":>7}{"p50":>9}{"p95":>9}{"p99":>9}{"máx":>9}{"erros":>8}')
+        for linha in linhas:
+            texto = (
+                f'{linha["endpoint"]:<12}{linha["requisicoes"]:>7}{linha["p50"]:>9.1f}{linha["p95"]:>9.1f}'
+                f'{linha["p99"]:>9.1f}{linha["max"]:>9.1f}{linha["erros"]:>8}'
+            )
+            self.stdout.write(self.style.WARNING(texto) if linha['erros'] else texto)
+
+        respostas = next((linha['requisicoes'] - linha['erros'] for linha in linhas if linha['endpoint'] == 'resposta'), 0)
+        self.stdout.write(
+            f'Conexões: {carga.conectados}/{quantidade}; respostas: {respostas} '
+            f'({respostas / duracao if duracao else 0:.0f}/s nas perguntas)'
+        )
+        if carga.quadros:
+            self.stdout.write(
+                f'Recebido: {carga.mensagens} mensagens em {carga.quadros} quadros '
+                f'({carga.mensagens / carga.quadros:.1f} por quadro)'
+            )
+        if carga.fim is not None:
+            self.stdout.write(f'Resultados gravados no fim: {carga.fim["gravados"]}')
+        else:
+            self.stdout.write(self.style.WARNING('A sala não confirmou o encerramento.'))
+
+        antes, conectados, depois = medidas['antes'], medidas.get('conectados'), medidas['depois']
+        if antes and conectados and depois:
+            por_conexao = (conectados[0] - antes[0]) / max(carga.conectados, 1)
+            self.stdout.write(
+                f'Worker: RSS {antes[0] / 1024:.0f} → {conectados[0] / 1024:.0f} MB com as conexões '
+                f'(~{por_conexao:.0f} KB por conexão); CPU {depois[1] - conectados[1]:.2f} s nas perguntas '
+                f'({100 * (depois[1] - conectados[1]) / duracao if duracao else 0:.0f}% de um núcleo)'
+            )
+        if carga.conectados < quantidade:
+            self.stdout.write(self.style.WARNING(
+                'Nem todos conectaram: confira AO_VIVO_MAX_PARTICIPANTES, o limite de arquivos abertos '
+                '(ulimit -n) e os erros do servidor.'
+            ))
@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from game.scoring import compactar, reconciliar
+
+
+class Command(BaseCommand):
+    help = 'Reconcilia as pontuações com o livro-razão e compacta os lançamentos antigos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias', type=int, default=None,
+            help='Agrupa em um lançamento por estudante os eventos com mais de N dias'
+        )
+        parser.add_argument(
+            '--somente-verificar', action='store_true',
+            help='Lista as divergências sem corrigir as pontuações'
+        )
+
+    def handle(self, *args, **options):
+        divergencias = reconciliar(corrigir=not options['somente_verificar'])
+        for estudante_id, pontos_totais, soma_eventos in divergencias:
+            self.stdout.write(self.style.WARNING(
+                f'Estudante {estudante_id}: pontuação {pontos_totais}, livro-razão {soma_eventos}'
+            ))
+        acao = 'encontradas' if options['somente_verificar'] else 'corrigidas'
+        self.stdout.write(self.style.SUCCESS(f'{len(divergencias)} divergências {acao}.'))
+
+        if options['dias'] is not None:
+            removidos, criados = compactar(timezone.now() - timedelta(days=options['dias']))
+            self.stdout.write(self.style.SUCCESS(
+                f'{removidos} lançamentos compactados em {criados}.'
+            ))
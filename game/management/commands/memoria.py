@@ -0,0 +1,96 @@
+import io
+import sys
+
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from game import memory
+
+
+class Command(BaseCommand):
+    help = (
+        'Detecta vazamentos: executa uma URL repetidamente com snapshots do tracemalloc entre '
+        'intervalos, ou compara snapshots gravados pelos workers'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Caminho executado repetidamente no processo (ex.: /dashboard/)')
+        parser.add_argument('--usuario', help='Usuário logado nas requisições de --url')
+        parser.add_argument('--requisicoes', type=int, default=500, help='Total de requisições para --url')
+        parser.add_argument('--intervalos', type=int, default=5, help='Snapshots ao longo das requisições')
+        parser.add_argument('--listar', action='store_true', help='Lista os snapshots gravados em disco')
+        parser.add_argument('--snapshot', help='Maiores pontos de alocação de um snapshot gravado')
+        parser.add_argument('--comparar', nargs=2, metavar=('ANTES', 'DEPOIS'), help='Compara dois snapshots gravados')
+        parser.add_argument('--limite', type=int, default=15, help='Linhas por relatório')
+
+    def handle(self, *args, **options):
+        limite = options['limite']
+        if options['listar']:
+            for rotulo in memory.snapshots()['disco']:
+                self.stdout.write(rotulo)
+        elif options['snapshot']:
+            self._linhas(memory.principais(self._carregar(options['snapshot']), limite), 'kb')
+        elif options['comparar']:
+            antes, depois = (self._carregar(rotulo) for rotulo in options['comparar'])
+            self._linhas(memory.comparar(antes, depois, limite), 'diferenca_kb')
+        elif options['url']:
+            self._executar(options, limite)
+        else:
+            raise CommandError('Informe --url, --listar, --snapshot ou --comparar.')
+
+    def _carregar(self, rotulo):
+        snapshot = memory.snapshot(rotulo)
+        if snapshot is None:
+            raise CommandError(f'Snapshot "{rotulo}" não encontrado em {memory.diretorio()}.')
+        return snapshot
+
+    def _linhas(self, linhas, coluna):
+        for linha in linhas:
+            self.stdout.write(f'{linha[coluna]:>+12.1f} KB  {linha["site"]}')
+
+    def _executar(self, options, limite):
+        # Requisições pelo WSGIHandler real: o Client de testes guarda contexto e
+        # receptores de sinais a cada resposta, o que apareceria como vazamento
+        cookies = ''
+        if options['usuario']:
+            client = Client()
+            try:
+                client.force_login(User.objects.get(username=options['usuario']))
+            except User.DoesNotExist:
+                raise CommandError(f'Usuário "{options["usuario"]}" não encontrado.')
+            cookies = '; '.join(f'{nome}={morsel.value}' for nome, morsel in client.cookies.items())
+        url = options['url']
+        caminho, _, consulta = url.partition('?')
+        handler = WSGIHandler()
+        status = []
+
+        def requisitar():
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': caminho, 'QUERY_STRING': consulta, 'SCRIPT_NAME': '',
+                'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost', 'HTTP_COOKIE': cookies,
+                'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,
+            }
+            response = handler(environ, lambda codigo, cabecalhos: status.append(int(codigo.split()[0])))
+            for _ in response:
+                pass
+            response.close()
+
+        requisitar()  # aquecimento: imports e caches de primeira requisição
+        if status[-1] >= 400:
+            raise CommandError(f'{url} respondeu {status[-1]}.')
+
+        relatorio = memory.medir(requisitar, max(options['requisicoes'], 1), options['intervalos'], limite)
+        for intervalo in relatorio:
+            rss = f'{intervalo["rss_mb"]} MB' if intervalo['rss_mb'] is not None else 'indisponível'
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{intervalo["feitas"]} requisições ({intervalo["segundos"]} s): RSS {rss}, '
+                f'rastreado {intervalo["rastreado_mb"]} MB'
+            ))
+            self._linhas(intervalo['crescimentos'], 'diferenca_kb')
+        if any(codigo >= 400 for codigo in status):
+            self.stdout.write(self.style.WARNING(f'{sum(codigo >= 400 for codigo in status)} respostas com erro.'))
+        crescimento = relatorio[-1]['rastreado_mb'] - relatorio[0]['rastreado_mb']
+        estilo = self.style.WARNING if crescimento > 1 else self.style.SUCCESS
+        self.stdout.write(estilo(f'Crescimento rastreado do primeiro ao último intervalo: {crescimento:+.2f} MB'))
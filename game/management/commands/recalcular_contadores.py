@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from game.counters import CAMPOS, divergentes, recalcular
+
+
+class Command(BaseCommand):
+    help = (
+        'Confere os contadores desnormalizados dos quizzes (perguntas, pontos máximos, alternativas) '
+        'e corrige os divergentes, por exemplo depois de bulk_create ou SQL direto'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--somente-verificar', action='store_true',
+            help='Lista as divergências sem corrigir os contadores'
+        )
+
+    def handle(self, *args, **options):
+        divergencias = divergentes()
+        for quiz_id, gravados, corretos in divergencias:
+            self.stdout.write(self.style.WARNING(
+                f'Quiz {quiz_id}: ' + ', '.join(
+                    f'{campo} {gravado} (correto {correto})'
+                    for campo, gravado, correto in zip(CAMPOS, gravados, corretos) if gravado != correto
+                )
+            ))
+        if divergencias and not options['somente_verificar']:
+            recalcular([quiz_id for quiz_id, _, _ in divergencias])
+        acao = 'encontradas' if options['somente_verificar'] else 'corrigidas'
+        self.stdout.write(self.style.SUCCESS(f'{len(divergencias)} divergências {acao}.'))
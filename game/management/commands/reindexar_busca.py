@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from game.search import backend, reconstruir
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice de busca textual de quizzes, perguntas e módulos'
+
+    def handle(self, *args, **options):
+        if backend() is None:
+            self.stdout.write(self.style.WARNING('Banco sem índice textual: a busca usa filtros icontains.'))
+            return
+        total = reconstruir()
+        self.stdout.write(self.style.SUCCESS(f'{total} documentos indexados.'))
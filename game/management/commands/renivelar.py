@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from game.levels import renivelar
+
+
+class Command(BaseCommand):
+    help = 'Recalcula o nível de todos os estudantes pela curva de níveis atual'
+
+    def handle(self, *args, **options):
+        alteradas = renivelar()
+        self.stdout.write(self.style.SUCCESS(f'{alteradas} pontuações mudaram de nível.'))
@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from game import server
+
+
+class Command(BaseCommand):
+    help = (
+        'Sobe o servidor de produção (gunicorn): vários workers com preload e aquecimento, '
+        'reciclagem após N requisições e desligamento gracioso'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bind', default='0.0.0.0:8000', help='Endereço e porta (ou unix:/caminho.sock)')
+        parser.add_argument('--asgi', action='store_true', help='Workers uvicorn com logicash.asgi')
+        parser.add_argument('--workers', type=int, help='Padrão: SERVIDOR_WORKERS (1 no modo ASGI sem AO_VIVO_AFINIDADE)')
+        parser.add_argument('--threads', type=int, help='Threads por worker WSGI. Padrão: SERVIDOR_THREADS')
+        parser.add_argument('--max-requisicoes', type=int, help='Reciclar o worker após N requisições (0 desliga)')
+        parser.add_argument('--timeout-gracioso', type=int, help='Segundos para terminar requisições no desligamento')
+        parser.add_argument(
+            '--inseguro', action='store_true',
+            help='Sobe mesmo com DEBUG ligado ou a SECRET_KEY de desenvolvimento (só para testes locais)'
+        )
+
+    def handle(self, *args, **options):
+        erro = server.erro_configuracao_insegura()
+        if erro and not options['inseguro']:
+            raise CommandError(f'{erro} Use --inseguro para subir assim mesmo.')
+        if erro:
+            self.stderr.write(self.style.WARNING(erro))
+        erro = server.disponivel(options['asgi'])
+        if erro:
+            raise CommandError(erro)
+        opcoes = server.configuracao(
+            options['bind'],
+            workers=options['workers'],
+            threads=options['threads'],
+            max_requisicoes=options['max_requisicoes'],
+            timeout_gracioso=options['timeout_gracioso'],
+            asgi=options['asgi'],
+        )
+        if options['asgi']:
+            erro = server.erro_workers_asgi(opcoes['workers'])
+            if erro:
+                raise CommandError(erro)
+        conexoes = opcoes['workers'] * opcoes['threads']
+        # --workers/--threads podem diferir dos valores usados no settings.py
+        max_age = server.conn_max_age(conexoes)
+        for banco in settings.DATABASES.values():
+            banco['CONN_MAX_AGE'] = max_age
+        if conexoes > settings.DB_MAX_CONEXOES:
+            self.stderr.write(self.style.WARNING(
+                f'{conexoes} conexões por banco passam de DB_MAX_CONEXOES ({settings.DB_MAX_CONEXOES}): '
+                'conexões não persistentes (uma por requisição). Reduza --workers/--threads ou '
+                'aumente LOGICASH_DB_MAX_CONEXOES.'
+            ))
+        self.stdout.write(
+            f'{opcoes["workers"]} workers x {opcoes["threads"]} threads ({conexoes} conexões por banco, '
+            f'CONN_MAX_AGE={max_age}) em {options["bind"]}'
+        )
+        server.Servidor(opcoes, asgi=options['asgi']).run()
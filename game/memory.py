@@ -0,0 +1,359 @@
+"""
+Instrumentação de memória dos workers.
+
+- MemoriaMiddleware mede o RSS antes e depois de cada requisição e acumula o
+  crescimento por rota (url_name), o que aponta quais views fazem o processo crescer.
+- tracemalloc sob demanda: iniciar() liga o rastreamento, capturar() tira um
+  snapshot (mantido no processo e gravado em settings.MEMORIA_DIRETORIO) e
+  comparar() lista os pontos de alocação que mais cresceram entre dois snapshots.
+- Disparo automático: quando o RSS passa de settings.MEMORIA_LIMITE_MB, o
+  middleware liga o tracemalloc e tira um snapshot de base; a cada
+  MEMORIA_INTERVALO requisições seguintes tira outro e registra no log
+  'game.memory' a diferença para a base. Os snapshots automáticos são tirados
+  em uma thread à parte (take_snapshot e compare_to levam centenas de ms e não
+  entram no tempo da requisição) e só a base e os últimos
+  MEMORIA_AUTOMATICOS ficam em disco.
+
+O endpoint /memoria/ (equipe) e o comando `memoria` expõem tudo isso.
+"""
+
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+from django.conf import settings
+from django.utils import timezone
+
+from .middleware import MiddlewareHibrido
+
+logger = logging.getLogger(__name__)
+
+MAX_SNAPSHOTS = 10
+QUADROS_PADRAO = 10
+LIMITE_SITES = 25
+
+# Alocações do próprio rastreamento e da importação de módulos só atrapalham a leitura
+_FILTROS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+_trava = threading.Lock()
+_snapshots = deque(maxlen=MAX_SNAPSHOTS)  # (rotulo, data, snapshot)
+_por_rota = {}  # url_name -> [requisições, soma dos deltas, maior delta]
+_automatico = {'base': None, 'contador': 0, 'capturando': False, 'rotulos': []}
+
+try:
+    _TAMANHO_PAGINA = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _TAMANHO_PAGINA = None
+
+
+def rss():
+    """
+    Memória residente atual do processo, em bytes (None se o sistema não informar)
+    """
+    if _TAMANHO_PAGINA is not None:
+        try:
+            with open('/proc/self/statm', 'rb') as arquivo:
+                return int(arquivo.read().split()[1]) * _TAMANHO_PAGINA
+        except OSError:
+            pass
+    try:
+        import psutil
+    except ImportError:  # psutil é opcional: sem /proc nem psutil não há RSS atual
+        return None
+    return psutil.Process().memory_info().rss
+
+
+def diretorio():
+    return str(getattr(settings, 'MEMORIA_DIRETORIO', os.path.join(settings.BASE_DIR, 'memoria')))
+
+
+def limite_mb():
+    return getattr(settings, 'MEMORIA_LIMITE_MB', 0)
+
+
+def intervalo():
+    return getattr(settings, 'MEMORIA_INTERVALO', 1000)
+
+
+def automaticos_mantidos():
+    return max(getattr(settings, 'MEMORIA_AUTOMATICOS', 5), 1)
+
+
+def iniciar(quadros=None):
+    """
+    Liga o tracemalloc (se ainda não estiver ligado). Retorna True se ligou agora.
+    """
+    if tracemalloc.is_tracing():
+        return False
+    tracemalloc.start(quadros or getattr(settings, 'MEMORIA_QUADROS', QUADROS_PADRAO))
+    return True
+
+
+def parar():
+    """
+    Desliga o tracemalloc e descarta os snapshots guardados no processo
+    """
+    with _trava:
+        _snapshots.clear()
+        _automatico['base'] = None
+        _automatico['contador'] = 0
+        _automatico['rotulos'] = []
+    tracemalloc.stop()
+
+
+def capturar(rotulo='manual', gravar=True):
+    """
+    Tira um snapshot (liga o tracemalloc se preciso), guarda no processo e,
+    com gravar=True, salva em disco. Retorna o rótulo final.
+    """
+    iniciar()
+    snapshot = tracemalloc.take_snapshot().filter_traces(_FILTROS)
+    rotulo = f'{timezone.now():%Y%m%dT%H%M%S%f}-{os.getpid()}-{rotulo}'
+    with _trava:
+        _snapshots.append((rotulo, timezone.now(), snapshot))
+    if gravar:
+        os.makedirs(diretorio(), exist_ok=True)
+        snapshot.dump(os.path.join(diretorio(), rotulo + '.snap'))
+    return rotulo
+
+
+def snapshot(rotulo):
+    """
+    Snapshot guardado no processo ou gravado em disco, ou None
+    """
+    with _trava:
+        for nome, _, guardado in _snapshots:
+            if nome == rotulo:
+                return guardado
+    if os.path.basename(rotulo) != rotulo:
+        return None
+    caminho = os.path.join(diretorio(), rotulo + '.snap')
+    if not os.path.isfile(caminho):
+        return None
+    return tracemalloc.Snapshot.load(caminho)
+
+
+def snapshots():
+    """
+    Rótulos dos snapshots deste processo e dos gravados em disco (de todos os workers)
+    """
+    with _trava:
+        locais = [nome for nome, _, _ in _snapshots]
+    em_disco = []
+    if os.path.isdir(diretorio()):
+        em_disco = sorted(nome[:-len('.snap')] for nome in os.listdir(diretorio()) if nome.endswith('.snap'))
+    return {'processo': locais, 'disco': em_disco}
+
+
+def _site(estatistica):
+    quadro = estatistica.traceback[0]
+    return f'{quadro.filename}:{quadro.lineno}'
+
+
+def principais(snapshot, limite=LIMITE_SITES, agrupar='lineno'):
+    """
+    Pontos de alocação com mais memória viva no snapshot
+    """
+    return [
+        {'site': _site(estatistica), 'kb': round(estatistica.size / 1024, 1), 'blocos': estatistica.count}
+        for estatistica in snapshot.statistics(agrupar)[:limite]
+    ]
+
+
+def comparar(antes, depois, limite=LIMITE_SITES, agrupar='lineno'):
+    """
+    Pontos de alocação que mais cresceram de `antes` para `depois`
+    """
+    return [
+        {
+            'site': _site(diferenca),
+            'kb': round(diferenca.size / 1024, 1),
+            'diferenca_kb': round(diferenca.size_diff / 1024, 1),
+            'diferenca_blocos': diferenca.count_diff,
+        }
+        for diferenca in depois.compare_to(antes, agrupar)[:limite]
+    ]
+
+
+def por_rota(limite=LIMITE_SITES):
+    """
+    Crescimento do RSS por rota, das que mais fizeram o processo crescer
+    """
+    with _trava:
+        linhas = [
+            {
+                'rota': rota,
+                'requisicoes': requisicoes,
+                'total_kb': round(total / 1024, 1),
+                'media_kb': round(total / requisicoes / 1024, 2),
+                'maior_kb': round(maior / 1024, 1),
+            }
+            for rota, (requisicoes, total, maior) in _por_rota.items()
+        ]
+    linhas.sort(key=lambda linha: linha['total_kb'], reverse=True)
+    return linhas[:limite]
+
+
+def zerar_rotas():
+    with _trava:
+        _por_rota.clear()
+
+
+def _registrar_rota(rota, delta):
+    with _trava:
+        acumulado = _por_rota.setdefault(rota, [0, 0, 0])
+        acumulado[0] += 1
+        acumulado[1] += delta
+        acumulado[2] = max(acumulado[2], delta)
+
+
+def situacao():
+    """
+    Resumo do processo: RSS, tracemalloc e disparo automático
+    """
+    atual, pico = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+    memoria = rss()
+    return {
+        'pid': os.getpid(),
+        'rss_mb': round(memoria / 2 ** 20, 1) if memoria is not None else None,
+        'limite_mb': limite_mb(),
+        'rastreando': tracemalloc.is_tracing(),
+        'rastreado_mb': round(atual / 2 ** 20, 1),
+        'pico_rastreado_mb': round(pico / 2 ** 20, 1),
+        'automatico': _automatico['base'],
+    }
+
+
+def _verificar_limite(memoria):
+    """
+    Disparo automático: decide se é hora de um snapshot (base ao passar do
+    limite, depois um a cada intervalo) e o tira fora da requisição
+    """
+    limite = limite_mb()
+    if not limite or memoria is None:
+        return
+    with _trava:
+        if _automatico['base'] is None:
+            if memoria < limite * 2 ** 20:
+                return
+        else:
+            _automatico['contador'] += 1
+            if _automatico['contador'] % intervalo():
+                return
+        if _automatico['capturando']:
+            return  # o snapshot anterior ainda não terminou
+        _automatico['capturando'] = True
+        base = _automatico['base']
+    threading.Thread(
+        target=_capturar_automatico, args=(memoria, limite, base), name='logicash-memoria', daemon=True
+    ).start()
+
+
+def _capturar_automatico(memoria, limite, base):
+    try:
+        if base is None:
+            rotulo = capturar('base')
+            with _trava:
+                _automatico['base'] = rotulo
+            logger.warning('RSS de %.1f MB passou de %s MB: tracemalloc ligado (snapshot %s)', memoria / 2 ** 20, limite, rotulo)
+            return
+
+        rotulo = capturar('auto')
+        diferencas = comparar(snapshot(base), snapshot(rotulo), limite=10)
+        _podar_automaticos(rotulo)
+        logger.warning(
+            'RSS de %.1f MB; maiores crescimentos desde %s:\n%s', memoria / 2 ** 20, base,
+            '\n'.join(f'{linha["diferenca_kb"]:+10.1f} KB  {linha["site"]}' for linha in diferencas),
+        )
+    except Exception:  # tracemalloc desligado no meio (parar()) ou disco cheio: o worker segue
+        logger.exception('Falha no snapshot automático de memória')
+    finally:
+        with _trava:
+            _automatico['capturando'] = False
+
+
+def _podar_automaticos(rotulo):
+    """
+    Mantém só os últimos MEMORIA_AUTOMATICOS snapshots automáticos (a base nunca é apagada)
+    """
+    with _trava:
+        _automatico['rotulos'].append(rotulo)
+        excedentes = _automatico['rotulos'][:-automaticos_mantidos()]
+        del _automatico['rotulos'][:len(excedentes)]
+        if excedentes:
+            mantidos = [item for item in _snapshots if item[0] not in excedentes]
+            _snapshots.clear()
+            _snapshots.extend(mantidos)
+    for excedente in excedentes:
+        try:
+            os.remove(os.path.join(diretorio(), excedente + '.snap'))
+        except FileNotFoundError:
+            pass
+
+
+class MemoriaMiddleware(MiddlewareHibrido):
+    """
+    Acumula o crescimento do RSS por rota e dispara o tracemalloc acima do limite
+    """
+
+    def responder(self, request):
+        antes = rss()
+        response = self.get_response(request)
+        self._registrar(request, antes)
+        return response
+
+    async def aresponder(self, request):
+        antes = rss()
+        response = await self.get_response(request)
+        self._registrar(request, antes)
+        return response
+
+    def _registrar(self, request, antes):
+        depois = rss()
+        if antes is not None and depois is not None:
+            correspondencia = getattr(request, 'resolver_match', None)
+            rota = correspondencia.view_name if correspondencia is not None else ''
+            _registrar_rota(rota or '(sem rota)', depois - antes)
+        _verificar_limite(depois)
+
+
+def medir(funcao, repeticoes, intervalos=5, limite=LIMITE_SITES):
+    """
+    Executa `funcao` `repeticoes` vezes com snapshots entre os intervalos.
+    Retorna uma lista com, por intervalo: requisições feitas, RSS, memória
+    rastreada e os pontos que mais cresceram desde o intervalo anterior.
+    """
+    iniciou = iniciar()
+    try:
+        anterior = tracemalloc.take_snapshot().filter_traces(_FILTROS)
+        por_intervalo = max(repeticoes // max(intervalos, 1), 1)
+        feitas = 0
+        relatorio = []
+        while feitas < repeticoes:
+            inicio = time.perf_counter()
+            for _ in range(min(por_intervalo, repeticoes - feitas)):
+                funcao()
+                feitas += 1
+            duracao = time.perf_counter() - inicio
+            atual = tracemalloc.take_snapshot().filter_traces(_FILTROS)
+            memoria = rss()
+            relatorio.append({
+                'feitas': feitas,
+                'segundos': round(duracao, 2),
+                'rss_mb': round(memoria / 2 ** 20, 1) if memoria is not None else None,
+                'rastreado_mb': round(tracemalloc.get_traced_memory()[0] / 2 ** 20, 2),
+                'crescimentos': comparar(anterior, atual, limite),
+            })
+            anterior = atual
+        return relatorio
+    finally:
+        if iniciou:
+            tracemalloc.stop()
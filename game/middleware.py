@@ -0,0 +1,139 @@
+import mimetypes
+import os
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+
+# Nomes gerados pelo ManifestStaticFilesStorage: nome.<12 hex>.ext
+_NOME_COM_HASH = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+
+# Variantes pré-comprimidas, em ordem de preferência
+CODIFICACOES = (('br', '.br'), ('gzip', '.gz'))
+
+CACHE_IMUTAVEL = 'public, max-age=31536000, immutable'
+CACHE_REVALIDAR = 'public, max-age=0, must-revalidate'
+
+
+class MiddlewareHibrido:
+    """
+    Base dos middlewares do projeto, como o MiddlewareMixin do Django: sob WSGI
+    chama responder(), sob ASGI aresponder(), sem trocar de thread a cada camada.
+    Subclasses implementam os dois.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.aresponder(request)
+        return self.responder(request)
+
+    def responder(self, request):
+        raise NotImplementedError
+
+    async def aresponder(self, request):
+        raise NotImplementedError
+
+
+def codificacoes_aceitas(request):
+    """
+    Retorna o conjunto de codificações aceitas pelo cliente (header Accept-Encoding)
+    """
+    aceitas = set()
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        nome, _, parametros = item.strip().partition(';')
+        if parametros.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        if nome:
+            aceitas.add(nome.strip().lower())
+    return aceitas
+
+
+class StaticAssetMiddleware(MiddlewareHibrido):
+    """
+    Serve os arquivos de STATIC_ROOT gerados pelo collectstatic diretamente no processo:
+    - escolhe a variante .br/.gz pré-comprimida conforme o Accept-Encoding
+    - usa FileResponse (wsgi.file_wrapper/sendfile quando o servidor suporta)
+    - cache de um ano imutável para nomes com hash de conteúdo
+    Arquivos que não existem em STATIC_ROOT seguem para as próximas camadas.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.prefixo = settings.STATIC_URL
+        self.raiz = settings.STATIC_ROOT
+
+    def _estatico(self, request):
+        return self.raiz and request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefixo)
+
+    def responder(self, request):
+        if self._estatico(request):
+            response = self.servir(request, request.path_info[len(self.prefixo):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    async def aresponder(self, request):
+        if self._estatico(request):
+            # stat/open no disco fora do event loop; as demais rotas não saem dele
+            response = await sync_to_async(self.servir, thread_sensitive=False)(
+                request, request.path_info[len(self.prefixo):]
+            )
+            if response is not None:
+                return response
+        return await self.get_response(request)
+
+    def servir(self, request, nome):
+        try:
+            caminho = safe_join(self.raiz, nome)
+        except ValueError:
+            return None  # tentativa de sair de STATIC_ROOT
+        if not os.path.isfile(caminho):
+            return None
+
+        estatisticas = os.stat(caminho)
+        if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), estatisticas.st_mtime):
+            response = HttpResponseNotModified()
+            self._cabecalhos_cache(response, nome, estatisticas)
+            return response
+
+        content_type, _ = mimetypes.guess_type(caminho)
+        content_type = content_type or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type == 'application/javascript':
+            content_type += '; charset=utf-8'
+
+        codificacao = None
+        aceitas = codificacoes_aceitas(request)
+        for nome_codificacao, sufixo in CODIFICACOES:
+            if nome_codificacao in aceitas and os.path.isfile(caminho + sufixo):
+                codificacao = nome_codificacao
+                caminho += sufixo
+                break
+
+        response = FileResponse(open(caminho, 'rb'), content_type=content_type)
+        # FileResponse adiciona "inline; filename=...", desnecessário para assets
+        del response.headers['Content-Disposition']
+        if codificacao:
+            response.headers['Content-Encoding'] = codificacao
+        self._cabecalhos_cache(response, nome, estatisticas)
+        return response
+
+    def _cabecalhos_cache(self, response, nome, estatisticas):
+        response.headers['Last-Modified'] = http_date(estatisticas.st_mtime)
+        response.headers['Vary'] = 'Accept-Encoding'
+        if _NOME_COM_HASH.search(nome):
+            response.headers['Cache-Control'] = CACHE_IMUTAVEL
+        else:
+            response.headers['Cache-Control'] = CACHE_REVALIDAR
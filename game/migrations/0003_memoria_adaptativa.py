@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0002_modulo_quiz_publico_alvo_desafio_resultado_desafio_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemoriaAdaptativa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.BinaryField(default=b'', help_text='Filas de revisão empacotadas por caixa')),
+                ('novas_introduzidas', models.IntegerField(default=0, help_text='Cursor das perguntas novas na ordem do quiz')),
+                ('data_atualizacao', models.DateTimeField(auto_now=True)),
+                ('estudante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memorias', to='game.estudante')),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memorias', to='game.quiz')),
+            ],
+            options={
+                'verbose_name': 'Memória Adaptativa',
+                'verbose_name_plural': 'Memórias Adaptativas',
+                'unique_together': {('estudante', 'quiz')},
+            },
+        ),
+    ]
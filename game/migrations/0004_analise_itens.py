@@ -0,0 +1,62 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0003_memoria_adaptativa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcoProcessamento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100, unique=True)),
+                ('ultimo_id', models.BigIntegerField(default=0)),
+                ('data_atualizacao', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Marco de Processamento',
+                'verbose_name_plural': 'Marcos de Processamento',
+            },
+        ),
+        migrations.CreateModel(
+            name='EstatisticaPergunta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tentativas', models.IntegerField(default=0)),
+                ('acertos', models.IntegerField(default=0)),
+                ('soma_escores', models.FloatField(default=0, help_text='Soma do escore do resultado sem esta pergunta')),
+                ('soma_escores_quadrado', models.FloatField(default=0)),
+                ('soma_escores_acertos', models.FloatField(default=0, help_text='Soma do escore entre quem acertou')),
+                ('escolhas', models.JSONField(blank=True, default=dict, help_text='Contagem de escolhas por id de Resposta')),
+                ('dificuldade', models.FloatField(blank=True, help_text='Proporção de acertos (0 = difícil, 1 = fácil)', null=True)),
+                ('discriminacao', models.FloatField(blank=True, help_text='Correlação ponto-bisserial item-total', null=True)),
+                ('data_atualizacao', models.DateTimeField(auto_now=True)),
+                ('pergunta', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='estatistica', to='game.pergunta')),
+            ],
+            options={
+                'verbose_name': 'Estatística de Pergunta',
+                'verbose_name_plural': 'Estatísticas de Perguntas',
+            },
+        ),
+        migrations.CreateModel(
+            name='RespostaResultado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('correta', models.BooleanField(default=False)),
+                ('pergunta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='respostas_estudantes', to='game.pergunta')),
+                ('resposta', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='escolhas', to='game.resposta')),
+                ('resultado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='respostas_escolhidas', to='game.resultado')),
+            ],
+            options={
+                'verbose_name': 'Resposta do Resultado',
+                'verbose_name_plural': 'Respostas dos Resultados',
+                'unique_together': {('resultado', 'pergunta')},
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0004_analise_itens'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EtapaDilema',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.SlugField(help_text='Identificador da etapa dentro do dilema')),
+                ('texto', models.TextField()),
+                ('inicial', models.BooleanField(default=False, help_text='Etapa em que o estudante começa')),
+                ('pontos', models.IntegerField(default=0, help_text='Pontos ao chegar nesta etapa (usado nos finais)')),
+                ('desafio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='etapas_dilema', to='game.desafio')),
+            ],
+            options={
+                'verbose_name': 'Etapa de Dilema',
+                'verbose_name_plural': 'Etapas de Dilemas',
+                'ordering': ['desafio', 'pk'],
+                'unique_together': {('desafio', 'chave')},
+            },
+        ),
+        migrations.CreateModel(
+            name='EscolhaDilema',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('texto', models.CharField(max_length=300)),
+                ('consequencia', models.TextField(blank=True, help_text='Explicação exibida após a escolha')),
+                ('pontos', models.IntegerField(default=0)),
+                ('ordem', models.IntegerField(default=1)),
+                ('destino', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='origens', to='game.etapadilema')),
+                ('etapa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='escolhas', to='game.etapadilema')),
+            ],
+            options={
+                'verbose_name': 'Escolha de Dilema',
+                'verbose_name_plural': 'Escolhas de Dilemas',
+                'ordering': ['etapa', 'ordem', 'pk'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EstadoDilema',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('assinatura', models.CharField(blank=True, help_text='Versão do grafo em que o percurso começou', max_length=16)),
+                ('etapa_atual', models.PositiveSmallIntegerField(default=0)),
+                ('caminho', models.BinaryField(default=b'', help_text='Índice da escolha feita em cada etapa')),
+                ('pontos', models.IntegerField(default=0)),
+                ('concluido', models.BooleanField(default=False)),
+                ('data_atualizacao', models.DateTimeField(auto_now=True)),
+                ('desafio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estados_dilema', to='game.desafio')),
+                ('estudante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dilemas', to='game.estudante')),
+            ],
+            options={
+                'verbose_name': 'Estado de Dilema',
+                'verbose_name_plural': 'Estados de Dilemas',
+                'unique_together': {('estudante', 'desafio')},
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:22
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def lancar_saldos_iniciais(apps, schema_editor):
+    # Pontos anteriores ao livro-razão entram como um lançamento de abertura
+    Pontuacao = apps.get_model('game', 'Pontuacao')
+    EventoPontuacao = apps.get_model('game', 'EventoPontuacao')
+    EventoPontuacao.objects.bulk_create(
+        EventoPontuacao(estudante_id=estudante_id, origem='saldo_inicial', delta=pontos)
+        for estudante_id, pontos in Pontuacao.objects.exclude(pontos_totais=0).values_list(
+            'estudante_id', 'pontos_totais'
+        ).iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0005_dilemas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoPontuacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origem', models.CharField(help_text='O que gerou os pontos, ex.: dilema:12', max_length=100)),
+                ('delta', models.IntegerField()),
+                ('data', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('estudante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eventos_pontuacao', to='game.estudante')),
+            ],
+            options={
+                'verbose_name': 'Evento de Pontuação',
+                'verbose_name_plural': 'Eventos de Pontuação',
+                'ordering': ['-data', '-pk'],
+            },
+        ),
+        migrations.RunPython(lancar_saldos_iniciais, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:25
+
+from django.db import migrations, models
+
+
+def criar_curva_padrao(apps, schema_editor):
+    # Mesma regra usada até aqui: 100 pontos por nível, até o nível 100
+    NivelPontuacao = apps.get_model('game', 'NivelPontuacao')
+    NivelPontuacao.objects.bulk_create(
+        NivelPontuacao(nivel=nivel, pontos_minimos=(nivel - 1) * 100) for nivel in range(1, 101)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0006_livro_pontuacao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NivelPontuacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nivel', models.PositiveIntegerField(unique=True)),
+                ('pontos_minimos', models.IntegerField(unique=True)),
+                ('nome', models.CharField(blank=True, help_text='Título exibido ao estudante, ex.: Poupador', max_length=50)),
+            ],
+            options={
+                'verbose_name': 'Nível de Pontuação',
+                'verbose_name_plural': 'Curva de Níveis',
+                'ordering': ['pontos_minimos'],
+            },
+        ),
+        migrations.RunPython(criar_curva_padrao, migrations.RunPython.noop),
+    ]
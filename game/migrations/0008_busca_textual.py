@@ -0,0 +1,63 @@
+from django.db import migrations
+
+SQLITE = [
+    "CREATE VIRTUAL TABLE game_busca USING fts5("
+    "tipo UNINDEXED, objeto_id UNINDEXED, titulo, corpo, tema, "
+    "tokenize = 'unicode61 remove_diacritics 2')",
+]
+
+POSTGRESQL = [
+    "CREATE TABLE game_busca ("
+    "chave bigint PRIMARY KEY, tipo varchar(20) NOT NULL, objeto_id bigint NOT NULL, "
+    "titulo text NOT NULL DEFAULT '', corpo text NOT NULL DEFAULT '', tema text NOT NULL DEFAULT '', "
+    "documento tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('portuguese', titulo), 'A') || "
+    "setweight(to_tsvector('portuguese', tema), 'B') || "
+    "setweight(to_tsvector('portuguese', corpo), 'C')) STORED)",
+    "CREATE INDEX game_busca_documento ON game_busca USING GIN (documento)",
+]
+
+TIPOS = {'quiz': 1, 'pergunta': 2, 'modulo': 3}
+
+
+def criar_indice(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    comandos = {'sqlite': SQLITE, 'postgresql': POSTGRESQL}.get(vendor)
+    if comandos is None:
+        return  # Sem índice textual: a busca usa icontains (ver game/search.py)
+    for comando in comandos:
+        schema_editor.execute(comando)
+
+    # Indexa o conteúdo existente
+    Quiz = apps.get_model('game', 'Quiz')
+    Pergunta = apps.get_model('game', 'Pergunta')
+    Modulo = apps.get_model('game', 'Modulo')
+    documentos = [
+        *(('quiz', pk, titulo, descricao, tema)
+          for pk, titulo, descricao, tema in Quiz.objects.values_list('pk', 'titulo', 'descricao', 'tema')),
+        *(('pergunta', pk, '', texto, '') for pk, texto in Pergunta.objects.values_list('pk', 'texto')),
+        *(('modulo', pk, nome, descricao, '')
+          for pk, nome, descricao in Modulo.objects.values_list('pk', 'nome', 'descricao')),
+    ]
+    coluna = 'rowid' if vendor == 'sqlite' else 'chave'
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO game_busca ({coluna}, tipo, objeto_id, titulo, corpo, tema) VALUES (%s, %s, %s, %s, %s, %s)',
+            [(pk * 4 + TIPOS[tipo], tipo, pk, titulo, corpo, tema) for tipo, pk, titulo, corpo, tema in documentos]
+        )
+
+
+def remover_indice(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute('DROP TABLE IF EXISTS game_busca')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0007_curva_niveis'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:09
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def preencher_contadores(apps, schema_editor):
+    # Valores iniciais dos contadores (depois mantidos por game/counters.py)
+    Quiz = apps.get_model('game', 'Quiz')
+    Pergunta = apps.get_model('game', 'Pergunta')
+    Resposta = apps.get_model('game', 'Resposta')
+    perguntas = {
+        linha['quiz_id']: linha
+        for linha in Pergunta.objects.values('quiz_id').annotate(total=Count('pk'), pontos=Sum('pontos')).order_by()
+    }
+    respostas = dict(
+        Resposta.objects.values('pergunta__quiz_id').annotate(total=Count('pk')).order_by().values_list(
+            'pergunta__quiz_id', 'total'
+        )
+    )
+    quizzes = list(Quiz.objects.all())
+    for quiz in quizzes:
+        linha = perguntas.get(quiz.pk, {})
+        quiz.total_perguntas = linha.get('total', 0)
+        quiz.pontos_maximos = linha.get('pontos') or 0
+        quiz.total_respostas = respostas.get(quiz.pk, 0)
+    Quiz.objects.bulk_update(quizzes, ['total_perguntas', 'pontos_maximos', 'total_respostas'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0008_busca_textual'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='pontos_maximos',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Soma dos pontos das perguntas'),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='total_perguntas',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='total_respostas',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Alternativas de todas as perguntas'),
+        ),
+        migrations.AlterField(
+            model_name='resultado',
+            name='total_perguntas',
+            field=models.IntegerField(blank=True, help_text='Em branco: o total atual de perguntas do quiz'),
+        ),
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+    ]
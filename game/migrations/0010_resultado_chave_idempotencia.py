@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0009_contadores_quiz'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resultado',
+            name='chave_idempotencia',
+            field=models.CharField(blank=True, editable=False, help_text='Chave enviada pelo cliente: reenvios da mesma tentativa não geram outro resultado (game/results.py)', max_length=64, null=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='resultado',
+            unique_together={('estudante', 'chave_idempotencia'), ('estudante', 'quiz', 'data_realizacao')},
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:16
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0010_resultado_chave_idempotencia'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='resultado',
+            name='data_realizacao',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
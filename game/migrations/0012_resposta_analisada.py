@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:30
+
+from django.db import migrations, models
+
+
+def marcar_ja_processadas(apps, schema_editor):
+    # Tudo até o marco antigo já foi somado às estatísticas; respostas que ele
+    # pulou só voltam a contar com analisar_perguntas --recalcular
+    MarcoProcessamento = apps.get_model('game', 'MarcoProcessamento')
+    RespostaResultado = apps.get_model('game', 'RespostaResultado')
+    marco = MarcoProcessamento.objects.filter(nome='analise_perguntas').first()
+    if marco:
+        RespostaResultado.objects.filter(pk__lte=marco.ultimo_id).update(analisada=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0011_resultado_data_offline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='respostaresultado',
+            name='analisada',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='respostaresultado',
+            index=models.Index(condition=models.Q(('analisada', False)), fields=['id'], name='resposta_pendente_analise_idx'),
+        ),
+        migrations.RunPython(marcar_ja_processadas, migrations.RunPython.noop),
+    ]
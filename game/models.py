@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 
@@ -40,6 +41,10 @@ class Quiz(models.Model):
     ativo = models.BooleanField(default=True)
     data_criacao = models.DateTimeField(auto_now_add=True)
     publico_alvo = models.CharField(max_length=100, blank=True, help_text="Ex: Ensino Fundamental, Médio, Adultos")
+    # Contadores desnormalizados, mantidos por game/counters.py (não editar à mão)
+    total_perguntas = models.PositiveIntegerField(default=0, editable=False)
+    pontos_maximos = models.PositiveIntegerField(default=0, editable=False, help_text="Soma dos pontos das perguntas")
+    total_respostas = models.PositiveIntegerField(default=0, editable=False, help_text="Alternativas de todas as perguntas")
     
     class Meta:
         verbose_name = "Quiz"
@@ -95,22 +100,33 @@ class Resultado(models.Model):
     estudante = models.ForeignKey(Estudante, on_delete=models.CASCADE, related_name='resultados')
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='resultados')
     pontuacao_obtida = models.IntegerField(default=0)
-    total_perguntas = models.IntegerField()
+    total_perguntas = models.IntegerField(blank=True, help_text="Em branco: o total atual de perguntas do quiz")
     acertos = models.IntegerField(default=0)
-    data_realizacao = models.DateTimeField(auto_now_add=True)
+    # Default em vez de auto_now_add: a sincronização offline grava a hora da tentativa
+    data_realizacao = models.DateTimeField(default=timezone.now, editable=False)
     tempo_gasto = models.IntegerField(null=True, blank=True, help_text="Tempo gasto em segundos")
     concluido = models.BooleanField(default=False)
     desafio = models.ForeignKey("Desafio", on_delete=models.SET_NULL, null=True, blank=True, related_name="resultados")
+    chave_idempotencia = models.CharField(
+        max_length=64, null=True, blank=True, editable=False,
+        help_text="Chave enviada pelo cliente: reenvios da mesma tentativa não geram outro resultado (game/results.py)"
+    )
     
     class Meta:
         verbose_name = "Resultado"
         verbose_name_plural = "Resultados"
         ordering = ['-data_realizacao']
-        unique_together = ['estudante', 'quiz', 'data_realizacao']
+        unique_together = [['estudante', 'quiz', 'data_realizacao'], ['estudante', 'chave_idempotencia']]
     
     def __str__(self):
         return f"{self.estudante.nome} - {self.quiz.titulo} ({self.acertos}/{self.total_perguntas})"
 
+    def save(self, *args, **kwargs):
+        # Lido do contador do quiz, sem contar as perguntas
+        if self.total_perguntas is None:
+            self.total_perguntas = self.quiz.total_perguntas
+        super().save(*args, **kwargs)
+
 
 class Pontuacao(models.Model):
     """
@@ -131,10 +147,17 @@ class Pontuacao(models.Model):
     
     def calcular_nivel(self):
         """
-        Calcula o nível baseado na pontuação total
-        Cada nível requer 100 pontos a mais que o anterior
+        Calcula o nível baseado na pontuação total, pela curva de níveis configurada
+        """
+        from .levels import nivel_para
+        return nivel_para(self.pontos_totais)
+    
+    def progresso_nivel(self):
+        """
+        Nível, progresso e pontos que faltam para o próximo nível
         """
-        return min((self.pontos_totais // 100) + 1, 100)  # Máximo nível 100
+        from .levels import progresso
+        return progresso(self.pontos_totais)
     
     def save(self, *args, **kwargs):
         self.nivel_atual = self.calcular_nivel()
@@ -239,3 +262,186 @@ class ProgressoDesafio(models.Model):
 
     def __str__(self):
         return f"{self.estudante.nome} - {self.desafio.titulo} ({'Concluído' if self.concluido else 'Em andamento'})"
+
+
+class MemoriaAdaptativa(models.Model):
+    """
+    Memória compacta de um estudante em um quiz para a prática adaptativa.
+    O estado de todas as perguntas fica empacotado em `estado` (ver game/adaptive.py).
+    """
+    estudante = models.ForeignKey(Estudante, on_delete=models.CASCADE, related_name="memorias")
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name="memorias")
+    estado = models.BinaryField(default=b"", help_text="Filas de revisão empacotadas por caixa")
+    novas_introduzidas = models.IntegerField(default=0, help_text="Cursor das perguntas novas na ordem do quiz")
+    data_atualizacao = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Memória Adaptativa"
+        verbose_name_plural = "Memórias Adaptativas"
+        unique_together = ["estudante", "quiz"]
+
+    def __str__(self):
+        return f"{self.estudante.nome} - {self.quiz.titulo}"
+
+
+class RespostaResultado(models.Model):
+    """
+    Alternativa escolhida pelo estudante em cada pergunta de um Resultado
+    """
+    resultado = models.ForeignKey(Resultado, on_delete=models.CASCADE, related_name="respostas_escolhidas")
+    pergunta = models.ForeignKey(Pergunta, on_delete=models.CASCADE, related_name="respostas_estudantes")
+    resposta = models.ForeignKey(Resposta, on_delete=models.SET_NULL, null=True, blank=True, related_name="escolhas")
+    correta = models.BooleanField(default=False)
+    # Marcada pela análise de itens (game/analytics.py) ao somar a resposta às estatísticas
+    analisada = models.BooleanField(default=False, editable=False)
+
+    class Meta:
+        verbose_name = "Resposta do Resultado"
+        verbose_name_plural = "Respostas dos Resultados"
+        unique_together = ["resultado", "pergunta"]
+        indexes = [
+            models.Index(fields=["id"], condition=models.Q(analisada=False), name="resposta_pendente_analise_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.resultado} - {self.pergunta}"
+
+
+class EstatisticaPergunta(models.Model):
+    """
+    Estatísticas de item de uma pergunta (dificuldade, discriminação e escolhas).
+    As somas acumuladas permitem atualizar os índices de forma incremental.
+    """
+    pergunta = models.OneToOneField(Pergunta, on_delete=models.CASCADE, related_name="estatistica")
+    tentativas = models.IntegerField(default=0)
+    acertos = models.IntegerField(default=0)
+    soma_escores = models.FloatField(default=0, help_text="Soma do escore do resultado sem esta pergunta")
+    soma_escores_quadrado = models.FloatField(default=0)
+    soma_escores_acertos = models.FloatField(default=0, help_text="Soma do escore entre quem acertou")
+    escolhas = models.JSONField(default=dict, blank=True, help_text="Contagem de escolhas por id de Resposta")
+    dificuldade = models.FloatField(null=True, blank=True, help_text="Proporção de acertos (0 = difícil, 1 = fácil)")
+    discriminacao = models.FloatField(null=True, blank=True, help_text="Correlação ponto-bisserial item-total")
+    data_atualizacao = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Estatística de Pergunta"
+        verbose_name_plural = "Estatísticas de Perguntas"
+
+    def __str__(self):
+        return f"{self.pergunta} ({self.tentativas} tentativas)"
+
+
+class MarcoProcessamento(models.Model):
+    """
+    Controle de uma rotina incremental (ex.: análise de itens): a linha é
+    travada durante cada lote e guarda o maior id já processado
+    """
+    nome = models.CharField(max_length=100, unique=True)
+    ultimo_id = models.BigIntegerField(default=0)
+    data_atualizacao = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Marco de Processamento"
+        verbose_name_plural = "Marcos de Processamento"
+
+    def __str__(self):
+        return f"{self.nome}: {self.ultimo_id}"
+
+
+class EtapaDilema(models.Model):
+    """
+    Situação de um desafio do tipo "dilema". Etapas sem escolhas são finais.
+    """
+    desafio = models.ForeignKey(Desafio, on_delete=models.CASCADE, related_name="etapas_dilema")
+    chave = models.SlugField(max_length=50, help_text="Identificador da etapa dentro do dilema")
+    texto = models.TextField()
+    inicial = models.BooleanField(default=False, help_text="Etapa em que o estudante começa")
+    pontos = models.IntegerField(default=0, help_text="Pontos ao chegar nesta etapa (usado nos finais)")
+
+    class Meta:
+        verbose_name = "Etapa de Dilema"
+        verbose_name_plural = "Etapas de Dilemas"
+        ordering = ["desafio", "pk"]
+        unique_together = ["desafio", "chave"]
+
+    def __str__(self):
+        return f"{self.desafio.titulo} - {self.chave}"
+
+
+class EscolhaDilema(models.Model):
+    """
+    Escolha disponível em uma etapa, levando a outra etapa do mesmo dilema
+    """
+    etapa = models.ForeignKey(EtapaDilema, on_delete=models.CASCADE, related_name="escolhas")
+    destino = models.ForeignKey(EtapaDilema, on_delete=models.CASCADE, related_name="origens")
+    texto = models.CharField(max_length=300)
+    consequencia = models.TextField(blank=True, help_text="Explicação exibida após a escolha")
+    pontos = models.IntegerField(default=0)
+    ordem = models.IntegerField(default=1)
+
+    class Meta:
+        verbose_name = "Escolha de Dilema"
+        verbose_name_plural = "Escolhas de Dilemas"
+        ordering = ["etapa", "ordem", "pk"]
+
+    def __str__(self):
+        return f"{self.etapa.chave} -> {self.destino.chave}: {self.texto[:40]}"
+
+
+class EstadoDilema(models.Model):
+    """
+    Percurso de um estudante em um dilema: etapa atual (índice no grafo
+    compilado) e escolhas feitas, um byte por passo (ver game/dilemma.py).
+    """
+    estudante = models.ForeignKey(Estudante, on_delete=models.CASCADE, related_name="dilemas")
+    desafio = models.ForeignKey(Desafio, on_delete=models.CASCADE, related_name="estados_dilema")
+    assinatura = models.CharField(max_length=16, blank=True, help_text="Versão do grafo em que o percurso começou")
+    etapa_atual = models.PositiveSmallIntegerField(default=0)
+    caminho = models.BinaryField(default=b"", help_text="Índice da escolha feita em cada etapa")
+    pontos = models.IntegerField(default=0)
+    concluido = models.BooleanField(default=False)
+    data_atualizacao = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Estado de Dilema"
+        verbose_name_plural = "Estados de Dilemas"
+        unique_together = ["estudante", "desafio"]
+
+    def __str__(self):
+        return f"{self.estudante.nome} - {self.desafio.titulo}"
+
+
+class EventoPontuacao(models.Model):
+    """
+    Lançamento do livro-razão de pontos (somente inclusão). A soma dos deltas de
+    um estudante é igual a Pontuacao.pontos_totais (ver game/scoring.py).
+    """
+    estudante = models.ForeignKey(Estudante, on_delete=models.CASCADE, related_name="eventos_pontuacao")
+    origem = models.CharField(max_length=100, help_text="O que gerou os pontos, ex.: dilema:12")
+    delta = models.IntegerField()
+    data = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = "Evento de Pontuação"
+        verbose_name_plural = "Eventos de Pontuação"
+        ordering = ["-data", "-pk"]
+
+    def __str__(self):
+        return f"{self.estudante.nome}: {self.delta:+d} ({self.origem})"
+
+
+class NivelPontuacao(models.Model):
+    """
+    Linha da curva de níveis: pontos mínimos para alcançar cada nível (ver game/levels.py)
+    """
+    nivel = models.PositiveIntegerField(unique=True)
+    pontos_minimos = models.IntegerField(unique=True)
+    nome = models.CharField(max_length=50, blank=True, help_text="Título exibido ao estudante, ex.: Poupador")
+
+    class Meta:
+        verbose_name = "Nível de Pontuação"
+        verbose_name_plural = "Curva de Níveis"
+        ordering = ["pontos_minimos"]
+
+    def __str__(self):
+        return f"Nível {self.nivel} ({self.pontos_minimos} pontos)"
@@ -0,0 +1,333 @@
+"""
+Perfilamento sob demanda de requisições em produção.
+
+O ProfilingMiddleware perfila a requisição quando:
+
+- um usuário da equipe pede, com o header `X-Perfil: 1` ou o parâmetro `?_perfil=1`;
+- a requisição cai na amostragem (settings.PERFIL_AMOSTRAGEM, fração de 0 a 1,
+  0 por padrão).
+
+Cada requisição usa um só profiler: no Python 3.11 o cProfile e o pyinstrument
+usam o mesmo gancho (PyEval_SetProfile) e o segundo a ligar desliga o primeiro.
+O padrão é o cProfile (.prof, para pstats ou snakeviz); com o pyinstrument
+instalado, `X-Perfil: amostragem` (ou settings.PERFIL_MODO = 'amostragem')
+grava no lugar dele o .html do profiler por amostragem. Junto vai um .json com
+URL, nome da rota, tempo e o log de queries. Só as PERFIL_MAX_CAPTURAS mais
+recentes são mantidas. A página /perfis/ (equipe) lista as capturas mais lentas.
+
+Apenas uma requisição por processo é perfilada de cada vez; as demais seguem
+sem perfil.
+
+Sob ASGI o cProfile só enxerga a thread do event loop: views síncronas e
+queries feitas nas threads de sync aparecem como espera. O log de queries é
+instalado na thread de sync da requisição e continua completo.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .middleware import MiddlewareHibrido
+
+try:
+    from pyinstrument import Profiler as ProfilerAmostragem
+except ImportError:  # pyinstrument é opcional: sem ele grava apenas o cProfile
+    ProfilerAmostragem = None
+
+HEADER_PERFIL = 'HTTP_X_PERFIL'
+PARAMETRO_PERFIL = '_perfil'
+MAX_QUERIES_LOG = 500
+MODOS = ('cprofile', 'amostragem')
+
+_NOME_CAPTURA = re.compile(r'^[\w.-]+$')
+_trava = threading.Lock()
+
+
+def diretorio():
+    return str(getattr(settings, 'PERFIL_DIRETORIO', os.path.join(settings.BASE_DIR, 'perfis')))
+
+
+def amostragem():
+    return getattr(settings, 'PERFIL_AMOSTRAGEM', 0.0)
+
+
+def max_capturas():
+    return getattr(settings, 'PERFIL_MAX_CAPTURAS', 200)
+
+
+def modo_perfil(request):
+    """
+    Profiler da requisição: 'amostragem' (pyinstrument) se pedido no header ou
+    em settings.PERFIL_MODO e instalado; senão 'cprofile'
+    """
+    if ProfilerAmostragem is None:
+        return 'cprofile'
+    pedido = request.META.get(HEADER_PERFIL) or request.GET.get(PARAMETRO_PERFIL)
+    if pedido in MODOS:
+        return pedido
+    return getattr(settings, 'PERFIL_MODO', 'cprofile')
+
+
+def origem_perfil(request):
+    """
+    'equipe', 'amostra' ou None (requisição não perfilada)
+    """
+    if _pedido(request) and getattr(request, 'user', None) is not None and request.user.is_staff:
+        return 'equipe'
+    return _sorteio()
+
+
+async def aorigem_perfil(request):
+    """
+    Versão assíncrona de origem_perfil: o usuário só é carregado (request.auser)
+    quando o perfil foi pedido
+    """
+    if _pedido(request) and hasattr(request, 'auser') and (await request.auser()).is_staff:
+        return 'equipe'
+    return _sorteio()
+
+
+def _pedido(request):
+    valores = ('1', *MODOS)
+    return request.META.get(HEADER_PERFIL) in valores or request.GET.get(PARAMETRO_PERFIL) in valores
+
+
+def _sorteio():
+    taxa = amostragem()
+    if taxa and random.random() < taxa:
+        return 'amostra'
+    return None
+
+
+class _LogQueries:
+    """
+    execute_wrapper que registra SQL, banco e duração de cada query
+    """
+
+    def __init__(self):
+        self.queries = []
+        self.total = 0
+
+    def para(self, alias):
+        def wrapper(execute, sql, params, many, context):
+            inicio = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                self.total += 1
+                if len(self.queries) < MAX_QUERIES_LOG:
+                    self.queries.append({
+                        'banco': alias,
+                        'sql': sql,
+                        'ms': round((time.perf_counter() - inicio) * 1000, 3),
+                    })
+        return wrapper
+
+
+def _nome_rota(request):
+    correspondencia = getattr(request, 'resolver_match', None)
+    return correspondencia.view_name if correspondencia is not None and correspondencia.view_name else ''
+
+
+def _rotacionar(pasta):
+    capturas = sorted(nome for nome in os.listdir(pasta) if nome.endswith('.json'))
+    for nome in capturas[:max(len(capturas) - max_capturas(), 0)]:
+        base = nome[:-len('.json')]
+        for extensao in ('.json', '.prof', '.html'):
+            try:
+                os.remove(os.path.join(pasta, base + extensao))
+            except FileNotFoundError:
+                pass
+
+
+def salvar_captura(request, response, perfil, amostrador, log, duracao, origem):
+    """
+    Grava os arquivos da captura e retorna o nome base
+    """
+    pasta = diretorio()
+    os.makedirs(pasta, exist_ok=True)
+    rota = _nome_rota(request)
+    # Nomes em ordem cronológica: a rotação apaga os primeiros
+    base = '{}-{}-{}'.format(
+        timezone.now().strftime('%Y%m%dT%H%M%S%f'),
+        re.sub(r'[^\w]+', '_', rota or 'sem_rota')[:40],
+        int(duracao * 1000),
+    )
+    if perfil is not None:
+        perfil.dump_stats(os.path.join(pasta, base + '.prof'))
+    if amostrador is not None:
+        with open(os.path.join(pasta, base + '.html'), 'w', encoding='utf-8') as arquivo:
+            arquivo.write(amostrador.output_html())
+
+    usuario = getattr(request, 'user', None)
+    metadados = {
+        'nome': base,
+        'data': timezone.now().isoformat(),
+        'metodo': request.method,
+        'caminho': request.get_full_path(),
+        'rota': rota,
+        'status': response.status_code,
+        'ms': round(duracao * 1000, 1),
+        'origem': origem,
+        'profiler': 'amostragem' if amostrador is not None else 'cprofile',
+        'usuario': usuario.get_username() if usuario is not None and usuario.is_authenticated else '',
+        'total_queries': log.total,
+        'ms_queries': round(sum(query['ms'] for query in log.queries), 1),
+        'queries': log.queries,
+    }
+    with open(os.path.join(pasta, base + '.json'), 'w', encoding='utf-8') as arquivo:
+        json.dump(metadados, arquivo, ensure_ascii=False)
+    _rotacionar(pasta)
+    return base
+
+
+def listar_capturas(limite=50):
+    """
+    Metadados das capturas, das mais lentas para as mais rápidas (sem o log de queries)
+    """
+    pasta = diretorio()
+    if not os.path.isdir(pasta):
+        return []
+    capturas = []
+    for nome in os.listdir(pasta):
+        if not nome.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(pasta, nome), encoding='utf-8') as arquivo:
+                metadados = json.load(arquivo)
+        except (OSError, ValueError):
+            continue  # captura sendo gravada ou apagada pela rotação
+        metadados.pop('queries', None)
+        metadados['tem_html'] = os.path.exists(os.path.join(pasta, nome[:-len('.json')] + '.html'))
+        metadados['tem_prof'] = os.path.exists(os.path.join(pasta, nome[:-len('.json')] + '.prof'))
+        capturas.append(metadados)
+    capturas.sort(key=lambda captura: captura['ms'], reverse=True)
+    return capturas[:limite]
+
+
+def caminho_captura(nome, extensao):
+    """
+    Caminho de um arquivo da captura, ou None se o nome for inválido ou não existir
+    """
+    if not _NOME_CAPTURA.match(nome):
+        return None
+    caminho = os.path.join(diretorio(), nome + extensao)
+    return caminho if os.path.isfile(caminho) else None
+
+
+def carregar_captura(nome, linhas=40, ordem='cumulative'):
+    """
+    (metadados com queries, relatório do pstats) de uma captura, ou None
+    """
+    caminho = caminho_captura(nome, '.json')
+    if caminho is None:
+        return None
+    with open(caminho, encoding='utf-8') as arquivo:
+        metadados = json.load(arquivo)
+    metadados['tem_html'] = caminho_captura(nome, '.html') is not None
+    relatorio = ''
+    caminho_prof = caminho_captura(nome, '.prof')
+    if caminho_prof is not None:
+        saida = io.StringIO()
+        pstats.Stats(caminho_prof, stream=saida).strip_dirs().sort_stats(ordem).print_stats(linhas)
+        relatorio = saida.getvalue()
+    return metadados, relatorio
+
+
+class ProfilingMiddleware(MiddlewareHibrido):
+    """
+    Perfila a requisição quando pedido pela equipe ou sorteado pela amostragem.
+    Deve vir depois do AuthenticationMiddleware (usa request.user).
+    """
+
+    def responder(self, request):
+        origem = origem_perfil(request)
+        if origem is None or not _trava.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self._perfilar(request, origem)
+        finally:
+            _trava.release()
+
+    async def aresponder(self, request):
+        origem = await aorigem_perfil(request)
+        if origem is None or not _trava.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            return await self._aperfilar(request, origem)
+        finally:
+            _trava.release()
+
+    def _perfilar(self, request, origem):
+        log = _LogQueries()
+        perfil, amostrador = _profilers(modo_perfil(request))
+        with ExitStack() as pilha:
+            _instalar_log(pilha, log)
+            inicio = time.perf_counter()
+            with _perfilando(perfil, amostrador):
+                response = self.get_response(request)
+            duracao = time.perf_counter() - inicio
+        nome = salvar_captura(request, response, perfil, amostrador, log, duracao, origem)
+        if origem == 'equipe':
+            response['X-Perfil'] = nome
+        return response
+
+    async def _aperfilar(self, request, origem):
+        log = _LogQueries()
+        perfil, amostrador = _profilers(modo_perfil(request), async_mode='enabled')
+        # As conexões são por thread: o log vai para a thread de sync desta requisição
+        pilha = ExitStack()
+        await sync_to_async(_instalar_log)(pilha, log)
+        try:
+            inicio = time.perf_counter()
+            with _perfilando(perfil, amostrador):
+                response = await self.get_response(request)
+            duracao = time.perf_counter() - inicio
+        finally:
+            await sync_to_async(pilha.close)()
+        # Grava em disco e lê request.user (consulta síncrona)
+        nome = await sync_to_async(salvar_captura)(request, response, perfil, amostrador, log, duracao, origem)
+        if origem == 'equipe':
+            response['X-Perfil'] = nome
+        return response
+
+
+def _profilers(modo, **opcoes_amostragem):
+    """
+    (cProfile, None) ou (None, pyinstrument): nunca os dois na mesma requisição
+    """
+    if modo == 'amostragem':
+        return None, ProfilerAmostragem(**opcoes_amostragem)
+    return cProfile.Profile(), None
+
+
+@contextmanager
+def _perfilando(perfil, amostrador):
+    if amostrador is not None:
+        amostrador.start()
+    else:
+        perfil.enable()
+    try:
+        yield
+    finally:
+        if amostrador is not None:
+            amostrador.stop()
+        else:
+            perfil.disable()
+
+
+def _instalar_log(pilha, log):
+    for conexao in connections.all():
+        pilha.enter_context(conexao.execute_wrapper(log.para(conexao.alias)))
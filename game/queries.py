@@ -0,0 +1,262 @@
+"""
+Consultas compartilhadas entre as views HTML e a API JSON.
+
+As funções que retornam querysets não os executam: quem consome decide
+quando (ou se) avaliar, o que permite pular as queries de fragmentos em cache.
+"""
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, Prefetch, Q, Sum
+
+from . import caching
+from .models import (
+    Conquista, Desafio, Estudante, EstudanteConquista, Modulo, Pontuacao, ProgressoDesafio, Resultado,
+)
+from .versioning import aversao_estudante, aversao_global, versao_estudante, versao_global
+
+# Tempo máximo de vida das entradas versionadas (a versão já garante a validade)
+TIMEOUT_VERSIONADO = 60 * 60 * 24
+# Dados compartilhados que mudam a todo momento (ranking, estatísticas gerais)
+TIMEOUT_COMPARTILHADO = 30
+TAMANHO_TOPO_RANKING = 50
+
+
+def _consulta_estatisticas(estudante):
+    return Resultado.objects.filter(estudante=estudante)
+
+
+_AGREGADOS_ESTATISTICAS = {
+    'total_quizzes': Count('id', filter=Q(concluido=True)),
+    'total_acertos': Sum('acertos'),
+    'total_perguntas': Sum('total_perguntas'),
+}
+
+
+def _formatar_estatisticas(totais):
+    total_acertos = totais['total_acertos'] or 0
+    total_perguntas = totais['total_perguntas'] or 0
+    percentual = (total_acertos / total_perguntas * 100) if total_perguntas > 0 else 0
+    return {
+        'total_quizzes': totais['total_quizzes'],
+        'total_acertos': total_acertos,
+        'total_perguntas': total_perguntas,
+        'percentual_acertos': round(percentual, 1),
+    }
+
+
+def estatisticas_estudante(estudante):
+    """
+    Totais de quizzes, acertos e perguntas do estudante em uma única query,
+    guardados no cache pela versão do estudante
+    """
+    chave = f'estatisticas:{estudante.pk}:{versao_estudante(estudante.pk)}'
+    estatisticas = cache.get(chave)
+    if estatisticas is None:
+        totais = _consulta_estatisticas(estudante).aggregate(**_AGREGADOS_ESTATISTICAS)
+        estatisticas = _formatar_estatisticas(totais)
+        cache.set(chave, estatisticas, TIMEOUT_VERSIONADO)
+    return estatisticas
+
+
+async def aestatisticas_estudante(estudante):
+    """
+    Versão assíncrona de estatisticas_estudante (mesma chave de cache)
+    """
+    chave = f'estatisticas:{estudante.pk}:{await aversao_estudante(estudante.pk)}'
+    estatisticas = await cache.aget(chave)
+    if estatisticas is None:
+        totais = await _consulta_estatisticas(estudante).aaggregate(**_AGREGADOS_ESTATISTICAS)
+        estatisticas = _formatar_estatisticas(totais)
+        await cache.aset(chave, estatisticas, TIMEOUT_VERSIONADO)
+    return estatisticas
+
+
+def conquistas_desbloqueadas(estudante, limite=6):
+    """
+    Últimas conquistas desbloqueadas pelo estudante
+    """
+    return EstudanteConquista.objects.filter(
+        estudante=estudante
+    ).select_related('conquista').order_by('-data_desbloqueio')[:limite]
+
+
+def conquistas_disponiveis(estudante, limite=3):
+    """
+    Próximas conquistas ativas ainda não desbloqueadas pelo estudante
+    """
+    return Conquista.objects.filter(ativa=True).exclude(
+        estudantes__estudante=estudante
+    ).order_by('criterio_pontos')[:limite]
+
+
+def resultados_recentes(estudante, limite=7):
+    """
+    Últimos quizzes concluídos pelo estudante
+    """
+    return Resultado.objects.filter(
+        estudante=estudante,
+        concluido=True
+    ).select_related('quiz').order_by('-data_realizacao')[:limite]
+
+
+def ranking(inicio=0, fim=50):
+    """
+    Janela do ranking geral ordenada por pontos
+    """
+    return Pontuacao.objects.select_related('estudante__user').order_by('-pontos_totais', 'pk')[inicio:fim]
+
+
+def _montar_estrutura():
+    modulos = Modulo.objects.filter(ativo=True).order_by('ordem').prefetch_related(
+        Prefetch('desafios', queryset=Desafio.objects.filter(ativo=True).select_related('quiz').order_by('ordem'))
+    )
+    return [
+        {
+            'id': modulo.pk,
+            'slug': modulo.slug,
+            'nome': modulo.nome,
+            'descricao': modulo.descricao,
+            'icone': modulo.icone,
+            'cor': modulo.cor,
+            'desafios': [
+                {
+                    'id': desafio.pk,
+                    'titulo': desafio.titulo,
+                    'descricao': desafio.descricao,
+                    'tipo': desafio.tipo,
+                    'ordem': desafio.ordem,
+                    'quiz_id': desafio.quiz_id,
+                    'pontos_base': desafio.pontos_base,
+                    # Contadores desnormalizados do quiz (game/counters.py)
+                    'total_perguntas': desafio.quiz.total_perguntas if desafio.quiz_id else 0,
+                    'pontos_maximos': desafio.quiz.pontos_maximos if desafio.quiz_id else 0,
+                }
+                for desafio in modulo.desafios.all()
+            ],
+        }
+        for modulo in modulos
+    ]
+
+
+def estrutura_modulos():
+    """
+    Estrutura dos módulos ativos e seus desafios ativos, em dicionários simples.
+    Montada com 2 queries (módulos + Prefetch dos desafios) e guardada no cache
+    pela versão global de conteúdo, então é compartilhada por todos os estudantes.
+    Uma versão antiga nunca é servida: o catálogo muda pelo admin e deve aparecer na hora.
+    """
+    return caching.obter(
+        'estrutura_modulos', _montar_estrutura, versao_global('conteudo'), TIMEOUT_VERSIONADO, obsoleto=False
+    )
+
+
+def _montar_topo_ranking():
+    linhas = ranking(0, TAMANHO_TOPO_RANKING).values_list('estudante_id', 'estudante__nome', 'pontos_totais', 'nivel_atual')
+    return {
+        'total': Pontuacao.objects.count(),
+        'itens': [
+            {
+                'posicao': indice + 1,
+                'estudante_id': estudante_id,
+                'nome': nome,
+                'pontos_totais': pontos,
+                'nivel_atual': nivel,
+            }
+            for indice, (estudante_id, nome, pontos, nivel) in enumerate(linhas)
+        ],
+    }
+
+
+def topo_ranking():
+    """
+    Os TAMANHO_TOPO_RANKING primeiros do ranking e o total de estudantes pontuados.
+    O ranking muda a cada pontuação: enquanto um processo recalcula, os outros
+    servem a versão anterior por alguns instantes.
+    """
+    return caching.obter('topo_ranking', _montar_topo_ranking, versao_global('ranking'), TIMEOUT_COMPARTILHADO)
+
+
+async def atopo_ranking():
+    """
+    Versão assíncrona de topo_ranking (mesma entrada de cache)
+    """
+    return await caching.aobter(
+        'topo_ranking', _montar_topo_ranking, await aversao_global('ranking'), TIMEOUT_COMPARTILHADO
+    )
+
+
+def _calcular_estatisticas_gerais():
+    totais = Pontuacao.objects.aggregate(total=Sum('pontos_totais'), media=Avg('pontos_totais'))
+    return {
+        'total_estudantes': Estudante.objects.count(),
+        'total_pontos': totais['total'] or 0,
+        'media_pontos': round(totais['media'] or 0, 2),
+    }
+
+
+def estatisticas_gerais():
+    """
+    Totais de estudantes e pontos da plataforma (mesma política de cache do ranking)
+    """
+    return caching.obter(
+        'estatisticas_gerais', _calcular_estatisticas_gerais, versao_global('ranking'), TIMEOUT_COMPARTILHADO
+    )
+
+
+async def aestatisticas_gerais():
+    """
+    Versão assíncrona de estatisticas_gerais (mesma entrada de cache)
+    """
+    return await caching.aobter(
+        'estatisticas_gerais', _calcular_estatisticas_gerais, await aversao_global('ranking'), TIMEOUT_COMPARTILHADO
+    )
+
+
+def mapa_modulos(estudante=None):
+    """
+    Mapa de módulos com o progresso do estudante: status de cada desafio,
+    percentual de conclusão e próximo desafio desbloqueado.
+    Usa no máximo 3 queries, independentemente do número de módulos e desafios.
+
+    Os desafios de um módulo são liberados em ordem: um desafio fica disponível
+    quando todos os anteriores do mesmo módulo foram concluídos.
+    """
+    progresso = {}
+    if estudante is not None:
+        progresso = {
+            desafio_id: (concluido, pontuacao)
+            for desafio_id, concluido, pontuacao in ProgressoDesafio.objects.filter(
+                estudante=estudante
+            ).values_list('desafio_id', 'concluido', 'pontuacao')
+        }
+
+    mapa = []
+    for modulo in estrutura_modulos():
+        desafios = []
+        concluidos = 0
+        proximo = None
+        liberado = True
+        for desafio in modulo['desafios']:
+            concluido, pontuacao = progresso.get(desafio['id'], (False, 0))
+            if concluido:
+                status = 'concluido'
+                concluidos += 1
+            elif not liberado:
+                status = 'bloqueado'
+            else:
+                status = 'em_andamento' if desafio['id'] in progresso else 'disponivel'
+                liberado = False
+            desafios.append({**desafio, 'status': status, 'pontuacao': pontuacao})
+            if proximo is None and status in ('disponivel', 'em_andamento'):
+                proximo = desafios[-1]
+
+        total = len(desafios)
+        mapa.append({
+            **modulo,
+            'desafios': desafios,
+            'total_desafios': total,
+            'desafios_concluidos': concluidos,
+            'percentual': round(concluidos / total * 100, 1) if total else 0,
+            'proximo_desafio': proximo,
+        })
+    return mapa
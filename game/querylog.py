@@ -0,0 +1,233 @@
+"""
+Log de queries lentas com EXPLAIN automático.
+
+Toda conexão recebe, ao ser aberta (sinal connection_created), um
+execute_wrapper que mede cada query. As que passam de
+settings.CONSULTA_LENTA_MS vão para o log 'game.querylog' com SQL, parâmetros,
+a view e a linha do projeto que a dispararam. Na primeira ocorrência de cada
+impressão digital (o SQL sem literais e com listas IN colapsadas), o plano de
+execução é capturado com EXPLAIN QUERY PLAN (SQLite) ou EXPLAIN (PostgreSQL) e
+anexado ao registro: varreduras completas aparecem sem investigação manual.
+
+As últimas ocorrências do processo ficam em memória (recentes()) e aparecem
+também na página /perfis/.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+from .middleware import MiddlewareHibrido
+
+logger = logging.getLogger(__name__)
+
+MAX_RECENTES = 200
+MAX_IMPRESSOES = 10000
+TAMANHO_PARAMETROS = 500
+
+_EXPLICAVEIS = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')
+_EXPLAIN = {'sqlite': 'EXPLAIN QUERY PLAN ', 'postgresql': 'EXPLAIN '}
+
+_LITERAIS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTAS = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+_ESPACOS = re.compile(r'\s+')
+
+_PASTA_PROJETO = str(settings.BASE_DIR) + os.sep
+_PASTA_PROPRIA = os.path.dirname(os.path.abspath(__file__)) + os.sep + 'querylog.py'
+
+_trava = threading.Lock()
+_recentes = deque(maxlen=MAX_RECENTES)
+_planos = {}  # impressão digital -> plano (None enquanto é capturado)
+_explicando = ContextVar('logicash_explicando', default=False)
+_requisicao_atual = ContextVar('logicash_requisicao_atual', default=None)
+
+
+def limite_ms():
+    """
+    Limite em ms a partir do qual a query é registrada (None desliga o log)
+    """
+    return getattr(settings, 'CONSULTA_LENTA_MS', None)
+
+
+def impressao_digital(sql):
+    """
+    Identifica queries com a mesma forma: sem literais, espaços normalizados e
+    listas IN de qualquer tamanho iguais
+    """
+    normalizado = _ESPACOS.sub(' ', _LISTAS.sub('(...)', _LITERAIS.sub('?', sql))).strip()
+    return hashlib.sha1(normalizado.encode()).hexdigest()[:12]
+
+
+def _view_atual():
+    """
+    Caminho da view da requisição em andamento, resolvido só quando uma query lenta é registrada
+    """
+    correspondencia = getattr(_requisicao_atual.get(), 'resolver_match', None)
+    if correspondencia is None:
+        return ''
+    view = correspondencia.func
+    return f'{view.__module__}.{getattr(view, "__qualname__", view.__class__.__name__)}'
+
+
+def _origem():
+    """
+    (view, linha): a view registrada pelo middleware (ou, fora de requisições, o
+    quadro mais externo do projeto) e o quadro mais interno do projeto na pilha
+    """
+    quadros = []
+    quadro = sys._getframe(2)
+    while quadro is not None:
+        arquivo = quadro.f_code.co_filename
+        if arquivo.startswith(_PASTA_PROJETO) and arquivo != _PASTA_PROPRIA and 'site-packages' not in arquivo:
+            quadros.append(quadro)
+        quadro = quadro.f_back
+    if not quadros:
+        return _view_atual(), ''
+
+    def descrever(quadro):
+        return f'{os.path.relpath(quadro.f_code.co_filename, _PASTA_PROJETO)}:{quadro.f_lineno} ({quadro.f_code.co_name})'
+
+    view = _view_atual()
+    if not view:
+        externo = quadros[-1]
+        view = f'{externo.f_globals.get("__name__", "?")}.{externo.f_code.co_name}'
+    return view, descrever(quadros[0])
+
+
+def _explicar(conexao, sql, params):
+    prefixo = _EXPLAIN.get(conexao.vendor)
+    if prefixo is None:
+        return None
+    token = _explicando.set(True)
+    try:
+        # Dentro de uma transação, um erro no EXPLAIN não pode abortar a transação da view
+        with transaction.atomic(using=conexao.alias) if conexao.in_atomic_block else nullcontext():
+            with conexao.cursor() as cursor:
+                cursor.execute(prefixo + sql, params)
+                linhas = cursor.fetchall()
+    except DatabaseError as erro:
+        return f'EXPLAIN falhou: {erro}'
+    finally:
+        _explicando.reset(token)
+    if conexao.vendor == 'sqlite':
+        # (id, pai, não usado, detalhe)
+        return '\n'.join(str(linha[-1]) for linha in linhas)
+    return '\n'.join(str(linha[0]) for linha in linhas)
+
+
+def _plano(conexao, sql, params, many, impressao):
+    """
+    Plano de execução na primeira vez que a impressão digital aparece; depois, None
+    """
+    if many or not sql.lstrip().upper().startswith(_EXPLICAVEIS):
+        return None
+    with _trava:
+        if impressao in _planos or len(_planos) >= MAX_IMPRESSOES:
+            return None
+        _planos[impressao] = None
+    plano = _explicar(conexao, sql, params)
+    with _trava:
+        _planos[impressao] = plano
+    return plano
+
+
+def plano(impressao):
+    with _trava:
+        return _planos.get(impressao)
+
+
+def recentes():
+    """
+    Últimas queries lentas registradas neste processo, das mais recentes às mais antigas
+    """
+    with _trava:
+        return list(reversed(_recentes))
+
+
+def limpar():
+    with _trava:
+        _recentes.clear()
+        _planos.clear()
+
+
+class RegistroConsultasLentas:
+    """
+    execute_wrapper instalado em cada conexão
+    """
+
+    def __init__(self, conexao):
+        self.conexao = conexao
+
+    def __call__(self, execute, sql, params, many, context):
+        limite = limite_ms()
+        if limite is None or _explicando.get():
+            return execute(sql, params, many, context)
+        inicio = time.perf_counter()
+        resultado = execute(sql, params, many, context)
+        ms = (time.perf_counter() - inicio) * 1000
+        if ms >= limite:
+            self.registrar(sql, params, many, ms)
+        return resultado
+
+    def registrar(self, sql, params, many, ms):
+        impressao = impressao_digital(sql)
+        view, linha = _origem()
+        registro = {
+            'banco': self.conexao.alias,
+            'ms': round(ms, 2),
+            'impressao': impressao,
+            'sql': sql,
+            'parametros': repr(params)[:TAMANHO_PARAMETROS],
+            'view': view,
+            'linha': linha,
+            'plano': _plano(self.conexao, sql, params, many, impressao),
+        }
+        with _trava:
+            _recentes.append(registro)
+        logger.warning(
+            'Query lenta (%.1f ms, %s) em %s [%s]: %s | parâmetros: %s%s',
+            ms, impressao, view or '?', linha or '?', sql, registro['parametros'],
+            f'\nPlano:\n{registro["plano"]}' if registro['plano'] else '',
+        )
+
+
+def instalar(connection, **kwargs):
+    """
+    Receptor do sinal connection_created
+    """
+    if not any(isinstance(wrapper, RegistroConsultasLentas) for wrapper in connection.execute_wrappers):
+        # No início da lista: connection.execute_wrapper() remove sempre o último,
+        # e a conexão pode ser aberta dentro de um desses blocos
+        connection.execute_wrappers.insert(0, RegistroConsultasLentas(connection))
+
+
+class ConsultaLentaMiddleware(MiddlewareHibrido):
+    """
+    Registra a requisição em andamento, para identificar a view que originou as
+    queries lentas. Sem process_view: sob ASGI ele custaria uma ida à thread de
+    sync por requisição só para guardar um nome que quase nunca é usado.
+    """
+
+    def responder(self, request):
+        token = _requisicao_atual.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _requisicao_atual.reset(token)
+
+    async def aresponder(self, request):
+        token = _requisicao_atual.set(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _requisicao_atual.reset(token)
@@ -0,0 +1,438 @@
+"""
+Envio idempotente do resultado de um quiz.
+
+O cliente gera uma chave (ex.: um UUID) por tentativa e a repete em todas as
+retransmissões da mesma tentativa. O primeiro envio corrige as respostas, grava
+o Resultado com as alternativas escolhidas e lança os pontos; os reenvios
+recebem o resultado original sem nenhuma escrita nem mudança de pontuação.
+
+A verificação é em camadas:
+
+1. cache: o corpo da resposta fica guardado pela chave (estudante + chave) por
+   TIMEOUT_CHAVE, e o reenvio é respondido sem tocar no banco;
+2. banco: sem a entrada no cache (expirada, outro servidor de cache), o
+   Resultado é procurado pela chave;
+3. restrição única (estudante, chave_idempotencia): dois envios simultâneos
+   que passaram pelas duas verificações não gravam duas vezes; o perdedor
+   recebe IntegrityError, desfaz o savepoint e devolve o resultado do vencedor.
+
+gravar_sessao() grava de uma vez os resultados de uma sessão ao vivo
+(game/live.py), com uma chave por sessão.
+
+sincronizar() recebe de uma vez as tentativas feitas offline: corrige todas
+com uma query, grava Resultado, RespostaResultado e ProgressoDesafio em massa
+em uma transação e lança os pontos líquidos do lote em um único evento.
+"""
+
+import re
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Desafio, ProgressoDesafio, Quiz, Resposta, RespostaResultado, Resultado
+from .scoring import registrar_pontos, registrar_pontos_em_massa
+from .versioning import incrementar_versao_estudante
+
+TIMEOUT_CHAVE = 60 * 60 * 24
+CHAVE_VALIDA = re.compile(r'^[A-Za-z0-9_.:-]{8,64}$')
+MAX_TENTATIVAS_LOTE = 200
+# Tentativas offline mais antigas que isso são gravadas com a hora da sincronização
+MAX_ATRASO_OFFLINE = timedelta(days=30)
+
+
+class EnvioInvalido(Exception):
+    pass
+
+
+class ChaveEmConflito(Exception):
+    """
+    A chave já foi usada em uma tentativa de outro quiz
+    """
+
+
+def _chave_cache(estudante_id, chave):
+    return f'resultado:chave:{estudante_id}:{chave}'
+
+
+def serializar(resultado, quiz):
+    return {
+        'id': resultado.pk,
+        'quiz_id': resultado.quiz_id,
+        'acertos': resultado.acertos,
+        'total_perguntas': resultado.total_perguntas,
+        'pontuacao_obtida': resultado.pontuacao_obtida,
+        'pontos_maximos': quiz.pontos_maximos,
+        'tempo_gasto': resultado.tempo_gasto,
+        'data_realizacao': resultado.data_realizacao.isoformat(),
+    }
+
+
+def _alternativas(respostas_ids, **filtros):
+    """
+    {resposta_id: (pergunta_id, quiz_id, correta, pontos da pergunta)}
+    """
+    return {
+        linha[0]: linha[1:]
+        for linha in Resposta.objects.filter(pk__in=respostas_ids, **filtros).values_list(
+            'pk', 'pergunta_id', 'pergunta__quiz_id', 'correta', 'pergunta__pontos'
+        )
+    }
+
+
+def _corrigir(alternativas, quiz_id, respostas):
+    acertos = pontos = 0
+    escolhas = []
+    for pergunta_id, resposta_id in respostas.items():
+        alternativa = alternativas.get(resposta_id)
+        if alternativa is None or alternativa[:2] != (pergunta_id, quiz_id):
+            raise EnvioInvalido(f'A resposta {resposta_id} não pertence à pergunta {pergunta_id} deste quiz.')
+        correta, valor = alternativa[2:]
+        acertos += correta
+        pontos += valor if correta else 0
+        escolhas.append(RespostaResultado(pergunta_id=pergunta_id, resposta_id=resposta_id, correta=correta))
+    return acertos, pontos, escolhas
+
+
+def corrigir(quiz, respostas):
+    """
+    Corrige {pergunta_id: resposta_id} em uma query. Retorna (acertos, pontos,
+    [RespostaResultado sem resultado]). Levanta EnvioInvalido se alguma
+    alternativa não pertencer à pergunta informada ou ao quiz.
+    """
+    return _corrigir(_alternativas(respostas.values(), pergunta__quiz=quiz), quiz.pk, respostas)
+
+
+def _existente(estudante, chave, quiz):
+    resultado = Resultado.objects.filter(estudante=estudante, chave_idempotencia=chave).first()
+    if resultado is not None and resultado.quiz_id != quiz.pk:
+        raise ChaveEmConflito(f'A chave {chave} já foi usada em outro quiz.')
+    return resultado
+
+
+def enviar(estudante, quiz, respostas, chave, tempo_gasto=None):
+    """
+    Registra a tentativa identificada por `chave`, uma única vez.
+    Retorna (dados do resultado, criado).
+    """
+    if not CHAVE_VALIDA.match(chave or ''):
+        raise EnvioInvalido('Chave de idempotência inválida: use de 8 a 64 letras, dígitos, "-", "_", "." ou ":".')
+    chave_cache = _chave_cache(estudante.pk, chave)
+    dados = cache.get(chave_cache)
+    if dados is not None:
+        if dados['quiz_id'] != quiz.pk:
+            raise ChaveEmConflito(f'A chave {chave} já foi usada em outro quiz.')
+        return dados, False
+
+    resultado = _existente(estudante, chave, quiz)
+    if resultado is None:
+        acertos, pontos, escolhas = corrigir(quiz, respostas)
+        try:
+            with transaction.atomic():
+                resultado = Resultado.objects.create(
+                    estudante=estudante,
+                    quiz=quiz,
+                    chave_idempotencia=chave,
+                    total_perguntas=quiz.total_perguntas,
+                    acertos=acertos,
+                    pontuacao_obtida=pontos,
+                    tempo_gasto=tempo_gasto,
+                    concluido=True,
+                )
+                for escolha in escolhas:
+                    escolha.resultado = resultado
+                RespostaResultado.objects.bulk_create(escolhas)
+                if pontos:
+                    registrar_pontos(estudante, pontos, f'quiz:{quiz.pk}:resultado:{resultado.pk}')
+        except IntegrityError:
+            # Envio simultâneo com a mesma chave gravou primeiro
+            resultado = _existente(estudante, chave, quiz)
+            if resultado is None:
+                raise
+        else:
+            dados = serializar(resultado, quiz)
+            transaction.on_commit(lambda: cache.set(chave_cache, dados, TIMEOUT_CHAVE))
+            return dados, True
+
+    dados = serializar(resultado, quiz)
+    cache.set(chave_cache, dados, TIMEOUT_CHAVE)
+    return dados, False
+
+
+def _validar_tentativa(tentativa):
+    """
+    Normaliza uma tentativa do lote: (chave, quiz_id, {pergunta: resposta},
+    tempo_gasto, desafio_id, data). Levanta EnvioInvalido.
+    """
+    try:
+        chave = tentativa['chave']
+        quiz_id = int(tentativa['quiz'])
+        respostas = {}
+        for item in tentativa['respostas']:
+            pergunta_id = int(item['pergunta'])
+            if pergunta_id in respostas:
+                raise EnvioInvalido(f'Pergunta {pergunta_id} respondida duas vezes.')
+            respostas[pergunta_id] = int(item['resposta'])
+        tempo_gasto = tentativa.get('tempo_gasto')
+        tempo_gasto = max(int(tempo_gasto), 0) if tempo_gasto is not None else None
+        desafio_id = int(tentativa['desafio']) if tentativa.get('desafio') is not None else None
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise EnvioInvalido('Informe "chave", "quiz" e "respostas" [{"pergunta": id, "resposta": id}].')
+    if not isinstance(chave, str) or not CHAVE_VALIDA.match(chave):
+        raise EnvioInvalido('Chave de idempotência inválida: use de 8 a 64 letras, dígitos, "-", "_", "." ou ":".')
+
+    agora = timezone.now()
+    try:
+        data = parse_datetime(tentativa['realizado_em']) if isinstance(tentativa.get('realizado_em'), str) else None
+    except ValueError:
+        data = None
+    if data is not None and timezone.is_naive(data):
+        data = timezone.make_aware(data)
+    if data is None or not agora - MAX_ATRASO_OFFLINE <= data <= agora:
+        data = agora
+    return chave, quiz_id, respostas, tempo_gasto, desafio_id, data
+
+
+def _preencher_ids(resultados):
+    """
+    Banco sem RETURNING no INSERT em massa: busca os ids pelas chaves de idempotência
+    """
+    if all(resultado.pk is not None for resultado in resultados):
+        return
+    ids = {
+        (estudante_id, chave): pk
+        for estudante_id, chave, pk in Resultado.objects.filter(
+            estudante_id__in={resultado.estudante_id for resultado in resultados},
+            chave_idempotencia__in={resultado.chave_idempotencia for resultado in resultados},
+        ).values_list('estudante_id', 'chave_idempotencia', 'pk')
+    }
+    for resultado in resultados:
+        resultado.pk = ids[resultado.estudante_id, resultado.chave_idempotencia]
+
+
+def _mesclar_progresso(estudante, melhores, agora):
+    """
+    Upsert de ProgressoDesafio ({desafio_id: melhor pontuação do lote}): conclui
+    e mantém a maior pontuação, em um único INSERT ... ON CONFLICT
+    """
+    existentes = {
+        progresso.desafio_id: progresso
+        for progresso in ProgressoDesafio.objects.select_for_update().filter(
+            estudante=estudante, desafio_id__in=melhores
+        )
+    }
+    linhas = []
+    for desafio_id, pontuacao in melhores.items():
+        anterior = existentes.get(desafio_id)
+        linhas.append(ProgressoDesafio(
+            estudante=estudante,
+            desafio_id=desafio_id,
+            concluido=True,
+            pontuacao=max(pontuacao, anterior.pontuacao if anterior else 0),
+            data_conclusao=anterior.data_conclusao if anterior and anterior.concluido else agora,
+        ))
+    ProgressoDesafio.objects.bulk_create(
+        linhas, update_conflicts=True, unique_fields=['estudante', 'desafio'],
+        update_fields=['concluido', 'pontuacao', 'data_conclusao'],
+    )
+
+
+def _gravar_lote(estudante, novas):
+    """
+    Grava as tentativas novas [(indice, chave, quiz, dados corrigidos...)] em
+    uma transação. Retorna {indice: Resultado}.
+    """
+    with transaction.atomic():
+        resultados = Resultado.objects.bulk_create([
+            Resultado(
+                estudante=estudante, quiz_id=quiz.pk, desafio_id=desafio_id, chave_idempotencia=chave,
+                total_perguntas=quiz.total_perguntas, acertos=acertos, pontuacao_obtida=pontos,
+                tempo_gasto=tempo_gasto, data_realizacao=data, concluido=True,
+            )
+            for _, chave, quiz, acertos, pontos, _, tempo_gasto, desafio_id, data in novas
+        ])
+        _preencher_ids(resultados)
+
+        escolhas = []
+        for resultado, (_, _, _, _, _, escolhas_tentativa, _, _, _) in zip(resultados, novas):
+            for escolha in escolhas_tentativa:
+                escolha.resultado = resultado
+            escolhas.extend(escolhas_tentativa)
+        RespostaResultado.objects.bulk_create(escolhas)
+
+        melhores = {}
+        for resultado in resultados:
+            if resultado.desafio_id is not None:
+                melhores[resultado.desafio_id] = max(melhores.get(resultado.desafio_id, 0), resultado.pontuacao_obtida)
+        if melhores:
+            _mesclar_progresso(estudante, melhores, timezone.now())
+
+        total = sum(resultado.pontuacao_obtida for resultado in resultados)
+        if total:
+            # Pontos líquidos do lote em um único lançamento e um único UPDATE da Pontuacao
+            registrar_pontos(estudante, total, f'sincronizacao:{resultados[0].pk}-{resultados[-1].pk}')
+        else:
+            # bulk_create não dispara post_save: o dashboard precisa ver os resultados novos
+            transaction.on_commit(lambda: incrementar_versao_estudante(estudante.pk))
+    return {novas[posicao][0]: resultado for posicao, resultado in enumerate(resultados)}
+
+
+def _processar_lote(estudante, tentativas):
+    itens = [None] * len(tentativas)
+    validas = {}  # indice -> tentativa normalizada
+    for indice, tentativa in enumerate(tentativas):
+        try:
+            validas[indice] = _validar_tentativa(tentativa)
+        except EnvioInvalido as erro:
+            chave = tentativa.get('chave') if isinstance(tentativa, dict) else None
+            itens[indice] = {'chave': chave if isinstance(chave, str) else None, 'status': 'invalido', 'erro': str(erro)}
+
+    chaves = {normalizada[0] for normalizada in validas.values()}
+    gravados = {
+        resultado.chave_idempotencia: resultado
+        for resultado in Resultado.objects.filter(estudante=estudante, chave_idempotencia__in=chaves)
+    }
+    quizzes = Quiz.objects.in_bulk(
+        {normalizada[1] for normalizada in validas.values()} | {resultado.quiz_id for resultado in gravados.values()}
+    )
+    desafios = dict(Desafio.objects.filter(
+        pk__in={normalizada[4] for normalizada in validas.values() if normalizada[4] is not None}, ativo=True
+    ).values_list('pk', 'quiz_id'))
+    alternativas = _alternativas({
+        resposta_id for normalizada in validas.values() if normalizada[0] not in gravados
+        for resposta_id in normalizada[2].values()
+    })
+
+    # (estudante, quiz, data_realizacao) é único: horários já gravados também contam
+    # (clientes offline costumam mandar a hora com precisão de segundos)
+    datas = [normalizada[5] for normalizada in validas.values()]
+    horarios = set(Resultado.objects.filter(
+        estudante=estudante,
+        quiz_id__in={normalizada[1] for normalizada in validas.values()},
+        data_realizacao__range=(min(datas), max(datas) + timedelta(microseconds=len(datas))),
+    ).values_list('quiz_id', 'data_realizacao')) if datas else set()
+
+    novas, vistas = [], {}
+    for indice, (chave, quiz_id, respostas, tempo_gasto, desafio_id, data) in validas.items():
+        if chave in gravados or chave in vistas:
+            original_quiz = gravados[chave].quiz_id if chave in gravados else vistas[chave]
+            if original_quiz != quiz_id:
+                itens[indice] = {'chave': chave, 'status': 'invalido', 'erro': f'A chave {chave} já foi usada em outro quiz.'}
+            else:
+                itens[indice] = {'chave': chave, 'status': 'repetido'}
+            continue
+        quiz = quizzes.get(quiz_id)
+        try:
+            if quiz is None or not quiz.ativo:
+                raise EnvioInvalido(f'Quiz {quiz_id} inexistente ou inativo.')
+            if desafio_id is not None and desafios.get(desafio_id) != quiz_id:
+                raise EnvioInvalido(f'O desafio {desafio_id} não é deste quiz.')
+            acertos, pontos, escolhas = _corrigir(alternativas, quiz_id, respostas)
+        except EnvioInvalido as erro:
+            itens[indice] = {'chave': chave, 'status': 'invalido', 'erro': str(erro)}
+            continue
+        vistas[chave] = quiz_id
+        # Tentativas do mesmo quiz no mesmo instante: desloca em microssegundos
+        while (quiz_id, data) in horarios:
+            data += timedelta(microseconds=1)
+        horarios.add((quiz_id, data))
+        novas.append((indice, chave, quiz, acertos, pontos, escolhas, tempo_gasto, desafio_id, data))
+
+    criados = _gravar_lote(estudante, novas) if novas else {}
+    por_chave = {**gravados, **{resultado.chave_idempotencia: resultado for resultado in criados.values()}}
+    for indice, resultado in criados.items():
+        itens[indice] = {
+            'chave': resultado.chave_idempotencia, 'status': 'criado',
+            'resultado': serializar(resultado, quizzes[resultado.quiz_id]),
+        }
+    for item in itens:
+        if item['status'] == 'repetido':
+            resultado = por_chave[item['chave']]
+            item['resultado'] = serializar(resultado, quizzes[resultado.quiz_id])
+    return itens
+
+
+def sincronizar(estudante, tentativas):
+    """
+    Registra um lote de tentativas feitas offline. Cada tentativa é
+    {"chave", "quiz", "respostas", "tempo_gasto"?, "desafio"?, "realizado_em"?}.
+    Retorna, na ordem do lote, {"chave", "status": "criado" | "repetido" |
+    "invalido", "resultado" ou "erro"}; tentativas já sincronizadas não são
+    gravadas de novo.
+    """
+    if len(tentativas) > MAX_TENTATIVAS_LOTE:
+        raise EnvioInvalido(f'No máximo {MAX_TENTATIVAS_LOTE} tentativas por lote.')
+    try:
+        itens = _processar_lote(estudante, tentativas)
+    except IntegrityError:
+        # Só a restrição da chave indica o mesmo lote gravado em paralelo (agora tudo
+        # é repetido); qualquer outro conflito não se resolve repetindo
+        chaves = [tentativa.get('chave') for tentativa in tentativas if isinstance(tentativa, dict)]
+        if not Resultado.objects.filter(
+            estudante=estudante, chave_idempotencia__in=[chave for chave in chaves if isinstance(chave, str)]
+        ).exists():
+            raise
+        itens = _processar_lote(estudante, tentativas)
+
+    chaves = {
+        _chave_cache(estudante.pk, item['chave']): item['resultado']
+        for item in itens if item['status'] != 'invalido'
+    }
+    if chaves:
+        transaction.on_commit(lambda: cache.set_many(chaves, TIMEOUT_CHAVE))
+    return itens
+
+
+def gravar_sessao(quiz, chave, data_realizacao, participacoes):
+    """
+    Grava o fim de uma sessão ao vivo: participacoes é [(estudante_id,
+    {pergunta_id: resposta_id}, tempo_gasto)]. As respostas são corrigidas de
+    novo contra o banco com uma query; Resultado e RespostaResultado entram em
+    massa e os pontos em um lançamento por estudante (registrar_pontos_em_massa),
+    tudo em uma transação. A chave da sessão torna a gravação idempotente.
+    Retorna {estudante_id: Resultado}.
+    """
+    participacoes = [participacao for participacao in participacoes if participacao[1]]
+    alternativas = _alternativas(
+        {resposta_id for _, respostas, _ in participacoes for resposta_id in respostas.values()},
+        pergunta__quiz=quiz,
+    )
+    with transaction.atomic():
+        gravados = set(Resultado.objects.filter(
+            chave_idempotencia=chave, estudante_id__in=[participacao[0] for participacao in participacoes]
+        ).values_list('estudante_id', flat=True))
+        novos, escolhas_por_estudante = [], {}
+        for estudante_id, respostas, tempo_gasto in participacoes:
+            # Alternativa removida durante a sessão: a resposta é descartada
+            validas = {
+                pergunta_id: resposta_id for pergunta_id, resposta_id in respostas.items()
+                if alternativas.get(resposta_id, (None, None))[:2] == (pergunta_id, quiz.pk)
+            }
+            if estudante_id in gravados or not validas:
+                continue
+            acertos, pontos, escolhas_por_estudante[estudante_id] = _corrigir(alternativas, quiz.pk, validas)
+            novos.append(Resultado(
+                estudante_id=estudante_id, quiz_id=quiz.pk, chave_idempotencia=chave,
+                total_perguntas=quiz.total_perguntas, acertos=acertos, pontuacao_obtida=pontos,
+                tempo_gasto=tempo_gasto, data_realizacao=data_realizacao, concluido=True,
+            ))
+        if not novos:
+            return {}
+        resultados = Resultado.objects.bulk_create(novos)
+        _preencher_ids(resultados)
+
+        escolhas = []
+        for resultado in resultados:
+            for escolha in escolhas_por_estudante[resultado.estudante_id]:
+                escolha.resultado = resultado
+                escolhas.append(escolha)
+        RespostaResultado.objects.bulk_create(escolhas)
+
+        registrar_pontos_em_massa(
+            {resultado.estudante_id: resultado.pontuacao_obtida for resultado in resultados}, f'ao-vivo:{chave}'
+        )
+        # bulk_create não dispara post_save (estudantes sem pontos também têm resultado novo)
+        transaction.on_commit(lambda: [incrementar_versao_estudante(resultado.estudante_id) for resultado in resultados])
+    return {resultado.estudante_id: resultado for resultado in resultados}
@@ -0,0 +1,166 @@
+"""
+Roteamento de leituras para réplicas (settings.DATABASE_REPLICAS).
+
+Por padrão tudo vai para o banco principal. Só as views marcadas com
+@ler_da_replica (ranking, estatísticas, exportações) leem modelos do app
+game em uma réplica, e mesmo nelas o principal é usado quando:
+
+- a requisição já escreveu algo (leituras seguintes precisam ver a escrita);
+- o navegador tem o cookie de fixação, gravado pelo ReplicaMiddleware depois
+  de qualquer escrita e válido por REPLICA_ATRASO_MAXIMO segundos, para que o
+  estudante leia os próprios dados logo após salvá-los.
+
+Sessões e autenticação nunca são lidas da réplica.
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from .middleware import MiddlewareHibrido
+
+COOKIE_PRIMARIO = 'logicash_primario'
+ATRASO_MAXIMO_PADRAO = 5
+
+# Apps cujos modelos podem ser lidos de uma réplica
+APPS_REPLICADOS = {'game'}
+
+
+class EstadoRoteamento:
+    """
+    Estado da requisição atual, compartilhado (mutável) entre middleware, views e router
+    """
+
+    def __init__(self, fixado=False):
+        self.replica = False
+        self.fixado = fixado
+        self.escreveu = False
+
+
+_estado = ContextVar('logicash_roteamento', default=None)
+
+
+def replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+def atraso_maximo():
+    return getattr(settings, 'REPLICA_ATRASO_MAXIMO', ATRASO_MAXIMO_PADRAO)
+
+
+def banco_de_leitura():
+    """
+    Alias do banco que a requisição atual deve usar para leituras de relatório
+    """
+    estado = _estado.get()
+    disponiveis = replicas()
+    if estado is None or not estado.replica or estado.fixado or estado.escreveu or not disponiveis:
+        return DEFAULT_DB_ALIAS
+    return random.choice(disponiveis)
+
+
+@contextmanager
+def estado_requisicao(fixado=False):
+    """
+    Abre o estado de roteamento de uma requisição (ou comando)
+    """
+    estado = EstadoRoteamento(fixado)
+    token = _estado.set(estado)
+    try:
+        yield estado
+    finally:
+        _estado.reset(token)
+
+
+@contextmanager
+def leitura_replica():
+    """
+    Permite leituras em réplica dentro do bloco
+    """
+    estado = _estado.get()
+    if estado is None:
+        with estado_requisicao() as estado:
+            estado.replica = True
+            yield estado
+        return
+    anterior, estado.replica = estado.replica, True
+    try:
+        yield estado
+    finally:
+        estado.replica = anterior
+
+
+def ler_da_replica(view):
+    """
+    Decorator para views somente leitura que toleram o atraso da réplica
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def _view_async(request, *args, **kwargs):
+            with leitura_replica():
+                return await view(request, *args, **kwargs)
+        return _view_async
+
+    @wraps(view)
+    def _view(request, *args, **kwargs):
+        with leitura_replica():
+            return view(request, *args, **kwargs)
+    return _view
+
+
+class ReplicaRouter:
+    """
+    Router de banco: escritas no principal, leituras de relatório nas réplicas
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in APPS_REPLICADOS:
+            return DEFAULT_DB_ALIAS
+        return banco_de_leitura()
+
+    def db_for_write(self, model, **hints):
+        estado = _estado.get()
+        # Gravações de sessão acontecem em quase toda requisição e não afetam o que o estudante lê
+        if estado is not None and model._meta.app_label != 'sessions':
+            estado.escreveu = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bancos = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in bancos and obj2._state.db in bancos:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Réplicas recebem o esquema por replicação, nunca por migrate
+        if db in replicas():
+            return False
+        return None
+
+
+class ReplicaMiddleware(MiddlewareHibrido):
+    """
+    Abre o estado de roteamento por requisição e fixa o navegador no banco
+    principal por alguns segundos depois de uma escrita
+    """
+
+    def responder(self, request):
+        with estado_requisicao(fixado=COOKIE_PRIMARIO in request.COOKIES) as estado:
+            response = self.get_response(request)
+        return self._fixar(request, response, estado)
+
+    async def aresponder(self, request):
+        # O estado é mutável: o router, nas threads do ORM, marca a escrita no mesmo objeto
+        with estado_requisicao(fixado=COOKIE_PRIMARIO in request.COOKIES) as estado:
+            response = await self.get_response(request)
+        return self._fixar(request, response, estado)
+
+    def _fixar(self, request, response, estado):
+        if replicas() and (estado.escreveu or request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE')):
+            response.set_cookie(COOKIE_PRIMARIO, '1', max_age=atraso_maximo(), httponly=True, samesite='Lax')
+        return response
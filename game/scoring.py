@@ -0,0 +1,145 @@
+"""
+Livro-razão de pontos e atualização atômica da Pontuacao.
+
+Todo ganho (ou perda) de pontos é um EventoPontuacao, gravado na mesma
+transação de um UPDATE com F(): o total e o nível são calculados pelo banco a
+partir do valor atual da linha, então conclusões simultâneas do mesmo
+estudante não perdem pontos.
+
+A reconciliação periódica (comando compactar_pontuacoes) confere os totais
+contra a soma do livro-razão com um único UPDATE e, opcionalmente, agrupa os
+lançamentos antigos em um lançamento por estudante, mantendo a soma.
+"""
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .levels import expressao_nivel
+from .models import EventoPontuacao, Pontuacao
+from .versioning import incrementar_versao_estudante, incrementar_versao_global
+
+ORIGEM_COMPACTACAO = 'compactacao'
+
+
+def _invalidar(estudante_id):
+    incrementar_versao_estudante(estudante_id)
+    incrementar_versao_global('ranking')
+
+
+def _somar(estudante_id, delta):
+    return _somar_varios([estudante_id], delta)
+
+
+def _somar_varios(estudantes_ids, delta):
+    novo_total = F('pontos_totais') + delta
+    return Pontuacao.objects.filter(estudante_id__in=estudantes_ids).update(
+        pontos_totais=novo_total,
+        nivel_atual=expressao_nivel(novo_total),
+        data_atualizacao=timezone.now(),
+    )
+
+
+def registrar_pontos(estudante, delta, origem):
+    """
+    Lança `delta` pontos para o estudante e atualiza a Pontuacao no próprio banco.
+    Retorna o EventoPontuacao criado.
+    """
+    estudante_id = getattr(estudante, 'pk', estudante)
+    with transaction.atomic():
+        evento = EventoPontuacao.objects.create(estudante_id=estudante_id, origem=origem, delta=delta)
+        if not _somar(estudante_id, delta):
+            Pontuacao.objects.get_or_create(estudante_id=estudante_id)
+            _somar(estudante_id, delta)
+        # O UPDATE não dispara post_save: invalida os caches só depois do commit
+        transaction.on_commit(lambda: _invalidar(estudante_id))
+    return evento
+
+
+def registrar_pontos_em_massa(deltas, origem):
+    """
+    Lança os pontos de vários estudantes de uma vez ({estudante_id: delta}, ex.:
+    o fim de uma sessão ao vivo): um INSERT em massa no livro-razão e um UPDATE
+    por valor distinto de delta. Retorna o número de lançamentos.
+    """
+    deltas = {estudante_id: delta for estudante_id, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+    with transaction.atomic():
+        EventoPontuacao.objects.bulk_create(
+            EventoPontuacao(estudante_id=estudante_id, origem=origem, delta=delta)
+            for estudante_id, delta in deltas.items()
+        )
+        existentes = set(Pontuacao.objects.filter(estudante_id__in=deltas).values_list('estudante_id', flat=True))
+        Pontuacao.objects.bulk_create(
+            [Pontuacao(estudante_id=estudante_id) for estudante_id in deltas if estudante_id not in existentes],
+            ignore_conflicts=True,
+        )
+        por_delta = {}
+        for estudante_id, delta in deltas.items():
+            por_delta.setdefault(delta, []).append(estudante_id)
+        for delta, estudantes_ids in por_delta.items():
+            _somar_varios(estudantes_ids, delta)
+
+        def invalidar():
+            for estudante_id in deltas:
+                incrementar_versao_estudante(estudante_id)
+            incrementar_versao_global('ranking')
+        transaction.on_commit(invalidar)
+    return len(deltas)
+
+
+def _soma_eventos():
+    soma = EventoPontuacao.objects.filter(estudante_id=OuterRef('estudante_id')).values('estudante_id').annotate(
+        total=Sum('delta')
+    ).values('total')
+    return Coalesce(Subquery(soma), 0)
+
+
+def reconciliar(corrigir=True):
+    """
+    Compara pontos_totais com a soma do livro-razão de cada estudante.
+    Com corrigir=True, ajusta as divergências (e o nível) em um único UPDATE.
+    Retorna [(estudante_id, pontos_totais, soma_eventos)] das divergências.
+    """
+    with transaction.atomic():
+        divergentes = Pontuacao.objects.annotate(soma_eventos=_soma_eventos()).exclude(
+            pontos_totais=F('soma_eventos')
+        )
+        divergencias = list(divergentes.values_list('estudante_id', 'pontos_totais', 'soma_eventos'))
+        if corrigir and divergencias:
+            Pontuacao.objects.filter(estudante_id__in=[linha[0] for linha in divergencias]).update(
+                pontos_totais=_soma_eventos(),
+                nivel_atual=expressao_nivel(_soma_eventos()),
+                data_atualizacao=timezone.now(),
+            )
+            transaction.on_commit(lambda: [_invalidar(linha[0]) for linha in divergencias])
+    return divergencias
+
+
+def compactar(antes):
+    """
+    Substitui os lançamentos anteriores a `antes` por um lançamento por
+    estudante com a mesma soma. Retorna (lançamentos removidos, criados).
+    """
+    with transaction.atomic():
+        # PostgreSQL não aceita FOR UPDATE com GROUP BY: trava as linhas só pela
+        # pk e agrega sem trava. Lançamentos novos recebem pk maior que a última
+        # travada, então o limite deixa a soma e o delete no mesmo conjunto.
+        travados = list(
+            EventoPontuacao.objects.select_for_update().filter(data__lt=antes).order_by('pk').values_list('pk', flat=True)
+        )
+        if not travados:
+            return 0, 0
+        antigos = EventoPontuacao.objects.filter(data__lt=antes, pk__lte=travados[-1])
+        somas = list(antigos.values('estudante_id').annotate(total=Sum('delta')).order_by().values_list(
+            'estudante_id', 'total'
+        ))
+        removidos, _ = antigos.delete()
+        criados = EventoPontuacao.objects.bulk_create(
+            EventoPontuacao(estudante_id=estudante_id, origem=ORIGEM_COMPACTACAO, delta=total, data=antes)
+            for estudante_id, total in somas
+            if total
+        )
+    return removidos, len(criados)
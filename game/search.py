@@ -0,0 +1,261 @@
+"""
+Busca textual em quizzes, perguntas e módulos.
+
+O índice fica na tabela game_busca: uma tabela virtual FTS5 no SQLite
+(tokenizador unicode61 sem acentos) ou uma tabela com coluna tsvector e índice
+GIN no PostgreSQL (ver migração 0008). Cada objeto é uma linha identificada por
+`chave` (id do objeto * 4 + código do tipo), então atualizar um objeto é
+apagar/inserir pela chave primária, sem varrer o índice.
+
+Os sinais de game/signals.py mantêm o índice atualizado a cada save/delete; o
+comando reindexar_busca reconstrói tudo (ex.: após update() em massa).
+Em outros bancos a busca recai em filtros icontains.
+"""
+
+import re
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils.html import escape
+
+from .models import Modulo, Pergunta, Quiz
+
+TIPOS = {'quiz': 1, 'pergunta': 2, 'modulo': 3}
+_TIPOS_POR_CODIGO = {codigo: tipo for tipo, codigo in TIPOS.items()}
+LIMITE_PADRAO = 20
+MAX_TERMOS = 8
+TAMANHO_TRECHO = 16  # palavras no trecho destacado
+
+# Delimitadores do destaque: trocados por <mark> depois de escapar o HTML do trecho
+_INICIO, _FIM = '\x02', '\x03'
+
+
+def chave(tipo, objeto_id):
+    return objeto_id * 4 + TIPOS[tipo]
+
+
+def documento(instancia):
+    """
+    (tipo, id, título, corpo, tema) indexados para uma instância
+    """
+    if isinstance(instancia, Quiz):
+        return 'quiz', instancia.pk, instancia.titulo, instancia.descricao, instancia.tema
+    if isinstance(instancia, Pergunta):
+        return 'pergunta', instancia.pk, '', instancia.texto, ''
+    if isinstance(instancia, Modulo):
+        return 'modulo', instancia.pk, instancia.nome, instancia.descricao, ''
+    raise TypeError(f'{type(instancia).__name__} não é indexado na busca')
+
+
+def termos(texto):
+    """
+    Palavras da consulta (sem operadores: a entrada do usuário nunca vira sintaxe)
+    """
+    return re.findall(r'\w+', (texto or '').lower())[:MAX_TERMOS]
+
+
+class _SQLite:
+    def salvar(self, cursor, documentos):
+        cursor.executemany('DELETE FROM game_busca WHERE rowid = %s', [(chave(d[0], d[1]),) for d in documentos])
+        cursor.executemany(
+            'INSERT INTO game_busca (rowid, tipo, objeto_id, titulo, corpo, tema) VALUES (%s, %s, %s, %s, %s, %s)',
+            [(chave(d[0], d[1]), *d) for d in documentos]
+        )
+
+    def remover(self, cursor, chaves):
+        cursor.executemany('DELETE FROM game_busca WHERE rowid = %s', [(valor,) for valor in chaves])
+
+    def limpar(self, cursor):
+        cursor.execute('DELETE FROM game_busca')
+
+    def buscar(self, cursor, palavras, tipos, limite):
+        # Cada palavra como prefixo entre aspas: "juro"* "compost"*
+        consulta = ' '.join(f'"{palavra}"*' for palavra in palavras)
+        filtro = ''
+        parametros = [_INICIO, _FIM, TAMANHO_TRECHO, consulta]
+        if tipos:
+            filtro = f' AND rowid %% 4 IN ({", ".join(["%s"] * len(tipos))})'
+            parametros += [TIPOS[tipo] for tipo in tipos]
+        cursor.execute(
+            # Pesos do bm25 por coluna: título 10, corpo 1, tema 5
+            'SELECT rowid, titulo, snippet(game_busca, -1, %s, %s, \'…\', %s), bm25(game_busca, 0, 0, 10.0, 1.0, 5.0) '
+            f'FROM game_busca WHERE game_busca MATCH %s{filtro} ORDER BY 4 LIMIT %s',
+            parametros + [limite]
+        )
+        # bm25 é menor para os melhores resultados: inverte para "maior é melhor"
+        return [(linha[0], linha[1], linha[2], -linha[3]) for linha in cursor.fetchall()]
+
+
+class _PostgreSQL:
+    def salvar(self, cursor, documentos):
+        cursor.executemany(
+            'INSERT INTO game_busca (chave, tipo, objeto_id, titulo, corpo, tema) VALUES (%s, %s, %s, %s, %s, %s) '
+            'ON CONFLICT (chave) DO UPDATE SET titulo = EXCLUDED.titulo, corpo = EXCLUDED.corpo, tema = EXCLUDED.tema',
+            [(chave(d[0], d[1]), *d) for d in documentos]
+        )
+
+    def remover(self, cursor, chaves):
+        cursor.execute('DELETE FROM game_busca WHERE chave = ANY(%s)', [list(chaves)])
+
+    def limpar(self, cursor):
+        cursor.execute('TRUNCATE game_busca')
+
+    def buscar(self, cursor, palavras, tipos, limite):
+        consulta = ' & '.join(f'{palavra}:*' for palavra in palavras)
+        filtro = ''
+        parametros = [consulta]
+        if tipos:
+            filtro = ' AND chave %% 4 = ANY(%s)'
+            parametros.append([TIPOS[tipo] for tipo in tipos])
+        cursor.execute(
+            'SELECT chave, titulo, ts_headline(\'portuguese\', coalesce(nullif(corpo, \'\'), titulo), q, %s), '
+            'ts_rank(documento, q) FROM game_busca, to_tsquery(\'portuguese\', %s) q '
+            f'WHERE documento @@ q{filtro} ORDER BY 4 DESC LIMIT %s',
+            [f'StartSel={_INICIO}, StopSel={_FIM}, MaxWords={TAMANHO_TRECHO}, MinWords=5', *parametros, limite]
+        )
+        return cursor.fetchall()
+
+
+_BACKENDS = {'sqlite': _SQLite(), 'postgresql': _PostgreSQL()}
+
+
+def backend():
+    """
+    Implementação do índice para o banco em uso, ou None (busca por icontains)
+    """
+    return _BACKENDS.get(connection.vendor)
+
+
+def indexar(*instancias):
+    """
+    Insere ou atualiza as instâncias no índice
+    """
+    indice = backend()
+    if indice is None or not instancias:
+        return
+    with connection.cursor() as cursor:
+        indice.salvar(cursor, [documento(instancia) for instancia in instancias])
+
+
+def remover(*instancias):
+    indice = backend()
+    if indice is None or not instancias:
+        return
+    with connection.cursor() as cursor:
+        indice.remover(cursor, [chave(*documento(instancia)[:2]) for instancia in instancias])
+
+
+def reconstruir(tamanho_lote=1000):
+    """
+    Reconstrói o índice inteiro. Retorna quantos documentos foram indexados.
+    """
+    indice = backend()
+    if indice is None:
+        return 0
+    total = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        indice.limpar(cursor)
+        for modelo in (Quiz, Pergunta, Modulo):
+            lote = []
+            for instancia in modelo.objects.order_by('pk').iterator(chunk_size=tamanho_lote):
+                lote.append(documento(instancia))
+                if len(lote) >= tamanho_lote:
+                    indice.salvar(cursor, lote)
+                    total += len(lote)
+                    lote = []
+            indice.salvar(cursor, lote)
+            total += len(lote)
+    return total
+
+
+def _trecho_html(trecho):
+    return escape(trecho).replace(_INICIO, '<mark>').replace(_FIM, '</mark>')
+
+
+def _buscar_sem_indice(palavras, tipos, limite):
+    # Bancos sem FTS: filtros icontains (varredura), sem relevância
+    linhas = []
+    filtros = {
+        'quiz': (Quiz, ('titulo', 'descricao', 'tema'), 'titulo', 'descricao'),
+        'pergunta': (Pergunta, ('texto',), None, 'texto'),
+        'modulo': (Modulo, ('nome', 'descricao'), 'nome', 'descricao'),
+    }
+    for tipo, (modelo, campos, campo_titulo, campo_corpo) in filtros.items():
+        if tipos and tipo not in tipos:
+            continue
+        consulta = Q()
+        for palavra in palavras:
+            consulta &= Q(*(Q(**{f'{campo}__icontains': palavra}) for campo in campos), _connector=Q.OR)
+        for instancia in modelo.objects.filter(consulta)[:limite]:
+            corpo = getattr(instancia, campo_corpo)
+            linhas.append((
+                chave(tipo, instancia.pk),
+                getattr(instancia, campo_titulo) if campo_titulo else '',
+                ' '.join(corpo.split()[:TAMANHO_TRECHO]),
+                0.0,
+            ))
+    return linhas[:limite]
+
+
+def buscar_linhas(texto, tipos=None, limite=LIMITE_PADRAO):
+    """
+    Linhas (chave, título, trecho, relevância) do índice, das mais relevantes para as menos
+    """
+    palavras = termos(texto)
+    if not palavras:
+        return []
+    indice = backend()
+    if indice is None:
+        return _buscar_sem_indice(palavras, tipos, limite)
+    with connection.cursor() as cursor:
+        return indice.buscar(cursor, palavras, tipos, limite)
+
+
+def ids_encontrados(tipo, texto, limite=500):
+    """
+    Ids de um tipo que casam com o texto, em ordem de relevância (usado no admin)
+    """
+    return [linha[0] // 4 for linha in buscar_linhas(texto, [tipo], limite)]
+
+
+def buscar(texto, tipos=None, limite=LIMITE_PADRAO):
+    """
+    Resultados para estudantes: apenas conteúdo ativo, com trecho destacado em HTML seguro.
+    Cada resultado: tipo, id, titulo, trecho, relevancia e, para perguntas, quiz_id.
+    """
+    # Busca mais linhas que o limite para compensar conteúdo inativo filtrado abaixo
+    linhas = buscar_linhas(texto, tipos, limite * 2)
+    por_tipo = {}
+    for linha in linhas:
+        por_tipo.setdefault(_TIPOS_POR_CODIGO[linha[0] % 4], []).append(linha[0] // 4)
+
+    ativos = {}
+    if 'quiz' in por_tipo:
+        for pk in Quiz.objects.filter(pk__in=por_tipo['quiz'], ativo=True).values_list('pk', flat=True):
+            ativos['quiz', pk] = {}
+    if 'modulo' in por_tipo:
+        for pk, slug in Modulo.objects.filter(pk__in=por_tipo['modulo'], ativo=True).values_list('pk', 'slug'):
+            ativos['modulo', pk] = {'slug': slug}
+    if 'pergunta' in por_tipo:
+        for pk, quiz_id, quiz_titulo in Pergunta.objects.filter(
+            pk__in=por_tipo['pergunta'], quiz__ativo=True
+        ).values_list('pk', 'quiz_id', 'quiz__titulo'):
+            ativos['pergunta', pk] = {'quiz_id': quiz_id, 'titulo': quiz_titulo}
+
+    resultados = []
+    for valor, titulo, trecho, relevancia in linhas:
+        tipo, objeto_id = _TIPOS_POR_CODIGO[valor % 4], valor // 4
+        extra = ativos.get((tipo, objeto_id))
+        if extra is None:
+            continue
+        resultados.append({
+            'tipo': tipo,
+            'id': objeto_id,
+            'titulo': titulo,
+            'trecho': _trecho_html(trecho),
+            'relevancia': relevancia,
+            **extra,
+        })
+        if len(resultados) >= limite:
+            break
+    return resultados
@@ -0,0 +1,151 @@
+"""
+Servidor de produção: gunicorn com vários workers, embutido no comando `servir`.
+
+- preload: a aplicação (e o aquecimento de game/warmup.py) é carregada uma vez
+  no master, antes do fork; os workers nascem com imports, templates e caches
+  prontos e compartilham essas páginas de memória (copy-on-write).
+- reciclagem: cada worker é substituído depois de SERVIDOR_MAX_REQUISICOES
+  requisições (com variação aleatória de até 10%, para não reciclarem todos
+  juntos), o que limita o efeito de vazamentos lentos.
+- desligamento gracioso: no SIGTERM o master para de aceitar conexões e cada
+  worker termina as requisições em andamento em até SERVIDOR_TIMEOUT_GRACIOSO
+  segundos, fechando as conexões com o banco ao sair.
+- modo ASGI (--asgi): workers do uvicorn rodando logicash.asgi, para as views
+  assíncronas e os WebSockets do quiz ao vivo (game/live.py; o uvicorn precisa
+  do extra [standard] para WebSocket). As salas ao vivo vivem na memória de um
+  worker: sem afinidade por código no balanceador (AO_VIVO_AFINIDADE) o modo
+  ASGI usa um worker só, e os workers ASGI não são reciclados (a reciclagem
+  derrubaria as salas abertas). No desligamento, o lifespan do ASGI encerra e
+  grava as salas abertas antes de o worker sair.
+
+gunicorn (e uvicorn, no modo ASGI) são dependências opcionais de produção.
+"""
+
+import os
+
+from django.conf import settings
+from django.db import connections
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # gunicorn é opcional: sem ele o comando servir não está disponível
+    BaseApplication = None
+
+WORKER_ASGI = 'uvicorn.workers.UvicornWorker'
+VARIACAO_RECICLAGEM = 0.1
+
+
+def disponivel(asgi=False):
+    """
+    Mensagem de erro se faltar alguma dependência, ou None
+    """
+    if BaseApplication is None:
+        return 'gunicorn não está instalado (pip install gunicorn).'
+    if asgi:
+        try:
+            import uvicorn.workers  # noqa: F401
+        except ImportError:
+            return 'uvicorn não está instalado (pip install "uvicorn[standard]").'
+    return None
+
+
+def _ao_iniciar_worker(servidor, worker):
+    # O master pode ter aberto conexões no preload; um socket herdado no fork
+    # seria compartilhado entre processos
+    connections.close_all()
+
+
+def _ao_sair_worker(servidor, worker):
+    connections.close_all()
+
+
+def erro_workers_asgi(workers):
+    """
+    Mensagem de erro se o modo ASGI tiver mais de um worker sem afinidade por sala, ou None
+    """
+    if workers > 1 and not settings.AO_VIVO_AFINIDADE:
+        return (
+            f'{workers} workers ASGI sem afinidade: estudantes cairiam em workers sem a sala ao vivo. '
+            'Use --workers 1 ou configure o balanceador para fixar /ws/ao-vivo/<codigo>/ em um '
+            'worker e defina LOGICASH_AO_VIVO_AFINIDADE=1.'
+        )
+    return None
+
+
+def erro_configuracao_insegura():
+    """
+    Mensagem de erro se DEBUG estiver ligado ou a SECRET_KEY for a de desenvolvimento, ou None
+    """
+    problemas = []
+    if settings.DEBUG:
+        problemas.append('DEBUG está ligado (defina LOGICASH_DEBUG=0)')
+    if settings.SECRET_KEY.startswith('django-insecure-'):
+        problemas.append('a SECRET_KEY é a de desenvolvimento (defina LOGICASH_SECRET_KEY)')
+    if problemas:
+        return 'Configuração insegura para produção: ' + '; '.join(problemas) + '.'
+    return None
+
+
+def conn_max_age(conexoes):
+    """
+    CONN_MAX_AGE para workers * threads conexões por banco: a mesma regra de
+    logicash/settings.py, aplicada aos valores efetivos do comando servir
+    """
+    return settings.DB_CONN_MAX_AGE if conexoes <= settings.DB_MAX_CONEXOES else 0
+
+
+def configuracao(bind, workers=None, threads=None, max_requisicoes=None, timeout_gracioso=None, asgi=False):
+    """
+    Configuração do gunicorn a partir dos settings SERVIDOR_* (argumentos têm prioridade)
+    """
+    max_requisicoes = settings.SERVIDOR_MAX_REQUISICOES if max_requisicoes is None else max_requisicoes
+    timeout_gracioso = settings.SERVIDOR_TIMEOUT_GRACIOSO if timeout_gracioso is None else timeout_gracioso
+    opcoes = {
+        'bind': bind,
+        'workers': workers or settings.SERVIDOR_WORKERS,
+        'threads': threads or settings.SERVIDOR_THREADS,
+        'preload_app': True,
+        'max_requests': max_requisicoes,
+        'max_requests_jitter': int(max_requisicoes * VARIACAO_RECICLAGEM),
+        'graceful_timeout': timeout_gracioso,
+        'timeout': max(timeout_gracioso, 30),
+        'post_fork': _ao_iniciar_worker,
+        'worker_exit': _ao_sair_worker,
+        'accesslog': '-',
+        'errorlog': '-',
+    }
+    if asgi:
+        opcoes['worker_class'] = WORKER_ASGI
+        opcoes['threads'] = 1  # o uvicorn usa um loop de eventos por worker
+        if not workers and not settings.AO_VIVO_AFINIDADE:
+            opcoes['workers'] = 1  # salas ao vivo em memória: um worker, salvo afinidade
+        # Reciclar o worker derrubaria as salas ao vivo abertas nele
+        opcoes['max_requests'] = opcoes['max_requests_jitter'] = 0
+    return opcoes
+
+
+if BaseApplication is not None:
+    class Servidor(BaseApplication):
+        """
+        Aplicação gunicorn que carrega logicash.wsgi (ou logicash.asgi) no master
+        """
+
+        def __init__(self, opcoes, asgi=False):
+            self.opcoes = opcoes
+            self.asgi = asgi
+            super().__init__()
+
+        def load_config(self):
+            for chave, valor in self.opcoes.items():
+                self.cfg.set(chave, valor)
+
+        def load(self):
+            # O aquecimento roda ao importar o módulo da aplicação (LOGICASH_AQUECER=1)
+            os.environ.setdefault('LOGICASH_AQUECER', '1')
+            if self.asgi:
+                from logicash.asgi import application
+            else:
+                from logicash.wsgi import application
+            return application
+else:
+    Servidor = None
@@ -0,0 +1,132 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from .models import (
+    Estudante, Resultado, EstudanteConquista, Pontuacao, Conquista, Quiz, Modulo, Desafio, ProgressoDesafio,
+    Pergunta, Resposta, EtapaDilema, EscolhaDilema, NivelPontuacao,
+)
+from . import counters, querylog, search
+from .versioning import incrementar_versao_estudante, incrementar_versao_global
+
+
+# As versões só sobem depois do commit: antes disso, um leitor concorrente ainda
+# vê as linhas antigas e guardaria o fragmento ou o ETag delas sob a versão nova
+def _versao_estudante(estudante_id):
+    transaction.on_commit(lambda: incrementar_versao_estudante(estudante_id))
+
+
+def _versao_global(nome):
+    transaction.on_commit(lambda: incrementar_versao_global(nome))
+
+
+@receiver([post_save, post_delete], sender=Resultado)
+@receiver([post_save, post_delete], sender=EstudanteConquista)
+@receiver([post_save, post_delete], sender=Pontuacao)
+@receiver([post_save, post_delete], sender=ProgressoDesafio)
+def invalidar_dashboard_estudante(sender, instance, **kwargs):
+    """
+    Sobe a versão do estudante quando algo exibido no seu dashboard ou mapa de desafios muda
+    """
+    _versao_estudante(instance.estudante_id)
+
+
+@receiver([post_save, post_delete], sender=Conquista)
+def invalidar_conquistas(sender, instance, **kwargs):
+    """
+    Conquistas são exibidas para todos os estudantes: invalida a versão global
+    """
+    _versao_global('conquistas')
+
+
+@receiver([post_save, post_delete], sender=Pontuacao)
+def invalidar_ranking(sender, instance, **kwargs):
+    """
+    Qualquer mudança de pontuação pode reordenar o ranking
+    """
+    _versao_global('ranking')
+
+
+@receiver([post_save, post_delete], sender=Estudante)
+def invalidar_perfil(sender, instance, **kwargs):
+    """
+    Dados do estudante aparecem no perfil, no dashboard e no ranking
+    """
+    _versao_estudante(instance.pk)
+    _versao_global('ranking')
+
+
+@receiver([post_save, post_delete], sender=Quiz)
+@receiver([post_save, post_delete], sender=Pergunta)
+@receiver([post_save, post_delete], sender=Resposta)
+@receiver([post_save, post_delete], sender=Modulo)
+@receiver([post_save, post_delete], sender=Desafio)
+@receiver([post_save, post_delete], sender=EtapaDilema)
+@receiver([post_save, post_delete], sender=EscolhaDilema)
+def invalidar_conteudo(sender, instance, **kwargs):
+    """
+    Alterações no catálogo de módulos, desafios, quizzes e perguntas
+    """
+    _versao_global('conteudo')
+
+
+@receiver([post_save, post_delete], sender=NivelPontuacao)
+def invalidar_niveis(sender, instance, **kwargs):
+    """
+    A curva de níveis em memória e as telas que exibem o progresso de nível
+    """
+    _versao_global('niveis')
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_save, sender=Pergunta)
+@receiver(post_save, sender=Modulo)
+def indexar_busca(sender, instance, raw=False, **kwargs):
+    """
+    Atualiza o documento do objeto no índice de busca textual
+    """
+    if not raw:
+        search.indexar(instance)
+
+
+@receiver(post_delete, sender=Quiz)
+@receiver(post_delete, sender=Pergunta)
+@receiver(post_delete, sender=Modulo)
+def remover_busca(sender, instance, **kwargs):
+    """
+    Remove o objeto do índice de busca textual
+    """
+    search.remover(instance)
+
+
+@receiver(pre_save, sender=Pergunta)
+def lembrar_quiz_da_pergunta(sender, instance, raw=False, **kwargs):
+    """
+    Guarda o quiz atual da pergunta: se ela mudar de quiz, os dois são recalculados
+    """
+    if not raw and instance.pk is not None:
+        instance._quiz_anterior = Pergunta.objects.filter(pk=instance.pk).values_list('quiz_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=Pergunta)
+def atualizar_contadores_pergunta(sender, instance, raw=False, **kwargs):
+    """
+    Total de perguntas, pontos máximos e alternativas do quiz (ver game/counters.py)
+    """
+    if not raw:
+        counters.alterado(instance.quiz_id, getattr(instance, '_quiz_anterior', None))
+
+
+@receiver([post_save, post_delete], sender=Resposta)
+def atualizar_contadores_resposta(sender, instance, raw=False, **kwargs):
+    """
+    Total de alternativas do quiz da pergunta
+    """
+    if not raw:
+        quiz_id = Pergunta.objects.filter(pk=instance.pergunta_id).values_list('quiz_id', flat=True).first()
+        counters.alterado(quiz_id)
+
+
+# Log de queries lentas em todas as conexões (ver game/querylog.py)
+connection_created.connect(querylog.instalar, dispatch_uid='game.querylog')
@@ -0,0 +1,255 @@
+"""
+Motor de simulações financeiras para os desafios do tipo "simulacao".
+
+Cada cenário calcula a série temporal inteira de uma vez com NumPy e aceita
+varreduras de parâmetros: qualquer parâmetro pode receber uma lista de valores
+e todas as combinações são calculadas juntas, como linhas de uma matriz
+(cenários x meses).
+
+Os resultados ficam no cache pelo hash dos parâmetros, então uma turma inteira
+rodando a mesma simulação ao mesmo tempo custa um único cálculo.
+"""
+
+import hashlib
+import itertools
+import json
+
+import numpy as np
+
+from . import caching
+
+# Limites para proteger o servidor de varreduras gigantes
+MAX_CENARIOS = 1000
+MAX_MESES = 600
+TIMEOUT_RESULTADO = 60 * 60
+
+
+class SimulacaoInvalida(ValueError):
+    """
+    Parâmetros de simulação inválidos (mensagem exibível ao estudante)
+    """
+
+
+def _fator_anuidade(taxa, fator, t):
+    # ((1 + r)^t - 1) / r, com o limite t quando r = 0
+    com_juros = np.divide(fator - 1, taxa, out=np.zeros_like(fator), where=taxa != 0)
+    return np.where(taxa != 0, com_juros, t)
+
+
+def _eixo_tempo(meses):
+    # Eixo comum a todos os cenários: vai até o maior horizonte da varredura
+    return np.arange(int(meses.max()) + 1, dtype=np.float64)[None, :]
+
+
+def _no_fim(serie, meses):
+    # Valor de cada cenário no seu próprio último mês
+    return serie[np.arange(len(serie)), meses.astype(np.intp)]
+
+
+def _cortar(serie, t, meses):
+    # Meses além do horizonte do cenário ficam vazios (NaN -> null no JSON)
+    return np.where(t <= meses[:, None], serie, np.nan)
+
+
+def poupanca(valor_inicial, deposito_mensal, taxa_mensal, meses):
+    """
+    Aplicação com depósitos mensais e juros compostos mensais
+    """
+    t = _eixo_tempo(meses)
+    r = (taxa_mensal / 100)[:, None]
+    fator = (1 + r) ** t
+    saldo = valor_inicial[:, None] * fator + deposito_mensal[:, None] * _fator_anuidade(r, fator, t)
+    depositado = valor_inicial[:, None] + deposito_mensal[:, None] * t
+    saldo_final = _no_fim(saldo, meses)
+    depositado_final = _no_fim(depositado, meses)
+    return {
+        'series': {'saldo': _cortar(saldo, t, meses), 'total_depositado': _cortar(depositado, t, meses)},
+        'resumo': {
+            'saldo_final': saldo_final,
+            'total_depositado': depositado_final,
+            'juros_ganhos': saldo_final - depositado_final,
+        },
+    }
+
+
+def juros_compostos(valor_inicial, taxa_mensal, meses):
+    """
+    Evolução de um valor a juros compostos, comparada aos juros simples
+    """
+    t = _eixo_tempo(meses)
+    r = (taxa_mensal / 100)[:, None]
+    compostos = valor_inicial[:, None] * (1 + r) ** t
+    simples = valor_inicial[:, None] * (1 + r * t)
+    return {
+        'series': {'juros_compostos': _cortar(compostos, t, meses), 'juros_simples': _cortar(simples, t, meses)},
+        'resumo': {
+            'saldo_final': _no_fim(compostos, meses),
+            'diferenca_para_simples': _no_fim(compostos, meses) - _no_fim(simples, meses),
+        },
+    }
+
+
+def parcelamento(valor, taxa_mensal, parcelas):
+    """
+    Financiamento com parcelas fixas (tabela Price)
+    """
+    r = taxa_mensal / 100
+    n = parcelas
+    with np.errstate(divide='ignore', invalid='ignore'):
+        parcela = np.where(r != 0, valor * r / (1 - (1 + r) ** -n), valor / n)
+
+    t = _eixo_tempo(n)
+    fator = (1 + r[:, None]) ** t
+    saldo = valor[:, None] * fator - parcela[:, None] * _fator_anuidade(r[:, None], fator, t)
+    saldo = np.maximum(saldo, 0)
+    pago = t * parcela[:, None]
+    total = parcela * n
+    return {
+        'series': {'saldo_devedor': _cortar(saldo, t, n), 'total_pago': _cortar(pago, t, n)},
+        'resumo': {
+            'parcela': parcela,
+            'total_pago': total,
+            'juros_totais': total - valor,
+        },
+    }
+
+
+def cartao_credito(saldo_inicial, taxa_mensal, pagamento_minimo_pct, pagamento_minimo_valor, meses):
+    """
+    Dívida de cartão de crédito pagando apenas o mínimo da fatura.
+    A recorrência é mês a mês, mas cada passo atualiza todos os cenários de uma vez.
+    """
+    t = _eixo_tempo(meses)
+    horizonte = t.shape[1] - 1
+    r = taxa_mensal / 100
+    quantidade = len(saldo_inicial)
+    saldo = np.empty((quantidade, horizonte + 1))
+    pago = np.zeros((quantidade, horizonte + 1))
+    saldo[:, 0] = saldo_inicial
+    quitado_em = np.full(quantidade, -1)
+
+    atual = saldo_inicial.astype(np.float64).copy()
+    acumulado = np.zeros(quantidade)
+    for mes in range(1, horizonte + 1):
+        atual = atual * (1 + r)
+        pagamento = np.minimum(atual, np.maximum(atual * pagamento_minimo_pct / 100, pagamento_minimo_valor))
+        atual = atual - pagamento
+        acumulado = acumulado + pagamento
+        saldo[:, mes] = atual
+        pago[:, mes] = acumulado
+        quitado_em = np.where((quitado_em < 0) & (atual <= 0.005), mes, quitado_em)
+
+    saldo_final = _no_fim(saldo, meses)
+    pago_final = _no_fim(pago, meses)
+    return {
+        'series': {'saldo_devedor': _cortar(saldo, t, meses), 'total_pago': _cortar(pago, t, meses)},
+        'resumo': {
+            'saldo_final': saldo_final,
+            'total_pago': pago_final,
+            'juros_pagos': pago_final + saldo_final - saldo_inicial,
+            'meses_para_quitar': np.where((quitado_em > 0) & (quitado_em <= meses), quitado_em, np.nan),
+        },
+    }
+
+
+# Parâmetros de cada cenário e seus valores padrão (taxas em % ao mês)
+CENARIOS = {
+    'poupanca': (poupanca, {
+        'valor_inicial': 0.0, 'deposito_mensal': 100.0, 'taxa_mensal': 0.5, 'meses': 12,
+    }),
+    'juros_compostos': (juros_compostos, {
+        'valor_inicial': 1000.0, 'taxa_mensal': 1.0, 'meses': 12,
+    }),
+    'parcelamento': (parcelamento, {
+        'valor': 1000.0, 'taxa_mensal': 2.0, 'parcelas': 12,
+    }),
+    'cartao_credito': (cartao_credito, {
+        'saldo_inicial': 1000.0, 'taxa_mensal': 12.0, 'pagamento_minimo_pct': 15.0,
+        'pagamento_minimo_valor': 50.0, 'meses': 24,
+    }),
+}
+
+# Parâmetros que definem o comprimento da série e precisam ser inteiros positivos
+PARAMETROS_MESES = {'meses', 'parcelas'}
+
+
+def normalizar_parametros(tipo, parametros):
+    """
+    Valida os parâmetros e converte cada um em uma lista ordenada de valores
+    """
+    if tipo not in CENARIOS:
+        raise SimulacaoInvalida(f'Simulação desconhecida: {tipo}')
+    _, padroes = CENARIOS[tipo]
+
+    desconhecidos = set(parametros) - set(padroes)
+    if desconhecidos:
+        raise SimulacaoInvalida(f'Parâmetros desconhecidos: {", ".join(sorted(desconhecidos))}')
+
+    normalizados = {}
+    for nome, padrao in padroes.items():
+        valores = parametros.get(nome, padrao)
+        if not isinstance(valores, (list, tuple)):
+            valores = [valores]
+        try:
+            valores = sorted({float(valor) for valor in valores})
+        except (TypeError, ValueError):
+            raise SimulacaoInvalida(f'Valor inválido para {nome}.')
+        if not valores or not all(np.isfinite(valores)):
+            raise SimulacaoInvalida(f'Valor inválido para {nome}.')
+        if nome in PARAMETROS_MESES:
+            if any(valor != int(valor) or not 1 <= valor <= MAX_MESES for valor in valores):
+                raise SimulacaoInvalida(f'{nome} deve ser um inteiro entre 1 e {MAX_MESES}.')
+            valores = [int(valor) for valor in valores]
+        elif any(valor < 0 for valor in valores):
+            raise SimulacaoInvalida(f'{nome} não pode ser negativo.')
+        normalizados[nome] = valores
+
+    quantidade = int(np.prod([len(valores) for valores in normalizados.values()]))
+    if quantidade > MAX_CENARIOS:
+        raise SimulacaoInvalida(f'A varredura gera {quantidade} cenários; o máximo é {MAX_CENARIOS}.')
+    return normalizados
+
+
+def chave_simulacao(tipo, normalizados):
+    """
+    Chave de cache derivada do hash dos parâmetros normalizados
+    """
+    bruto = json.dumps([tipo, normalizados], sort_keys=True, separators=(',', ':'))
+    return 'simulacao:' + hashlib.sha256(bruto.encode()).hexdigest()
+
+
+def _para_lista(valores):
+    arredondados = np.round(valores, 2)
+    return np.where(np.isnan(arredondados), None, arredondados).tolist()
+
+
+def calcular(tipo, normalizados):
+    """
+    Executa a simulação para todas as combinações de parâmetros
+    """
+    funcao, _ = CENARIOS[tipo]
+    nomes = list(normalizados)
+    combinacoes = list(itertools.product(*(normalizados[nome] for nome in nomes)))
+    colunas = np.array(combinacoes, dtype=np.float64).T
+    resultado = funcao(**dict(zip(nomes, colunas)))
+    return {
+        'tipo': tipo,
+        'cenarios': [dict(zip(nomes, combinacao)) for combinacao in combinacoes],
+        'series': {nome: _para_lista(serie) for nome, serie in resultado['series'].items()},
+        'resumo': {nome: _para_lista(valores) for nome, valores in resultado['resumo'].items()},
+    }
+
+
+def simular(tipo, parametros):
+    """
+    Retorna o resultado da simulação, calculando-o no máximo uma vez por
+    combinação de parâmetros: o primeiro pedido trava a chave e calcula, os
+    pedidos simultâneos aguardam o resultado no cache
+    """
+    normalizados = normalizar_parametros(tipo, parametros)
+    return caching.obter(
+        chave_simulacao(tipo, normalizados),
+        lambda: calcular(tipo, normalizados),
+        timeout=TIMEOUT_RESULTADO,
+        local=False,  # resultados grandes e variados: o LRU do processo ficaria com as sobras
+    )
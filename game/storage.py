@@ -0,0 +1,279 @@
+import gzip
+import re
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional: sem ele apenas a variante .gz é gerada
+    brotli = None
+
+
+# Extensões que passam por minificação e pré-compressão
+EXTENSOES_MINIFICAVEIS = ('.css', '.js')
+EXTENSOES_COMPRIMIVEIS = ('.css', '.js', '.svg', '.txt', '.json', '.html', '.map')
+
+# Arquivos menores que isso não compensam o custo de uma variante comprimida
+TAMANHO_MINIMO_COMPRESSAO = 256
+
+# Tokens do minificador de CSS: strings preservadas intactas e comentários
+_CSS_TOKENS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|(/\*.*?\*/)', re.S)
+# Contexto em que uma "/" abre uma regex em vez de ser uma divisão: depois de
+# pontuação ou de uma destas palavras-chave
+_ANTES_DE_REGEX = set('(,=:[!&|?{};+-*%<>~^}')
+_PALAVRAS_ANTES_DE_REGEX = {
+    'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void',
+    'throw', 'case', 'do', 'else', 'yield', 'await',
+}
+_JS_PALAVRA = re.compile(r'[\w$]+')
+
+
+def _minificar_trecho_css(trecho):
+    """
+    Remove espaços redundantes de um trecho de CSS sem strings
+    """
+    trecho = re.sub(r'\s+', ' ', trecho)
+    trecho = re.sub(r'\s*([{};,>])\s*', r'\1', trecho)
+    trecho = re.sub(r':\s+', ':', trecho)
+    return trecho.replace(';}', '}')
+
+
+def minificar_css(conteudo):
+    """
+    Minifica CSS removendo comentários e espaços, preservando o conteúdo de strings
+    """
+    partes = []
+    pendente = ''
+    posicao = 0
+    for match in _CSS_TOKENS.finditer(conteudo):
+        pendente += conteudo[posicao:match.start()]
+        if match.group(1):
+            # Strings interrompem o trecho minificável e são copiadas como estão
+            partes.append(_minificar_trecho_css(pendente))
+            partes.append(match.group(1))
+            pendente = ''
+        posicao = match.end()
+    partes.append(_minificar_trecho_css(pendente + conteudo[posicao:]))
+    return ''.join(partes).strip()
+
+
+def _fim_literal(conteudo, inicio, fecha):
+    """
+    Posição logo após o fim de uma string ou regex que começa em inicio.
+    Levanta ValueError se o literal não fechar na mesma linha
+    """
+    posicao = inicio + 1
+    em_classe = False
+    while posicao < len(conteudo):
+        caractere = conteudo[posicao]
+        if caractere == '\\':
+            posicao += 2
+            continue
+        if caractere == '\n':
+            break
+        if fecha == '/' and caractere in '[]':
+            # Dentro de [...] uma "/" não encerra a regex
+            em_classe = caractere == '['
+        elif caractere == fecha and not em_classe:
+            return posicao + 1
+        posicao += 1
+    raise ValueError('literal sem fim na posição %d' % inicio)
+
+
+def _tokens_js(conteudo):
+    """
+    Divide o JavaScript em pares (tipo, texto): 'codigo', 'literal' (strings,
+    templates e regex, copiados como estão) ou 'comentario'. Levanta ValueError
+    quando não consegue reconhecer algum literal
+    """
+    tokens = []
+    chaves = []  # '{' de blocos e '${' de templates abertos
+    anterior = ''  # último token significativo, para distinguir regex de divisão
+    inicio = posicao = 0
+    em_template = False
+
+    while posicao < len(conteudo):
+        if em_template:
+            # Corpo de template até a crase final ou até uma interpolação ${
+            while posicao < len(conteudo) and conteudo[posicao] != '`' and not conteudo.startswith('${', posicao):
+                posicao += 2 if conteudo[posicao] == '\\' else 1
+            if posicao >= len(conteudo):
+                raise ValueError('template sem fim na posição %d' % inicio)
+            if conteudo[posicao] == '`':
+                posicao += 1
+                anterior = '`'
+            else:
+                posicao += 2
+                chaves.append('${')
+                anterior = '{'
+            tokens.append(('literal', conteudo[inicio:posicao]))
+            inicio = posicao
+            em_template = False
+            continue
+
+        caractere = conteudo[posicao]
+        if caractere.isspace():
+            posicao += 1
+            continue
+
+        fim = None
+        if caractere in '"\'':
+            tipo, fim = 'literal', _fim_literal(conteudo, posicao, caractere)
+            anterior = caractere
+        elif conteudo.startswith('//', posicao):
+            fim = conteudo.find('\n', posicao)
+            tipo, fim = 'comentario', len(conteudo) if fim < 0 else fim
+        elif conteudo.startswith('/*', posicao):
+            fim = conteudo.find('*/', posicao + 2)
+            if fim < 0:
+                raise ValueError('comentário sem fim na posição %d' % posicao)
+            tipo, fim = 'comentario', fim + 2
+        elif caractere == '/' and (anterior in _ANTES_DE_REGEX or anterior in _PALAVRAS_ANTES_DE_REGEX or not anterior):
+            fim = _fim_literal(conteudo, posicao, '/')
+            flags = _JS_PALAVRA.match(conteudo, fim)
+            tipo, fim = 'literal', flags.end() if flags else fim
+            anterior = ')'  # depois de uma regex, "/" é divisão
+        elif caractere in '`}' and (caractere == '`' or chaves[-1:] == ['${']):
+            # Abertura de template ou fim de uma interpolação: volta ao corpo do template
+            if caractere == '}':
+                chaves.pop()
+            tokens.append(('codigo', conteudo[inicio:posicao]))
+            inicio = posicao
+            posicao += 1
+            em_template = True
+            continue
+        else:
+            palavra = _JS_PALAVRA.match(conteudo, posicao)
+            if palavra:
+                anterior = palavra.group()
+                posicao = palavra.end()
+                continue
+            if caractere == '{':
+                chaves.append('{')
+            elif caractere == '}' and chaves:
+                chaves.pop()
+            anterior = caractere
+            posicao += 1
+            continue
+
+        tokens.append(('codigo', conteudo[inicio:posicao]))
+        tokens.append((tipo, conteudo[posicao:fim]))
+        inicio = posicao = fim
+
+    if em_template:
+        raise ValueError('template sem fim na posição %d' % inicio)
+    tokens.append(('codigo', conteudo[inicio:]))
+    return tokens
+
+
+def minificar_js(conteudo):
+    """
+    Minificação conservadora de JavaScript: remove comentários, indentação e
+    linhas vazias, mas mantém as quebras de linha para não depender de ASI.
+    Strings, templates e regex são copiados como estão; se algum literal não
+    for reconhecido o arquivo é mantido sem minificação
+    """
+    try:
+        tokens = _tokens_js(conteudo)
+    except ValueError:
+        return conteudo
+
+    partes = []
+    pendente = ''
+    for tipo, texto in tokens:
+        if tipo == 'literal':
+            partes.append(re.sub(r'[ \t]*\n\s*', '\n', pendente))
+            partes.append(texto)
+            pendente = ''
+        elif tipo == 'comentario':
+            # Um comentário de bloco ainda separa tokens e, se ocupa várias linhas, termina uma instrução
+            pendente += '' if texto.startswith('//') else ('\n' if '\n' in texto else ' ')
+        else:
+            pendente += texto
+    partes.append(re.sub(r'[ \t]*\n\s*', '\n', pendente))
+    return ''.join(partes).strip()
+
+
+def minificar(nome, conteudo):
+    """
+    Minifica o conteúdo de acordo com a extensão do arquivo
+    """
+    if nome.endswith('.css'):
+        return minificar_css(conteudo)
+    if nome.endswith('.js'):
+        return minificar_js(conteudo)
+    return conteudo
+
+
+def comprimir(conteudo):
+    """
+    Gera as variantes pré-comprimidas de um conteúdo: {'gz': bytes, 'br': bytes}
+    Variantes que não reduzem o tamanho são descartadas.
+    """
+    variantes = {'gz': gzip.compress(conteudo, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variantes['br'] = brotli.compress(conteudo, quality=11)
+    return {
+        extensao: dados for extensao, dados in variantes.items()
+        if len(dados) < len(conteudo)
+    }
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Storage de arquivos estáticos usado pelo collectstatic:
+    - nomes com hash de conteúdo (manifesto do Django)
+    - minificação de CSS/JS
+    - variantes pré-comprimidas .gz (e .br se o pacote brotli estiver instalado)
+    """
+    manifest_strict = False
+
+    def stored_name(self, name):
+        # Sem manifesto (collectstatic ainda não executado) usa o nome original,
+        # para que o ambiente de desenvolvimento e os testes continuem funcionando
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        processados = {}
+        for original, processado, alterado in super().post_process(paths, dry_run, **options):
+            if processado and not isinstance(processado, Exception):
+                processados[processado] = original
+            yield original, processado, alterado
+
+        if dry_run:
+            return
+
+        for nome, original in processados.items():
+            self._otimizar(nome)
+            # A cópia sem hash também é servida (ex.: referências diretas)
+            if self.exists(original):
+                self._otimizar(original)
+
+    def _otimizar(self, nome):
+        """
+        Minifica e gera as variantes comprimidas de um arquivo já coletado
+        """
+        if not nome.endswith(EXTENSOES_COMPRIMIVEIS):
+            return
+
+        with self.open(nome) as arquivo:
+            conteudo = arquivo.read()
+
+        if nome.endswith(EXTENSOES_MINIFICAVEIS):
+            minificado = minificar(nome, conteudo.decode('utf-8')).encode('utf-8')
+            if minificado != conteudo:
+                self.delete(nome)
+                self._save(nome, ContentFile(minificado))
+                conteudo = minificado
+
+        if len(conteudo) < TAMANHO_MINIMO_COMPRESSAO:
+            return
+
+        for extensao, dados in comprimir(conteudo).items():
+            variante = f'{nome}.{extensao}'
+            if self.exists(variante):
+                self.delete(variante)
+            self._save(variante, ContentFile(dados))
@@ -1,9 +1,15 @@
-from django.test import TestCase, Client
+import os
+
+from django.test import LiveServerTestCase, TestCase, Client
 from django.urls import reverse
 from django.contrib.auth.models import User
 from django.contrib.auth import get_user_model
 from django.contrib.messages import get_messages
-from .models import Estudante, Pontuacao, Conquista, EstudanteConquista, Quiz, Resultado
+from .models import (
+    Estudante, Pontuacao, Conquista, EstudanteConquista, Quiz, Pergunta, Resposta, Resultado,
+    Modulo, Desafio, ProgressoDesafio, RespostaResultado, EstatisticaPergunta,
+    EtapaDilema, EscolhaDilema, EstadoDilema, EventoPontuacao, NivelPontuacao,
+)
 from .forms import LoginForm, SignupForm, PasswordResetFormCustom
 
 
@@ -16,6 +22,9 @@ class DashboardViewTest(TestCase):
         """
         Configuração inicial para os testes
         """
+        from django.core.cache import cache
+        cache.clear()
+
         # Cria um usuário para teste
         self.user = User.objects.create_user(
             username='testuser',
@@ -566,3 +575,2457 @@ class AuthenticationURLTest(TestCase):
         """
         response = self.client.get('/password-reset/done/')
         self.assertEqual(response.status_code, 200)
+
+
+class StaticAssetPipelineTest(TestCase):
+    """
+    Testes para a minificação, pré-compressão e serviço de arquivos estáticos
+    """
+
+    def setUp(self):
+        """
+        Cria um STATIC_ROOT temporário com um asset com hash e sua variante .gz
+        """
+        import gzip
+        import tempfile
+        import shutil
+
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root)
+
+        os.makedirs(os.path.join(self.static_root, 'css'))
+        self.conteudo = b'body{color:#000}' * 40
+        for nome in ('css/style.0123456789ab.css', 'css/style.css'):
+            with open(os.path.join(self.static_root, nome), 'wb') as arquivo:
+                arquivo.write(self.conteudo)
+            with open(os.path.join(self.static_root, nome + '.gz'), 'wb') as arquivo:
+                arquivo.write(gzip.compress(self.conteudo))
+
+        override = self.settings(STATIC_ROOT=self.static_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_minificar_css_preserva_strings(self):
+        """
+        Testa se a minificação de CSS remove comentários e espaços sem alterar strings
+        """
+        from .storage import minificar_css
+
+        css = '/* título */\nbody {\n    font-family: "Segoe  UI", sans-serif;\n    margin: 0;\n}\n'
+        self.assertEqual(minificar_css(css), 'body{font-family:"Segoe  UI",sans-serif;margin:0}')
+
+    def test_minificar_js_remove_comentarios(self):
+        """
+        Testa se a minificação de JS remove comentários mas mantém URLs em strings
+        """
+        from .storage import minificar_js
+
+        js = "/**\n * Doc\n */\nfunction a() {\n    // comentário\n    return 'http://x';\n}\n"
+        self.assertEqual(minificar_js(js), "function a() {\nreturn 'http://x';\n}")
+
+    def test_minificar_js_preserva_regex_e_templates(self):
+        """
+        Testa se regex com /* ou // e templates com interpolação saem intactos
+        """
+        from .storage import minificar_js
+
+        js = 'var re = /[/*]/g;\nvar x = 1;\nvar y = 2; /* fim */\nfoo(re, x, y);'
+        self.assertEqual(minificar_js(js), 'var re = /[/*]/g;\nvar x = 1;\nvar y = 2;\nfoo(re, x, y);')
+
+        js = "var url = /https?:\\/\\//i; // protocolo\nvar meio = a / b / 2;\nvar t = `${ {x: `//`}.x }\n    fim`;"
+        self.assertEqual(
+            minificar_js(js),
+            "var url = /https?:\\/\\//i;\nvar meio = a / b / 2;\nvar t = `${ {x: `//`}.x }\n    fim`;",
+        )
+
+    def test_minificar_js_nao_altera_literal_sem_fim(self):
+        """
+        Testa se um arquivo com literal não reconhecido é mantido sem minificação
+        """
+        from .storage import minificar_js
+
+        js = "var s = 'sem fim\n// não é comentário\n"
+        self.assertEqual(minificar_js(js), js)
+
+    def test_serve_variante_gzip_com_cache_imutavel(self):
+        """
+        Testa se o asset com hash é servido comprimido e com cache de um ano
+        """
+        response = self.client.get('/static/css/style.0123456789ab.css', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css; charset=utf-8')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_serve_sem_compressao_quando_nao_aceita(self):
+        """
+        Testa se o arquivo original é servido quando o cliente não aceita gzip
+        """
+        response = self.client.get('/static/css/style.css', HTTP_ACCEPT_ENCODING='identity')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(b''.join(response.streaming_content), self.conteudo)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=0, must-revalidate')
+
+    def test_bloqueia_path_traversal(self):
+        """
+        Testa se caminhos fora do STATIC_ROOT não são servidos pelo middleware
+        """
+        response = self.client.get('/static/../settings.py')
+        self.assertNotEqual(response.status_code, 200)
+
+
+class DashboardFragmentCacheTest(TestCase):
+    """
+    Testes para o cache versionado dos fragmentos do dashboard
+    """
+
+    def setUp(self):
+        """
+        Configuração inicial com um estudante, uma conquista e um resultado
+        """
+        from django.core.cache import cache
+        cache.clear()
+
+        self.user = User.objects.create_user(username='aluno', password='testpass123')
+        self.estudante = Estudante.objects.create(user=self.user, nome='Aluno Teste')
+        Pontuacao.objects.create(estudante=self.estudante, pontos_totais=50)
+        self.quiz = Quiz.objects.create(
+            titulo='Quiz de Orçamento', descricao='Orçamento', nivel_dificuldade=1, tema='Orçamento'
+        )
+        Resultado.objects.create(
+            estudante=self.estudante, quiz=self.quiz, total_perguntas=5, acertos=4, concluido=True
+        )
+        self.client.login(username='aluno', password='testpass123')
+
+    def _contar_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(contexto.captured_queries), response
+
+    def test_fragmentos_reutilizados_sem_queries(self):
+        """
+        Testa se a segunda renderização não executa as queries dos fragmentos
+        """
+        primeira, _ = self._contar_queries()
+        segunda, response = self._contar_queries()
+        self.assertLess(segunda, primeira)
+        self.assertContains(response, 'Quiz de Orçamento')
+
+    def test_escrita_invalida_fragmentos(self):
+        """
+        Testa se um novo resultado sobe a versão e aparece no dashboard
+        """
+        from .versioning import versao_estudante
+
+        self._contar_queries()
+        versao_anterior = versao_estudante(self.estudante.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            outro_quiz = Quiz.objects.create(
+                titulo='Quiz de Juros', descricao='Juros', nivel_dificuldade=2, tema='Juros'
+            )
+            Resultado.objects.create(
+                estudante=self.estudante, quiz=outro_quiz, total_perguntas=5, acertos=5, concluido=True
+            )
+
+        self.assertGreater(versao_estudante(self.estudante.pk), versao_anterior)
+        _, response = self._contar_queries()
+        self.assertContains(response, 'Quiz de Juros')
+
+    def test_versao_so_sobe_apos_commit(self):
+        """
+        Testa se a versão do estudante só sobe quando a transação confirma
+        """
+        from .versioning import versao_estudante
+
+        versao_anterior = versao_estudante(self.estudante.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Resultado.objects.create(
+                estudante=self.estudante, quiz=self.quiz, total_perguntas=5, acertos=5, concluido=True
+            )
+            self.assertEqual(versao_estudante(self.estudante.pk), versao_anterior)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(versao_estudante(self.estudante.pk), versao_anterior)
+
+    def test_conquista_nova_invalida_fragmento(self):
+        """
+        Testa se editar o catálogo de conquistas invalida o fragmento para todos
+        """
+        self._contar_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            Conquista.objects.create(nome='Poupador', descricao='Poupe', icone='piggy-bank', criterio_pontos=100)
+        _, response = self._contar_queries()
+        self.assertContains(response, 'Poupador')
+
+
+class ConditionalResponseTest(TestCase):
+    """
+    Testes para respostas condicionais (ETag/Last-Modified) das páginas do estudante
+    """
+
+    def setUp(self):
+        """
+        Configuração inicial com um estudante logado
+        """
+        from django.core.cache import cache
+        cache.clear()
+
+        self.user = User.objects.create_user(username='aluno', password='testpass123')
+        self.estudante = Estudante.objects.create(user=self.user, nome='Aluno Teste')
+        self.pontuacao = Pontuacao.objects.create(estudante=self.estudante, pontos_totais=50)
+        self.client.login(username='aluno', password='testpass123')
+
+    def test_dashboard_retorna_304_sem_mudancas(self):
+        """
+        Testa se o dashboard responde 304 sem executar a view quando nada mudou
+        """
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        with self.assertNumQueries(2):  # sessão e usuário (autenticação)
+            response = self.client.get(reverse('dashboard'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_dashboard_muda_etag_apos_escrita(self):
+        """
+        Testa se uma nova pontuação gera um novo ETag
+        """
+        etag = self.client.get(reverse('dashboard'))['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pontuacao.pontos_totais = 150
+            self.pontuacao.save()
+
+        response = self.client.get(reverse('dashboard'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_ranking_invalida_com_pontuacao_de_outro_estudante(self):
+        """
+        Testa se o ranking muda quando qualquer estudante pontua
+        """
+        etag = self.client.get(reverse('ranking'))['ETag']
+        self.assertEqual(
+            self.client.get(reverse('ranking'), HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            outro = Estudante.objects.create(
+                user=User.objects.create_user(username='outro', password='x'), nome='Outro'
+            )
+            Pontuacao.objects.create(estudante=outro, pontos_totais=500)
+        self.assertEqual(
+            self.client.get(reverse('ranking'), HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+    def test_mensagens_pendentes_forcam_renderizacao(self):
+        """
+        Testa se a página é renderizada quando há mensagens a exibir
+        """
+        etag = self.client.get(reverse('profile'))['ETag']
+        response = self.client.post(reverse('profile'), {'nome': 'Aluno Renomeado'})
+        self.assertEqual(response.status_code, 302)
+
+        response = self.client.get(reverse('profile'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class ApiTest(TestCase):
+    """
+    Testes para a API JSON compacta
+    """
+
+    def setUp(self):
+        """
+        Configuração inicial com alguns estudantes pontuados
+        """
+        from django.core.cache import cache
+        cache.clear()
+
+        self.user = User.objects.create_user(username='aluno', password='testpass123')
+        self.estudante = Estudante.objects.create(user=self.user, nome='Aluno Teste')
+        Pontuacao.objects.create(estudante=self.estudante, pontos_totais=120)
+        for indice in range(5):
+            outro = Estudante.objects.create(
+                user=User.objects.create_user(username=f'outro{indice}', password='x'),
+                nome=f'Outro {indice}'
+            )
+            Pontuacao.objects.create(estudante=outro, pontos_totais=indice * 100)
+
+        self.conquista = Conquista.objects.create(
+            nome='Primeiro Quiz', descricao='Complete um quiz', icone='star', criterio_pontos=10
+        )
+        EstudanteConquista.objects.create(estudante=self.estudante, conquista=self.conquista)
+        self.client.login(username='aluno', password='testpass123')
+
+    def test_api_exige_autenticacao(self):
+        """
+        Testa se a API responde 401 em JSON para usuários anônimos
+        """
+        self.client.logout()
+        response = self.client.get(reverse('api_dashboard'))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_dashboard_campos_esparsos(self):
+        """
+        Testa se ?fields= limita os campos retornados
+        """
+        response = self.client.get(reverse('api_dashboard'), {'fields': 'pontos_totais,nivel_atual'})
+        self.assertEqual(response.json(), {'pontos_totais': 120, 'nivel_atual': 2})
+
+    def test_ranking_paginado(self):
+        """
+        Testa a janela de ranking com offset e limit
+        """
+        response = self.client.get(reverse('api_ranking'), {'offset': 1, 'limit': 2})
+        dados = response.json()
+        self.assertEqual(dados['count'], 6)
+        self.assertEqual(dados['next'], 3)
+        self.assertEqual([item['posicao'] for item in dados['results']], [2, 3])
+        self.assertEqual(dados['results'][0]['pontos_totais'], 300)
+
+    def test_conquistas_indica_desbloqueio(self):
+        """
+        Testa se as conquistas indicam quais já foram desbloqueadas
+        """
+        dados = self.client.get(reverse('api_conquistas')).json()
+        self.assertEqual(dados['count'], 1)
+        self.assertTrue(dados['results'][0]['desbloqueada'])
+
+    def test_resposta_comprimida(self):
+        """
+        Testa se respostas grandes são comprimidas com gzip
+        """
+        response = self.client.get(reverse('api_ranking'), {'limit': 100}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get('Content-Encoding'), 'gzip')
+
+
+class MapaModulosTest(TestCase):
+    """
+    Testes para o mapa de módulos e desafios com progresso do estudante
+    """
+
+    def setUp(self):
+        """
+        Cria módulos com desafios e progresso parcial do estudante
+        """
+        from django.core.cache import cache
+        cache.clear()
+
+        self.user = User.objects.create_user(username='aluno', password='testpass123')
+        self.estudante = Estudante.objects.create(user=self.user, nome='Aluno Teste')
+        self.modulo = Modulo.objects.create(nome='Orçamento', descricao='Planejar gastos', slug='orcamento')
+        self.desafios = [
+            Desafio.objects.create(modulo=self.modulo, titulo=f'Desafio {ordem}', descricao='...', ordem=ordem)
+            for ordem in (1, 2, 3)
+        ]
+        Modulo.objects.create(nome='Inativo', descricao='...', slug='inativo', ativo=False)
+        ProgressoDesafio.objects.create(estudante=self.estudante, desafio=self.desafios[0], concluido=True)
+
+    def _criar_modulos(self, quantidade):
+        for indice in range(quantidade):
+            modulo = Modulo.objects.create(nome=f'Extra {indice}', descricao='...', slug=f'extra-{indice}')
+            for ordem in (1, 2):
+                Desafio.objects.create(modulo=modulo, titulo='...', descricao='...', ordem=ordem)
+
+    def test_status_e_proximo_desafio(self):
+        """
+        Testa percentual, status sequencial e próximo desafio liberado
+        """
+        from .queries import mapa_modulos
+
+        mapa = mapa_modulos(self.estudante)
+        self.assertEqual([modulo['slug'] for modulo in mapa], ['orcamento'])
+        modulo = mapa[0]
+        self.assertEqual(modulo['percentual'], 33.3)
+        self.assertEqual(
+            [desafio['status'] for desafio in modulo['desafios']],
+            ['concluido', 'disponivel', 'bloqueado']
+        )
+        self.assertEqual(modulo['proximo_desafio']['id'], self.desafios[1].pk)
+
+    def test_numero_constante_de_queries(self):
+        """
+        Testa se o número de queries não cresce com a quantidade de módulos
+        """
+        from .queries import mapa_modulos
+
+        with self.assertNumQueries(3):
+            mapa_modulos(self.estudante)
+        with self.captureOnCommitCallbacks(execute=True):
+            self._criar_modulos(5)
+        with self.assertNumQueries(3):
+            mapa = mapa_modulos(self.estudante)
+        self.assertEqual(len(mapa), 6)
+
+        # Estrutura em cache: apenas a query de progresso do estudante
+        with self.assertNumQueries(1):
+            mapa_modulos(self.estudante)
+
+    def test_pagina_de_desafios_exibe_progresso(self):
+        """
+        Testa se a página de desafios mostra o progresso do estudante
+        """
+        self.client.login(username='aluno', password='testpass123')
+        response = self.client.get(reverse('desafios'))
+        self.assertContains(response, '1 / 3 desafios concluídos')
+        self.assertContains(response, 'Próximo: Desafio 2')
+        self.assertNotContains(response, 'Inativo')
+
+
+class PraticaAdaptativaTest(TestCase):
+    """
+    Testes para o motor de seleção adaptativa de perguntas
+    """
+
+    def setUp(self):
+        """
+        Cria um quiz com cinco perguntas, cada uma com uma resposta certa e uma errada
+        """
+        from django.core.cache import cache
+        cache.clear()
+
+        self.user = User.objects.create_user(username='aluno', password='testpass123')
+        self.estudante = Estudante.objects.create(user=self.user, nome='Aluno Teste')
+        self.quiz = Quiz.objects.create(
+            titulo='Quiz de Juros', descricao='Juros', nivel_dificuldade=2, tema='Juros'
+        )
+        self.perguntas = []
+        for ordem in range(1, 6):
+            pergunta = Pergunta.objects.create(quiz=self.quiz, texto=f'Pergunta {ordem}', ordem=ordem)
+            Resposta.objects.create(pergunta=pergunta, texto='Certa', correta=True, ordem=1)
+            Resposta.objects.create(pergunta=pergunta, texto='Errada', correta=False, ordem=2)
+            self.perguntas.append(pergunta)
+
+    def test_estado_serializado_compacto(self):
+        """
+        Testa se o estado empacotado ida e volta preserva as filas e ocupa 8 bytes por pergunta
+        """
+        from .adaptive import EstadoMemoria
+
+        estado = EstadoMemoria()
+        for pergunta_id in range(1, 101):
+            estado.registrar(pergunta_id, correta=pergunta_id % 2 == 0, agora=0)
+        dados = estado.serializar()
+        restaurado = EstadoMemoria.carregar(dados)
+
+        self.assertEqual(len(restaurado), 100)
+        self.assertEqual(restaurado.caixa(2), 1)
+        self.assertEqual(restaurado.caixa(3), 0)
+        self.assertLess(len(dados), 100 * 8 + 64)
+
+    def test_erradas_voltam_antes_das_novas(self):
+        """
+        Testa se uma pergunta errada e vencida é priorizada sobre perguntas novas
+        """
+        from .adaptive import proximas_perguntas, registrar_resposta
+
+        primeira = proximas_perguntas(self.estudante, self.quiz, quantidade=2, agora=0)
+        self.assertEqual([p.pk for p in primeira], [self.perguntas[0].pk, self.perguntas[1].pk])
+
+        registrar_resposta(self.estudante, self.perguntas[0], correta=True, agora=0)
+        registrar_resposta(self.estudante, self.perguntas[1], correta=False, agora=0)
+
+        # 15 minutos depois: a errada venceu (caixa 0, 10 min), a certa só amanhã
+        sessao = proximas_perguntas(self.estudante, self.quiz, quantidade=3, agora=15 * 60)
+        self.assertEqual(
+            [p.pk for p in sessao],
+            [self.perguntas[1].pk, self.perguntas[2].pk, self.perguntas[3].pk]
+        )
+
+    def test_pergunta_removida_nao_ocupa_vaga(self):
+        """
+        Testa se uma pergunta vencida que saiu do quiz é descartada antes da seleção
+        """
+        from .adaptive import proximas_perguntas, registrar_resposta
+
+        registrar_resposta(self.estudante, self.perguntas[0], correta=False, agora=0)
+        registrar_resposta(self.estudante, self.perguntas[4], correta=False, agora=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.perguntas[4].delete()
+
+        sessao = proximas_perguntas(self.estudante, self.quiz, quantidade=2, agora=15 * 60)
+        self.assertEqual([p.pk for p in sessao], [self.perguntas[0].pk, self.perguntas[1].pk])
+
+    def test_api_de_pratica(self):
+        """
+        Testa a API de prática: sorteio sem gabarito e correção atualizando a memória
+        """
+        self.client.login(username='aluno', password='testpass123')
+        url = reverse('api_pratica', args=[self.quiz.pk])
+
+        dados = self.client.get(url, {'quantidade': 2}).json()
+        self.assertEqual(len(dados['results']), 2)
+        self.assertNotIn('correta', dados['results'][0]['respostas'][0])
+
+        pergunta = self.perguntas[0]
+        certa = pergunta.respostas.get(correta=True)
+        response = self.client.post(
+            url, {'pergunta': pergunta.pk, 'resposta': certa.pk}, content_type='application/json'
+        )
+        self.assertEqual(response.json()['caixa'], 1)
+        self.assertTrue(response.json()['correta'])
+
+
+class AnaliseItensTest(TestCase):
+    """
+    Testes para a análise vetorizada de dificuldade, discriminação e distratores
+    """
+
+    def setUp(self):
+        """
+        Cria um quiz com duas perguntas respondidas por quatro estudantes
+        """
+        self.quiz = Quiz.objects.create(titulo='Quiz', descricao='...', nivel_dificuldade=1, tema='Geral')
+        self.p1 = Pergunta.objects.create(quiz=self.quiz, texto='P1', ordem=1)
+        self.p2 = Pergunta.objects.create(quiz=self.quiz, texto='P2', ordem=2)
+        self.p1_certa = Resposta.objects.create(pergunta=self.p1, texto='Certa', correta=True)
+        self.p1_errada = Resposta.objects.create(pergunta=self.p1, texto='Errada')
+        self.p2_certa = Resposta.objects.create(pergunta=self.p2, texto='Certa', correta=True)
+        self.p2_errada = Resposta.objects.create(pergunta=self.p2, texto='Errada')
+        self.indice = 0
+
+    def _tentativa(self, acerta_p1, acerta_p2):
+        self.indice += 1
+        user = User.objects.create_user(username=f'aluno{self.indice}', password='x')
+        estudante = Estudante.objects.create(user=user, nome=f'Aluno {self.indice}')
+        resultado = Resultado.objects.create(
+            estudante=estudante, quiz=self.quiz, total_perguntas=2,
+            acertos=int(acerta_p1) + int(acerta_p2), concluido=True
+        )
+        for pergunta, certa, errada, acertou in (
+            (self.p1, self.p1_certa, self.p1_errada, acerta_p1),
+            (self.p2, self.p2_certa, self.p2_errada, acerta_p2),
+        ):
+            RespostaResultado.objects.create(
+                resultado=resultado, pergunta=pergunta, resposta=certa if acertou else errada, correta=acertou
+            )
+
+    def test_calcular_indices_ponto_bisserial(self):
+        """
+        Testa a discriminação calculada pelas somas contra a correlação de Pearson
+        """
+        import numpy as np
+        from .analytics import calcular_indices
+
+        x = np.array([1, 1, 0, 0, 1], dtype=float)
+        y = np.array([5, 4, 1, 2, 3], dtype=float)
+        p, r = calcular_indices(
+            np.array([5]), np.array([x.sum()]), np.array([y.sum()]),
+            np.array([(y * y).sum()]), np.array([(x * y).sum()])
+        )
+        self.assertAlmostEqual(p[0], 0.6)
+        self.assertAlmostEqual(r[0], np.corrcoef(x, y)[0, 1])
+
+    def test_atualizacao_incremental_igual_a_recalculo(self):
+        """
+        Testa se processar em duas etapas dá o mesmo resultado do recálculo completo
+        """
+        from .analytics import atualizar_estatisticas
+
+        self._tentativa(True, True)
+        self._tentativa(True, False)
+        self.assertEqual(atualizar_estatisticas(tamanho_lote=3), (4, 2))
+
+        self._tentativa(False, True)
+        self._tentativa(False, False)
+        self.assertEqual(atualizar_estatisticas(), (4, 2))
+        incremental = EstatisticaPergunta.objects.get(pergunta=self.p1)
+
+        atualizar_estatisticas(recalcular=True)
+        completo = EstatisticaPergunta.objects.get(pergunta=self.p1)
+
+        self.assertEqual(incremental.tentativas, 4)
+        self.assertAlmostEqual(incremental.dificuldade, 0.5)
+        self.assertAlmostEqual(incremental.discriminacao, completo.discriminacao)
+        self.assertEqual(incremental.escolhas, completo.escolhas)
+        self.assertEqual(incremental.escolhas[str(self.p1_errada.pk)], 2)
+
+    def test_sem_respostas_novas_nao_altera(self):
+        """
+        Testa se uma execução sem respostas novas não processa nada
+        """
+        from .analytics import atualizar_estatisticas
+
+        self._tentativa(True, False)
+        atualizar_estatisticas()
+        self.assertEqual(atualizar_estatisticas(), (0, 0))
+
+    def test_resposta_com_id_menor_gravada_depois_e_processada(self):
+        """
+        Testa se respostas de uma transação que terminou depois, com ids menores
+        que os já processados, ainda entram nas estatísticas
+        """
+        from .analytics import atualizar_estatisticas
+
+        self._tentativa(True, True)
+        self._tentativa(False, False)
+        atrasadas = list(RespostaResultado.objects.order_by('pk')[:2])
+        RespostaResultado.objects.filter(pk__in=[resposta.pk for resposta in atrasadas]).delete()
+        self.assertEqual(atualizar_estatisticas(), (2, 2))
+
+        # Mesmos ids, gravados só agora
+        RespostaResultado.objects.bulk_create(atrasadas)
+        self.assertEqual(atualizar_estatisticas(), (2, 2))
+        self.assertEqual(EstatisticaPergunta.objects.get(pergunta=self.p1).tentativas, 2)
+        self.assertEqual(atualizar_estatisticas(), (0, 0))
+
+
+class SimulacaoFinanceiraTest(TestCase):
+    """
+    Testes para o motor vetorizado de simulações financeiras
+    """
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def test_poupanca_confere_com_laco(self):
+        """
+        Testa a fórmula fechada da poupança contra o cálculo mês a mês
+        """
+        from .simulation import simular
+
+        resultado = simular('poupanca', {'valor_inicial': 500, 'deposito_mensal': 100, 'taxa_mensal': 1, 'meses': 24})
+        saldo = 500.0
+        for _ in range(24):
+            saldo = saldo * 1.01 + 100
+        self.assertAlmostEqual(resultado['resumo']['saldo_final'][0], round(saldo, 2), places=2)
+
+    def test_varredura_de_parametros(self):
+        """
+        Testa se listas de parâmetros geram todas as combinações, com séries cortadas no horizonte
+        """
+        from .simulation import simular
+
+        resultado = simular('parcelamento', {'taxa_mensal': [0, 2], 'parcelas': [3, 12]})
+        self.assertEqual(len(resultado['cenarios']), 4)
+        self.assertEqual(resultado['resumo']['parcela'][0], 333.33)
+        self.assertEqual(len(resultado['series']['saldo_devedor'][0]), 13)
+        self.assertIsNone(resultado['series']['saldo_devedor'][0][4])
+        self.assertGreater(resultado['resumo']['juros_totais'][3], resultado['resumo']['juros_totais'][2])
+
+    def test_resultado_em_cache_pelo_hash(self):
+        """
+        Testa se a mesma combinação de parâmetros é calculada uma única vez
+        """
+        from unittest import mock
+        from . import simulation
+
+        with mock.patch.object(simulation, 'calcular', wraps=simulation.calcular) as calcular:
+            simulation.simular('cartao_credito', {'saldo_inicial': 2000})
+            simulation.simular('cartao_credito', {'saldo_inicial': '2000'})
+        self.assertEqual(calcular.call_count, 1)
+
+    def test_api_valida_parametros(self):
+        """
+        Testa a API de simulação com parâmetros válidos e inválidos
+        """
+        User.objects.create_user(username='aluno', password='testpass123')
+        self.client.login(username='aluno', password='testpass123')
+
+        url = reverse('api_simulacao', args=['juros_compostos'])
+        dados = self.client.get(url, {'taxa_mensal': '1,2', 'meses': '12'}).json()
+        self.assertEqual(len(dados['resumo']['saldo_final']), 2)
+
+        response = self.client.get(url, {'meses': '9999'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('api_simulacao', args=['loteria']))
+        self.assertEqual(response.status_code, 400)
+
+
+class DilemaTest(TestCase):
+    """
+    Testes para o motor de dilemas com grafo compilado
+    """
+
+    def setUp(self):
+        """
+        Cria um dilema: inicio -> (poupar | gastar); gastar -> (dividir | parcelar)
+        """
+        from django.core.cache import cache
+        cache.clear()
+
+        self.user = User.objects.create_user(username='aluno', password='testpass123')
+        self.estudante = Estudante.objects.create(user=self.user, nome='Aluno Teste')
+        modulo = Modulo.objects.create(nome='Consumo', descricao='...', slug='consumo')
+        self.desafio = Desafio.objects.create(
+            modulo=modulo, titulo='O celular novo', descricao='...', tipo='dilema', pontos_base=50
+        )
+        etapa = lambda chave, **extra: EtapaDilema.objects.create(desafio=self.desafio, chave=chave, texto=chave, **extra)
+        self.inicio = etapa('inicio', inicial=True)
+        self.gastar = etapa('gastar')
+        self.poupar = etapa('poupar', pontos=30)
+        self.dividida = etapa('dividida', pontos=10)
+        self.parcelada = etapa('parcelada')
+        EscolhaDilema.objects.create(etapa=self.inicio, destino=self.poupar, texto='Poupar', pontos=20, ordem=1)
+        EscolhaDilema.objects.create(etapa=self.inicio, destino=self.gastar, texto='Comprar', ordem=2)
+        EscolhaDilema.objects.create(etapa=self.gastar, destino=self.dividida, texto='À vista', ordem=1)
+        EscolhaDilema.objects.create(
+            etapa=self.gastar, destino=self.parcelada, texto='Parcelar', consequencia='Juros!', pontos=-5, ordem=2
+        )
+
+    def test_compila_grafo_imutavel(self):
+        """
+        Testa a ordem das etapas a partir da inicial e os finais
+        """
+        from .dilemma import compilar
+
+        grafo = compilar(self.desafio.pk)
+        self.assertEqual(grafo.chaves[0], 'inicio')
+        self.assertEqual(len(grafo.chaves), 5)
+        self.assertEqual(grafo.chaves[grafo.escolhas[0][1].destino], 'gastar')
+        self.assertTrue(grafo.final(grafo.chaves.index('poupar')))
+        self.assertFalse(grafo.final(0))
+        self.assertEqual(compilar(self.desafio.pk).assinatura, grafo.assinatura)
+
+    def test_rejeita_ciclos_e_etapas_inalcancaveis(self):
+        """
+        Testa a validação de ciclos e de etapas fora do percurso
+        """
+        from .dilemma import GrafoInvalido, compilar
+
+        EscolhaDilema.objects.create(etapa=self.parcelada, destino=self.inicio, texto='Voltar')
+        EtapaDilema.objects.create(desafio=self.desafio, chave='solta', texto='...')
+        with self.assertRaises(GrafoInvalido) as contexto:
+            compilar(self.desafio.pk)
+        self.assertIn('ciclo', str(contexto.exception))
+        self.assertIn('solta', str(contexto.exception))
+
+    def test_passo_e_consulta_direta(self):
+        """
+        Testa que, com o grafo em memória, um passo só lê e grava o estado do estudante
+        """
+        from .dilemma import carregar_estado, escolher, percurso
+
+        grafo, estado = carregar_estado(self.estudante, self.desafio.pk)
+        with self.assertNumQueries(4):  # savepoint, estado com trava, gravação, liberação
+            grafo, estado, escolha = escolher(self.estudante, self.desafio.pk, 1)
+        self.assertEqual(grafo.chaves[estado.etapa_atual], 'gastar')
+        self.assertEqual(bytes(EstadoDilema.objects.get().caminho), b'\x01')
+
+        grafo, estado, escolha = escolher(self.estudante, self.desafio.pk, 1)
+        self.assertEqual(escolha.consequencia, 'Juros!')
+        self.assertTrue(estado.concluido)
+        self.assertEqual(percurso(grafo, estado.caminho), ['inicio', 'gastar', 'parcelada'])
+        self.assertTrue(ProgressoDesafio.objects.get(estudante=self.estudante, desafio=self.desafio).concluido)
+
+    def test_api_pontua_apenas_na_primeira_conclusao(self):
+        """
+        Testa o percurso pela API, reinício e pontuação única
+        """
+        self.client.login(username='aluno', password='testpass123')
+        url = reverse('api_dilema', args=[self.desafio.pk])
+
+        dados = self.client.get(url).json()
+        self.assertEqual([escolha['texto'] for escolha in dados['escolhas']], ['Poupar', 'Comprar'])
+
+        dados = self.client.post(url, {'escolha': 0}, content_type='application/json').json()
+        self.assertTrue(dados['concluido'])
+        self.assertEqual(dados['pontos'], 50)
+        self.assertEqual(Pontuacao.objects.get(estudante=self.estudante).pontos_totais, 50)
+
+        response = self.client.post(url, {'escolha': 0}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        self.client.post(url, {'reiniciar': True}, content_type='application/json')
+        self.client.post(url, {'escolha': 0}, content_type='application/json')
+        self.assertEqual(Pontuacao.objects.get(estudante=self.estudante).pontos_totais, 50)
+
+    def test_edicao_reinicia_percursos_antigos(self):
+        """
+        Testa que alterar o grafo invalida o compilado e reinicia percursos em andamento
+        """
+        from .dilemma import carregar_estado, escolher
+
+        escolher(self.estudante, self.desafio.pk, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            novo = EtapaDilema.objects.create(desafio=self.desafio, chave='emprestimo', texto='...')
+            EscolhaDilema.objects.create(etapa=self.gastar, destino=novo, texto='Pedir emprestado', ordem=3)
+
+        grafo, estado = carregar_estado(self.estudante, self.desafio.pk)
+        self.assertEqual(len(grafo.chaves), 6)
+        self.assertEqual(estado.etapa_atual, 0)
+        self.assertEqual(bytes(estado.caminho), b'')
+
+
+class LivroPontuacaoTest(TestCase):
+    """
+    Testes para o livro-razão de pontos e as atualizações atômicas
+    """
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+        self.user = User.objects.create_user(username='aluno', password='testpass123')
+        self.estudante = Estudante.objects.create(user=self.user, nome='Aluno Teste')
+
+    def test_incremento_no_banco_nao_perde_pontos(self):
+        """
+        Testa que dois lançamentos somam no banco mesmo com uma cópia desatualizada em memória
+        """
+        from .scoring import registrar_pontos
+
+        registrar_pontos(self.estudante, 60, 'quiz:1')
+        desatualizada = Pontuacao.objects.get(estudante=self.estudante)
+        registrar_pontos(self.estudante, 70, 'quiz:2')
+
+        pontuacao = Pontuacao.objects.get(estudante=self.estudante)
+        self.assertEqual(desatualizada.pontos_totais, 60)
+        self.assertEqual(pontuacao.pontos_totais, 130)
+        self.assertEqual(pontuacao.nivel_atual, pontuacao.calcular_nivel())
+        self.assertEqual(
+            list(EventoPontuacao.objects.order_by('pk').values_list('origem', 'delta')),
+            [('quiz:1', 60), ('quiz:2', 70)]
+        )
+
+    def test_invalida_ranking_apos_commit(self):
+        """
+        Testa que a versão do ranking só sobe quando a transação é confirmada
+        """
+        from .scoring import registrar_pontos
+        from .versioning import versao_global
+
+        Pontuacao.objects.create(estudante=self.estudante)
+        antes = versao_global('ranking')
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_pontos(self.estudante, 10, 'quiz:1')
+            self.assertEqual(versao_global('ranking'), antes)
+        self.assertNotEqual(versao_global('ranking'), antes)
+
+    def test_reconciliacao_corrige_divergencias(self):
+        """
+        Testa que a reconciliação ajusta o total e o nível pela soma dos lançamentos
+        """
+        from .scoring import reconciliar, registrar_pontos
+
+        registrar_pontos(self.estudante, 250, 'dilema:1')
+        Pontuacao.objects.filter(estudante=self.estudante).update(pontos_totais=999, nivel_atual=10)
+
+        self.assertEqual(reconciliar(corrigir=False), [(self.estudante.pk, 999, 250)])
+        self.assertEqual(reconciliar(), [(self.estudante.pk, 999, 250)])
+        pontuacao = Pontuacao.objects.get(estudante=self.estudante)
+        self.assertEqual((pontuacao.pontos_totais, pontuacao.nivel_atual), (250, 3))
+        self.assertEqual(reconciliar(), [])
+
+    def test_compactacao_preserva_soma(self):
+        """
+        Testa a compactação dos lançamentos antigos pelo comando de manutenção
+        """
+        from datetime import timedelta
+        from io import StringIO
+        from django.core.management import call_command
+        from django.utils import timezone
+        from .scoring import compactar, registrar_pontos
+
+        for delta in (10, 20, -5):
+            evento = registrar_pontos(self.estudante, delta, 'quiz:1')
+            EventoPontuacao.objects.filter(pk=evento.pk).update(data=timezone.now() - timedelta(days=400))
+        registrar_pontos(self.estudante, 7, 'quiz:2')
+        self.assertEqual(compactar(timezone.now() - timedelta(days=800)), (0, 0))
+
+        saida = StringIO()
+        call_command('compactar_pontuacoes', '--dias', '365', stdout=saida)
+        self.assertIn('3 lançamentos compactados em 1', saida.getvalue())
+        self.assertEqual(
+            sorted(EventoPontuacao.objects.values_list('origem', 'delta')),
+            [('compactacao', 25), ('quiz:2', 7)]
+        )
+        self.assertEqual(Pontuacao.objects.get(estudante=self.estudante).pontos_totais, 32)
+
+
+class CurvaNiveisTest(TestCase):
+    """
+    Testes para a curva de níveis configurável
+    """
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+        self.user = User.objects.create_user(username='aluno', password='testpass123')
+        self.estudante = Estudante.objects.create(user=self.user, nome='Aluno Teste')
+
+    def _nova_curva(self):
+        NivelPontuacao.objects.all().delete()
+        NivelPontuacao.objects.bulk_create([
+            NivelPontuacao(nivel=1, pontos_minimos=0, nome='Iniciante'),
+            NivelPontuacao(nivel=2, pontos_minimos=50, nome='Poupador'),
+            NivelPontuacao(nivel=3, pontos_minimos=200, nome='Investidor'),
+        ])
+        from .versioning import incrementar_versao_global
+        incrementar_versao_global('niveis')
+
+    def test_curva_padrao_mantem_regra_anterior(self):
+        """
+        Testa a curva criada pela migração (100 pontos por nível, até o 100)
+        """
+        from .levels import nivel_para, progresso
+
+        self.assertEqual(nivel_para(0), 1)
+        self.assertEqual(nivel_para(250), 3)
+        self.assertEqual(nivel_para(10 ** 6), 100)
+        self.assertEqual(progresso(250), {
+            'nivel': 3, 'nome': '', 'pontos_nivel': 200, 'pontos_proximo': 300, 'faltam': 50, 'percentual': 50,
+        })
+
+    def test_curva_configurada_e_carregada_uma_vez(self):
+        """
+        Testa buscas na curva da tabela sem consultar o banco a cada chamada
+        """
+        from .levels import nivel_para, progresso
+
+        self._nova_curva()
+        self.assertEqual(nivel_para(49), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(nivel_para(50), 2)
+            self.assertEqual(progresso(125)['percentual'], 50)
+            self.assertEqual(progresso(500)['faltam'], None)
+            self.assertEqual(progresso(500)['nome'], 'Investidor')
+
+    def test_renivelamento_em_massa(self):
+        """
+        Testa que o comando renivelar atualiza os níveis com a nova curva
+        """
+        from io import StringIO
+        from django.core.management import call_command
+        from .scoring import registrar_pontos
+
+        registrar_pontos(self.estudante, 120, 'quiz:1')
+        self.assertEqual(Pontuacao.objects.get(estudante=self.estudante).nivel_atual, 2)
+        self._nova_curva()
+        registrar_pontos(self.estudante, 100, 'quiz:2')
+        self.assertEqual(Pontuacao.objects.get(estudante=self.estudante).nivel_atual, 3)
+
+        Pontuacao.objects.filter(estudante=self.estudante).update(nivel_atual=7)
+        saida = StringIO()
+        call_command('renivelar', stdout=saida)
+        self.assertIn('1 pontuações', saida.getvalue())
+        self.assertEqual(Pontuacao.objects.get(estudante=self.estudante).nivel_atual, 3)
+
+    def test_dashboard_mostra_pontos_para_o_proximo_nivel(self):
+        """
+        Testa a barra de progresso do nível no dashboard
+        """
+        from .scoring import registrar_pontos
+
+        self._nova_curva()
+        registrar_pontos(self.estudante, 125, 'quiz:1')
+        self.client.login(username='aluno', password='testpass123')
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, 'width: 50%')
+        self.assertContains(response, 'Faltam 75 pontos para o nível 3')
+        self.assertContains(response, 'Poupador')
+
+
+class ViewsAssincronasTest(TestCase):
+    """
+    Testes para as variantes assíncronas do dashboard, ranking e estatísticas
+    """
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+        self.user = User.objects.create_user(username='aluno', password='testpass123')
+        self.estudante = Estudante.objects.create(user=self.user, nome='Aluno Assíncrono')
+        Pontuacao.objects.create(estudante=self.estudante, pontos_totais=150)
+        Conquista.objects.create(nome='Primeiros Passos', descricao='...', criterio_pontos=500)
+
+    async def test_dashboard_async_igual_ao_sincrono(self):
+        """
+        Testa que o dashboard async renderiza os mesmos dados e responde 304 quando nada mudou
+        """
+        from django.test import AsyncClient
+
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await client.get(reverse('dashboard_async'))
+        self.assertEqual(response.status_code, 200)
+        conteudo = response.content.decode()
+        self.assertIn('Aluno Assíncrono', conteudo)
+        self.assertIn('Faltam 50 pontos para o nível 3', conteudo)
+        self.assertIn('Primeiros Passos', conteudo)
+
+        response = await client.get(reverse('dashboard_async'), headers={'if-none-match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_ranking_e_estatisticas_async(self):
+        """
+        Testa as páginas de ranking e estatísticas servidas pelas views async
+        """
+        from django.test import AsyncClient
+
+        client = AsyncClient()
+        response = await client.get(reverse('ranking_async'))
+        self.assertEqual(response.status_code, 302)
+
+        await client.aforce_login(self.user)
+        response = await client.get(reverse('ranking_async'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+        response = await client.get(reverse('estatisticas_async'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_pontos'], 150)
+        self.assertEqual(response.context['total_estudantes'], 1)
+
+    async def test_pilha_de_middlewares_sem_troca_de_thread(self):
+        """
+        Testa que os middlewares do projeto rodam async sob ASGI e mantêm saúde,
+        perfil e log de queries lentas funcionando
+        """
+        import tempfile
+        from asgiref.sync import iscoroutinefunction
+        from django.conf import settings
+        from django.test import AsyncClient
+        from django.utils.module_loading import import_string
+        from . import querylog
+        from .profiling import listar_capturas
+
+        async def get_response(request):
+            return None
+
+        for caminho in settings.MIDDLEWARE:
+            if caminho.startswith('game.'):
+                self.assertTrue(iscoroutinefunction(import_string(caminho)(get_response)), caminho)
+
+        client = AsyncClient()
+        response = await client.get('/saude/vivo/')
+        self.assertEqual(response['Cache-Control'], 'no-store')
+
+        self.user.is_staff = True
+        await self.user.asave()
+        await client.aforce_login(self.user)
+        querylog.limpar()
+        self.addCleanup(querylog.limpar)
+        with tempfile.TemporaryDirectory() as diretorio, self.settings(PERFIL_DIRETORIO=diretorio, CONSULTA_LENTA_MS=0):
+            with self.assertLogs('game.querylog', 'WARNING'):
+                response = await client.get(reverse('dashboard_async'), headers={'x-perfil': '1'})
+            captura, = listar_capturas()
+        self.assertEqual(captura['nome'], response['X-Perfil'])
+        self.assertGreater(captura['total_queries'], 0)
+        self.assertIn('game.async_views.dashboard_async', {registro['view'] for registro in querylog.recentes()})
+
+
+class BuscaTextualTest(TestCase):
+    """
+    Testes para a busca textual em quizzes, perguntas e módulos
+    """
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+        self.user = User.objects.create_user(username='aluno', password='testpass123')
+        self.quiz = Quiz.objects.create(
+            titulo='Juros Compostos', descricao='Entenda como o dinheiro cresce com o tempo',
+            tema='Investimentos', nivel_dificuldade=2
+        )
+        self.outro = Quiz.objects.create(
+            titulo='Orçamento Familiar', descricao='Planeje as despesas e evite juros do cartão',
+            tema='Planejamento', nivel_dificuldade=1
+        )
+        self.pergunta = Pergunta.objects.create(
+            quiz=self.outro, texto='Qual é a melhor forma de pagar a fatura do cartão de crédito?', ordem=1
+        )
+        self.modulo = Modulo.objects.create(
+            nome='Poupança', descricao='Guardar dinheiro para objetivos', slug='poupanca'
+        )
+
+    def test_resultados_ordenados_com_destaque(self):
+        """
+        Testa a relevância (título pesa mais) e o trecho destacado
+        """
+        from .search import buscar
+
+        resultados = buscar('juros')
+        self.assertEqual([(r['tipo'], r['id']) for r in resultados], [('quiz', self.quiz.pk), ('quiz', self.outro.pk)])
+        self.assertIn('<mark>Juros</mark>', resultados[0]['trecho'])
+        self.assertGreater(resultados[0]['relevancia'], resultados[1]['relevancia'])
+
+    def test_prefixo_acentos_e_tipos(self):
+        """
+        Testa busca por prefixo, sem acentos, e o filtro por tipo
+        """
+        from .search import buscar
+
+        self.assertEqual([r['tipo'] for r in buscar('poupanca')], ['modulo'])
+        resultados = buscar('cart', tipos=['pergunta'])
+        self.assertEqual([(r['tipo'], r['id'], r['quiz_id']) for r in resultados], [('pergunta', self.pergunta.pk, self.outro.pk)])
+        self.assertEqual(resultados[0]['titulo'], 'Orçamento Familiar')
+
+    def test_indice_incremental(self):
+        """
+        Testa que salvar e excluir atualizam o índice, e que inativos não aparecem
+        """
+        from .search import buscar
+
+        self.quiz.titulo = 'Rendimentos'
+        self.quiz.save()
+        self.assertEqual([r['id'] for r in buscar('rendimentos')], [self.quiz.pk])
+        self.assertEqual([r['id'] for r in buscar('compostos')], [])
+
+        self.outro.ativo = False
+        self.outro.save()
+        self.assertEqual(buscar('fatura'), [])
+
+        self.modulo.delete()
+        self.assertEqual(buscar('poupança'), [])
+
+    def test_entrada_nao_vira_sintaxe_e_html_escapado(self):
+        """
+        Testa que operadores da consulta são ignorados e o texto indexado é escapado
+        """
+        from .search import buscar
+
+        Quiz.objects.create(titulo='<b>Juros</b> simples', descricao='...', tema='x', nivel_dificuldade=1)
+        self.assertEqual(buscar('" OR * NEAR('), [])
+        trechos = [r['trecho'] for r in buscar('simples')]
+        self.assertEqual(trechos, ['&lt;b&gt;Juros&lt;/b&gt; <mark>simples</mark>'])
+
+    def test_pagina_api_e_admin(self):
+        """
+        Testa a página de busca, a API e a busca do admin pelo índice
+        """
+        self.client.login(username='aluno', password='testpass123')
+        response = self.client.get(reverse('busca'), {'q': 'juros'})
+        self.assertContains(response, '<mark>Juros</mark>')
+
+        dados = self.client.get(reverse('api_busca'), {'q': 'dinheiro', 'tipos': 'modulo'}).json()
+        self.assertEqual([r['slug'] for r in dados['results']], ['poupanca'])
+
+        User.objects.create_superuser('admin', 'admin@example.com', 'adminpass')
+        self.client.login(username='admin', password='adminpass')
+        response = self.client.get('/admin/game/pergunta/', {'q': 'orçamento'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.pergunta])
+
+
+class ReplicaRoteamentoTest(TestCase):
+    """
+    Testes para o roteamento de leituras para réplicas
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='aluno', password='testpass123')
+        self.estudante = Estudante.objects.create(user=self.user, nome='Aluno Réplica', escola='Escola X')
+        Pontuacao.objects.create(estudante=self.estudante, pontos_totais=320)
+
+    def test_router_le_da_replica_somente_quando_permitido(self):
+        """
+        Testa que só leituras de modelos do game dentro de leitura_replica vão para a réplica
+        """
+        from django.contrib.sessions.models import Session
+        from django.test import override_settings
+        from .routers import ReplicaRouter, estado_requisicao, leitura_replica
+
+        router = ReplicaRouter()
+        with override_settings(DATABASE_REPLICAS=['replica1']):
+            self.assertEqual(router.db_for_read(Pontuacao), 'default')
+            with leitura_replica():
+                self.assertEqual(router.db_for_read(Pontuacao), 'replica1')
+                self.assertEqual(router.db_for_read(User), 'default')
+                self.assertEqual(router.db_for_read(Session), 'default')
+
+            # Depois de uma escrita a requisição passa a ler do principal
+            with leitura_replica() as estado:
+                router.db_for_write(Session)
+                self.assertEqual(router.db_for_read(Pontuacao), 'replica1')
+                router.db_for_write(Pontuacao)
+                self.assertTrue(estado.escreveu)
+                self.assertEqual(router.db_for_read(Pontuacao), 'default')
+
+            # Navegador fixado no principal pelo cookie
+            with estado_requisicao(fixado=True), leitura_replica():
+                self.assertEqual(router.db_for_read(Pontuacao), 'default')
+
+            self.assertFalse(router.allow_migrate('replica1', 'game'))
+            self.assertIsNone(router.allow_migrate('default', 'game'))
+        with leitura_replica():
+            self.assertEqual(router.db_for_read(Pontuacao), 'default')
+
+    def test_middleware_fixa_no_principal_depois_de_escrita(self):
+        """
+        Testa que o cookie de fixação só é gravado após escritas e com réplicas configuradas
+        """
+        from django.test import override_settings
+        from .routers import COOKIE_PRIMARIO
+
+        response = self.client.post(reverse('login'), {'username': 'aluno', 'password': 'testpass123'})
+        self.assertNotIn(COOKIE_PRIMARIO, response.cookies)
+
+        with override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_ATRASO_MAXIMO=3):
+            response = self.client.post(reverse('login'), {'username': 'aluno', 'password': 'testpass123'})
+            self.assertEqual(response.cookies[COOKIE_PRIMARIO]['max-age'], 3)
+            self.client.cookies.pop(COOKIE_PRIMARIO)
+
+            response = self.client.get(reverse('busca'))
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn(COOKIE_PRIMARIO, response.cookies)
+
+    def test_exportacao_csv_do_ranking(self):
+        """
+        Testa a exportação do ranking em CSV, restrita à equipe
+        """
+        self.client.login(username='aluno', password='testpass123')
+        self.assertEqual(self.client.get(reverse('exportar_ranking')).status_code, 302)
+
+        User.objects.create_superuser('admin', 'admin@example.com', 'adminpass')
+        self.client.login(username='admin', password='adminpass')
+        response = self.client.get(reverse('exportar_ranking'))
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        linhas = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(linhas, ['posicao,nome,escola,serie,pontos,nivel', '1,Aluno Réplica,Escola X,,320,4'])
+
+
+class CacheCompartilhadoTest(TestCase):
+    """
+    Testes para o cache de dados compartilhados com proteção contra estouro de manada
+    """
+
+    def setUp(self):
+        from django.core.cache import cache
+        from . import caching
+        cache.clear()
+        caching.limpar_local()
+        self.calculos = 0
+
+    def calcular(self):
+        self.calculos += 1
+        return self.calculos
+
+    def test_lru_local_e_versao(self):
+        """
+        Testa que o LRU do processo evita o cache compartilhado e que a versão invalida
+        """
+        from unittest import mock
+        from django.core.cache import cache
+        from . import caching
+
+        self.assertEqual(caching.obter('x', self.calcular, versao=1), 1)
+        cache.delete(caching._chave('x'))
+        self.assertEqual(caching.obter('x', self.calcular, versao=1), 1)
+        self.assertEqual(caching.obter('x', self.calcular, versao=2), 2)
+
+        with mock.patch.object(caching, 'MAX_LOCAL', 2):
+            caching.obter('y', self.calcular)
+            caching.obter('z', self.calcular)
+            self.assertNotIn('x', caching._local)
+
+    def test_recalculo_unico_serve_valor_obsoleto(self):
+        """
+        Testa que, com a trava de outro processo, o valor anterior é servido sem recalcular
+        """
+        from unittest import mock
+        from django.core.cache import cache
+        from . import caching
+
+        caching.obter('topo', self.calcular, versao=1, local=False)
+        cache.add(caching._chave('topo') + ':trava', 1)
+        self.assertEqual(caching.obter('topo', self.calcular, versao=2, local=False), 1)
+        self.assertEqual(self.calculos, 1)
+
+        # Sem valor obsoleto aceitável: espera a trava vencer e só então calcula, com a trava
+        cache.delete(caching._chave('topo') + ':trava')
+        cache.add(caching._chave('topo') + ':trava', 1, 0.2)
+        self.assertEqual(caching.obter('topo', self.calcular, versao=2, obsoleto=False, local=False), 2)
+        self.assertIsNone(cache.get(caching._chave('topo') + ':trava'))
+
+        self.assertEqual(caching.obter('topo', self.calcular, versao=3, local=False), 3)
+
+    def test_trava_liberada_sem_valor_passa_para_quem_espera(self):
+        """
+        Testa que, se quem calculava falhar, um dos que esperam pega a trava e calcula
+        """
+        import asyncio
+        import threading
+        from django.core.cache import cache
+        from . import caching
+
+        trava = caching._chave('topo') + ':trava'
+        cache.add(trava, 1)
+        threading.Timer(0.1, cache.delete, args=[trava]).start()
+        self.assertEqual(caching.obter('topo', self.calcular, versao=1, obsoleto=False, local=False), 1)
+        self.assertIsNone(cache.get(trava))
+
+        # A espera assíncrona também aguarda a trava vencer em vez de calcular sem ela
+        cache.add(trava, 1, 0.2)
+        valor = asyncio.run(caching.aobter('topo', self.calcular, versao=2, obsoleto=False, local=False))
+        self.assertEqual(valor, 2)
+
+    def test_calculo_lento_feito_uma_vez(self):
+        """
+        Testa que, numa chave fria com cálculo lento, quem espera não recalcula
+        """
+        import threading
+        import time
+        from . import caching
+
+        def lento():
+            time.sleep(0.3)
+            return self.calcular()
+
+        valores = []
+        threads = [
+            threading.Thread(target=lambda: valores.append(caching.obter('frio', lento, obsoleto=False, local=False)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(valores, [1] * 4)
+        self.assertEqual(self.calculos, 1)
+
+    def test_trava_vencida_nao_e_apagada_por_quem_a_perdeu(self):
+        """
+        Testa que um cálculo que passou do TIMEOUT_TRAVA não apaga a trava de outro processo
+        """
+        from django.core.cache import cache
+        from . import caching
+
+        trava = caching._chave('topo') + ':trava'
+
+        def demorado():
+            # A trava venceu e outro processo a pegou enquanto este calculava
+            cache.delete(trava)
+            cache.add(trava, 'outro')
+            return self.calcular()
+
+        self.assertEqual(caching.obter('topo', demorado, local=False), 1)
+        self.assertEqual(cache.get(trava), 'outro')
+
+    def test_expiracao_antecipada_probabilistica(self):
+        """
+        Testa que entradas caras perto do vencimento podem ser recalculadas antes da hora
+        """
+        from unittest import mock
+        from . import caching
+
+        envelope = (1, 'valor', 100.0, 2.0)
+        with mock.patch('game.caching.random.random', return_value=0.0):
+            self.assertTrue(caching._fresco(envelope, 1, 99.0))
+        with mock.patch('game.caching.random.random', return_value=0.9):
+            # -log(0.1) * 2s ~= 4.6s de antecipação
+            self.assertFalse(caching._fresco(envelope, 1, 96.0))
+            self.assertTrue(caching._fresco(envelope, 1, 90.0))
+        self.assertFalse(caching._fresco(envelope, 2, 0.0))
+
+    def test_estatisticas_e_ranking_em_cache(self):
+        """
+        Testa que as estatísticas gerais e o topo do ranking são calculados uma vez por versão
+        """
+        from . import queries
+        from .versioning import incrementar_versao_global
+
+        user = User.objects.create_user(username='aluno', password='testpass123')
+        estudante = Estudante.objects.create(user=user, nome='Aluno Cache')
+        Pontuacao.objects.create(estudante=estudante, pontos_totais=120)
+
+        self.assertEqual(queries.estatisticas_gerais()['total_pontos'], 120)
+        self.assertEqual(queries.topo_ranking()['itens'][0]['nome'], 'Aluno Cache')
+        with self.assertNumQueries(0):
+            queries.estatisticas_gerais()
+            queries.topo_ranking()
+
+        Pontuacao.objects.filter(estudante=estudante).update(pontos_totais=200)
+        incrementar_versao_global('ranking')
+        self.assertEqual(queries.estatisticas_gerais()['media_pontos'], 200)
+
+
+class PerfilamentoTest(TestCase):
+    """
+    Testes para o perfilamento sob demanda de requisições
+    """
+
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+        configuracao = override_settings(PERFIL_DIRETORIO=self.diretorio.name, PERFIL_AMOSTRAGEM=0)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        self.staff = User.objects.create_user(username='equipe', password='testpass123', is_staff=True)
+        self.aluno = User.objects.create_user(username='aluno', password='testpass123')
+
+    def test_equipe_pede_perfil_e_ve_capturas(self):
+        """
+        Testa a captura pedida pela equipe, a listagem e o detalhe com pstats e queries
+        """
+        from .profiling import listar_capturas
+
+        self.client.login(username='aluno', password='testpass123')
+        response = self.client.get(reverse('ranking'), {'_perfil': '1'})
+        self.assertNotIn('X-Perfil', response)
+        self.assertEqual(listar_capturas(), [])
+        self.assertEqual(self.client.get(reverse('perfis')).status_code, 302)
+
+        from django.core.cache import cache
+        from . import caching
+        cache.clear()
+        caching.limpar_local()
+
+        self.client.login(username='equipe', password='testpass123')
+        response = self.client.get(reverse('ranking'), HTTP_X_PERFIL='1')
+        nome = response['X-Perfil']
+        self.assertTrue(os.path.exists(os.path.join(self.diretorio.name, nome + '.prof')))
+
+        captura, = listar_capturas()
+        self.assertEqual((captura['rota'], captura['usuario'], captura['origem']), ('ranking', 'equipe', 'equipe'))
+        self.assertGreater(captura['total_queries'], 0)
+
+        response = self.client.get(reverse('perfis'))
+        self.assertContains(response, reverse('perfil_detalhe', args=[nome]))
+        response = self.client.get(reverse('perfil_detalhe', args=[nome]))
+        self.assertContains(response, 'function calls')
+        self.assertContains(response, 'ranking_view')
+        self.assertContains(response, 'game_pontuacao')
+        self.assertFalse(os.path.exists(os.path.join(self.diretorio.name, nome + '.html')))
+        response = self.client.get(reverse('perfil_arquivo', args=[nome, 'prof']))
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="{nome}.prof"')
+        self.assertEqual(self.client.get(reverse('perfil_arquivo', args=[nome, 'json'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('perfil_detalhe', args=['..'])).status_code, 404)
+
+    def test_perfil_por_amostragem_sem_cprofile(self):
+        """
+        Testa que o pyinstrument, quando pedido, roda sozinho e grava amostras da view
+        """
+        from .profiling import ProfilerAmostragem, listar_capturas
+
+        if ProfilerAmostragem is None:
+            self.skipTest('pyinstrument não instalado')
+        self.client.login(username='equipe', password='testpass123')
+        response = self.client.get(reverse('ranking'), {'_perfil': 'amostragem'})
+        nome = response['X-Perfil']
+        self.assertFalse(os.path.exists(os.path.join(self.diretorio.name, nome + '.prof')))
+        captura, = listar_capturas()
+        self.assertEqual(captura['profiler'], 'amostragem')
+        with open(os.path.join(self.diretorio.name, nome + '.html'), encoding='utf-8') as arquivo:
+            self.assertIn('ranking_view', arquivo.read())
+        self.assertContains(self.client.get(reverse('perfil_detalhe', args=[nome])), 'Abrir o relatório do pyinstrument')
+        response = self.client.get(reverse('perfil_arquivo', args=[nome, 'html']))
+        self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+
+    def test_amostragem_e_rotacao(self):
+        """
+        Testa que a amostragem perfila requisições anônimas e só as últimas capturas ficam
+        """
+        from .profiling import listar_capturas
+
+        with self.settings(PERFIL_AMOSTRAGEM=1.0, PERFIL_MAX_CAPTURAS=2):
+            for _ in range(3):
+                response = self.client.get(reverse('login'))
+                self.assertNotIn('X-Perfil', response)
+        capturas = listar_capturas()
+        self.assertEqual(len(capturas), 2)
+        self.assertEqual({captura['origem'] for captura in capturas}, {'amostra'})
+        self.assertEqual(len(os.listdir(self.diretorio.name)), 4)
+
+
+class MemoriaTest(TestCase):
+    """
+    Testes para a instrumentação de memória dos workers
+    """
+
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+        from . import memory
+
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+        configuracao = override_settings(MEMORIA_DIRETORIO=self.diretorio.name, MEMORIA_LIMITE_MB=0)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        self.addCleanup(memory.parar)
+        memory.zerar_rotas()
+
+        User.objects.create_user(username='equipe', password='testpass123', is_staff=True)
+
+    def test_endpoint_da_equipe(self):
+        """
+        Testa o crescimento por rota, os snapshots e a comparação pelo endpoint
+        """
+        self.assertEqual(self.client.get(reverse('memoria')).status_code, 302)
+        self.client.login(username='equipe', password='testpass123')
+        self.client.get(reverse('login'))
+
+        dados = self.client.get(reverse('memoria')).json()
+        self.assertFalse(dados['rastreando'])
+        self.assertIn('login', [linha['rota'] for linha in dados['rotas']])
+
+        antes = self.client.post(reverse('memoria'), {'acao': 'capturar', 'rotulo': 'antes'}).json()['snapshot']
+        retidos = [bytearray(64 * 1024) for _ in range(16)]
+        depois = self.client.post(reverse('memoria'), {'acao': 'capturar'}).json()['snapshot']
+        self.assertTrue(os.path.exists(os.path.join(self.diretorio.name, antes + '.snap')))
+
+        dados = self.client.get(reverse('memoria'), {'snapshot': depois, 'antes': antes, 'depois': depois}).json()
+        self.assertTrue(dados['rastreando'])
+        self.assertEqual(dados['snapshots']['processo'], [antes, depois])
+        self.assertTrue(dados['principais'])
+        self.assertIn('tests.py', dados['diferencas'][0]['site'])
+        self.assertGreaterEqual(dados['diferencas'][0]['diferenca_kb'], 1024)
+        del retidos
+
+        self.assertEqual(self.client.get(reverse('memoria'), {'snapshot': '../x'}).status_code, 404)
+        self.assertEqual(self.client.post(reverse('memoria'), {'acao': 'formatar'}).status_code, 400)
+        self.assertFalse(self.client.post(reverse('memoria'), {'acao': 'parar'}).json()['rastreando'])
+
+    def test_disparo_automatico_acima_do_limite(self):
+        """
+        Testa que acima do limite o tracemalloc é ligado e o crescimento vai para o log
+        """
+        with self.settings(MEMORIA_LIMITE_MB=1, MEMORIA_INTERVALO=2), self.assertLogs('game.memory') as logs:
+            for _ in range(3):
+                self.client.get(reverse('login'))
+                self._aguardar_snapshot()
+        self.assertEqual(len(logs.output), 2)
+        self.assertIn('tracemalloc ligado', logs.output[0])
+        self.assertIn('maiores crescimentos', logs.output[1])
+        self.assertEqual(len(os.listdir(self.diretorio.name)), 2)
+
+    def test_snapshots_automaticos_fora_da_requisicao_e_podados(self):
+        """
+        Testa que a requisição não espera o snapshot e que só a base e os últimos ficam em disco
+        """
+        import threading
+        from unittest import mock
+        from . import memory
+
+        threads = []
+        capturar = memory.capturar
+
+        def capturar_registrando(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return capturar(*args, **kwargs)
+
+        with self.settings(MEMORIA_LIMITE_MB=1, MEMORIA_INTERVALO=1, MEMORIA_AUTOMATICOS=2), self.assertLogs('game.memory'):
+            with mock.patch.object(memory, 'capturar', capturar_registrando):
+                for _ in range(5):
+                    self.client.get(reverse('login'))
+                    self._aguardar_snapshot()
+
+        self.assertEqual(threads, ['logicash-memoria'] * 5)
+        base = memory.situacao()['automatico']
+        arquivos = sorted(os.listdir(self.diretorio.name))
+        self.assertEqual(len(arquivos), 3)
+        self.assertIn(base + '.snap', arquivos)
+        self.assertEqual(len(memory.snapshots()['processo']), 3)
+
+    def _aguardar_snapshot(self):
+        import threading
+
+        for thread in threading.enumerate():
+            if thread.name == 'logicash-memoria':
+                thread.join()
+
+    def test_comando_compara_snapshots_gravados(self):
+        """
+        Testa o comando memoria com snapshots gravados por um worker
+        """
+        from io import StringIO
+        from django.core.management import call_command
+        from . import memory
+
+        antes = memory.capturar('antes')
+        retidos = [bytearray(64 * 1024) for _ in range(16)]
+        depois = memory.capturar('depois')
+        saida = StringIO()
+        call_command('memoria', '--comparar', antes, depois, '--limite', '1', stdout=saida)
+        self.assertIn('tests.py', saida.getvalue())
+        del retidos
+
+        saida = StringIO()
+        call_command('memoria', '--listar', stdout=saida)
+        self.assertEqual(saida.getvalue().split(), [antes, depois])
+
+
+class ConsultasLentasTest(TestCase):
+    """
+    Testes para o log de queries lentas com EXPLAIN automático
+    """
+
+    def setUp(self):
+        from . import querylog
+        querylog.limpar()
+        self.addCleanup(querylog.limpar)
+        self.user = User.objects.create_user(username='aluno', password='testpass123')
+        self.estudante = Estudante.objects.create(user=self.user, nome='Aluno Lento')
+
+    def test_impressao_digital(self):
+        """
+        Testa que queries de mesma forma têm a mesma impressão digital
+        """
+        from .querylog import impressao_digital
+
+        self.assertEqual(
+            impressao_digital('SELECT * FROM t WHERE id IN (%s, %s) AND nome = \'a\''),
+            impressao_digital('SELECT *  FROM t WHERE id IN (%s, %s, %s) AND nome = \'b\''),
+        )
+        self.assertNotEqual(impressao_digital('SELECT * FROM t WHERE id = 1'), impressao_digital('SELECT * FROM u WHERE id = 1'))
+
+    def test_registra_view_linha_e_plano_uma_vez(self):
+        """
+        Testa que queries acima do limite são registradas com a view, a linha e o
+        plano de execução apenas na primeira ocorrência de cada forma
+        """
+        from django.core.cache import cache
+        from . import querylog
+
+        self.client.login(username='aluno', password='testpass123')
+        with self.settings(CONSULTA_LENTA_MS=None):
+            self.client.get(reverse('dashboard'))
+        self.assertEqual(querylog.recentes(), [])
+
+        cache.clear()
+        with self.settings(CONSULTA_LENTA_MS=0), self.assertLogs('game.querylog', 'WARNING'):
+            self.client.get(reverse('dashboard'))
+            cache.clear()
+            primeira = len(querylog.recentes())
+            self.client.get(reverse('dashboard'))
+
+        resultados = [r for r in querylog.recentes() if 'FROM "game_resultado"' in r['sql']]
+        self.assertTrue(resultados)
+        self.assertEqual(resultados[0]['view'], 'game.views.dashboard_view')
+        self.assertTrue(resultados[0]['linha'].startswith('game/'))
+        # A ocorrência mais antiga traz o plano; as seguintes, não
+        self.assertIn('game_resultado', resultados[-1]['plano'])
+        self.assertIsNone(resultados[0]['plano'])
+        self.assertEqual(len(querylog.recentes()), 2 * primeira)
+
+        User.objects.create_superuser('admin', 'admin@example.com', 'adminpass')
+        self.client.login(username='admin', password='adminpass')
+        self.assertContains(self.client.get(reverse('perfis')), 'game_resultado')
+
+
+class AquecimentoTest(TestCase):
+    """
+    Testes para o aquecimento do processo antes de receber tráfego
+    """
+
+    def setUp(self):
+        from django.core.cache import cache
+        from . import caching
+        cache.clear()
+        caching.limpar_local()
+
+    def test_aquecer_compila_templates_e_preenche_caches(self):
+        """
+        Testa que todas as etapas rodam e que os caches ficam prontos para a primeira requisição
+        """
+        from . import queries
+        from .warmup import aquecer
+
+        Quiz.objects.create(titulo='Quiz Aquecido', descricao='...', tema='x', nivel_dificuldade=1)
+        with self.assertLogs('game.warmup', 'INFO'):
+            relatorio = {nome: (detalhe, ok) for nome, _, detalhe, ok in aquecer()}
+        self.assertEqual(list(relatorio), ['rotas', 'templates', 'traducoes', 'caches', 'conexoes'])
+        self.assertTrue(all(ok for _, ok in relatorio.values()), relatorio)
+        self.assertIn('1 quizzes', relatorio['caches'][0])
+
+        with self.assertNumQueries(0):
+            queries.estrutura_modulos()
+            queries.topo_ranking()
+            queries.estatisticas_gerais()
+
+    def test_comando_falha_se_uma_etapa_falhar(self):
+        """
+        Testa que o comando relata as etapas e falha quando alguma não completa
+        """
+        from io import StringIO
+        from unittest import mock
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+
+        saida = StringIO()
+        with self.assertLogs('game.warmup', 'INFO'):
+            call_command('aquecer', stdout=saida)
+        self.assertIn('templates', saida.getvalue())
+
+        etapas = (('caches', mock.Mock(side_effect=RuntimeError('cache fora'))),)
+        with mock.patch('game.warmup.ETAPAS', etapas), self.assertLogs('game.warmup'):
+            with self.assertRaises(CommandError):
+                call_command('aquecer', stdout=saida)
+        self.assertIn('RuntimeError: cache fora', saida.getvalue())
+
+
+class SaudeTest(TestCase):
+    def test_vivo_e_pronto_sem_host_sessao_ou_login(self):
+        response = self.client.get('/saude/vivo/', HTTP_HOST='sonda.interna')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'ok')
+        self.assertEqual(response['Cache-Control'], 'no-store')
+        self.assertNotIn('sessionid', response.cookies)
+
+        response = self.client.get('/saude/pronto/', HTTP_HOST='sonda.interna')
+        self.assertEqual(response.status_code, 200)
+        dados = response.json()
+        self.assertEqual(set(dados['verificacoes']), {'banco:default', 'cache'})
+        self.assertTrue(all(verificacao['ok'] for verificacao in dados['verificacoes'].values()))
+
+    def test_pronto_indisponivel_se_falhar_ou_estiver_lento(self):
+        from unittest import mock
+
+        from django.test import override_settings
+
+        with mock.patch('game.health.cache.get', return_value=None):
+            response = self.client.get('/saude/pronto/')
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.json()['verificacoes']['cache']['ok'])
+        self.assertIn('RuntimeError', response.json()['verificacoes']['cache']['erro'])
+
+        with override_settings(SAUDE_LIMITE_MS=-1):
+            response = self.client.get('/saude/pronto/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['status'], 'indisponivel')
+
+    def test_configuracao_do_servidor_e_orcamento_de_conexoes(self):
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        from django.test import override_settings
+
+        from game import checks, server
+
+        with override_settings(SERVIDOR_WORKERS=3, SERVIDOR_THREADS=2, SERVIDOR_MAX_REQUISICOES=1000,
+                               SERVIDOR_TIMEOUT_GRACIOSO=20):
+            opcoes = server.configuracao('127.0.0.1:9000')
+            self.assertEqual((opcoes['workers'], opcoes['threads']), (3, 2))
+            self.assertTrue(opcoes['preload_app'])
+            self.assertEqual((opcoes['max_requests'], opcoes['max_requests_jitter']), (1000, 100))
+            self.assertEqual(opcoes['graceful_timeout'], 20)
+            asgi = server.configuracao('127.0.0.1:9000', workers=4, asgi=True)
+            self.assertEqual((asgi['workers'], asgi['threads'], asgi['worker_class']), (4, 1, server.WORKER_ASGI))
+            # Salas ao vivo em memória: ASGI sem reciclagem e com um worker, salvo afinidade
+            self.assertEqual(asgi['max_requests'], 0)
+            self.assertEqual(server.configuracao('127.0.0.1:9000', asgi=True)['workers'], 1)
+            self.assertIsNotNone(server.erro_workers_asgi(4))
+            self.assertIsNone(server.erro_workers_asgi(1))
+            with override_settings(AO_VIVO_AFINIDADE=True):
+                self.assertEqual(server.configuracao('127.0.0.1:9000', asgi=True)['workers'], 3)
+                self.assertIsNone(server.erro_workers_asgi(4))
+
+            with override_settings(DB_MAX_CONEXOES=10):
+                self.assertEqual(checks.orcamento_conexoes(None), [])
+            with override_settings(DB_MAX_CONEXOES=5):
+                self.assertEqual([aviso.id for aviso in checks.orcamento_conexoes(None)], ['game.W001'])
+
+            # Mesma regra do settings.py para os workers/threads passados ao servir
+            with override_settings(DB_MAX_CONEXOES=6, DB_CONN_MAX_AGE=60):
+                self.assertEqual(server.conn_max_age(6), 60)
+                self.assertEqual(server.conn_max_age(7), 0)
+
+        # DEBUG ligado ou chave de desenvolvimento: recusa antes de qualquer outra verificação
+        with override_settings(DEBUG=True, SECRET_KEY='x' * 50):
+            with self.assertRaisesMessage(CommandError, '--inseguro'):
+                call_command('servir')
+        with override_settings(DEBUG=False, SECRET_KEY='django-insecure-' + 'x' * 50):
+            with self.assertRaisesMessage(CommandError, 'LOGICASH_SECRET_KEY'):
+                call_command('servir')
+        with override_settings(DEBUG=False, SECRET_KEY='x' * 50):
+            self.assertIsNone(server.erro_configuracao_insegura())
+
+        if server.disponivel() is not None:
+            with self.assertRaises(CommandError):
+                call_command('servir', '--inseguro')
+
+
+class CargaTest(LiveServerTestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        quiz = Quiz.objects.create(titulo='Quiz carga', descricao='d', nivel_dificuldade=1, tema='Poupança')
+        pergunta = Pergunta.objects.create(quiz=quiz, texto='Poupar é bom?')
+        Resposta.objects.create(pergunta=pergunta, texto='Sim', correta=True)
+        Resposta.objects.create(pergunta=pergunta, texto='Não', ordem=2)
+
+    def test_semente_repete_os_sorteios(self):
+        import random
+
+        from game.loadtest import Estudante, GeradorCarga
+
+        def sorteios(semente):
+            gerador = GeradorCarga(
+                self.live_server_url, [('a', 'x'), ('b', 'x')], quizzes=range(1, 50), aleatorio=random.Random(semente)
+            )
+            estudantes = [Estudante(gerador, usuario, senha) for usuario, senha in gerador.estudantes]
+            return [
+                (estudante.sortear_jornada(), gerador.variaveis(estudante.usuario, estudante.aleatorio)['quiz'])
+                for estudante in estudantes
+                for _ in range(20)
+            ]
+
+        estado = random.getstate()
+        self.assertEqual(sorteios(46), sorteios(46))
+        self.assertNotEqual(sorteios(46), sorteios(47))
+        self.assertEqual(random.getstate(), estado)
+
+    def test_jornadas_com_login_csrf_e_relatorio(self):
+        import io
+        import json
+        import tempfile
+
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        from django.test import override_settings
+
+        from game.loadtest import JORNADAS_PADRAO
+
+        # Todos os passos padrão em uma única jornada: o relatório não depende do que foi sorteado
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as arquivo:
+            json.dump({'completa': {'passos': [
+                passo for jornada in JORNADAS_PADRAO.values() for passo in jornada['passos']
+            ]}}, arquivo)
+        self.addCleanup(os.remove, arquivo.name)
+        with override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']):
+            saida = io.StringIO()
+            call_command(
+                'carga', url=self.live_server_url, estudantes=2, criar=True, duracao=1.5, taxa=40,
+                jornadas=arquivo.name, semente=46, stdout=saida,
+            )
+            relatorio = saida.getvalue()
+            self.assertIn('semente 46', relatorio)
+            passos = {passo['nome'] for jornada in JORNADAS_PADRAO.values() for passo in jornada['passos']}
+            for endpoint in ('login', *passos):
+                self.assertRegex(relatorio, rf'\n{endpoint} +[1-9]\d* .* 0\.0%')
+            self.assertRegex(relatorio, r'Jornadas completas: completa x[1-9]')
+            self.assertNotIn('pulados', relatorio)
+            self.assertEqual(User.objects.filter(username__startswith='carga').count(), 2)
+            self.assertTrue(Estudante.objects.filter(user__username='carga1').exists())
+
+            # Jornada própria: erro contado por endpoint e passo sem variável pulado
+            with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as arquivo:
+                json.dump({'quebrada': {'passos': [
+                    {'nome': 'inexistente', 'url': '/nao-existe/'},
+                    {'nome': 'sem_variavel', 'url': '/api/desafios/{nada}/dilema/'},
+                ]}}, arquivo)
+            self.addCleanup(os.remove, arquivo.name)
+            saida = io.StringIO()
+            call_command('carga', url=self.live_server_url, estudantes=1, duracao=0.5, jornadas=arquivo.name, stdout=saida)
+            self.assertRegex(saida.getvalue(), r'\ninexistente +[1-9]\d* .* 100\.0%')
+            self.assertIn('404 x', saida.getvalue())
+            self.assertIn('sem_variavel x', saida.getvalue())
+
+            with self.assertRaises(CommandError):
+                call_command('carga', url=self.live_server_url, estudantes=1, senha='errada', duracao=0.5,
+                             stdout=io.StringIO())
+
+
+class ContadoresQuizTest(TestCase):
+    def setUp(self):
+        self.quiz = Quiz.objects.create(titulo='Orçamento', descricao='d', nivel_dificuldade=1, tema='Orçamento')
+        self.outro = Quiz.objects.create(titulo='Crédito', descricao='d', nivel_dificuldade=2, tema='Crédito')
+
+    def _contadores(self, quiz):
+        quiz.refresh_from_db()
+        return quiz.total_perguntas, quiz.pontos_maximos, quiz.total_respostas
+
+    def test_sinais_mantem_contadores(self):
+        p1 = Pergunta.objects.create(quiz=self.quiz, texto='A', ordem=1, pontos=2)
+        p2 = Pergunta.objects.create(quiz=self.quiz, texto='B', ordem=2, pontos=3)
+        for pergunta in (p1, p2):
+            Resposta.objects.create(pergunta=pergunta, texto='Sim', correta=True)
+            Resposta.objects.create(pergunta=pergunta, texto='Não', ordem=2)
+        self.assertEqual(self._contadores(self.quiz), (2, 5, 4))
+
+        p2.pontos = 5
+        p2.save()
+        self.assertEqual(self._contadores(self.quiz), (2, 7, 4))
+
+        # Pergunta movida de quiz: os dois são recalculados
+        p2.quiz = self.outro
+        p2.save()
+        self.assertEqual(self._contadores(self.quiz), (1, 2, 2))
+        self.assertEqual(self._contadores(self.outro), (1, 5, 2))
+
+        p1.respostas.first().delete()
+        p1.delete()
+        self.assertEqual(self._contadores(self.quiz), (0, 0, 0))
+
+    def test_correcao_le_contador_sem_contar_perguntas(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        Pergunta.objects.create(quiz=self.quiz, texto='A', ordem=1)
+        Pergunta.objects.create(quiz=self.quiz, texto='B', ordem=2)
+        quiz = Quiz.objects.get(pk=self.quiz.pk)
+        estudante = Estudante.objects.create(user=User.objects.create_user('contador'), nome='Contador')
+        with CaptureQueriesContext(connection) as contexto:
+            resultado = Resultado.objects.create(estudante=estudante, quiz=quiz, acertos=1)
+        self.assertEqual(resultado.total_perguntas, 2)
+        self.assertFalse(any('game_pergunta' in query['sql'] for query in contexto.captured_queries))
+
+        # Valor informado explicitamente é mantido
+        resultado = Resultado.objects.create(estudante=estudante, quiz=quiz, acertos=1, total_perguntas=1)
+        self.assertEqual(resultado.total_perguntas, 1)
+
+    def test_lote_recalcula_uma_vez_e_comando_corrige_divergencias(self):
+        import io
+        from unittest import mock
+
+        from django.core.management import call_command
+
+        from game import counters
+
+        with mock.patch('game.counters.recalcular', wraps=counters.recalcular) as recalcular:
+            with counters.em_lote() as pendentes:
+                for ordem in range(1, 6):
+                    pergunta = Pergunta.objects.create(quiz=self.quiz, texto=f'P{ordem}', ordem=ordem, pontos=ordem)
+                    Resposta.objects.create(pergunta=pergunta, texto='Sim', correta=True)
+                # bulk_create não dispara sinais: o quiz é anotado à mão
+                Pergunta.objects.bulk_create([Pergunta(quiz=self.outro, texto='X', ordem=1, pontos=4)])
+                pendentes.add(self.outro.pk)
+            recalcular.assert_called_once()
+        self.assertEqual(self._contadores(self.quiz), (5, 15, 5))
+        self.assertEqual(self._contadores(self.outro), (1, 4, 0))
+
+        Quiz.objects.filter(pk=self.quiz.pk).update(total_perguntas=99)
+        saida = io.StringIO()
+        call_command('recalcular_contadores', somente_verificar=True, stdout=saida)
+        self.assertIn(f'Quiz {self.quiz.pk}: total_perguntas 99 (correto 5)', saida.getvalue())
+        self.assertEqual(self._contadores(self.quiz)[0], 99)
+        call_command('recalcular_contadores', stdout=io.StringIO())
+        self.assertEqual(self._contadores(self.quiz), (5, 15, 5))
+
+    def test_recalcular_invalida_estrutura_de_modulos(self):
+        from django.core.cache import cache
+        from game import caching, counters, queries
+
+        cache.clear()
+        caching.limpar_local()
+        modulo = Modulo.objects.create(nome='Básico', slug='basico', descricao='d', ordem=1)
+        Desafio.objects.create(modulo=modulo, titulo='Quiz do orçamento', descricao='d', quiz=self.quiz, ordem=1)
+        Quiz.objects.filter(pk=self.quiz.pk).update(total_perguntas=99)
+        self.assertEqual(queries.estrutura_modulos()[0]['desafios'][0]['total_perguntas'], 99)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            counters.recalcular([self.quiz.pk])
+        self.assertEqual(queries.estrutura_modulos()[0]['desafios'][0]['total_perguntas'], 0)
+
+    def test_catalogo_mostra_contadores(self):
+        Pergunta.objects.create(quiz=self.quiz, texto='A', ordem=1, pontos=4)
+        modulo = Modulo.objects.create(nome='Básico', slug='basico', descricao='d', ordem=1)
+        Desafio.objects.create(modulo=modulo, titulo='Quiz do orçamento', descricao='d', quiz=self.quiz, ordem=1)
+        response = self.client.get(reverse('desafios'))
+        self.assertContains(response, '1 pergunta, até 4 pts')
+
+
+class ResultadoIdempotenteTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.user = User.objects.create_user('envio', password='senha-envio')
+        self.estudante = Estudante.objects.create(user=self.user, nome='Envio')
+        Pontuacao.objects.create(estudante=self.estudante)
+        self.quiz = Quiz.objects.create(titulo='Juros', descricao='d', nivel_dificuldade=1, tema='Juros')
+        self.outro = Quiz.objects.create(titulo='Metas', descricao='d', nivel_dificuldade=1, tema='Metas')
+        self.certas, self.erradas = [], []
+        for ordem, pontos in ((1, 2), (2, 3)):
+            pergunta = Pergunta.objects.create(quiz=self.quiz, texto=f'P{ordem}', ordem=ordem, pontos=pontos)
+            self.certas.append(Resposta.objects.create(pergunta=pergunta, texto='Certa', correta=True))
+            self.erradas.append(Resposta.objects.create(pergunta=pergunta, texto='Errada', ordem=2))
+        self.client.force_login(self.user)
+
+    def _enviar(self, chave, respostas, quiz=None):
+        import json
+
+        corpo = {'respostas': [{'pergunta': r.pergunta_id, 'resposta': r.pk} for r in respostas], 'tempo_gasto': 40}
+        return self.client.post(
+            reverse('api_resultado', args=[(quiz or self.quiz).pk]), json.dumps(corpo),
+            content_type='application/json', HTTP_IDEMPOTENCY_KEY=chave,
+        )
+
+    def _pontos(self):
+        return Pontuacao.objects.get(estudante=self.estudante).pontos_totais
+
+    def test_reenvio_devolve_original_sem_escrever(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        # O cache é preenchido depois do commit
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._enviar('tentativa-0001', [self.certas[0], self.erradas[1]])
+        self.assertEqual(response.status_code, 201)
+        original = response.json()
+        self.assertEqual(
+            (original['acertos'], original['total_perguntas'], original['pontuacao_obtida'], original['pontos_maximos']),
+            (1, 2, 2, 5)
+        )
+        self.assertEqual(self._pontos(), 2)
+        self.assertEqual(RespostaResultado.objects.filter(resultado_id=original['id']).count(), 2)
+
+        with CaptureQueriesContext(connection) as contexto:
+            response = self._enviar('tentativa-0001', [self.certas[0], self.certas[1]])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+        self.assertEqual(response.json(), original)
+        escritas = [q['sql'] for q in contexto.captured_queries if q['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')]
+        self.assertFalse(any('game_' in sql for sql in escritas), escritas)
+        self.assertFalse(any('game_resultado' in q['sql'] for q in contexto.captured_queries))
+
+        # Sem o cache (expirado ou outro servidor), o banco deduplica
+        from django.core.cache import cache
+
+        cache.clear()
+        response = self._enviar('tentativa-0001', [self.certas[0]])
+        self.assertEqual((response.status_code, response.json()), (200, original))
+        self.assertEqual(Resultado.objects.filter(estudante=self.estudante).count(), 1)
+        self.assertEqual(self._pontos(), 2)
+
+        # Outra tentativa é outro resultado
+        self.assertEqual(self._enviar('tentativa-0002', self.certas).status_code, 201)
+        self.assertEqual(self._pontos(), 7)
+
+    def test_corrida_resolvida_pela_restricao_unica(self):
+        from unittest import mock
+
+        from game import results
+
+        vencedor = self._enviar('corrida-0001', self.certas).json()
+        from django.core.cache import cache
+
+        cache.clear()
+        # As duas verificações não veem o vencedor: o INSERT esbarra na restrição
+        with mock.patch('game.results._existente', side_effect=[None, Resultado.objects.get(pk=vencedor['id'])]):
+            dados, criado = results.enviar(
+                self.estudante, Quiz.objects.get(pk=self.quiz.pk), {self.certas[0].pergunta_id: self.certas[0].pk},
+                'corrida-0001'
+            )
+        self.assertFalse(criado)
+        self.assertEqual(dados, vencedor)
+        self.assertEqual(Resultado.objects.count(), 1)
+        self.assertEqual(self._pontos(), 5)
+
+    def test_validacoes(self):
+        self.assertEqual(self._enviar('curta', self.certas).status_code, 400)
+        self.assertEqual(self._enviar('errada-0001', [self.certas[0]], quiz=self.outro).status_code, 400)
+        resposta = self.client.post(
+            reverse('api_resultado', args=[self.quiz.pk]), '{"respostas": 1}',
+            content_type='application/json', HTTP_IDEMPOTENCY_KEY='invalida-0001',
+        )
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual(self._enviar('chave-0001', self.certas).status_code, 201)
+        Pergunta.objects.create(quiz=self.outro, texto='Q', ordem=1)
+        self.assertEqual(self._enviar('chave-0001', [], quiz=self.outro).status_code, 409)
+        self.assertEqual(Resultado.objects.count(), 1)
+
+
+class SincronizacaoOfflineTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.user = User.objects.create_user('offline', password='senha-offline')
+        self.estudante = Estudante.objects.create(user=self.user, nome='Offline')
+        Pontuacao.objects.create(estudante=self.estudante)
+        self.quiz = Quiz.objects.create(titulo='Juros', descricao='d', nivel_dificuldade=1, tema='Juros')
+        modulo = Modulo.objects.create(nome='Crédito', descricao='...', slug='credito')
+        self.desafio = Desafio.objects.create(modulo=modulo, titulo='Juros', descricao='...', quiz=self.quiz)
+        self.certas, self.erradas = [], []
+        for ordem, pontos in ((1, 2), (2, 3)):
+            pergunta = Pergunta.objects.create(quiz=self.quiz, texto=f'P{ordem}', ordem=ordem, pontos=pontos)
+            self.certas.append(Resposta.objects.create(pergunta=pergunta, texto='Certa', correta=True))
+            self.erradas.append(Resposta.objects.create(pergunta=pergunta, texto='Errada', ordem=2))
+        self.client.force_login(self.user)
+
+    def _tentativa(self, chave, respostas, **extras):
+        return {
+            'chave': chave, 'quiz': self.quiz.pk, 'desafio': self.desafio.pk,
+            'respostas': [{'pergunta': r.pergunta_id, 'resposta': r.pk} for r in respostas], **extras,
+        }
+
+    def _sincronizar(self, tentativas):
+        import gzip
+        import json
+
+        return self.client.post(
+            reverse('api_sincronizar'), gzip.compress(json.dumps({'tentativas': tentativas}).encode()),
+            content_type='application/json', HTTP_CONTENT_ENCODING='gzip',
+        )
+
+    def test_lote_grava_tudo_com_um_lancamento_de_pontos(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        ontem = (timezone.now() - timedelta(days=1)).isoformat()
+        lote = [
+            self._tentativa('offline-0001', [self.certas[0], self.erradas[1]], realizado_em=ontem),
+            self._tentativa('offline-0002', self.certas, realizado_em=ontem, tempo_gasto=30),
+            self._tentativa('offline-0003', [self.erradas[0]]),
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._sincronizar(lote)
+        self.assertEqual(response.status_code, 200)
+        dados = response.json()
+        self.assertEqual((dados['criados'], dados['repetidos'], dados['invalidos']), (3, 0, 0))
+        self.assertEqual([item['resultado']['pontuacao_obtida'] for item in dados['resultados']], [2, 5, 0])
+
+        resultados = Resultado.objects.filter(estudante=self.estudante).order_by('pk')
+        self.assertEqual(resultados.count(), 3)
+        # A hora da tentativa offline é preservada; mesmo instante no mesmo quiz não colide
+        self.assertLess(resultados[0].data_realizacao, timezone.now() - timedelta(hours=23))
+        self.assertNotEqual(resultados[0].data_realizacao, resultados[1].data_realizacao)
+        self.assertEqual(RespostaResultado.objects.filter(resultado__estudante=self.estudante).count(), 5)
+
+        self.assertEqual(Pontuacao.objects.get(estudante=self.estudante).pontos_totais, 7)
+        eventos = EventoPontuacao.objects.filter(estudante=self.estudante)
+        self.assertEqual([(evento.delta, evento.origem.split(':')[0]) for evento in eventos], [(7, 'sincronizacao')])
+        progresso = ProgressoDesafio.objects.get(estudante=self.estudante, desafio=self.desafio)
+        self.assertEqual((progresso.concluido, progresso.pontuacao), (True, 5))
+
+    def test_reenvio_do_lote_nao_grava_de_novo(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        lote = [self._tentativa('offline-0001', [self.certas[0]]), self._tentativa('offline-0002', self.certas)]
+        primeiro = self._sincronizar(lote).json()
+
+        with CaptureQueriesContext(connection) as contexto:
+            response = self._sincronizar(lote + [self._tentativa('offline-0001', [self.certas[0]])])
+        dados = response.json()
+        self.assertEqual([item['status'] for item in dados['resultados']], ['repetido'] * 3)
+        self.assertEqual(
+            [item['resultado'] for item in dados['resultados'][:2]],
+            [item['resultado'] for item in primeiro['resultados']]
+        )
+        escritas = [q['sql'] for q in contexto.captured_queries if q['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')]
+        self.assertFalse(any('game_' in sql for sql in escritas), escritas)
+        self.assertEqual(Resultado.objects.filter(estudante=self.estudante).count(), 2)
+        self.assertEqual(Pontuacao.objects.get(estudante=self.estudante).pontos_totais, 7)
+
+    def test_mesmo_horario_em_lotes_diferentes(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        # Cliente offline com precisão de segundos: a hora coincide com um resultado já gravado
+        horario = (timezone.now() - timedelta(hours=1)).replace(microsecond=0).isoformat()
+        primeiro = self._sincronizar([self._tentativa('offline-0001', self.certas, realizado_em=horario)])
+        self.assertEqual(primeiro.json()['criados'], 1)
+        segundo = self._sincronizar([
+            self._tentativa('offline-0002', self.certas, realizado_em=horario),
+            self._tentativa('offline-0003', self.certas, realizado_em=horario),
+        ])
+        self.assertEqual(segundo.status_code, 200)
+        self.assertEqual(segundo.json()['criados'], 2)
+        datas = list(Resultado.objects.filter(estudante=self.estudante).values_list('data_realizacao', flat=True))
+        self.assertEqual(len(set(datas)), 3)
+
+    def test_itens_invalidos_nao_impedem_o_resto(self):
+        import json
+
+        ProgressoDesafio.objects.create(estudante=self.estudante, desafio=self.desafio, concluido=True, pontuacao=5)
+        lote = [
+            self._tentativa('curta', self.certas),
+            self._tentativa('offline-0001', [self.certas[0], self.certas[0]]),
+            {'chave': 'offline-0002', 'quiz': 999999, 'respostas': []},
+            self._tentativa('offline-0003', [self.certas[0]]),
+            'lixo',
+        ]
+        dados = self._sincronizar(lote).json()
+        self.assertEqual(
+            [item['status'] for item in dados['resultados']],
+            ['invalido', 'invalido', 'invalido', 'criado', 'invalido']
+        )
+        self.assertTrue(all(item['erro'] for item in dados['resultados'] if item['status'] == 'invalido'))
+        # Melhor pontuação anterior é mantida no upsert do progresso
+        self.assertEqual(ProgressoDesafio.objects.get(estudante=self.estudante, desafio=self.desafio).pontuacao, 5)
+
+        # Corpo malformado, compressão inválida e lote grande demais
+        url = reverse('api_sincronizar')
+        self.assertEqual(self.client.post(url, '{', content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.post(
+            url, b'nao-gzip', content_type='application/json', HTTP_CONTENT_ENCODING='gzip'
+        ).status_code, 400)
+        self.assertEqual(self.client.post(
+            url, json.dumps({'tentativas': {}}), content_type='application/json'
+        ).status_code, 400)
+        self.assertEqual(self._sincronizar([self._tentativa(f'lote-{i:05}', []) for i in range(201)]).status_code, 413)
+        self.client.logout()
+        self.assertEqual(self._sincronizar([]).status_code, 401)
+
+
+class ClienteWebSocketTeste:
+    """
+    Cliente de teste sobre o ApplicationCommunicator: guarda as mensagens de cada quadro recebido
+    """
+
+    def __init__(self, caminho, cookie=None, origem=None):
+        from asgiref.testing import ApplicationCommunicator
+
+        from game import live
+
+        cabecalhos = [(b'host', b'testserver')]
+        if cookie:
+            cabecalhos.append((b'cookie', f'sessionid={cookie}'.encode()))
+        if origem:
+            cabecalhos.append((b'origin', origem.encode()))
+        caminho, _, consulta = caminho.partition('?')
+        self.comunicador = ApplicationCommunicator(live.aplicacao, {
+            'type': 'websocket', 'path': caminho, 'query_string': consulta.encode(), 'headers': cabecalhos,
+        })
+        self.mensagens = []
+        self.quadros = 0
+        self.fechamento = None
+
+    async def conectar(self):
+        await self.comunicador.send_input({'type': 'websocket.connect'})
+        return await self.comunicador.receive_output(2)
+
+    async def enviar(self, **dados):
+        import json
+
+        await self.comunicador.send_input({'type': 'websocket.receive', 'text': json.dumps(dados)})
+
+    async def esperar(self, tipo, timeout=2):
+        import json
+
+        while True:
+            for indice, mensagem in enumerate(self.mensagens):
+                if mensagem['tipo'] == tipo:
+                    return self.mensagens.pop(indice)
+            if self.fechamento is not None:
+                raise AssertionError(f'Conexão fechada ({self.fechamento}) sem mensagem {tipo}')
+            saida = await self.comunicador.receive_output(timeout)
+            if saida['type'] == 'websocket.close':
+                self.fechamento = saida.get('code')
+            else:
+                self.quadros += 1
+                self.mensagens.extend(json.loads(saida['text']))
+
+    async def desconectar(self):
+        await self.comunicador.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await self.comunicador.wait(2)
+
+
+class SalaAoVivoTest(TestCase):
+    def setUp(self):
+        from game import live
+
+        live._salas.clear()
+        self.professor = User.objects.create_user('professora', password='senha-prof', is_staff=True)
+        self.alunos = []
+        for nome in ('ana', 'bia'):
+            user = User.objects.create_user(nome, password='senha-aluno', first_name=nome.title())
+            self.alunos.append((user, Estudante.objects.create(user=user, nome=nome.title())))
+        self.quiz = Quiz.objects.create(titulo='Ao vivo', descricao='d', nivel_dificuldade=1, tema='Poupança')
+        self.certas, self.erradas = [], []
+        for ordem, pontos in ((1, 2), (2, 3)):
+            pergunta = Pergunta.objects.create(quiz=self.quiz, texto=f'P{ordem}', ordem=ordem, pontos=pontos)
+            self.certas.append(Resposta.objects.create(pergunta=pergunta, texto='Certa', correta=True))
+            self.erradas.append(Resposta.objects.create(pergunta=pergunta, texto='Errada', ordem=2))
+
+    def _cookie(self, user):
+        cliente = Client()
+        cliente.force_login(user)
+        return cliente.cookies['sessionid'].value
+
+    async def _abrir(self):
+        from asgiref.sync import sync_to_async
+
+        professor = ClienteWebSocketTeste(f'/ws/ao-vivo/?quiz={self.quiz.pk}', await sync_to_async(self._cookie)(self.professor))
+        self.assertEqual((await professor.conectar())['type'], 'websocket.accept')
+        sala = await professor.esperar('sala')
+        alunos = []
+        for user, _ in self.alunos:
+            aluno = ClienteWebSocketTeste(f'/ws/ao-vivo/{sala["codigo"]}/', await sync_to_async(self._cookie)(user))
+            await aluno.conectar()
+            self.assertEqual((await aluno.esperar('sala'))['papel'], 'estudante')
+            alunos.append(aluno)
+        return sala, professor, alunos
+
+    async def test_sessao_completa_grava_so_no_fim(self):
+        from django.test import override_settings
+
+        with override_settings(AO_VIVO_INTERVALO_MS=10):
+            sala, professor, (ana, bia) = await self._abrir()
+            self.assertEqual((sala['papel'], sala['quiz']['total_perguntas']), ('professor', 2))
+            # Coalescido por intervalo: o primeiro quadro pode ser de antes da segunda entrada
+            participantes = await professor.esperar('participantes')
+            while participantes['total'] < 2:
+                participantes = await professor.esperar('participantes')
+            self.assertEqual(participantes['total'], 2)
+
+            await professor.enviar(acao='proxima')
+            pergunta = await ana.esperar('pergunta')
+            self.assertEqual({a['id'] for a in pergunta['alternativas']}, {self.certas[0].pk, self.erradas[0].pk})
+            self.assertNotIn('corretas', pergunta)
+            await bia.esperar('pergunta')
+
+            await ana.enviar(acao='responder', resposta=self.certas[0].pk)
+            self.assertEqual((await ana.esperar('recebida'))['resposta'], self.certas[0].pk)
+            await ana.enviar(acao='responder', resposta=self.erradas[0].pk)
+            self.assertIn('já respondeu', (await ana.esperar('erro'))['mensagem'])
+            # A contagem é publicada a cada intervalo; a primeira pode ser da pergunta recém-aberta
+            contagem = await professor.esperar('contagem')
+            while not contagem['alternativas'][str(self.certas[0].pk)]:
+                contagem = await professor.esperar('contagem')
+            self.assertEqual(contagem['alternativas'][str(self.erradas[0].pk)], 0)
+
+            # A última resposta fecha a pergunta: gabarito, placar e posição de cada um
+            await bia.enviar(acao='responder', resposta=self.erradas[0].pk)
+            gabarito = await professor.esperar('gabarito')
+            self.assertEqual(gabarito['corretas'], [self.certas[0].pk])
+            self.assertEqual(gabarito['alternativas'], {str(self.certas[0].pk): 1, str(self.erradas[0].pk): 1})
+            placar = await bia.esperar('placar')
+            self.assertEqual([(l['nome'], l['pontos']) for l in placar['ranking']], [('Ana', 2), ('Bia', 0)])
+            posicao = await bia.esperar('posicao')
+            self.assertEqual((posicao['posicao'], posicao['acertou']), (2, False))
+            self.assertFalse(await Resultado.objects.aexists())
+
+            await professor.enviar(acao='proxima')
+            await bia.esperar('pergunta')
+            await bia.enviar(acao='responder', resposta=self.certas[1].pk)
+            await professor.enviar(acao='revelar')
+            await ana.esperar('gabarito')
+            await professor.enviar(acao='proxima')  # depois da última pergunta: encerra
+            fim = await ana.esperar('fim')
+            self.assertEqual(fim['gravados'], 2)
+            self.assertEqual([(l['nome'], l['pontos']) for l in fim['ranking']], [('Bia', 3), ('Ana', 2)])
+            with self.assertRaises(AssertionError):
+                await ana.esperar('nada')
+            self.assertEqual(ana.fechamento, 1000)
+            for cliente in (professor, ana, bia):
+                await cliente.desconectar()
+
+        resultados = {r.estudante.nome: r async for r in Resultado.objects.select_related('estudante')}
+        self.assertEqual(
+            {nome: (r.acertos, r.pontuacao_obtida, r.total_perguntas) for nome, r in resultados.items()},
+            {'Ana': (1, 2, 2), 'Bia': (1, 3, 2)}
+        )
+        self.assertEqual(await RespostaResultado.objects.acount(), 3)
+        pontos = {p.estudante.nome: p.pontos_totais async for p in Pontuacao.objects.select_related('estudante')}
+        self.assertEqual(pontos, {'Ana': 2, 'Bia': 3})
+        self.assertEqual(await EventoPontuacao.objects.filter(origem__startswith='ao-vivo:').acount(), 2)
+
+    async def test_reconexao_e_recusas(self):
+        from asgiref.sync import sync_to_async
+        from django.test import override_settings
+
+        from game import live
+
+        with override_settings(AO_VIVO_INTERVALO_MS=10):
+            sala, professor, (ana, bia) = await self._abrir()
+            await professor.enviar(acao='proxima')
+            await ana.esperar('pergunta')
+            await ana.enviar(acao='responder', resposta=self.certas[0].pk)
+            await ana.esperar('recebida')
+
+            # Reconectar substitui a conexão antiga e devolve a pergunta aberta
+            de_novo = ClienteWebSocketTeste(f'/ws/ao-vivo/{sala["codigo"]}/', await sync_to_async(self._cookie)(self.alunos[0][0]))
+            await de_novo.conectar()
+            pergunta = await de_novo.esperar('pergunta')
+            self.assertEqual(pergunta['respondida'], self.certas[0].pk)
+            with self.assertRaises(AssertionError):
+                await ana.esperar('nada')
+            self.assertEqual(ana.fechamento, live.FECHAR_SUBSTITUIDA)
+            await ana.desconectar()
+
+            # Estudante não conduz a sala; mensagem inválida vira erro
+            await bia.enviar(acao='encerrar')
+            self.assertIn('inválida', (await bia.esperar('erro'))['mensagem'])
+            await bia.comunicador.send_input({'type': 'websocket.receive', 'text': 'x' * 5000})
+            await bia.esperar('erro')
+
+            cookie_bia = await sync_to_async(self._cookie)(self.alunos[1][0])
+            for caminho, cookie, codigo in (
+                (f'/ws/ao-vivo/{sala["codigo"]}/', None, live.FECHAR_NAO_AUTENTICADO),
+                ('/ws/ao-vivo/000000x/', cookie_bia, live.FECHAR_NAO_ENCONTRADA),
+                (f'/ws/ao-vivo/?quiz={self.quiz.pk}', cookie_bia, live.FECHAR_PROIBIDO),
+            ):
+                cliente = ClienteWebSocketTeste(caminho, cookie)
+                await cliente.conectar()
+                await cliente.esperar('erro')
+                with self.assertRaises(AssertionError):
+                    await cliente.esperar('nada')
+                self.assertEqual(cliente.fechamento, codigo)
+                await cliente.desconectar()
+
+            # Origem de outro site: recusado antes do handshake
+            cliente = ClienteWebSocketTeste(f'/ws/ao-vivo/{sala["codigo"]}/', cookie_bia, origem='https://outro.site')
+            self.assertEqual((await cliente.conectar())['type'], 'websocket.close')
+
+            for cliente in (professor, bia, de_novo):
+                await cliente.desconectar()
+        self.assertIn(sala['codigo'], live._salas)  # sem professor, a sala espera AO_VIVO_TEMPO_ORFA
+        live._salas[sala['codigo']]._orfa.cancel()
+
+    async def test_desligamento_do_worker_grava_salas_abertas(self):
+        from asgiref.testing import ApplicationCommunicator
+        from django.test import override_settings
+
+        from game import live
+
+        with override_settings(AO_VIVO_INTERVALO_MS=10):
+            sala, professor, (ana, bia) = await self._abrir()
+            await professor.enviar(acao='proxima')
+            await ana.esperar('pergunta')
+            await ana.enviar(acao='responder', resposta=self.certas[0].pk)
+            await ana.esperar('recebida')
+            # O servidor derruba as conexões antes do lifespan.shutdown
+            for cliente in (professor, ana, bia):
+                await cliente.desconectar()
+
+            ciclo = ApplicationCommunicator(live.roteador(None), {'type': 'lifespan'})
+            await ciclo.send_input({'type': 'lifespan.startup'})
+            self.assertEqual((await ciclo.receive_output(2))['type'], 'lifespan.startup.complete')
+            await ciclo.send_input({'type': 'lifespan.shutdown'})
+            self.assertEqual((await ciclo.receive_output(2))['type'], 'lifespan.shutdown.complete')
+
+        self.assertNotIn(sala['codigo'], live._salas)
+        resultado = await Resultado.objects.select_related('estudante').aget()
+        self.assertEqual((resultado.estudante.nome, resultado.pontuacao_obtida), ('Ana', 2))
+
+    async def test_fila_agrupa_e_coalesce_estados(self):
+        import asyncio
+        import json
+
+        from game import live
+
+        enviados = []
+
+        async def send(mensagem):
+            enviados.append(mensagem)
+
+        conexao = live.Conexao(send, 0.05)
+        conexao.enviar({'tipo': 'pergunta', 'n': 1})
+        await asyncio.sleep(0.01)  # primeiro quadro sai na hora
+        for total in range(1, 6):
+            conexao.estado('respondidas', live._json({'tipo': 'respondidas', 'total': total}))
+        conexao.enviar({'tipo': 'gabarito'})
+        conexao.estado('placar', live._json({'tipo': 'placar'}))
+        conexao.estado('respondidas', live._json({'tipo': 'respondidas', 'total': 9}))
+        await asyncio.sleep(0.1)
+        conexao.fechar()
+        await asyncio.sleep(0.01)
+        quadros = [json.loads(m['text']) for m in enviados if m['type'] == 'websocket.send']
+        self.assertEqual(quadros, [
+            [{'tipo': 'pergunta', 'n': 1}],
+            [{'tipo': 'respondidas', 'total': 5}, {'tipo': 'gabarito'}, {'tipo': 'placar'}, {'tipo': 'respondidas', 'total': 9}],
+        ])
+        self.assertEqual(enviados[-1], {'type': 'websocket.close', 'code': 1000})
+
+        # Cliente que não lê é desconectado em vez de acumular
+        async def travado(mensagem):
+            await asyncio.sleep(10)
+
+        lenta = live.Conexao(travado, 0)
+        for indice in range(live.LIMITE_FILA + 2):
+            lenta.enviar({'tipo': 'x', 'i': indice})
+        self.assertEqual(lenta.fechamento, live.FECHAR_LENTO)
+        lenta.parar()
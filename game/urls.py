@@ -1,6 +1,6 @@
 from django.contrib import admin # noqa: F401
 from django.urls import path, include # noqa: F401
-from . import views
+from . import views, api, async_views
 
 urlpatterns = [
     # Página inicial
@@ -11,8 +11,31 @@ urlpatterns = [
     path('dashboard/', views.dashboard_view, name='dashboard'), # Dashboard principal
     path('ranking/', views.ranking_view, name='ranking'),       # Página de ranking
     path('estatisticas/', views.estatisticas_view, name='estatisticas'), # Página de estatísticas
+    path('exportar/ranking.csv', views.exportar_ranking_csv, name='exportar_ranking'),
+    path('perfis/', views.perfis_view, name='perfis'),
+    path('perfis/<str:nome>/', views.perfil_detalhe_view, name='perfil_detalhe'),
+    path('perfis/<str:nome>.<str:extensao>', views.perfil_arquivo_view, name='perfil_arquivo'),
+    path('memoria/', views.memoria_view, name='memoria'),
     path('profile/', views.profile_view, name='profile'), # Página de perfil do usuário
     path('desafios/', views.lista_desafios, name='desafios'), 
+    path('busca/', views.busca_view, name='busca'),
+    
+    # Variantes assíncronas (ASGI)
+    path('async/dashboard/', async_views.dashboard_async, name='dashboard_async'),
+    path('async/ranking/', async_views.ranking_async, name='ranking_async'),
+    path('async/estatisticas/', async_views.estatisticas_async, name='estatisticas_async'),
+    
+    # API JSON
+    path('api/dashboard/', api.dashboard_api, name='api_dashboard'),
+    path('api/ranking/', api.ranking_api, name='api_ranking'),
+    path('api/progresso/', api.progresso_api, name='api_progresso'),
+    path('api/conquistas/', api.conquistas_api, name='api_conquistas'),
+    path('api/busca/', api.busca_api, name='api_busca'),
+    path('api/quizzes/<int:quiz_id>/pratica/', api.pratica_api, name='api_pratica'),
+    path('api/quizzes/<int:quiz_id>/resultados/', api.resultado_api, name='api_resultado'),
+    path('api/sincronizar/', api.sincronizar_api, name='api_sincronizar'),
+    path('api/simulacoes/<slug:tipo>/', api.simulacao_api, name='api_simulacao'),
+    path('api/desafios/<int:desafio_id>/dilema/', api.dilema_api, name='api_dilema'),
     
     # Autenticação
     path('login/', views.login_view, name='login'),
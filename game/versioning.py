@@ -0,0 +1,110 @@
+"""
+Contadores de versão guardados no cache.
+
+Cada estudante tem um contador que sobe a cada escrita que altera o seu dashboard
+(Resultado, EstudanteConquista, Pontuacao). Fragmentos de template usam a versão
+como parte da chave, então invalidar é um único INCR: as chaves antigas deixam de
+ser consultadas e expiram sozinhas, sem varredura de chaves.
+"""
+
+import time
+
+from django.core.cache import cache
+
+
+def _valor_inicial():
+    # Se a chave for despejada do cache, o contador recomeça a partir do relógio,
+    # garantindo que nunca volte a um valor já usado por fragmentos antigos
+    return time.time_ns() // 1000
+
+
+def _versao(chave):
+    versao = cache.get(chave)
+    if versao is None:
+        cache.add(chave, _valor_inicial(), timeout=None)
+        versao = cache.get(chave)
+    return versao
+
+
+async def _aversao(chave):
+    versao = await cache.aget(chave)
+    if versao is None:
+        await cache.aadd(chave, _valor_inicial(), timeout=None)
+        versao = await cache.aget(chave)
+    return versao
+
+
+def _incrementar(chave):
+    # Guarda também o instante da modificação, usado como Last-Modified
+    cache.set(chave + ':ts', time.time(), timeout=None)
+    try:
+        return cache.incr(chave)
+    except ValueError:
+        # Chave inexistente: inicializa (add evita sobrescrever uma corrida) e incrementa
+        cache.add(chave, _valor_inicial(), timeout=None)
+        return cache.incr(chave)
+
+
+def chave_estudante(estudante_id):
+    return f'versao:estudante:{estudante_id}'
+
+
+def chave_global(nome):
+    return f'versao:global:{nome}'
+
+
+def versao_estudante(estudante_id):
+    """
+    Retorna a versão atual dos dados do estudante
+    """
+    return _versao(chave_estudante(estudante_id))
+
+
+async def aversao_estudante(estudante_id):
+    """
+    Versão assíncrona de versao_estudante, para views async
+    """
+    return await _aversao(chave_estudante(estudante_id))
+
+
+def incrementar_versao_estudante(estudante_id):
+    """
+    Invalida todos os fragmentos do estudante em O(1)
+    """
+    return _incrementar(chave_estudante(estudante_id))
+
+
+def versao_global(nome):
+    """
+    Retorna a versão de um conjunto de dados compartilhado (ex.: 'conquistas')
+    """
+    return _versao(chave_global(nome))
+
+
+async def aversao_global(nome):
+    """
+    Versão assíncrona de versao_global, para views async
+    """
+    return await _aversao(chave_global(nome))
+
+
+def incrementar_versao_global(nome):
+    """
+    Invalida os fragmentos que dependem de um conjunto de dados compartilhado
+    """
+    return _incrementar(chave_global(nome))
+
+
+def carimbo(chaves):
+    """
+    Lê várias versões em uma única ida ao cache.
+    Retorna (tupla de versões, instante da última modificação ou None)
+    """
+    valores = cache.get_many(chaves + [chave + ':ts' for chave in chaves])
+    faltando = [chave for chave in chaves if chave not in valores]
+    for chave in faltando:
+        valores[chave] = _versao(chave)
+
+    versoes = tuple(valores[chave] for chave in chaves)
+    instantes = [valores[chave + ':ts'] for chave in chaves if chave + ':ts' in valores]
+    return versoes, (max(instantes) if len(instantes) == len(chaves) else None)
@@ -1,17 +1,24 @@
-from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, JsonResponse
+import csv
+
+from django.shortcuts import render, redirect
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import logout, login, authenticate
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.db.models import Count, Sum
 from django.core.mail import send_mail
 from django.conf import settings
 from django.utils.crypto import get_random_string
 from django.utils import timezone
 from django.urls import reverse
-from .models import Estudante, Pontuacao, Conquista, EstudanteConquista, Resultado, Modulo, Desafio, ProgressoDesafio
+from django.views.decorators.http import require_http_methods
+from .models import Estudante, Pontuacao
 from .forms import LoginForm, SignupForm, PasswordResetFormCustom, SetPasswordForm, ProfileUpdateForm
+from .versioning import versao_estudante, versao_global
+from . import memory, profiling, querylog, queries, search
+from .routers import banco_de_leitura, ler_da_replica
+from .conditional import resposta_condicional, chaves_estudante, chaves_globais, lembrar_estudante
 
 
 def index(request):
@@ -31,6 +38,7 @@ def base(request):
 #=================== VIEWS PRINCIPAIS ====================#
 
 @login_required
+@resposta_condicional(chaves_estudante('conquistas', 'niveis'))
 def dashboard_view(request):
     """
     View do dashboard do estudante - exibe pontuação, conquistas e progresso
@@ -41,6 +49,7 @@ def dashboard_view(request):
             user=request.user,
             defaults={'nome': request.user.get_full_name() or request.user.username}
         )
+        lembrar_estudante(request, estudante)
         
         # Busca ou cria a pontuação do estudante
         pontuacao, created = Pontuacao.objects.get_or_create(
@@ -49,43 +58,30 @@ def dashboard_view(request):
         )
         
         # Busca conquistas desbloqueadas pelo estudante
-        conquistas_desbloqueadas = EstudanteConquista.objects.filter(
-            estudante=estudante
-        ).select_related('conquista').order_by('-data_desbloqueio')[:6]
-        
-        # Busca estatísticas adicionais
-        total_quizzes = Resultado.objects.filter(estudante=estudante, concluido=True).count()
-        total_acertos = Resultado.objects.filter(estudante=estudante).aggregate(
-            total=Sum('acertos')
-        )['total'] or 0
-        total_perguntas = Resultado.objects.filter(estudante=estudante).aggregate(
-            total=Sum('total_perguntas')
-        )['total'] or 0
+        conquistas_desbloqueadas = queries.conquistas_desbloqueadas(estudante)
         
-        # Calcula percentual de acertos
-        percentual_acertos = (total_acertos / total_perguntas * 100) if total_perguntas > 0 else 0
+        # Busca estatísticas adicionais (uma única query, cacheada pela versão do estudante)
+        estatisticas = queries.estatisticas_estudante(estudante)
         
         # Busca conquistas disponíveis para mostrar próximas metas
-        conquistas_disponiveis = Conquista.objects.filter(ativa=True).exclude(
-            estudantes__estudante=estudante
-        ).order_by('criterio_pontos')[:3]
+        conquistas_disponiveis = queries.conquistas_disponiveis(estudante)
         
         # Dados para o gráfico de progresso (últimos 7 resultados)
-        resultados_recentes = Resultado.objects.filter(
-            estudante=estudante, 
-            concluido=True
-        ).order_by('-data_realizacao')[:7]
+        resultados_recentes = queries.resultados_recentes(estudante)
+        
+        # As listas acima são querysets preguiçosos: só são executadas se o
+        # fragmento correspondente não estiver no cache (ver {% cache %} em index.html)
         
         context = {
             'estudante': estudante,
             'pontuacao': pontuacao,
+            'progresso_nivel': pontuacao.progresso_nivel(),
             'conquistas_desbloqueadas': conquistas_desbloqueadas,
             'conquistas_disponiveis': conquistas_disponiveis,
-            'total_quizzes': total_quizzes,
-            'total_acertos': total_acertos,
-            'total_perguntas': total_perguntas,
-            'percentual_acertos': round(percentual_acertos, 1),
+            **estatisticas,
             'resultados_recentes': resultados_recentes,
+            'versao_estudante': versao_estudante(estudante.pk),
+            'versao_conquistas': versao_global('conquistas'),
         }
         
         return render(request, 'index.html', context)
@@ -114,31 +110,133 @@ def logout_view(request):
     return redirect('login')
 
 @login_required
+@resposta_condicional(chaves_globais('ranking'))
+@ler_da_replica
 def ranking_view(request):
     """
     View para exibir o ranking dos estudantes
     """
-    rankings = Pontuacao.objects.select_related('estudante__user').order_by('-pontos_totais')[:50]
+    rankings = queries.topo_ranking()['itens']
     return render(request, 'ranking.html', {'rankings': rankings})
 
+class _Eco:
+    """Buffer de escrita que apenas devolve a linha (para o csv.writer em streaming)"""
+    def write(self, valor):
+        return valor
+
+@staff_member_required
+@ler_da_replica
+def exportar_ranking_csv(request):
+    """
+    Exporta o ranking completo em CSV, lido da réplica e enviado em streaming
+    """
+    banco = banco_de_leitura()  # o streaming continua depois que a view retorna
+    linhas = Pontuacao.objects.using(banco).order_by('-pontos_totais', 'pk').values_list(
+        'estudante__nome', 'estudante__escola', 'estudante__serie', 'pontos_totais', 'nivel_atual'
+    )
+    escritor = csv.writer(_Eco())
+
+    def gerar():
+        yield escritor.writerow(['posicao', 'nome', 'escola', 'serie', 'pontos', 'nivel'])
+        for posicao, linha in enumerate(linhas.iterator(chunk_size=2000), start=1):
+            yield escritor.writerow([posicao, *linha])
+
+    response = StreamingHttpResponse(gerar(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="ranking.csv"'
+    return response
+
+@staff_member_required
+def perfis_view(request):
+    """
+    Capturas do ProfilingMiddleware, das requisições mais lentas para as mais rápidas,
+    e as últimas queries lentas deste processo
+    """
+    return render(request, 'perfis.html', {
+        'capturas': profiling.listar_capturas(),
+        'consultas_lentas': querylog.recentes()[:50],
+    })
+
+@staff_member_required
+def perfil_detalhe_view(request, nome):
+    """
+    Relatório do pstats e log de queries de uma captura
+    """
+    ordem = request.GET.get('ordem', 'cumulative')
+    if ordem not in ('cumulative', 'tottime', 'ncalls'):
+        ordem = 'cumulative'
+    captura = profiling.carregar_captura(nome, ordem=ordem)
+    if captura is None:
+        raise Http404('Captura não encontrada')
+    metadados, relatorio = captura
+    return render(request, 'perfil.html', {'captura': metadados, 'relatorio': relatorio, 'ordem': ordem})
+
+@staff_member_required
+def perfil_arquivo_view(request, nome, extensao):
+    """
+    Download do .prof (pstats/snakeviz) ou do .html do pyinstrument
+    """
+    caminho = profiling.caminho_captura(nome, '.' + extensao) if extensao in ('prof', 'html') else None
+    if caminho is None:
+        raise Http404('Arquivo não encontrado')
+    if extensao == 'html':
+        return FileResponse(open(caminho, 'rb'), content_type='text/html; charset=utf-8')
+    return FileResponse(open(caminho, 'rb'), as_attachment=True, filename=f'{nome}.{extensao}')
+
+@staff_member_required
+@require_http_methods(['GET', 'POST'])
+def memoria_view(request):
+    """
+    Memória do worker que atendeu: RSS, crescimento por rota e snapshots do tracemalloc.
+    GET ?snapshot=<rótulo> lista os maiores pontos de alocação; ?antes=<a>&depois=<b> compara.
+    POST acao=iniciar|capturar|parar|zerar controla o rastreamento.
+    """
+    if request.method == 'POST':
+        acao = request.POST.get('acao')
+        if acao == 'iniciar':
+            memory.iniciar()
+        elif acao == 'capturar':
+            return JsonResponse({'snapshot': memory.capturar(request.POST.get('rotulo') or 'manual')})
+        elif acao == 'parar':
+            memory.parar()
+        elif acao == 'zerar':
+            memory.zerar_rotas()
+        else:
+            return JsonResponse({'erro': 'acao deve ser iniciar, capturar, parar ou zerar'}, status=400)
+        return JsonResponse(memory.situacao())
+
+    dados = {**memory.situacao(), 'rotas': memory.por_rota(), 'snapshots': memory.snapshots()}
+    if 'snapshot' in request.GET:
+        snapshot = memory.snapshot(request.GET['snapshot'])
+        if snapshot is None:
+            raise Http404('Snapshot não encontrado')
+        dados['principais'] = memory.principais(snapshot)
+    if 'antes' in request.GET and 'depois' in request.GET:
+        antes, depois = memory.snapshot(request.GET['antes']), memory.snapshot(request.GET['depois'])
+        if antes is None or depois is None:
+            raise Http404('Snapshot não encontrado')
+        dados['diferencas'] = memory.comparar(antes, depois)
+    return JsonResponse(dados)
+
 @login_required
+@ler_da_replica
 def estatisticas_view(request):
     """
     View para exibir estatísticas gerais dos estudantes
     """
-    total_estudantes = Estudante.objects.count()
-    total_pontos = Pontuacao.objects.aggregate(total=Sum('pontos_totais'))['total'] or 0
-    media_pontos = Pontuacao.objects.aggregate(media=Sum('pontos_totais') / Count('id'))['media'] or 0
-    
-    context = {
-        'total_estudantes': total_estudantes,
-        'total_pontos': total_pontos,
-        'media_pontos': round(media_pontos, 2),
-    }
-    
-    return render(request, 'estatisticas.html', context)
+    return render(request, 'estatisticas.html', queries.estatisticas_gerais())
+
+@login_required
+@resposta_condicional(chaves_globais('conteudo'))
+def busca_view(request):
+    """
+    Busca textual em quizzes, perguntas e módulos, com trechos destacados
+    """
+    consulta = request.GET.get('q', '').strip()
+    resultados = search.buscar(consulta) if consulta else []
+    return render(request, 'busca.html', {'consulta': consulta, 'resultados': resultados})
 
 @login_required
+@resposta_condicional(chaves_estudante('niveis'))
 def profile_view(request):
     """
     View para visualizar e editar perfil do usuário
@@ -151,6 +249,7 @@ def profile_view(request):
             user=request.user,
             nome=request.user.get_full_name() or request.user.username
         )
+    lembrar_estudante(request, estudante)
     
     if request.method == 'POST':
         form = ProfileUpdateForm(request.POST, instance=estudante)
@@ -360,12 +459,28 @@ def password_reset_confirm_view(request, user_id, token):
 
 #=================== VIEWS DE DESAFIOS ====================#
 
+def _mapa_desafios(request):
+    """
+    Renderiza o mapa de módulos e desafios, com o progresso se houver login
+    """
+    estudante = None
+    if request.user.is_authenticated:
+        estudante, created = Estudante.objects.get_or_create(
+            user=request.user,
+            defaults={'nome': request.user.get_full_name() or request.user.username}
+        )
+        lembrar_estudante(request, estudante)
+    
+    modulos = queries.mapa_modulos(estudante)
+    return render(request, 'desafios.html', {'modulos': modulos})
+
+
 @login_required
+@resposta_condicional(chaves_estudante('conteudo'))
 def desafios_view(request):
-    modulos = Modulo.objects.all()
-    return render(request, 'desafios.html', {'modulos': modulos})
+    return _mapa_desafios(request)
 
-    
+
+@resposta_condicional(chaves_estudante('conteudo'))
 def lista_desafios(request):
-    modulos = Modulo.objects.all()
-    return render(request, 'desafios.html', {'modulos': modulos})
\ No newline at end of file
+    return _mapa_desafios(request)
@@ -0,0 +1,134 @@
+"""
+Aquecimento do processo antes de receber tráfego.
+
+aquecer() faz o trabalho que, sem ele, as primeiras requisições de cada
+worker pagariam: compila todos os templates (ficam no loader em cache),
+resolve e compila todas as rotas, carrega as traduções, preenche os caches
+de módulos, quizzes, ranking, estatísticas e curva de níveis e, por fim,
+fecha as conexões com o banco. Sem conexões abertas é seguro fazer fork
+depois dele (gunicorn --preload): cada worker abre as suas.
+
+Roda pelo comando `aquecer` ou automaticamente ao carregar logicash/wsgi.py e
+logicash/asgi.py com LOGICASH_AQUECER=1. Uma etapa que falha é registrada no
+log e não impede as demais nem a subida do servidor.
+"""
+
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import translation
+
+logger = logging.getLogger(__name__)
+
+EXTENSOES_TEMPLATE = ('.html', '.txt')
+
+
+def _rotas(resolver):
+    total = 0
+    for padrao in resolver.url_patterns:
+        padrao.pattern.regex  # compila a expressão regular (preguiçosa)
+        if isinstance(padrao, URLResolver):
+            total += _rotas(padrao)
+        elif isinstance(padrao, URLPattern):
+            total += 1
+    return total
+
+
+def aquecer_rotas():
+    resolver = get_resolver()
+    total = _rotas(resolver)
+    resolver.reverse_dict  # popula os dicionários usados por reverse() e {% url %}
+    return f'{total} rotas'
+
+
+def aquecer_templates():
+    compilados, falhas = 0, []
+    for motor in engines.all():
+        for pasta in motor.template_dirs:
+            pasta = str(pasta)
+            for raiz, _, arquivos in os.walk(pasta):
+                for arquivo in arquivos:
+                    if not arquivo.endswith(EXTENSOES_TEMPLATE):
+                        continue
+                    nome = os.path.relpath(os.path.join(raiz, arquivo), pasta).replace(os.sep, '/')
+                    try:
+                        motor.get_template(nome)
+                    except (TemplateDoesNotExist, TemplateSyntaxError) as erro:
+                        falhas.append(f'{nome}: {erro}')
+                    else:
+                        compilados += 1
+    for falha in falhas:
+        logger.info('Template não compilado no aquecimento: %s', falha)
+    return f'{compilados} templates' + (f', {len(falhas)} com erro' if falhas else '')
+
+
+def aquecer_traducoes():
+    translation.activate(settings.LANGUAGE_CODE)
+    translation.gettext('Home')
+    translation.deactivate()
+    return settings.LANGUAGE_CODE
+
+
+def aquecer_caches():
+    from . import adaptive, levels, queries
+    from .models import Quiz
+
+    queries.estrutura_modulos()
+    queries.topo_ranking()
+    queries.estatisticas_gerais()
+    levels.curva()
+    quizzes = list(Quiz.objects.filter(ativo=True).values_list('pk', flat=True))
+    for quiz_id in quizzes:
+        adaptive.perguntas_do_quiz(quiz_id)
+    return f'módulos, ranking, estatísticas, níveis e {len(quizzes)} quizzes'
+
+
+def fechar_conexoes():
+    # Abre cada banco (falha aqui, e não na primeira requisição, se algum estiver fora)
+    try:
+        for conexao in connections.all():
+            conexao.ensure_connection()
+    finally:
+        connections.close_all()
+    return f'{len(connections.all())} bancos'
+
+
+ETAPAS = (
+    ('rotas', aquecer_rotas),
+    ('templates', aquecer_templates),
+    ('traducoes', aquecer_traducoes),
+    ('caches', aquecer_caches),
+    ('conexoes', fechar_conexoes),  # sempre a última: nada pode ficar aberto antes do fork
+)
+
+
+def aquecer(inicio=None):
+    """
+    Executa as etapas e retorna [(etapa, segundos, detalhe ou erro, ok)].
+    `inicio` (time.perf_counter() do começo da carga do processo) inclui no
+    log o tempo total de inicialização.
+    """
+    relatorio = []
+    comeco = time.perf_counter()
+    for nome, etapa in ETAPAS:
+        antes = time.perf_counter()
+        try:
+            detalhe, ok = etapa(), True
+        except Exception as erro:  # o aquecimento nunca impede o servidor de subir
+            logger.exception('Falha na etapa %s do aquecimento', nome)
+            detalhe, ok = f'{type(erro).__name__}: {erro}', False
+        relatorio.append((nome, time.perf_counter() - antes, detalhe, ok))
+
+    duracao = time.perf_counter() - comeco
+    logger.info(
+        'Aquecimento em %.0f ms%s (%s)',
+        duracao * 1000,
+        f', inicialização total em {(time.perf_counter() - inicio) * 1000:.0f} ms' if inicio is not None else '',
+        ', '.join(f'{nome} {segundos * 1000:.0f} ms' for nome, segundos, _, _ in relatorio),
+    )
+    return relatorio
@@ -8,9 +8,23 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
 import os
+import time
 
-from django.core.asgi import get_asgi_application
+_inicio = time.perf_counter()
+
+from django.core.asgi import get_asgi_application  # noqa: E402 (o aquecimento conta desde antes do import do Django)
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'logicash.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# WebSockets do quiz ao vivo (game/live.py); o resto segue para o Django
+from game.live import roteador  # noqa: E402 (depois do setup do Django)
+
+application = roteador(django_application)
+
+# Com LOGICASH_AQUECER=1 o processo se aquece antes de receber tráfego; com
+# gunicorn --preload isso acontece uma vez no master, antes do fork (ver game/warmup.py)
+if os.environ.get('LOGICASH_AQUECER') == '1':
+    from game.warmup import aquecer
+    aquecer(inicio=_inicio)
@@ -21,12 +21,20 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-fl%kvrqg*0k@&!o@9tuim^k6q9o9=&%r%^m7wfq44+5!((g)rw'
+SECRET_KEY = os.environ.get(
+    'LOGICASH_SECRET_KEY', 'django-insecure-fl%kvrqg*0k@&!o@9tuim^k6q9o9=&%r%^m7wfq44+5!((g)rw'
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# Em produção use LOGICASH_DEBUG=0: o comando servir se recusa a subir com DEBUG
+# ligado ou com a SECRET_KEY acima, salvo com --inseguro
+DEBUG = os.environ.get('LOGICASH_DEBUG', '1') == '1'
 
-ALLOWED_HOSTS = []
+# Identificador da versão implantada; entra nos ETags para que um deploy
+# com templates novos não responda 304 com HTML antigo
+RELEASE_VERSION = os.environ.get('LOGICASH_RELEASE', 'dev')
+
+ALLOWED_HOSTS = [host for host in os.environ.get('LOGICASH_ALLOWED_HOSTS', '').split(',') if host]
 
 
 # Application definition
@@ -42,13 +50,19 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'game.health.SaudeMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'game.memory.MemoriaMiddleware',
+    'game.middleware.StaticAssetMiddleware',
+    'game.routers.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'game.profiling.ProfilingMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'game.querylog.ConsultaLentaMiddleware',
 ]
 
 ROOT_URLCONF = 'logicash.urls'
@@ -74,10 +88,54 @@ WSGI_APPLICATION = 'logicash.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Servidor de produção (comando servir, game/server.py)
+SERVIDOR_WORKERS = int(os.environ.get('LOGICASH_WORKERS', 2 * (os.cpu_count() or 1) + 1))
+SERVIDOR_THREADS = int(os.environ.get('LOGICASH_THREADS', 1))
+SERVIDOR_MAX_REQUISICOES = int(os.environ.get('LOGICASH_MAX_REQUISICOES', 1000))
+SERVIDOR_TIMEOUT_GRACIOSO = int(os.environ.get('LOGICASH_TIMEOUT_GRACIOSO', 30))
+
+# Conexões persistentes: cada thread de cada worker mantém uma conexão por banco,
+# então o total é workers * threads. Acima de DB_MAX_CONEXOES (o que o servidor do
+# banco aceita para esta aplicação) as conexões voltam a ser fechadas a cada
+# requisição (o check game.W001 avisa). O comando servir aplica a mesma regra
+# aos --workers/--threads efetivos (game.server.conn_max_age).
+DB_MAX_CONEXOES = int(os.environ.get('LOGICASH_DB_MAX_CONEXOES', 100))
+DB_CONN_MAX_AGE = int(os.environ.get('LOGICASH_CONN_MAX_AGE', 60))
+_CONN_MAX_AGE = DB_CONN_MAX_AGE if SERVIDOR_WORKERS * SERVIDOR_THREADS <= DB_MAX_CONEXOES else 0
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': _CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# Réplicas de leitura (opcional), usadas pelo ranking, estatísticas e exportações.
+# LOGICASH_REPLICAS lista os arquivos separados por vírgula; localmente, uma cópia
+# do db.sqlite3 serve como réplica (ver docs/SETUP.md). Com outro banco, declare
+# os aliases em DATABASES e liste-os em DATABASE_REPLICAS.
+DATABASE_REPLICAS = []
+for _indice, _arquivo in enumerate(filter(None, os.environ.get('LOGICASH_REPLICAS', '').split(','))):
+    _alias = f'replica{_indice + 1}'
+    DATABASES[_alias] = {**DATABASES['default'], 'NAME': _arquivo.strip(), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(_alias)
+
+DATABASE_ROUTERS = ['game.routers.ReplicaRouter']
+
+# Segundos em que o estudante continua lendo do banco principal depois de uma escrita
+REPLICA_ATRASO_MAXIMO = int(os.environ.get('LOGICASH_REPLICA_ATRASO', 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Em produção com vários workers, use um backend compartilhado (Redis/Memcached)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'logicash',
     }
 }
 
@@ -124,6 +182,17 @@ STATICFILES_DIRS = [
 
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# collectstatic gera nomes com hash, minifica CSS/JS e cria variantes .gz/.br,
+# servidas pelo game.middleware.StaticAssetMiddleware com cache imutável
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'game.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
 # Media files (uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -138,6 +207,53 @@ LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/login/'
 
+# Perfilamento sob demanda (game/profiling.py): a equipe pede com ?_perfil=1 ou o
+# header X-Perfil: 1; LOGICASH_PERFIL_AMOSTRAGEM perfila uma fração do tráfego (ex.: 0.001)
+PERFIL_DIRETORIO = os.environ.get('LOGICASH_PERFIL_DIRETORIO', os.path.join(BASE_DIR, 'perfis'))
+PERFIL_AMOSTRAGEM = float(os.environ.get('LOGICASH_PERFIL_AMOSTRAGEM', 0))
+PERFIL_MAX_CAPTURAS = int(os.environ.get('LOGICASH_PERFIL_MAX_CAPTURAS', 200))
+# 'cprofile' ou 'amostragem' (pyinstrument, se instalado): um só profiler por requisição
+PERFIL_MODO = os.environ.get('LOGICASH_PERFIL_MODO', 'cprofile')
+
+# Memória dos workers (game/memory.py): acima de LOGICASH_MEMORIA_LIMITE_MB o tracemalloc
+# é ligado e, a cada MEMORIA_INTERVALO requisições, o crescimento vai para o log 'game.memory'
+MEMORIA_DIRETORIO = os.environ.get('LOGICASH_MEMORIA_DIRETORIO', os.path.join(BASE_DIR, 'memoria'))
+MEMORIA_LIMITE_MB = int(os.environ.get('LOGICASH_MEMORIA_LIMITE_MB', 0))
+MEMORIA_INTERVALO = int(os.environ.get('LOGICASH_MEMORIA_INTERVALO', 1000))
+# Snapshots automáticos mantidos em disco além da base
+MEMORIA_AUTOMATICOS = int(os.environ.get('LOGICASH_MEMORIA_AUTOMATICOS', 5))
+MEMORIA_QUADROS = 10
+
+# Queries acima de LOGICASH_CONSULTA_LENTA_MS vão para o log 'game.querylog' com o
+# plano de execução da primeira ocorrência (vazio desliga; 0 registra todas)
+_consulta_lenta = os.environ.get('LOGICASH_CONSULTA_LENTA_MS', '100')
+CONSULTA_LENTA_MS = float(_consulta_lenta) if _consulta_lenta else None
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'game': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
+# Sondas /saude/vivo/ e /saude/pronto/ (game/health.py): latência máxima aceita do banco e do cache
+SAUDE_LIMITE_MS = int(os.environ.get('LOGICASH_SAUDE_LIMITE_MS', 500))
+
+# Quiz ao vivo por WebSocket (game/live.py, somente sob ASGI): segundos por pergunta,
+# janela de agrupamento das mensagens de saída, tamanho máximo da sala e segundos
+# sem o professor conectado antes de a sala ser encerrada (e gravada)
+AO_VIVO_TEMPO_PERGUNTA = int(os.environ.get('LOGICASH_AO_VIVO_TEMPO_PERGUNTA', 20))
+AO_VIVO_INTERVALO_MS = int(os.environ.get('LOGICASH_AO_VIVO_INTERVALO_MS', 100))
+AO_VIVO_MAX_PARTICIPANTES = int(os.environ.get('LOGICASH_AO_VIVO_MAX_PARTICIPANTES', 500))
+AO_VIVO_TEMPO_ORFA = int(os.environ.get('LOGICASH_AO_VIVO_TEMPO_ORFA', 120))
+# As salas vivem na memória de um worker: só com o balanceador fixando cada
+# /ws/ao-vivo/<codigo>/ em um worker o comando `servir --asgi` aceita vários workers
+AO_VIVO_AFINIDADE = os.environ.get('LOGICASH_AO_VIVO_AFINIDADE') == '1'
+
 # Configurações de Email (para desenvolvimento)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 DEFAULT_FROM_EMAIL = 'noreply@logicash.com'
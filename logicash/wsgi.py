@@ -8,9 +8,18 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 """
 
 import os
+import time
 
-from django.core.wsgi import get_wsgi_application
+_inicio = time.perf_counter()
+
+from django.core.wsgi import get_wsgi_application  # noqa: E402 (o aquecimento conta desde antes do import do Django)
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'logicash.settings')
 
 application = get_wsgi_application()
+
+# Com LOGICASH_AQUECER=1 o processo se aquece antes de receber tráfego; com
+# gunicorn --preload isso acontece uma vez no master, antes do fork (ver game/warmup.py)
+if os.environ.get('LOGICASH_AQUECER') == '1':
+    from game.warmup import aquecer
+    aquecer(inicio=_inicio)